@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+
+"""
+
+Name: PCFG Ruleset Loading Benchmark
+
+Description: Compares how long it takes to load a ruleset from its text
+files against loading it from a compiled binary ruleset
+
+The ruleset is copied to a temp directory and compiled there, so the
+ruleset in the Rules folder isn't modified. Times the guesser's PCFG and
+OMEN loaders and the scorer's grammar loader.
+
+Example:
+    python3 benchmarks/load_ruleset.py -r Russian
+
+"""
+
+
+import sys
+import os
+import argparse
+import contextlib
+import io
+import shutil
+import tempfile
+import time
+
+# Run from the benchmarks folder but import from the main program
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+
+from lib_guesser.binary_ruleset import compile_ruleset, open_binary_ruleset, BINARY_FILENAME
+from lib_guesser.grammar_io import load_grammar
+from lib_guesser.omen.input_file_io import load_rules
+from lib_scorer.pcfg_password_scorer import PCFGPasswordScorer
+from lib_scorer import grammar_io as scorer_grammar_io
+
+
+def time_loads(base_directory, rule_name, binary):
+    """
+    Times loading the ruleset
+
+    Inputs:
+        base_directory: The rule directory
+
+        rule_name: The name of the ruleset
+
+        binary: The BinaryRuleset to load from, or None to load the text files
+
+    Returns:
+        (pcfg_time, omen_time, scorer_time): The seconds each loader took.
+        omen_time is None if the ruleset doesn't have OMEN data
+    """
+    start_time = time.perf_counter()
+    with contextlib.redirect_stderr(io.StringIO()):
+        grammar, _, _ = load_grammar(rule_name, base_directory, '4.6', False, False, 'Grammar', binary)
+        grammar.load_all()
+    pcfg_time = time.perf_counter() - start_time
+
+    omen_time = None
+    if os.path.isfile(os.path.join(base_directory, 'Omen', 'CP.level')):
+        start_time = time.perf_counter()
+        load_rules(os.path.join(base_directory, 'Omen'), {}, binary)
+        omen_time = time.perf_counter() - start_time
+
+    # The scorer opens the binary ruleset itself, so hide it when timing
+    # the text files
+    binary_filename = os.path.join(base_directory, BINARY_FILENAME)
+    if binary is None:
+        os.rename(binary_filename, binary_filename + '.hidden')
+
+    start_time = time.perf_counter()
+    scorer_grammar_io.load_grammar(PCFGPasswordScorer(), base_directory)
+    scorer_time = time.perf_counter() - start_time
+
+    if binary is None:
+        os.rename(binary_filename + '.hidden', binary_filename)
+
+    return pcfg_time, omen_time, scorer_time
+
+
+def main():
+    """
+    Main function, runs the benchmark and prints the results to stdout
+    """
+    parser = argparse.ArgumentParser(description='Ruleset loading benchmark')
+    parser.add_argument('--rule', '-r', help='Name of the ruleset to use. Default is "Default"',
+        metavar='RULESET_NAME', required=False, default="Default")
+    args = parser.parse_args()
+
+    rule_directory = os.path.join(
+        os.path.dirname(os.path.realpath(__file__)),
+        '..',
+        'Rules',
+        args.rule)
+
+    with tempfile.TemporaryDirectory() as temp_directory:
+        base_directory = os.path.join(temp_directory, args.rule)
+        shutil.copytree(rule_directory, base_directory)
+
+        start_time = time.perf_counter()
+        binary_filename = compile_ruleset(base_directory)
+        compile_time = time.perf_counter() - start_time
+        file_size = os.path.getsize(binary_filename)
+
+        text_times = time_loads(base_directory, args.rule, None)
+
+        binary = open_binary_ruleset(base_directory)
+        binary_times = time_loads(base_directory, args.rule, binary)
+        binary.close()
+
+    print()
+    print(f"Ruleset: {args.rule}")
+    print(f"Compile: {compile_time:.3f} seconds ({file_size} bytes)")
+    for name, text_time, binary_time in zip(['PCFG', 'OMEN', 'Scorer'], text_times, binary_times):
+        if text_time is None:
+            print(f"{name}: no data in the ruleset")
+            continue
+        print(f"{name}: text {text_time:.3f} seconds, binary {binary_time:.3f} seconds, " +
+            f"speedup {text_time / binary_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+
+"""
+
+Name: OMEN Guess Generation Benchmark
+
+Description: Times how fast the OMEN MarkovCracker generates guesses at each
+OMEN level, and how much memory the OMEN grammar takes up
+
+Only the first --num guesses are generated for each level, (rounded up to
+the end of a batch), so the higher levels finish in a reasonable amount of
+time. The guesses are generated in batches the same way the guesser does
+it, but aren't printed.
+
+Example:
+    python3 benchmarks/omen_guesses.py -r Default --num 500000
+
+"""
+
+
+import sys
+import os
+import argparse
+import time
+import tracemalloc
+
+# Run from the benchmarks folder but import from the main program
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+
+from lib_guesser.omen.input_file_io import load_rules
+from lib_guesser.omen.markov_cracker import MarkovCracker
+from lib_guesser.omen.optimizer import Optimizer
+
+
+def main():
+    """
+    Main function, runs the benchmark and prints the results to stdout
+    """
+    parser = argparse.ArgumentParser(description='OMEN guess generation benchmark')
+    parser.add_argument('--rule', '-r', help='Name of the ruleset to use. Default is "Default"',
+        metavar='RULESET_NAME', required=False, default="Default")
+    parser.add_argument('--num', '-n', help='Maximum guesses to generate per level. Default is 200000',
+        metavar='INT', type=int, default=200000)
+    parser.add_argument('--max_level', help='Highest OMEN level to generate guesses for. Default is 11',
+        metavar='INT', type=int, default=11)
+    args = parser.parse_args()
+
+    omen_directory = os.path.join(
+        os.path.dirname(os.path.realpath(__file__)),
+        '..',
+        'Rules',
+        args.rule,
+        'Omen')
+
+    tracemalloc.start()
+    grammar = {}
+    if not load_rules(omen_directory, grammar):
+        print("Error loading the OMEN ruleset")
+        return
+    grammar_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    optimizer = Optimizer(max_length = 4)
+
+    print()
+    print(f"OMEN grammar memory: {grammar_memory / 1024 / 1024:.1f} MB")
+    print()
+    print("Level    Guesses    Seconds    Guesses per second")
+
+    total_guesses = 0
+    total_time = 0
+    for level in range(1, args.max_level + 1):
+        markov_cracker = MarkovCracker(grammar, level, optimizer)
+
+        num_guesses = 0
+        start_time = time.perf_counter()
+        while num_guesses < args.num:
+            guesses = markov_cracker.next_guesses()
+            if guesses is None:
+                break
+            num_guesses += len(guesses)
+        level_time = time.perf_counter() - start_time
+
+        total_guesses += num_guesses
+        total_time += level_time
+        print(f"{level:5} {num_guesses:10} {level_time:10.3f} {num_guesses / level_time:21,.0f}")
+
+    print(f"Total {total_guesses:10} {total_time:10.3f} {total_guesses / total_time:21,.0f}")
+
+
+if __name__ == "__main__":
+    main()
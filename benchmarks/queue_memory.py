@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+
+
+"""
+
+Name: PCFG Guesser Priority Queue Memory Benchmark
+
+Description: Fills a PcfgQueue with a large number of pre-terminals and
+reports how many bytes each queued pre-terminal costs.
+
+For comparison it also builds the same number of items using the old
+format, where every parse tree was a dictionary holding a list of
+(name, index) tuples wrapped in a QueueItem object.
+
+Uses the base structures and grammar from a ruleset so the parse trees
+are realistic, but the indexes of each parse tree are picked at random
+since a real cracking session would take a long time to build up a
+queue with millions of items in it.
+
+Example:
+    python3 benchmarks/queue_memory.py -r Default -n 1000000
+
+"""
+
+
+import sys
+import os
+import argparse
+import gc
+import heapq
+import random
+import tracemalloc
+
+# Run from the benchmarks folder but import from the main program
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+
+from lib_guesser.pcfg_grammar import PcfgGrammar
+from lib_guesser.priority_queue import PcfgQueue
+
+
+class LegacyQueueItem:
+    """
+    The old pqueue wrapper, kept here only to measure its memory usage
+    """
+
+    def __init__(self, pt_item):
+        self.pt_item = pt_item
+
+    def __lt__(self, other):
+        return self.pt_item['prob'] > other.pt_item['prob']
+
+
+def random_parse_trees(pcfg, num_items, seed):
+    """
+    Generates random compiled pt_items for the benchmark
+
+    Inputs:
+        pcfg: The PcfgGrammar to pull base structures from
+
+        num_items: The number of pt_items to generate
+
+        seed: The random seed so runs are repeatable
+
+    Returns:
+        pt_items: A generator of compiled pt_items
+    """
+    rand = random.Random(seed)
+    compiled = pcfg.compiled
+    num_bases = len(compiled.base_types)
+
+    for _ in range(num_items):
+        base_id = rand.randrange(num_bases)
+        indices = tuple(
+            rand.randrange(compiled.num_groups(type_id))
+            for type_id in compiled.base_types[base_id]
+            )
+        yield {
+            'prob': compiled.find_prob(base_id, indices),
+            'base_id': base_id,
+            'indices': indices,
+        }
+
+
+def measure(fill_function):
+    """
+    Measures how much memory is still allocated after running fill_function
+
+    Inputs:
+        fill_function: A function that builds and returns the structure
+        to measure
+
+    Returns:
+        (structure, num_bytes)
+    """
+    gc.collect()
+    tracemalloc.start()
+    structure = fill_function()
+    gc.collect()
+    num_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return structure, num_bytes
+
+
+def main():
+    """
+    Main function, runs the benchmark and prints the results to stdout
+    """
+    parser = argparse.ArgumentParser(description='PcfgQueue memory benchmark')
+    parser.add_argument('--rule', '-r', help='Name of the ruleset to use. Default is "Default"',
+        metavar='RULESET_NAME', required=False, default="Default")
+    parser.add_argument('--num', '-n', help='Number of pre-terminals to queue. Default is 1000000',
+        metavar='INT', required=False, default=1000000, type=int)
+    parser.add_argument('--seed', help='Random seed. Default is 0',
+        metavar='INT', required=False, default=0, type=int)
+    args = parser.parse_args()
+
+    base_directory = os.path.join(
+        os.path.dirname(os.path.realpath(__file__)),
+        '..',
+        'Rules',
+        args.rule)
+
+    pcfg = PcfgGrammar(args.rule, base_directory, '4.6', skip_brute=True)
+
+    # The pt_items are generated while filling each queue so the memory for
+    # the parse tree tuples is counted. Temporary dictionaries are freed
+    # before the measurement is taken
+    def fill_queue():
+        pcfg_queue = PcfgQueue(pcfg)
+        pcfg_queue.p_queue = []
+        for pt_item in random_parse_trees(pcfg, args.num, args.seed):
+            pcfg_queue.insert_queue(pt_item)
+        return pcfg_queue
+
+    def fill_legacy():
+        p_queue = []
+        for pt_item in random_parse_trees(pcfg, args.num, args.seed):
+            legacy_item = {
+                'pt': pcfg.compiled.decode(pt_item['base_id'], pt_item['indices']),
+                'base_prob': pcfg.base[pt_item['base_id']]['prob'],
+                'prob': pt_item['prob'],
+            }
+            heapq.heappush(p_queue, LegacyQueueItem(legacy_item))
+        return p_queue
+
+    pcfg_queue, queue_bytes = measure(fill_queue)
+    del pcfg_queue
+    legacy_queue, legacy_bytes = measure(fill_legacy)
+    del legacy_queue
+
+    print()
+    print(f"Ruleset: {args.rule}")
+    print(f"Pre-terminals queued: {args.num}")
+    print(f"PcfgQueue: {queue_bytes / args.num:.1f} bytes per pre-terminal ({queue_bytes} total)")
+    print(f"Old QueueItem format: {legacy_bytes / args.num:.1f} bytes per pre-terminal ({legacy_bytes} total)")
+    print(f"Reduction: {legacy_bytes / queue_bytes:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
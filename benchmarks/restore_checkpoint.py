@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+
+"""
+
+Name: PCFG Guesser Session Restore Benchmark
+
+Description: Compares how long it takes to restore the priority queue of a
+saved session by re-walking the grammar, (the normal session save file),
+against loading a checkpoint of the pqueue.
+
+Pops pre-terminals off a PcfgQueue to simulate a session that has been
+running for a while, then saves it both ways and times restoring it.
+
+Example:
+    python3 benchmarks/restore_checkpoint.py -r Default -n 200000
+
+"""
+
+
+import sys
+import os
+import argparse
+import configparser
+import io
+import tempfile
+import time
+
+# Run from the benchmarks folder but import from the main program
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+
+from lib_guesser.pcfg_grammar import PcfgGrammar
+from lib_guesser.priority_queue import PcfgQueue
+from lib_guesser.queue_checkpoint import write_checkpoint, read_checkpoint
+
+
+def main():
+    """
+    Main function, runs the benchmark and prints the results to stdout
+    """
+    parser = argparse.ArgumentParser(description='Session restore benchmark')
+    parser.add_argument('--rule', '-r', help='Name of the ruleset to use. Default is "Default"',
+        metavar='RULESET_NAME', required=False, default="Default")
+    parser.add_argument('--num', '-n', help='Number of pre-terminals to pop before saving. Default is 200000',
+        metavar='INT', required=False, default=200000, type=int)
+    args = parser.parse_args()
+
+    base_directory = os.path.join(
+        os.path.dirname(os.path.realpath(__file__)),
+        '..',
+        'Rules',
+        args.rule)
+
+    pcfg = PcfgGrammar(args.rule, base_directory, '4.6', skip_brute=True)
+
+    # Simulate a session that exits after popping num pre-terminals. The
+    # last one popped hasn't been guessed yet, so it is saved as pending
+    pcfg_queue = PcfgQueue(pcfg)
+    num_popped = 0
+    pending_item = None
+    while num_popped < args.num:
+        pt_item = pcfg_queue.next()
+        if pt_item is None:
+            break
+        pending_item = pt_item
+        num_popped += 1
+
+    save_config = configparser.ConfigParser()
+    save_config.add_section('guessing_info')
+    pcfg_queue.update_save_config(save_config)
+
+    # Re-walk the grammar to restore the pqueue
+    start_time = time.perf_counter()
+    rewalk_queue = PcfgQueue(pcfg, save_config)
+    rewalk_time = time.perf_counter() - start_time
+
+    # Save and then load a checkpoint
+    config_text = io.StringIO()
+    save_config.write(config_text)
+
+    with tempfile.TemporaryDirectory() as temp_directory:
+        filename = os.path.join(temp_directory, 'benchmark.chk')
+
+        start_time = time.perf_counter()
+        queue_items, next_seq = pcfg_queue.checkpoint_snapshot()
+        pending_items = [(-pending_item['prob'], 0, pending_item['indices'], pending_item['base_id'])]
+        write_checkpoint(filename, config_text.getvalue(), pending_items, queue_items, next_seq)
+        write_time = time.perf_counter() - start_time
+        file_size = os.path.getsize(filename)
+
+        start_time = time.perf_counter()
+        _, _, queue_items, next_seq = read_checkpoint(filename)
+        checkpoint_queue = PcfgQueue(pcfg, save_config, checkpoint = (queue_items, next_seq))
+        load_time = time.perf_counter() - start_time
+
+    # The re-walk puts the pending pre-terminal back in the pqueue, while the
+    # checkpoint already has its children. Pop it so they both end up with
+    # the same parse trees in the pqueue
+    #
+    # They can still differ slightly. The re-walk decides what was already
+    # guessed by comparing probabilities to the last one popped, so parse
+    # trees that tie with it, (or only differ by rounding), can be dropped
+    # or added twice. The checkpoint saves the exact pqueue
+    rewalk_queue.next()
+    rewalk_items = [(item[3], item[2]) for item in rewalk_queue.p_queue]
+    checkpoint_items = [(item[3], item[2]) for item in checkpoint_queue.p_queue]
+
+    print()
+    print(f"Ruleset: {args.rule}")
+    print(f"Pre-terminals popped: {num_popped}")
+    print(f"Pre-terminals in the pqueue: {len(pcfg_queue.p_queue)}")
+    print(f"Re-walk restore: {rewalk_time:.3f} seconds")
+    print(f"Checkpoint write: {write_time:.3f} seconds ({file_size} bytes)")
+    print(f"Checkpoint restore: {load_time:.3f} seconds")
+    print(f"Speedup: {rewalk_time / load_time:.1f}x")
+    print(f"Parse trees only in the re-walk pqueue: {len(set(rewalk_items) - set(checkpoint_items))}")
+    print(f"Parse trees only in the checkpoint pqueue: {len(set(checkpoint_items) - set(rewalk_items))}")
+    print(f"Duplicates in the re-walk pqueue: {len(rewalk_items) - len(set(rewalk_items))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+
+"""
+
+Name: PCFG Batch Scoring Benchmark
+
+Description: Compares scoring a list of passwords one at a time with
+PCFGPasswordScorer.parse() against scoring them with parse_batch()
+
+Lists of real passwords have a lot of duplicates and shared sections, so
+use a password leak or a sample of one as the input to get realistic
+numbers.
+
+Example:
+    python3 benchmarks/score_batch.py -r Default -i passwords.txt
+
+"""
+
+
+import sys
+import os
+import argparse
+import contextlib
+import io
+import time
+
+# Run from the benchmarks folder but import from the main program
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+
+from lib_scorer.pcfg_password_scorer import PCFGPasswordScorer
+from lib_scorer.grammar_io import load_grammar
+
+
+def main():
+    """
+    Main function, runs the benchmark and prints the results to stdout
+    """
+    parser = argparse.ArgumentParser(description='Batch scoring benchmark')
+    parser.add_argument('--rule', '-r', help='Name of the ruleset to use. Default is "Default"',
+        metavar='RULESET_NAME', required=False, default="Default")
+    parser.add_argument('--input', '-i', help='File of passwords to score, one per line',
+        metavar='INPUT_FILENAME', required=True)
+    parser.add_argument('--batch_size', help='Passwords passed to each parse_batch() call. Default is 100000',
+        metavar='INT', type=int, default=100000)
+    args = parser.parse_args()
+
+    base_directory = os.path.join(
+        os.path.dirname(os.path.realpath(__file__)),
+        '..',
+        'Rules',
+        args.rule)
+
+    pw_parser = PCFGPasswordScorer()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if not load_grammar(pw_parser, base_directory):
+            print("Error loading the ruleset")
+            return
+    pw_parser.create_multiword_detector()
+    pw_parser.create_omen_scorer(base_directory, 9)
+
+    with open(args.input, encoding='utf-8', errors='replace') as input_file:
+        passwords = [line.rstrip('\r\n') for line in input_file]
+
+    start_time = time.perf_counter()
+    single = [pw_parser.parse(password) for password in passwords]
+    single_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    batch = []
+    for index in range(0, len(passwords), args.batch_size):
+        batch.extend(pw_parser.parse_batch(passwords[index:index + args.batch_size]))
+    batch_time = time.perf_counter() - start_time
+
+    mismatches = sum(
+        1 for one, other in zip(single, batch)
+        if one[1] != other[1] or one[3] != other[3] or abs(one[2] - other[2]) > one[2] * 1e-9)
+
+    print()
+    print(f"Passwords: {len(passwords)}, unique: {len(set(passwords))}")
+    print(f"parse(): {single_time:.3f} seconds")
+    print(f"parse_batch(): {batch_time:.3f} seconds, speedup {single_time / batch_time:.1f}x")
+    print(f"Mismatched results: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+
+
+"""
+
+Name: PCFG Scorer Server Load Test
+
+Description: Sends score requests to a scorer service from several clients
+at once, and prints the latency of the requests and how many passwords
+were scored per second
+
+Starts its own scorer_server.py on a temporary Unix socket unless --socket
+or --port is used to test a service that is already running. The clients
+are threads, each with its own connection, that keep sending batches of
+passwords from the input file until the time is up.
+
+Example:
+    python3 benchmarks/scorer_load_test.py -r Default -i passwords.txt --clients 4 --batch_size 1
+
+"""
+
+
+import sys
+import os
+import argparse
+import subprocess
+import tempfile
+import threading
+import time
+import itertools
+
+# Run from the benchmarks folder but import from the main program
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+
+from lib_scorer.scorer_client import ScorerClient
+
+
+def start_server(rule_name, socket_path, timeout = 120):
+    """
+    Starts a scorer_server.py and waits for it to start listening
+
+    Inputs:
+        rule_name: The ruleset for the server to load
+
+        socket_path: The Unix socket for the server to listen on
+
+        timeout: How many seconds to wait for the ruleset to load
+
+    Returns:
+        process: The subprocess.Popen of the server
+    """
+    program = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'scorer_server.py')
+    process = subprocess.Popen(
+        [sys.executable, program, '-r', rule_name, '--socket', socket_path],
+        stderr = subprocess.DEVNULL)
+
+    stop_time = time.perf_counter() + timeout
+    while time.perf_counter() < stop_time:
+        if process.poll() is not None:
+            raise RuntimeError("The scorer server exited before it started listening")
+        try:
+            ScorerClient(socket_path = socket_path).close()
+            return process
+        except OSError:
+            time.sleep(0.05)
+
+    process.terminate()
+    raise RuntimeError("Timed out waiting for the scorer server to start")
+
+
+def run_client(connect_args, passwords, batch_size, stop_time, latencies):
+    """
+    Sends batches of passwords until the time is up
+
+    Runs in its own thread
+
+    Inputs:
+        connect_args: The arguments to create the ScorerClient with
+
+        passwords: The list of passwords to send
+
+        batch_size: How many passwords to send in each request
+
+        stop_time: The time.perf_counter() to stop at
+
+        latencies: The list to add the seconds each request took to
+
+    Returns:
+        None
+    """
+    client = ScorerClient(**connect_args)
+
+    # Loop through the input file as many times as needed
+    password_loop = itertools.cycle(passwords)
+
+    while time.perf_counter() < stop_time:
+        batch = list(itertools.islice(password_loop, batch_size))
+
+        start_time = time.perf_counter()
+        client.score(batch)
+        latencies.append(time.perf_counter() - start_time)
+
+    client.close()
+
+
+def percentile(sorted_values, percent):
+    """
+    Gets a percentile of a sorted list
+
+    Inputs:
+        sorted_values: The list of values, sorted from smallest to largest
+
+        percent: The percentile to get, aka 99
+
+    Returns:
+        value: The value at that percentile
+    """
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * percent / 100))
+    return sorted_values[index]
+
+
+def main():
+    """
+    Main function, runs the load test and prints the results to stdout
+    """
+    parser = argparse.ArgumentParser(description='Scorer server load test')
+    parser.add_argument('--rule', '-r', help='Name of the ruleset to start the server with. Default is "Default"',
+        metavar='RULESET_NAME', required=False, default="Default")
+    parser.add_argument('--input', '-i', help='File of passwords to send, one per line. ' +
+        'Default is scorer_test_list.txt', metavar='INPUT_FILENAME', required=False,
+        default=os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'scorer_test_list.txt'))
+    parser.add_argument('--clients', help='Number of clients sending requests at once. Default is 4',
+        metavar='INT', type=int, default=4)
+    parser.add_argument('--batch_size', help='Passwords sent in each request. Default is 1',
+        metavar='INT', type=int, default=1)
+    parser.add_argument('--time', help='Seconds to run the test for. Default is 10',
+        metavar='SECONDS', type=float, default=10)
+    parser.add_argument('--socket', help='Test a server that is already running on this Unix socket',
+        metavar='SOCKET_FILENAME', default=None)
+    parser.add_argument('--port', help='Test a server that is already running on this localhost port',
+        metavar='PORT', type=int, default=None)
+    args = parser.parse_args()
+
+    with open(args.input, encoding='utf-8', errors='replace') as input_file:
+        passwords = [line.rstrip('\r\n') for line in input_file if line.rstrip('\r\n')]
+    if not passwords:
+        print("Error: The input file doesn't have any passwords in it")
+        return
+
+    temp_directory = None
+    process = None
+    if args.port is not None:
+        connect_args = {'port': args.port}
+    elif args.socket is not None:
+        connect_args = {'socket_path': args.socket}
+    else:
+        temp_directory = tempfile.TemporaryDirectory()
+        socket_path = os.path.join(temp_directory.name, 'scorer.sock')
+        print(f"Starting a scorer server with the {args.rule} ruleset")
+        process = start_server(args.rule, socket_path)
+        connect_args = {'socket_path': socket_path}
+
+    try:
+        latencies = []
+        stop_time = time.perf_counter() + args.time
+        threads = [
+            threading.Thread(
+                target=run_client,
+                args=(connect_args, passwords, args.batch_size, stop_time, latencies))
+            for _ in range(args.clients)]
+
+        start_time = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start_time
+
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+            temp_directory.cleanup()
+
+    if not latencies:
+        print("Error: No requests finished")
+        return
+
+    latencies.sort()
+    num_passwords = len(latencies) * args.batch_size
+
+    print()
+    print(f"Clients: {args.clients}, batch size: {args.batch_size}")
+    print(f"Requests: {len(latencies)} in {elapsed:.2f} seconds")
+    print(f"Throughput: {num_passwords / elapsed:.0f} passwords per second")
+    print("Latency: " + ", ".join(
+        f"p{percent} {percentile(latencies, percent) * 1000:.3f} ms" for percent in [50, 95, 99]))
+    print(f"         max {latencies[-1] * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+"""
+
+Name: PCFG Ruleset Compiler
+
+   Compiles a trained ruleset into a single binary file, (ruleset.bin in the
+   rule directory), that the guesser and the scorer memory-map instead of
+   parsing all of the text files when they start up.
+
+   The text files are still used by everything else, and are what you should
+   edit. If any of them change after the ruleset is compiled, the binary file
+   is ignored until this is run again.
+
+Copyright 2021 Matt Weir
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+Contact Info: cweir@vt.edu
+
+"""
+
+# Including this to print error message if python < 3.0 is used
+from __future__ import print_function
+import sys
+# Check for python3 and error out if not
+if sys.version_info[0] < 3:
+    print("This program requires Python 3.x", file=sys.stderr)
+    sys.exit(1)
+
+import argparse
+import os
+import time
+
+# Local imports
+from lib_guesser.binary_ruleset import compile_ruleset
+
+
+def parse_command_line(program_info):
+    """
+    Parses the command line
+
+    Inputs:
+        program_info: A python dictionary that contains information about
+        the program, and variables which cotain default values for
+        command line options
+
+    Returns:
+        True: If the command line was parsed correctly
+
+        False: If an error occured parsing the command line
+    """
+
+    # Keeping the title text to be generic to make re-using code easier
+    parser = argparse.ArgumentParser(
+        description= program_info['name'] +
+        ', version: ' +
+        program_info['version']
+    )
+
+    parser.add_argument(
+        '--rule',
+        '-r',
+        help = 'Name of the ruleset to compile. Default is ' +
+        program_info['rule_name'],
+        metavar = 'RULESET_NAME',
+        required = False,
+        default = program_info['rule_name']
+    )
+
+    args=parser.parse_args()
+
+    program_info['rule_name'] = args.rule
+
+    return True
+
+
+def main():
+    # Information about this program
+    program_info = {
+        # Program and Contact Info
+        'name':'PCFG Ruleset Compiler',
+        'version': '4.6',
+        'author':'Matt Weir',
+        'contact':'cweir@vt.edu',
+
+        # Standard Options
+        'rule_name':'Default',
+    }
+
+    print(program_info['name'])
+    print("Version: " + str(program_info['version']))
+
+    # Parsing the command line
+    if not parse_command_line(program_info):
+        # There was a problem with the command line so exit
+        print("Exiting...")
+        return
+
+    base_directory = os.path.join(
+                        os.path.dirname(os.path.realpath(__file__)),
+                        'Rules',
+                        program_info['rule_name'])
+
+    print("Compiling Rule: " + str(program_info['rule_name']))
+    start_time = time.perf_counter()
+
+    try:
+        filename = compile_ruleset(base_directory)
+
+    except Exception as error:
+        print(error, file=sys.stderr)
+        print("Error compiling the ruleset. Exiting...", file=sys.stderr)
+        return
+
+    print("Saved " + filename + " (" + str(os.path.getsize(filename)) + " bytes) in " +
+        f"{time.perf_counter() - start_time:.2f} seconds")
+
+
+if __name__ == "__main__":
+    main()
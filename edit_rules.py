@@ -43,6 +43,9 @@ import os
 import shutil
 import re
 
+# Local imports
+from lib_guesser.binary_ruleset import compile_ruleset, BINARY_FILENAME
+
 
 def parse_command_line(program_info):
     # Keeping the title text to be generic to make re-using code easier
@@ -213,6 +216,13 @@ def edit_rules(config):
         for line in grammar:
             grammar_fp.write(line)
 
+    # Update the binary version of the ruleset if it has one, otherwise it
+    # will be ignored since grammar.txt changed
+    rule_dir = os.path.join(config.get('rules_dir'), config.get('rule'))
+    if os.path.isfile(os.path.join(rule_dir, BINARY_FILENAME)):
+        print('Updating the binary ruleset.')
+        compile_ruleset(rule_dir)
+
     return True
 
 def main():
@@ -16,7 +16,6 @@ TO-DO
 '''
 
 import random, math, sys, time, os
-import numpy as np
 from datetime import datetime
 
 #from lib_scorer.pcfg_password_scorer import PCFGPasswordScorer
@@ -226,6 +225,10 @@ class MonteCarloEvaluator(PcfgGrammar):
         Returns:
 
         """
+        # Imported here since it is slow to import and only needed once the
+        # samples have been generated
+        import numpy as np
+
         logprobs = np.fromiter((lp for lp in samples), float)
         
         if self.log_scale != 10:
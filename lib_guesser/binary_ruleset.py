@@ -0,0 +1,563 @@
+#!/usr/bin/env python3
+
+
+"""
+
+Name: PCFG Binary Ruleset
+
+Description: Compiles a ruleset into a single binary file that can be
+memory-mapped, so it loads faster than parsing all of the text files
+
+The text files are still the "real" ruleset. The binary file is a cache of
+them saved as ruleset.bin in the rule directory. If it is missing, or any of
+the text files it was compiled from have changed since, the loaders fall
+back to reading the text files.
+
+File layout:
+
+    header: magic, version, length of the index
+    index: JSON describing where each section is in the file
+    data: The sections, each starting on an 8 byte boundary
+
+Each text file is saved as a section. There are three kinds:
+
+    'prob': A file of (value, probability) lines, like Alpha/6.txt. Saved as
+    the values, the probability of each group of values that share the same
+    probability, and where each group starts
+
+    'level': An OMEN ngram file of (level, ngram) lines, like Omen/CP.level.
+    Saved as the ngrams and an array of their levels
+
+    'lines': Any other file, saved as a list of its lines
+
+The values in a section are saved as one UTF-8 string separated by
+newlines, which can't appear in a value since the text files are line
+based.
+
+"""
+
+
+import sys
+import os
+import mmap
+import struct
+import json
+import codecs
+import configparser
+from array import array
+
+
+# The name of the binary file in the rule directory
+BINARY_FILENAME = "ruleset.bin"
+
+# Identifies the file and the version of the format
+MAGIC = b'PCFGRUL1'
+VERSION = 1
+
+# magic, version, length of the JSON index
+HEADER = struct.Struct('<8sII')
+
+# Sections start on an 8 byte boundary so arrays of doubles are aligned
+ALIGNMENT = 8
+
+# Used so values that couldn't be decoded, (saved by the loaders as
+# surrogates), make it through the round trip
+STRING_ERRORS = 'surrogatepass'
+
+# Binary rulesets that have been re-opened after being sent to a worker
+# process, keyed by the rule directory. So each worker only opens a ruleset
+# once no matter how many tasks it is sent
+_reopened = {}
+
+# The OMEN files that are saved in the binary file, and what kind of
+# section they are saved as
+OMEN_FILES = [
+    ("IP.level", 'level'),
+    ("EP.level", 'level'),
+    ("CP.level", 'level'),
+    ("LN.level", 'lines'),
+    ("alphabet.txt", 'lines'),
+    ("omen_keyspace.txt", 'lines'),
+]
+
+
+def compile_ruleset(base_directory):
+    """
+    Compiles the text files of a ruleset into a binary ruleset file
+
+    The file is written to a temp file and then renamed, so a loader never
+    sees a partially written file
+
+    Inputs:
+        base_directory: The rule directory to compile
+
+    Returns:
+        filename: The binary ruleset file that was written
+
+    Raises:
+        OSError: If the ruleset could not be read or the file written
+
+        ValueError: If one of the files in the ruleset could not be parsed
+    """
+    # Import here to avoid a circular import with grammar_io
+    from .grammar_io import _load_from_file
+
+    config = configparser.ConfigParser()
+    config_filename = os.path.join(base_directory, "config.ini")
+    with open(config_filename) as config_file:
+        config.read_file(config_file)
+
+    encoding = config.get('TRAINING_DATASET_DETAILS','encoding')
+
+    # The sources are checked when loading to see if the binary is stale
+    sources = [config_filename]
+
+    omen_config_filename = os.path.join(base_directory, "Omen", "config.txt")
+    omen_encoding = encoding
+    if os.path.isfile(omen_config_filename):
+        omen_config = configparser.ConfigParser()
+        omen_config.read(omen_config_filename)
+        omen_encoding = omen_config.get('training_settings','encoding')
+        sources.append(omen_config_filename)
+
+    # Holds (relpath, section_info, blobs) for each file being saved
+    sections = []
+
+    for filename in _prob_filenames(base_directory, config):
+        if not os.path.isfile(filename):
+            continue
+
+        grammar_section = []
+        if not _load_from_file(grammar_section, filename, encoding):
+            raise ValueError("Could not parse " + filename)
+
+        values = []
+        probs = array('d')
+        groups = array('I')
+        for item in grammar_section:
+            groups.append(len(values))
+            values.extend(item['values'])
+            probs.append(item['prob'])
+        groups.append(len(values))
+
+        sections.append((filename, {'kind': 'prob', 'count': len(values)}, {
+            'strings': _encode_strings(values),
+            'probs': probs.tobytes(),
+            'groups': groups.tobytes(),
+        }))
+
+    for name, kind in OMEN_FILES:
+        filename = os.path.join(base_directory, "Omen", name)
+        if not os.path.isfile(filename):
+            continue
+
+        with codecs.open(filename, 'r', encoding= omen_encoding, errors= 'strict') as file:
+            lines = [line.rstrip('\n\r') for line in file]
+
+        if kind == 'lines':
+            sections.append((filename, {'kind': kind, 'count': len(lines)}, {
+                'strings': _encode_strings(lines),
+            }))
+            continue
+
+        values = []
+        levels = array('i')
+        for line in lines:
+            split_values = line.split('\t')
+            if len(split_values) != 2:
+                raise ValueError("Error parsing " + filename)
+            levels.append(int(split_values[0]))
+            values.append(split_values[1])
+
+        sections.append((filename, {'kind': kind, 'count': len(values)}, {
+            'strings': _encode_strings(values),
+            'levels': levels.tobytes(),
+        }))
+
+    sources.extend(section[0] for section in sections)
+
+    # Lay out the data. Offsets are relative to the start of the data, since
+    # the length of the index isn't known until they are all filled in
+    data = bytearray()
+    index_sections = {}
+    for filename, section_info, blobs in sections:
+        for blob_name, blob in blobs.items():
+            data.extend(b'\0' * (-len(data) % ALIGNMENT))
+            section_info[blob_name] = [len(data), len(blob)]
+            data.extend(blob)
+        index_sections[_relative_path(base_directory, filename)] = section_info
+
+    index = {
+        'uuid': config.get('TRAINING_DATASET_DETAILS','uuid'),
+        'sources': {
+            _relative_path(base_directory, filename): _file_signature(filename)
+            for filename in sources
+        },
+        'sections': index_sections,
+    }
+    index_data = json.dumps(index, sort_keys=True).encode('utf-8')
+
+    header = HEADER.pack(MAGIC, VERSION, len(index_data))
+    padding = b'\0' * (-(len(header) + len(index_data)) % ALIGNMENT)
+
+    binary_filename = os.path.join(base_directory, BINARY_FILENAME)
+    temp_filename = binary_filename + '.tmp'
+    with open(temp_filename, 'wb') as binary_file:
+        binary_file.write(header)
+        binary_file.write(index_data)
+        binary_file.write(padding)
+        binary_file.write(data)
+        binary_file.flush()
+        os.fsync(binary_file.fileno())
+
+    os.replace(temp_filename, binary_filename)
+
+    return binary_filename
+
+
+def open_binary_ruleset(base_directory):
+    """
+    Opens the binary ruleset file for a rule directory if it can be used
+
+    Inputs:
+        base_directory: The rule directory
+
+    Returns:
+        BinaryRuleset: If the binary ruleset exists and is up to date
+
+        None: If there isn't one, or it can't be used. A warning is printed
+        if it exists but can't be used
+    """
+    filename = os.path.join(base_directory, BINARY_FILENAME)
+    if not os.path.isfile(filename):
+        return None
+
+    try:
+        binary = BinaryRuleset(base_directory)
+
+    except (OSError, ValueError) as error:
+        print("Warning: Not using the binary ruleset " + filename + ": " + str(error), file=sys.stderr)
+        return None
+
+    stale = binary.stale_sources()
+    if stale:
+        print("Warning: The binary ruleset " + filename + " is out of date, loading the text files instead", file=sys.stderr)
+        print("Files changed since it was compiled: " + ", ".join(stale), file=sys.stderr)
+        print("Run compile_ruleset.py to update it", file=sys.stderr)
+        binary.close()
+        return None
+
+    return binary
+
+
+class BinaryRuleset:
+    """
+    A memory-mapped binary ruleset file
+
+    Sections are looked up by the full path of the text file they were
+    compiled from, so the loaders can ask for the same filename they would
+    otherwise open
+    """
+
+    def __init__(self, base_directory):
+        """
+        Opens and memory-maps the binary ruleset file
+
+        Inputs:
+            base_directory: The rule directory the binary ruleset is in
+
+        Returns:
+            BinaryRuleset
+
+        Raises:
+            OSError: If the file could not be opened
+
+            ValueError: If the file isn't a valid binary ruleset
+        """
+        self.base_directory = base_directory
+        self.filename = os.path.join(base_directory, BINARY_FILENAME)
+
+        with open(self.filename, 'rb') as binary_file:
+            self.mm = mmap.mmap(binary_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            if len(self.mm) < HEADER.size:
+                raise ValueError("File is too short")
+
+            magic, version, index_length = HEADER.unpack_from(self.mm, 0)
+            if magic != MAGIC:
+                raise ValueError("Not a binary ruleset file")
+            if version != VERSION:
+                raise ValueError("Unsupported binary ruleset version " + str(version))
+
+            index_end = HEADER.size + index_length
+            if index_end > len(self.mm):
+                raise ValueError("File is truncated")
+
+            try:
+                index = json.loads(self.mm[HEADER.size:index_end].decode('utf-8'))
+            except UnicodeDecodeError as error:
+                raise ValueError("Invalid index") from error
+
+            self.data_start = index_end + (-index_end % ALIGNMENT)
+            self.uuid = index['uuid']
+            self.sources = index['sources']
+            self.sections = index['sections']
+
+            for section_info in self.sections.values():
+                for blob_name in ('strings', 'probs', 'groups', 'levels'):
+                    if blob_name in section_info:
+                        offset, length = section_info[blob_name]
+                        if self.data_start + offset + length > len(self.mm):
+                            raise ValueError("File is truncated")
+
+        except (ValueError, KeyError, struct.error) as error:
+            self.mm.close()
+            raise ValueError(str(error)) from error
+
+    def __reduce__(self):
+        """
+        Lets a BinaryRuleset be sent to worker processes. The memory map
+        can't be pickled, so the worker opens the file itself
+        """
+        return (_reopen, (self.base_directory,))
+
+    def close(self):
+        """
+        Unmaps the file
+
+        Inputs:
+            None
+
+        Returns:
+            None
+        """
+        self.mm.close()
+
+    def stale_sources(self):
+        """
+        Finds the text files that have changed since the binary was compiled
+
+        Inputs:
+            None
+
+        Returns:
+            stale: A list of the relative paths of files that have been
+            modified or removed
+        """
+        stale = []
+        for relpath, signature in self.sources.items():
+            filename = os.path.join(self.base_directory, *relpath.split('/'))
+            try:
+                if _file_signature(filename) != signature:
+                    stale.append(relpath)
+            except OSError:
+                stale.append(relpath)
+
+        return stale
+
+    def grouped(self, filename):
+        """
+        Returns a 'prob' section in the format used by the guesser grammar
+
+        Inputs:
+            filename: The full path of the text file the section was compiled
+            from
+
+        Returns:
+            grammar_section: A list of {'values':[...], 'prob':prob}
+            dictionaries in probability order
+
+            None: If the file isn't in the binary ruleset
+        """
+        section = self._section(filename, 'prob')
+        if section is None:
+            return None
+
+        values = self._strings(section)
+        probs = self._array(section, 'probs', 'd')
+        groups = self._array(section, 'groups', 'I')
+
+        return [
+            {'values': values[groups[i]:groups[i+1]], 'prob': prob}
+            for i, prob in enumerate(probs)
+        ]
+
+    def prob_pairs(self, filename):
+        """
+        Returns a 'prob' section as (value, prob) pairs in file order
+
+        Inputs:
+            filename: The full path of the text file the section was compiled
+            from
+
+        Returns:
+            pairs: A list of (value, prob) tuples
+
+            None: If the file isn't in the binary ruleset
+        """
+        section = self._section(filename, 'prob')
+        if section is None:
+            return None
+
+        values = self._strings(section)
+        probs = self._array(section, 'probs', 'd')
+        groups = self._array(section, 'groups', 'I')
+
+        value_probs = []
+        for i, prob in enumerate(probs):
+            value_probs.extend([prob] * (groups[i+1] - groups[i]))
+
+        return list(zip(values, value_probs))
+
+    def levels(self, filename):
+        """
+        Returns a 'level' section
+
+        Inputs:
+            filename: The full path of the text file the section was compiled
+            from
+
+        Returns:
+            (levels, values): The levels and the ngrams, in file order
+
+            None: If the file isn't in the binary ruleset
+        """
+        section = self._section(filename, 'level')
+        if section is None:
+            return None
+
+        return self._array(section, 'levels', 'i'), self._strings(section)
+
+    def lines(self, filename):
+        """
+        Returns a 'lines' section
+
+        Inputs:
+            filename: The full path of the text file the section was compiled
+            from
+
+        Returns:
+            lines: A list of the lines in the file, without line endings
+
+            None: If the file isn't in the binary ruleset
+        """
+        section = self._section(filename, 'lines')
+        if section is None:
+            return None
+
+        return self._strings(section)
+
+    def _section(self, filename, kind):
+        """
+        Looks up the section for a text file
+
+        Inputs:
+            filename: The full path of the text file
+
+            kind: The kind of section expected
+
+        Returns:
+            section_info: The section's entry from the index, or None if it
+            isn't in the file
+        """
+        section = self.sections.get(_relative_path(self.base_directory, filename))
+        if section is None or section['kind'] != kind:
+            return None
+
+        return section
+
+    def _blob(self, section, blob_name):
+        """
+        Returns the bytes of part of a section
+        """
+        offset, length = section[blob_name]
+        start = self.data_start + offset
+        return self.mm[start:start + length]
+
+    def _strings(self, section):
+        """
+        Returns the list of strings saved in a section
+        """
+        if section['count'] == 0:
+            return []
+
+        return self._blob(section, 'strings').decode('utf-8', STRING_ERRORS).split('\n')
+
+    def _array(self, section, blob_name, typecode):
+        """
+        Returns an array saved in a section
+        """
+        values = array(typecode)
+        values.frombytes(self._blob(section, blob_name))
+        return values
+
+
+def _reopen(base_directory):
+    """
+    Re-opens a binary ruleset that was sent to a worker process
+
+    Inputs:
+        base_directory: The rule directory
+
+    Returns:
+        BinaryRuleset
+    """
+    binary = _reopened.get(base_directory)
+    if binary is None:
+        binary = BinaryRuleset(base_directory)
+        _reopened[base_directory] = binary
+
+    return binary
+
+
+def _prob_filenames(base_directory, config):
+    """
+    Returns the (value, probability) files in a ruleset
+
+    Inputs:
+        base_directory: The rule directory
+
+        config: The ConfigParser for the ruleset's config.ini
+
+    Returns:
+        filenames: A list of full paths. Some may not exist
+    """
+    filenames = []
+    for section in config.sections():
+        if not config.has_option(section, 'directory') or not config.has_option(section, 'filenames'):
+            continue
+
+        directory = config.get(section, 'directory')
+        for file in json.loads(config.get(section, 'filenames')):
+            filenames.append(os.path.join(base_directory, directory, file))
+
+    filenames.append(os.path.join(base_directory, "Omen", "pcfg_omen_prob.txt"))
+    filenames.append(os.path.join(base_directory, "Emails", "email_providers.txt"))
+    filenames.append(os.path.join(base_directory, "Websites", "website_hosts.txt"))
+
+    return filenames
+
+
+def _encode_strings(values):
+    """
+    Encodes a list of strings as one newline separated block of bytes
+    """
+    return '\n'.join(values).encode('utf-8', STRING_ERRORS)
+
+
+def _relative_path(base_directory, filename):
+    """
+    Returns the path of a file relative to the rule directory, using '/'
+    on every OS so it can be used as a key in the index
+    """
+    return os.path.relpath(filename, base_directory).replace(os.sep, '/')
+
+
+def _file_signature(filename):
+    """
+    Returns the size and modification time of a file, used to tell if it
+    has changed since the binary ruleset was compiled
+    """
+    file_stat = os.stat(filename)
+    return [file_stat.st_size, file_stat.st_mtime_ns]
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+
+
+"""
+
+Name: PCFG_Guesser Capitalization Masks
+
+Description: Precompiles the capitalization masks, ('C' transitions), so
+they can be quickly applied to alpha strings while generating guesses
+
+A mask such as 'ULLLLU' used to be applied by walking it one character at
+a time and calling upper() on each letter that needed it. Instead each mask
+is compiled once when the grammar is loaded into the runs of letters that
+need to be uppercased, (for 'ULLLLU' that is [0:1] and [5:6]). Applying the
+mask is then a couple of string slices. Masks that don't uppercase anything,
+(which is every mask when the --all_lower/skip_case option is used), are
+skipped entirely.
+
+"""
+
+
+def compile_mask(mask):
+    """
+    Compiles a capitalization mask into a function that applies it
+
+    The mask is applied to the end of the word, so the runs are saved as
+    negative offsets from the end of the word. That way it still works if
+    the word is longer than the mask
+
+    Inputs:
+        mask: The capitalization mask, such as 'ULLL'. An 'L' keeps the
+        letter as is, and anything else makes it uppercase
+
+    Returns:
+        apply_function: A function that takes a word and returns it with
+        the mask applied
+
+        None: If the mask does not change the word, (it is all 'L')
+    """
+
+    mask_len = len(mask)
+
+    # Find the runs of letters to uppercase
+    runs = []
+    start = None
+    for index, item in enumerate(mask):
+        if item != 'L':
+            if start is None:
+                start = index
+        elif start is not None:
+            runs.append((start - mask_len, index - mask_len))
+            start = None
+
+    # The last run goes to the end of the word
+    if start is not None:
+        runs.append((start - mask_len, None))
+
+    # Nothing to uppercase
+    if not runs:
+        return None
+
+    # Special case the most common masks to avoid extra slicing
+    if len(runs) == 1:
+        run_start, run_end = runs[0]
+
+        if run_end is None:
+            return lambda word: word[:run_start] + word[run_start:].upper()
+
+        return lambda word: word[:run_start] + word[run_start:run_end].upper() + word[run_end:]
+
+    def apply_runs(word):
+        parts = []
+        prev_end = 0
+        for run_start, run_end in runs:
+            # Convert to positive offsets so the slices are easy to stitch
+            # back together
+            run_start += len(word)
+            parts.append(word[prev_end:run_start])
+            if run_end is None:
+                parts.append(word[run_start:].upper())
+                return ''.join(parts)
+
+            run_end += len(word)
+            parts.append(word[run_start:run_end].upper())
+            prev_end = run_end
+
+        parts.append(word[prev_end:])
+        return ''.join(parts)
+
+    return apply_runs
+
+
+class CapitalizationMasks:
+    """
+    Holds the compiled capitalization masks for every 'C' transition in a
+    grammar
+    """
+
+    def __init__(self, grammar):
+        """
+        Compiles all the capitalization masks in the grammar
+
+        Inputs:
+            grammar: The PCFG grammar dictionary as returned from
+            grammar_io.load_grammar()
+
+        Returns:
+            CapitalizationMasks
+        """
+
+        # Compiled masks, keyed by the mask string. None means the mask
+        # does not change the word
+        self.compiled = {}
+
+        # The compiled masks for each probability group. Keyed by the
+        # transition name, (aka 'C8'), and then indexed by the group index.
+        # Each item is a tuple of compiled masks in the same order as the
+        # grammar, or None if none of the masks in the group change the word
+        self.groups = {}
+
+        for name, groups in grammar.items():
+            if name[0] != 'C':
+                continue
+
+            self.groups[name] = []
+            for group in groups:
+                masks = tuple(self._compile(mask) for mask in group['values'])
+
+                if all(mask is None for mask in masks):
+                    self.groups[name].append(None)
+                else:
+                    self.groups[name].append(masks)
+
+    def _compile(self, mask):
+        """
+        Compiles a mask, re-using previous results if it has been seen before
+
+        Inputs:
+            mask: The capitalization mask string
+
+        Returns:
+            apply_function: See compile_mask()
+        """
+        if mask not in self.compiled:
+            self.compiled[mask] = compile_mask(mask)
+
+        return self.compiled[mask]
+
+    def apply(self, words, pt_type, index):
+        """
+        Applies all the masks in a probability group to a list of words
+
+        The results are ordered by word and then by mask, aka
+        word1+mask1, word1+mask2, word2+mask1, ...
+
+        Inputs:
+            words: A list of words to apply the masks to
+
+            pt_type: The capitalization transition, aka 'C8'
+
+            index: The index of the probability group
+
+        Returns:
+            cased_words: A list of the words with the masks applied. If none
+            of the masks change the word, this is the words list itself
+        """
+
+        masks = self.groups[pt_type][index]
+
+        # Zero cost path for lowercase masks
+        if masks is None:
+            return words
+
+        if len(masks) == 1:
+            return list(map(masks[0], words))
+
+        return [
+            word if mask is None else mask(word)
+            for word in words
+            for mask in masks
+        ]
+
+    def num_variants(self, pt_type, index):
+        """
+        Returns how many versions of each word apply() will return for a
+        probability group
+
+        Inputs:
+            pt_type: The capitalization transition, aka 'C8'
+
+            index: The index of the probability group
+
+        Returns:
+            num_variants: The number of masks, or 1 if all of the masks are
+            lowercase
+        """
+        masks = self.groups[pt_type][index]
+        if masks is None:
+            return 1
+
+        return len(masks)
+
+    def apply_one(self, word, mask):
+        """
+        Applies a single mask to a single word
+
+        Inputs:
+            word: The word to apply the mask to
+
+            mask: The capitalization mask string
+
+        Returns:
+            cased_word: The word with the mask applied
+        """
+        compiled = self._compile(mask)
+        if compiled is None:
+            return word
+
+        return compiled(word)
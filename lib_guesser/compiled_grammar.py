@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+
+
+"""
+
+Name: PCFG_Guesser Compiled Grammar
+
+Description: An integer indexed version of the PCFG grammar that is used by
+the "next" function and the priority queue.
+
+The grammar loaded from disk is a dictionary keyed by strings, ('A8', 'D4',
+etc), where every replacement is a list of {'values':[], 'prob':float}
+dictionaries. That is easy to work with, but looking up a probability
+requires a string hash plus a couple of dictionary lookups, and every
+parse tree has to keep around a copy of those strings.
+
+The compiled grammar assigns every nonterminal an integer id, saves the
+probabilities in a contiguous array('d') per nonterminal, and saves all the
+terminal values in a flat list per nonterminal with an array of offsets
+marking where each probability group starts. A parse tree then becomes
+a base structure id plus a tuple of small ints, one index per transition.
+
+"""
+
+
+from array import array
+
+
+class CompiledGrammar:
+    """
+    Integer indexed representation of a PCFG grammar
+
+    Nonterminal ids, (type ids), are assigned in the order they are seen in
+    the grammar dictionary. Base structure ids are the index of the base
+    structure in the list of base structures that was passed in.
+
+    A compiled parse tree is a tuple of indexes, one for each transition in
+    the base structure. For example if the base structure with id 3 is
+    ['A3', 'C3', 'D2'], then the parse tree (0, 1, 4) with base id 3 is the
+    same as the old style parse tree [('A3',0), ('C3',1), ('D2',4)]
+    """
+
+    def __init__(self, grammar, base_structures):
+        """
+        Compiles the grammar
+
+        Inputs:
+            grammar: The PCFG grammar dictionary as returned from
+            grammar_io.load_grammar()
+
+            base_structures: The list of base structures as returned from
+            grammar_io.load_grammar()
+
+        Returns:
+            CompiledGrammar
+        """
+
+        # Maps type ids to nonterminal names. Aka 5 -> 'D2'
+        self.names = []
+
+        # Maps nonterminal names to type ids. Aka 'D2' -> 5
+        self.ids = {}
+
+        # The probability of each group of values for a nonterminal
+        # Indexed by type id. Each item is an array('d')
+        self.probs = []
+
+        # All the terminal values for a nonterminal in probability order.
+        # Indexed by type id. Each item is a flat list of strings
+        self.strings = []
+
+        # Where each probability group starts in self.strings. Indexed by
+        # type id. There is one more offset than groups so the values for
+        # group i are strings[offsets[i]:offsets[i+1]]
+        self.offsets = []
+
+        for name, groups in grammar.items():
+            self._add_nonterminal(name, groups)
+
+        # Used by the Deadbeat Dad algorithm to compare parents of a child.
+        # Indexed by type id. parent_ratio[type_id][i] is how much more
+        # probable the parent with index i-1 is than a child with index i,
+        # aka probs[i-1] / probs[i]. Index 0 has no parent and is unused.
+        self.parent_ratio = []
+        for probs in self.probs:
+            ratio = array('d', [0.0])
+            for index in range(1, len(probs)):
+                if probs[index] > 0:
+                    ratio.append(probs[index-1] / probs[index])
+                else:
+                    ratio.append(float('inf'))
+            self.parent_ratio.append(ratio)
+
+        # The type ids for the transitions in each base structure. Indexed
+        # by base id
+        self.base_types = []
+
+        # The probability of each base structure. Indexed by base id
+        self.base_probs = array('d')
+
+        for base in base_structures:
+            self.base_types.append(tuple(self.ids[name] for name in base['replacements']))
+            self.base_probs.append(base['prob'])
+
+    def _add_nonterminal(self, name, groups):
+        """
+        Compiles the values and probabilities for one nonterminal
+
+        Inputs:
+            name: The name of the nonterminal, aka 'A8'
+
+            groups: A list of {'values':[], 'prob':float} dictionaries
+            in probability order
+
+        Returns:
+            None
+        """
+
+        type_id = len(self.names)
+        self.names.append(name)
+        self.ids[name] = type_id
+
+        probs = array('d')
+        strings = []
+        offsets = array('L', [0])
+
+        for group in groups:
+            probs.append(group['prob'])
+            strings.extend(group['values'])
+            offsets.append(len(strings))
+
+        self.probs.append(probs)
+        self.strings.append(strings)
+        self.offsets.append(offsets)
+
+    def num_groups(self, type_id):
+        """
+        Returns the number of probability groups for a nonterminal
+
+        Inputs:
+            type_id: The id of the nonterminal
+
+        Returns:
+            size: The number of groups, (aka the max index + 1)
+        """
+        return len(self.probs[type_id])
+
+    def values(self, type_id, index):
+        """
+        Returns the terminal values for a probability group
+
+        Inputs:
+            type_id: The id of the nonterminal
+
+            index: The index of the probability group
+
+        Returns:
+            values: A list of the terminal strings for this group
+        """
+        offsets = self.offsets[type_id]
+        return self.strings[type_id][offsets[index]:offsets[index+1]]
+
+    def find_prob(self, base_id, pt):
+        """
+        Finds the probability of a compiled parse tree
+
+        Inputs:
+            base_id: The id of the base structure
+
+            pt: The compiled parse tree, (a tuple of ints)
+
+        Returns:
+            prob: The probability of the parse tree according to the grammar
+        """
+        prob = self.base_probs[base_id]
+        probs = self.probs
+        for type_id, index in zip(self.base_types[base_id], pt):
+            prob *= probs[type_id][index]
+
+        return prob
+
+    def prefix_probs(self, base_id, pt):
+        """
+        Finds the running probability of a compiled parse tree after each
+        transition, in the same order find_prob() multiplies them
+
+        Parse trees next to each other in the "next" function only differ
+        by one transition, so find_prob_from() can start from one of these
+        instead of multiplying every transition again. Floating point
+        multiplication isn't associative, so dividing out the transition
+        that changed would give a slightly different answer than find_prob()
+        depending on which parse tree it was worked out from. Restarting
+        the same chain of multiplications part way through doesn't have that
+        problem
+
+        Inputs:
+            base_id: The id of the base structure
+
+            pt: The compiled parse tree, (a tuple of ints)
+
+        Returns:
+            prefix: A list with one more item than pt. prefix[i] is the
+            probability of the base structure times the first i transitions,
+            so prefix[-1] is the same as find_prob(base_id, pt)
+        """
+        prob = self.base_probs[base_id]
+        probs = self.probs
+        prefix = [prob]
+        for type_id, index in zip(self.base_types[base_id], pt):
+            prob *= probs[type_id][index]
+            prefix.append(prob)
+
+        return prefix
+
+    def find_prob_from(self, base_id, pt, start, prefix_prob):
+        """
+        Finds the probability of a compiled parse tree given the running
+        probability of its first transitions
+
+        The result is exactly the same as find_prob(base_id, pt), but only
+        the transitions from start onwards are multiplied
+
+        Inputs:
+            base_id: The id of the base structure
+
+            pt: The compiled parse tree, (a tuple of ints)
+
+            start: The position of the first transition to multiply
+
+            prefix_prob: prefix_probs()[start] for any parse tree that has
+            the same first start transitions as pt
+
+        Returns:
+            prob: The probability of the parse tree according to the grammar
+        """
+        prob = prefix_prob
+        probs = self.probs
+        base_types = self.base_types[base_id]
+        for pos in range(start, len(pt)):
+            prob *= probs[base_types[pos]][pt[pos]]
+
+        return prob
+
+    def decode(self, base_id, pt):
+        """
+        Converts a compiled parse tree back into a list of (name, index)
+        tuples, which is the format the rest of the guesser uses to print
+        status and generate guesses
+
+        Inputs:
+            base_id: The id of the base structure
+
+            pt: The compiled parse tree, (a tuple of ints)
+
+        Returns:
+            decoded_pt: A list of tuples. Aka [('A3',0),('C3',1),('D2',4)]
+        """
+        names = self.names
+        return [(names[type_id], index) for type_id, index in zip(self.base_types[base_id], pt)]
@@ -13,11 +13,16 @@ modes in the future
 
 
 import sys
+import os
+import io
 import time
+import configparser
 import threading # Used only for the "check for user input" threads
 
 # Local imports
 from .priority_queue import PcfgQueue
+from .queue_checkpoint import CheckpointWriter, read_checkpoint
+from .session_autosave import AutoSave, write_atomic
 from .status_report import StatusReport
 
 
@@ -26,9 +31,49 @@ class CrackingSession:
     Used to manage a password cracking session
     """
 
-    def __init__(self, pcfg, save_config, save_filename):
+    def __init__(self, pcfg, save_config, save_filename, max_queue_size = None, queue_spill = False,
+        workers = 1, relaxed_order = False, node = None, skip = 0, checkpoint_interval = None,
+        autosave_interval = None, autosave_pts = None):
         """
         Basic initialization function
+
+        Inputs:
+            pcfg: The PCFG grammar object
+
+            save_config: A configparser object to save/load the session
+
+            save_filename: The file to save the session to
+
+            max_queue_size: The maximum number of items to keep in the
+            priority queue. None means unbounded
+
+            queue_spill: If True, items trimmed from the priority queue are
+            saved to disk instead of being regenerated later
+
+            workers: The number of worker processes to generate guesses
+            with. If 1, guesses are generated in the main process
+
+            relaxed_order: If True, guesses from the worker processes are
+            written out as soon as they are ready instead of in strict
+            probability order
+
+            node: A NodePartition if the guesses are being split between
+            multiple computers. None means generate all the guesses
+
+            skip: The number of guesses to skip before starting to output
+            guesses. Used with limit to split a session into chunks by guess
+            number, or to resume at an exact guess count
+
+            checkpoint_interval: The number of seconds between saving
+            checkpoints of the whole pqueue. None means checkpoints are not
+            saved. (see queue_checkpoint.py)
+
+            autosave_interval: The number of seconds between automatically
+            saving the session. None means don't autosave based on time
+
+            autosave_pts: The number of pre-terminals between automatically
+            saving the session. None means don't autosave based on the number
+            of pre-terminals
         """
 
         # Used to save a session's status to disk
@@ -48,17 +93,83 @@ class CrackingSession:
         # The actual Priority queue. Will be defined when run() is called
         self.pqueue = None
 
+        # Memory management options for the priority queue
+        self.max_queue_size = max_queue_size
+        self.queue_spill = queue_spill
+
+        # Multiprocessing options
+        self.workers = workers
+        self.relaxed_order = relaxed_order
+
+        # Distributed guessing options. The grammar needs to know about the
+        # partition to split up OMEN guesses
+        self.node = node
+        self.pcfg.node_partition = node
+
+        # The number of guesses left to skip
+        self.skip = skip
+
+        # Saving checkpoints of the pqueue so restoring a session doesn't
+        # need to re-walk the grammar. The checkpoint is saved next to the
+        # session file. It is still loaded when restoring a session even if
+        # checkpoints aren't being saved in the new session
+        self.checkpoint_filename = os.path.splitext(save_filename)[0] + '.chk'
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_writer = None
+        if checkpoint_interval is not None:
+            self.checkpoint_writer = CheckpointWriter(self.checkpoint_filename)
+        self.last_checkpoint = time.time()
+
+        # Pre-terminals loaded from a checkpoint that were popped from the
+        # pqueue but never had their guesses generated
+        self.pending_items = []
+
+        # The parse tree of the OMEN level a restored session finished
+        # generating the guesses for. None if there wasn't one
+        self.restored_omen = None
+
+        # Periodically saving the session in case the program dies. The
+        # grammar also uses this to save progress while generating OMEN
+        # guesses
+        self.autosave = None
+        if autosave_interval is not None or autosave_pts is not None:
+            self.autosave = AutoSave(self._autosave_files, autosave_interval, autosave_pts)
+        self.pcfg.autosave = self.autosave
+
+        # The ParallelGuesses object while guesses are being generated by
+        # worker processes
+        self.generator = None
+
     def run(self, load_session = False, limit = None):
         """
         Starts the cracking session and starts generating guesses
         """
+        try:
+            self._run_session(load_session, limit)
+
+        # Make sure saves being written in the background are finished
+        # before the program exits
+        finally:
+            if self.autosave is not None:
+                self.autosave.wait()
+            if self.checkpoint_writer is not None:
+                self.checkpoint_writer.wait()
+
+    def _run_session(self, load_session = False, limit = None):
+        """
+        Sets up the pqueue and generates guesses until the session is done
+        """
 
         ## New session
         #
         if not load_session:
 
             # Initalize the priority queue
-            self.pqueue = PcfgQueue(self.pcfg)
+            self.pqueue = PcfgQueue(
+                self.pcfg,
+                max_queue_size = self.max_queue_size,
+                spill = self.queue_spill
+                )
 
             # Save the inital restore file
             self._save_session()
@@ -67,18 +178,52 @@ class CrackingSession:
         #
         else:
             print ("Restoring saved progress...",file=sys.stderr)
+
+            # Use the pqueue checkpoint if there is one. This replaces
+            # self.save_config with the copy saved in the checkpoint
+            checkpoint = self._load_checkpoint()
+
             # Update the status report so things like probability coverage
             # reflect what was done before
             self.report.load(self.save_config)
 
             # Update the priority queue to skip over pre-terminals that have
             # been guessed previously
-            self.pqueue = PcfgQueue(self.pcfg, self.save_config)
+            self.pqueue = PcfgQueue(
+                self.pcfg,
+                self.save_config,
+                max_queue_size = self.max_queue_size,
+                spill = self.queue_spill,
+                checkpoint = checkpoint
+                )
+
+        # Let the status report display the priority queue stats
+        self.report.pqueue = self.pqueue
 
         print ("Starting to generate password guesses",file=sys.stderr)
         print ("Press [ENTER] to display a status output",file=sys.stderr)
         print ("Press 'q' [ENTER] to exit",file=sys.stderr)
 
+        ## Start the worker processes
+        #
+        # DevNote: This needs to happen before the user input thread is
+        #          started. Forked processes close stdin when they start up,
+        #          and will hang waiting on the lock held by the input() call
+        #          in that thread
+        generator = None
+        if self.workers > 1:
+            # Imported here so multiprocessing is only loaded if it's used
+            from .parallel_guesses import ParallelGuesses
+
+            generator = ParallelGuesses(
+                self.pcfg,
+                self.workers,
+                ordered = not self.relaxed_order
+                )
+
+            # Let the OMEN guesses be generated by the workers too
+            self.pcfg.omen_workers = generator
+
         ## Set up the check to see if a user is pressing a button
         #
         user_thread = threading.Thread(target=keypress, args=(self.report, self.pcfg))
@@ -101,13 +246,29 @@ class CrackingSession:
 
                 omen_guess_num = self.save_config.getint('guessing_info','omen_guess_number')
                 num_generated_guesses = self.pcfg.restore_omen(omen_guess_num, self.report.pt_item)
+
+                # Stop instead of losing the rest of the OMEN level. The
+                # session file isn't saved so it can be restored again
+                if num_generated_guesses is None:
+                    if generator is not None:
+                        generator.close()
+                        self.pcfg.omen_workers = None
+                    print("Exiting...",file=sys.stderr)
+                    return
+
                 self.report.num_guesses += num_generated_guesses
+                self.restored_omen = self.report.pt_item['pt']
+
+        # Hand guess generation off to worker processes
+        if generator is not None:
+            self._run_parallel(generator, user_thread, limit)
+            return
 
         # Keep running while the p_queue.next_function still has items in it
         while True:
 
             # Get the next item from the pqueue
-            pt_item = self.pqueue.next()
+            pt_item = self._next_pt_item()
 
             # If the pqueue is empty, there are no more guesses to make
             if pt_item is None:
@@ -129,20 +290,34 @@ class CrackingSession:
             #          sessions.
             #
             if not user_thread.is_alive():
-                print("Saving Session Info",file=sys.stderr)
-                self._save_session()
-                print("Exiting...",file=sys.stderr)
+                self._exit_session([pt_item])
                 break
 
+            # Check if another node is generating these guesses, or if they
+            # are being skipped
+            guess_range = self._guess_range(pt_item)
+            if guess_range is None:
+                continue
+            start, stop = guess_range
+
             # Update stats after the save might occur so we don't double count
             # them when restoring a session
             self.report.num_parse_trees += 1
             self.report.pt_item = pt_item
 
             try:
-                num_generated_guesses = self.pcfg.create_guesses(pt_item['pt'], limit = limit)
+                num_generated_guesses = self.pcfg.create_guesses(
+                    pt_item['pt'],
+                    limit = limit,
+                    start = start,
+                    stop = stop
+                    )
                 self.report.num_guesses += num_generated_guesses
 
+                # OMEN guesses are skipped while they are being generated
+                if self.skip and pt_item['pt'][0][0][0] == 'M':
+                    self.skip -= self.pcfg.omen_skipped
+
                 # Check if a limit was defined
                 if limit:
                     limit = limit - num_generated_guesses
@@ -152,6 +327,8 @@ class CrackingSession:
 
                 self.report.probability_coverage += pt_item['prob'] * num_generated_guesses
 
+                self._periodic_save()
+
             # The receiving program is no longer accepting guesses
             # Usually occurs after all passwords have been cracked
             except OSError:
@@ -159,9 +336,501 @@ class CrackingSession:
 
         return
 
-    def _save_session(self):
+    def _run_parallel(self, generator, user_thread, limit = None):
         """
-        Saves a gussing session's status to disk
+        Generates guesses using a pool of worker processes
+
+        The main process pops pre-terminals off the pqueue and sends them
+        to the workers. The encoded guesses the workers send back are then
+        written out in the order the pre-terminals were popped, (unless
+        relaxed_order is set). OMEN pre-terminals are started once all the
+        work before them has been written out, and their guesses are then
+        generated by the workers one group of (length, IP) work units at a
+        time.
+
+        Inputs:
+            generator: The ParallelGuesses object managing the workers
+
+            user_thread: The thread checking for user input
+
+            limit: (None/Int) The maximum number of guesses to generate
+
+        Returns:
+            None
+        """
+
+        # The number of guesses that have been sent to the workers. Used so
+        # the limit is applied when submitting work rather than by throwing
+        # away guesses later
+        num_submitted = 0
+
+        # Set when there are no more pre-terminals to submit
+        done_submitting = False
+
+        # An OMEN pre-terminal waiting for the workers to finish up
+        omen_item = None
+
+        # Lets autosave find the pre-terminals the workers are still on
+        self.generator = generator
+
+        try:
+            while True:
+
+                # Keep the workers busy
+                while not done_submitting and omen_item is None and generator.has_room():
+
+                    if limit and num_submitted >= limit:
+                        done_submitting = True
+                        break
+
+                    pt_item = self._next_pt_item()
+
+                    if pt_item is None:
+                        done_submitting = True
+                        break
+
+                    # OMEN guesses are generated after all the work before
+                    # them is written out
+                    if pt_item['pt'][0][0][0] == 'M':
+                        omen_item = pt_item
+                        break
+
+                    # Check if another node is generating these guesses, or
+                    # if they are being skipped
+                    guess_range = self._guess_range(pt_item)
+                    if guess_range is None:
+                        continue
+                    start, stop = guess_range
+
+                    if stop is None:
+                        stop = self.pcfg.keyspace(pt_item['pt'])
+
+                    num_guesses = stop - start
+                    if limit:
+                        num_guesses = min(num_guesses, limit - num_submitted)
+
+                    generator.submit(pt_item, num_guesses, start)
+                    num_submitted += num_guesses
+
+                result = generator.next_result()
+
+                # All of the submitted work has been written out
+                if result is None:
+
+                    if omen_item is not None:
+                        pt_item = omen_item
+                        omen_item = None
+
+                        if not user_thread.is_alive():
+                            self._exit_session([pt_item], pt_item['prob'])
+                            return
+
+                        self.report.num_parse_trees += 1
+                        self.report.pt_item = pt_item
+
+                        num_remaining = None
+                        if limit:
+                            num_remaining = limit - num_submitted
+
+                        num_generated_guesses = self.pcfg.create_guesses(
+                            pt_item['pt'],
+                            limit = num_remaining,
+                            start = self.skip
+                            )
+                        self.skip -= self.pcfg.omen_skipped
+                        self.report.num_guesses += num_generated_guesses
+                        self.report.probability_coverage += pt_item['prob'] * num_generated_guesses
+                        num_submitted += num_generated_guesses
+
+                        # The user asked to exit while the OMEN guesses were
+                        # being generated
+                        if self.pcfg.omen_exit:
+                            self._exit_session()
+                            return
+
+                        continue
+
+                    if limit and num_submitted >= limit:
+                        print("Limit reached. Exiting...",file=sys.stderr)
+                    else:
+                        print ("Done processing the PCFG. No more guesses to generate",file=sys.stderr)
+                        print ("Shutting down guessing session",file=sys.stderr)
+                    return
+
+                task_info, data, num_guesses = result
+                pt_item = task_info['pt_item']
+
+                # Check to see if the program should exit based on user input
+                #
+                # Nothing from this result has been written out yet, so the
+                # session is saved to restart from the most probable
+                # pre-terminal that hasn't been fully written
+                if not user_thread.is_alive():
+                    pending_items = [pt_item]
+                    for item in generator.pending_pt_items():
+                        if item is not pt_item:
+                            pending_items.append(item)
+                    self._exit_session(pending_items, self._pending_probability(generator, pt_item))
+                    return
+
+                self.pcfg.print_encoded_guesses(data)
+
+                # Large pre-terminals are split into chunks, so only count
+                # the parse tree once
+                num_pts = 0
+                if task_info['chunk_index'] == 0:
+                    num_pts = 1
+                self.report.num_parse_trees += num_pts
+                self.report.pt_item = pt_item
+                self.report.num_guesses += num_guesses
+                self.report.probability_coverage += pt_item['prob'] * num_guesses
+
+                self._periodic_save(generator, num_pts)
+
+        # The receiving program is no longer accepting guesses
+        # Usually occurs after all passwords have been cracked
+        except OSError:
+            return
+
+        finally:
+            generator.close()
+            self.generator = None
+            self.pcfg.omen_workers = None
+
+    def _guess_range(self, pt_item):
+        """
+        Finds the range of guesses to generate for a pre-terminal
+
+        When the guesses are split between multiple nodes, this node may
+        only be responsible for part of a pre-terminal, or none of it
+
+        If there are guesses left to skip, whole pre-terminals are jumped
+        over using their keyspace, and the first pre-terminal that isn't
+        skipped starts part way through. This updates self.skip
+
+        Inputs:
+            pt_item: The parse tree item popped from the pqueue
+
+        Returns:
+            (start, stop): The range of guesses to generate. If stop is None
+            then generate all the guesses after start
+
+            None: If another node is generating the guesses for this
+            pre-terminal, or they are all being skipped
+        """
+
+        # OMEN guesses are split up and skipped while they are being generated
+        if pt_item['pt'][0][0][0] == 'M':
+            return self.skip, None
+
+        if self.node is None:
+            if not self.skip:
+                return 0, None
+            start, stop = 0, self.pcfg.keyspace(pt_item['pt'])
+
+        else:
+            guess_range = self.node.assign(pt_item['pt'], self.pcfg.keyspace(pt_item['pt']))
+            if guess_range is None:
+                return None
+            start, stop = guess_range
+
+        # Skip the whole pre-terminal
+        if self.skip >= stop - start:
+            self.skip -= stop - start
+            return None
+
+        start += self.skip
+        self.skip = 0
+
+        return start, stop
+
+    def _next_pt_item(self):
+        """
+        Returns the next pre-terminal to generate guesses for
+
+        Pre-terminals loaded from a checkpoint that hadn't been guessed yet
+        are returned first. Their children are already in the pqueue
+
+        A session saved while OMEN guesses were being generated saves the
+        probability of the OMEN level, so restoring the pqueue puts that
+        level back in it. It is skipped when it is popped since its guesses
+        were already generated by restore_omen()
+
+        Inputs:
+            None
+
+        Returns:
+            pt_item: The next parse tree item
+
+            None: If there are no more pre-terminals
+        """
+        if self.pending_items:
+            pt_item = self.pending_items.pop(0)
+            self.pqueue.max_probability = pt_item['prob']
+            return pt_item
+
+        pt_item = self.pqueue.next()
+
+        if pt_item is not None and pt_item['pt'] == self.restored_omen:
+            self.restored_omen = None
+            pt_item = self.pqueue.next()
+
+        return pt_item
+
+    def _pending_probability(self, generator, pt_item = None):
+        """
+        Finds the max probability to save the session with so the
+        pre-terminals that have been popped but not fully written out by the
+        workers are generated again when the session is restored
+
+        The pqueue max probability isn't changed, since the workers will
+        still finish these pre-terminals if the session keeps running
+
+        Inputs:
+            generator: The ParallelGuesses object managing the workers
+
+            pt_item: A pre-terminal that has been returned by the workers
+            but not written out yet
+
+        Returns:
+            max_probability: The probability of the most probable
+            pre-terminal that hasn't been fully written out, or the pqueue
+            max probability if there aren't any
+        """
+        probs = [self.pqueue.max_probability]
+        if pt_item is not None:
+            probs = [pt_item['prob']]
+
+        pending_probability = generator.max_pending_prob()
+        if pending_probability is not None:
+            probs.append(pending_probability)
+
+        return max(probs)
+
+    def _exit_session(self, pending_items = (), max_probability = None):
+        """
+        Saves the session when the user has asked to exit
+
+        Inputs:
+            pending_items: The pt_items that were popped from the pqueue but
+            whose guesses have not been written out
+
+            max_probability: The max probability to save instead of the
+            pqueue's. None means use the pqueue's
+
+        Returns:
+            None
+        """
+        print("Saving Session Info",file=sys.stderr)
+        self._save_session(pending_items, max_probability)
+        print("Exiting...",file=sys.stderr)
+
+    def _load_checkpoint(self):
+        """
+        Loads the pqueue checkpoint for a restored session, if there is one
+
+        The checkpoint is only used if it was made for the same ruleset and
+        is at least as new as the session file. If it is used, the copy of
+        the session file saved in it replaces self.save_config so the status
+        counters match the pqueue
+
+        Inputs:
+            None
+
+        Returns:
+            (queue_items, next_seq): The saved pqueue, to pass to PcfgQueue
+
+            None: If there is no usable checkpoint
+        """
+        if not os.path.isfile(self.checkpoint_filename):
+            return None
+
+        # Items spilled to disk aren't saved in checkpoints
+        if self.queue_spill:
+            print("Ignoring the pqueue checkpoint since --queue_spill is set",file=sys.stderr)
+            return None
+
+        try:
+            config_text, pending_items, queue_items, next_seq = read_checkpoint(self.checkpoint_filename)
+
+            checkpoint_config = configparser.ConfigParser()
+            checkpoint_config.read_string(config_text)
+
+            if checkpoint_config.get('rule_info', 'uuid') != self.save_config.get('rule_info', 'uuid'):
+                print("Ignoring the pqueue checkpoint since it is for a different ruleset",file=sys.stderr)
+                return None
+
+            # These options change which base structures are in the grammar,
+            # so the saved parse trees would point to the wrong ones
+            for option in ['skip_brute', 'skip_case']:
+                if checkpoint_config.getboolean('rule_info', option) != self.pcfg.load_args[option]:
+                    print(f"Ignoring the pqueue checkpoint since the {option} option does not match the loaded grammar",file=sys.stderr)
+                    return None
+
+            # The session file is newer if the session was saved by a version
+            # of the guesser that didn't save checkpoints
+            if checkpoint_config.get('session_info', 'last_updated') < self.save_config.get('session_info', 'last_updated'):
+                print("Ignoring the pqueue checkpoint since it is older than the session file",file=sys.stderr)
+                return None
+
+        except (OSError, ValueError, configparser.Error) as error:
+            print(error,file=sys.stderr)
+            print("Ignoring the pqueue checkpoint since it could not be read: " + self.checkpoint_filename,file=sys.stderr)
+            return None
+
+        self.save_config = checkpoint_config
+
+        for neg_prob, _, indices, base_id in pending_items:
+            self.pending_items.append(self.pcfg.decode_pt_item({
+                'prob': -neg_prob,
+                'base_id': base_id,
+                'indices': indices,
+                }))
+
+        return queue_items, next_seq
+
+    def _periodic_save(self, generator = None, num_pts = 1):
+        """
+        Autosaves the session and/or writes a pqueue checkpoint if it is
+        time to
+
+        Called after the guesses for a pre-terminal have been written out
+
+        Inputs:
+            generator: The ParallelGuesses object if workers are being used
+
+            num_pts: The number of pre-terminals that were finished
+
+        Returns:
+            None
+        """
+        if self.autosave is not None:
+            self.autosave.count_pt(num_pts)
+            self.autosave.check()
+
+        self._check_checkpoint(generator)
+
+    def _autosave_files(self, markov_cracker = None):
+        """
+        Gets the files to write for an autosave
+
+        Called by AutoSave when an autosave is due
+
+        Inputs:
+            markov_cracker: The MarkovCracker if OMEN guesses are being
+            generated, or None
+
+        Returns:
+            files: A list of (filename, data) tuples to write, in order
+        """
+
+        # Guesses still sitting in the output buffer would be lost if the
+        # program died after the save
+        self.pcfg.flush_guesses()
+
+        pending_items = ()
+        max_probability = None
+        if self.generator is not None:
+            max_probability = self._pending_probability(self.generator)
+            pending_items = self.generator.pending_pt_items()
+
+        files = []
+
+        # Save the OMEN state before the session file that points to it
+        omen_guess_num = None
+        if markov_cracker is not None:
+            omen_guess_num = self.pcfg.omen_guess_num
+            files.append((self.pcfg.save_file[:-4] + '.omn', markov_cracker.session_data()))
+
+        self._update_save_config(omen_guess_num, max_probability)
+
+        config_text = io.StringIO()
+        self.save_config.write(config_text)
+        files.append((self.save_filename, config_text.getvalue().encode('utf-8')))
+
+        # Keep the checkpoint in step with the session file, otherwise it will
+        # be ignored as out of date when restoring
+        if self.checkpoint_writer is not None:
+            self._write_checkpoint(pending_items)
+
+        return files
+
+    def _check_checkpoint(self, generator = None):
+        """
+        Writes a checkpoint in the background if enough time has passed
+        since the last one
+
+        Inputs:
+            generator: The ParallelGuesses object if workers are being used.
+            Pre-terminals still being worked on are saved as pending items
+
+        Returns:
+            None
+        """
+        if self.checkpoint_writer is None:
+            return
+
+        if time.time() - self.last_checkpoint < self.checkpoint_interval:
+            return
+
+        pending_items = ()
+        max_probability = None
+        if generator is not None:
+            max_probability = self._pending_probability(generator)
+            pending_items = generator.pending_pt_items()
+
+        self._update_save_config(max_probability = max_probability)
+        self._write_checkpoint(pending_items)
+
+    def _write_checkpoint(self, pending_items = (), background = True):
+        """
+        Writes a checkpoint of the pqueue along with the current session
+        save config
+
+        Inputs:
+            pending_items: The pt_items that were popped from the pqueue but
+            whose guesses have not been written out
+
+            background: If True the checkpoint is written in a background
+            thread
+
+        Returns:
+            None
+        """
+        config_text = io.StringIO()
+        self.save_config.write(config_text)
+
+        queue_items, next_seq = self.pqueue.checkpoint_snapshot()
+
+        pending_items = [
+            (-pt_item['prob'], 0, pt_item['indices'], pt_item['base_id'])
+            for pt_item in pending_items
+        ]
+
+        self.checkpoint_writer.save(
+            config_text.getvalue(),
+            pending_items,
+            queue_items,
+            next_seq,
+            background = background
+            )
+        self.last_checkpoint = time.time()
+
+    def _update_save_config(self, omen_guess_num = None, max_probability = None):
+        """
+        Updates the session save config with the current status
+
+        Inputs:
+            omen_guess_num: The OMEN guess number if this is being saved while
+            OMEN guesses are being generated. Not needed if the user exited
+            during OMEN guess generation
+
+            max_probability: The max probability to save instead of the
+            pqueue's, such as when the workers are still generating guesses
+            for pre-terminals popped before it. None means use the pqueue's
+
+        Returns:
+            None
         """
 
         # Update the status report information
@@ -170,28 +839,73 @@ class CrackingSession:
         # Update the guessing session information
         self.save_config.set('guessing_info', 'mode', self.mode)
 
+        # Save which part of the guesses this node is generating so a
+        # restored session continues with the same partition
+        if self.node is not None:
+            self.save_config.set('guessing_info', 'node', str(self.node))
+            self.save_config.set('guessing_info', 'node_omen_units', str(self.node.omen_units))
+
         # Priority Queue Mode
         if self.mode == "priority_queue":
             self.pqueue.update_save_config(self.save_config)
 
+            if max_probability is not None:
+                self.save_config.set('guessing_info', 'max_probability', str(max_probability))
+
         #OMEN Guessing is going on so save the current state
         if self.pcfg.omen_exit:
+            omen_guess_num = self.pcfg.omen_guess_num
+
+        if omen_guess_num is not None:
             self.save_config.set(
                 'guessing_info',
                 'omen_guess_number',
-                str(self.pcfg.omen_guess_num)
+                str(omen_guess_num)
                 )
 
+        # Not in the middle of generating OMEN guesses, (an earlier autosave
+        # or restored session might have been)
+        else:
+            self.save_config.remove_option('guessing_info', 'omen_guess_number')
+
+    def _save_session(self, pending_items = (), max_probability = None):
+        """
+        Saves a gussing session's status to disk
+
+        Inputs:
+            pending_items: The pt_items that were popped from the pqueue but
+            whose guesses have not been written out. Only used for the
+            checkpoint, since the session file saves the max probability
+
+            max_probability: The max probability to save instead of the
+            pqueue's. None means use the pqueue's
+
+        Returns:
+            True: If the session file was saved
+
+            False: If an error occured
+        """
+        self._update_save_config(max_probability = max_probability)
+
+        # Make sure an older autosave doesn't overwrite this one
+        if self.autosave is not None:
+            self.autosave.wait()
+
         # Save the configuration file
         try:
-            with open(self.save_filename, 'w') as configfile:
-                self.save_config.write(configfile)
+            config_text = io.StringIO()
+            self.save_config.write(config_text)
+            write_atomic(self.save_filename, config_text.getvalue().encode('utf-8'))
 
         except IOError as error:
             print (error)
             print ("Error writing sessiong restore file: " + self.save_filename)
             return False
 
+        # Save the checkpoint before exiting so it matches the session file
+        if self.checkpoint_writer is not None:
+            self._write_checkpoint(pending_items, background = False)
+
         return True
 
 
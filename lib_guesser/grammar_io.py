@@ -14,9 +14,13 @@ import os
 import configparser
 import json
 import codecs
+from functools import partial
 
+# Local imports
+from .pruned_grammar import PrunedGrammar
 
-def load_grammar(rule_name, base_directory, version, skip_brute, skip_case, base_structure_folder):
+
+def load_grammar(rule_name, base_directory, version, skip_brute, skip_case, base_structure_folder, binary=None):
     """
     Main function to load up a grammar from disk
 
@@ -37,12 +41,17 @@ def load_grammar(rule_name, base_directory, version, skip_brute, skip_case, base
 
         base_structure_folder: The folder where the base structure can be found
 
+        binary: A BinaryRuleset to load the grammar from instead of the text
+        files. Files that aren't in it are still loaded from the text files
+
     Returns:
         
         grammar: A loaded PCFG Grammar, minus the (S)tart item and base structures.
         Mostly terminals, but some can be transforms like capitalization masks.
-        Takes the form of a dictionary with the variable name, and
-        a sub-dictionary of the form:
+        Only includes the ones used by the base structures. None of them
+        have been read from disk yet, call load_all() to load them. Takes the
+        form of a PrunedGrammar mapping with the variable name, and a
+        sub-dictionary of the form:
         
         .. code-block:: python
 
@@ -70,10 +79,11 @@ def load_grammar(rule_name, base_directory, version, skip_brute, skip_case, base
         raise Exception
 
     # Holds all of the grammar with the exception of the base structures and
-    # OMEN probabilities
-    grammar = {}
+    # OMEN probabilities. The terminals aren't read until the unused ones
+    # have been pruned
+    grammar = PrunedGrammar()
 
-    if not _load_terminals(ruleset_info, grammar, base_directory, config, skip_case):
+    if not _load_terminals(ruleset_info, grammar, base_directory, config, skip_case, binary):
         raise Exception
 
     # Holds the base structures
@@ -82,14 +92,20 @@ def load_grammar(rule_name, base_directory, version, skip_brute, skip_case, base
             base_structures,
             base_directory,
             skip_brute,
-            base_structure_folder):
+            base_structure_folder,
+            binary):
 
         raise Exception
 
+    _remove_unsupported_base_structures(base_structures, grammar)
+
+    # Don't load terminals that none of the base structures use
+    grammar.restrict({item for base in base_structures for item in base['replacements']})
+
     return grammar, base_structures, ruleset_info
 
 
-def load_omen_keyspace(base_directory):
+def load_omen_keyspace(base_directory, binary=None):
     """
     Loads the OMEN keyspace information from file
 
@@ -102,6 +118,9 @@ def load_omen_keyspace(base_directory):
         
         base_directory: The base directory to load the rules from
 
+        binary: A BinaryRuleset to load the keyspace from instead of the text
+        file, or None
+
     Returns:
         
         omen_keyspace: A dictionary indexed by omen levels with the value being
@@ -113,23 +132,30 @@ def load_omen_keyspace(base_directory):
 
     omen_keyspace = {}
 
+    lines = None
+    if binary is not None:
+        lines = binary.lines(filename)
+
     # Try to open the file
-    with open(filename, 'r') as file:
-        # Read though all the lines in the file
-        for value in file:
+    if lines is None:
+        with open(filename, 'r') as file:
+            lines = file.readlines()
+
+    # Read though all the lines in the file
+    for value in lines:
 
-            # Split up the tab seperated items and then save their values
-            split_values = value.rstrip().split("\t")
+        # Split up the tab seperated items and then save their values
+        split_values = value.rstrip().split("\t")
 
-            level = int(split_values[0])
-            keyspace = int(split_values[1])
+        level = int(split_values[0])
+        keyspace = int(split_values[1])
 
-            omen_keyspace[level] = keyspace
+        omen_keyspace[level] = keyspace
 
     return omen_keyspace
 
 
-def _load_base_structures(base_structures, base_directory, skip_brute, base_structure_folder):
+def _load_base_structures(base_structures, base_directory, skip_brute, base_structure_folder, binary=None):
     """
     Loads the base structures for the grammar
 
@@ -150,6 +176,8 @@ def _load_base_structures(base_structures, base_directory, skip_brute, base_stru
         this as a variable to support other modes like
         PRINCE dictionary generation
 
+        binary: A BinaryRuleset to load the base structures from, or None
+
     Returns:
         
         True: Config was loaded and parsed correctly
@@ -161,60 +189,61 @@ def _load_base_structures(base_structures, base_directory, skip_brute, base_stru
 
     # Try to open the file
     try:
-        with open(filename, 'r') as file:
-
-            # If skip_brute is enabled, find out what probability is
-            # assigned to brute force guesses if any
-
-            # This is the maximum probability the grammar is compared against
-            # Need to specify this because if we remove brute force structures
-            # the total prob needs to be reduced so everything else can be
-            # normalized against the new total prob.
-            total_prob= 1.0
-
-            if skip_brute:
+        # (value, prob) pairs for each line in the file
+        pairs = None
+        if binary is not None:
+            pairs = binary.prob_pairs(filename)
+
+        if pairs is None:
+            pairs = []
+            with open(filename, 'r') as file:
                 for value in file:
                     # Split up the tab seperated items and then save their values
                     split_values = value.rstrip().split("\t")
+                    pairs.append((split_values[0], float(split_values[1])))
 
-                    # Found the brute force section, record probabilty and break
-                    # out of the loop
-                    if split_values[0] == 'M':
-                        total_prob = total_prob - float(split_values[1])
+        # If skip_brute is enabled, find out what probability is
+        # assigned to brute force guesses if any
 
-                        # Reset the file pointer and exit
-                        file.seek(0)
-                        break
+        # This is the maximum probability the grammar is compared against
+        # Need to specify this because if we remove brute force structures
+        # the total prob needs to be reduced so everything else can be
+        # normalized against the new total prob.
+        total_prob= 1.0
 
-            # Read though all the lines in the file
-            for value in file:
+        if skip_brute:
+            for value, prob in pairs:
+                # Found the brute force section, record probabilty and break
+                # out of the loop
+                if value == 'M':
+                    total_prob = total_prob - prob
+                    break
 
-                # Split up the tab seperated items and then save their values
-                split_values = value.rstrip().split("\t")
-
-                value = split_values[0]
-                prob = float(split_values[1]) / total_prob
-
-                new_base = {
-                    'prob':prob,
-                    'replacements':[]
-                }
-
-                ## Split up the replacements and save them
-                #
-                # Note, splitting on digits, and all transistions are only
-                # one alpha character long
-                for item in value:
-                    if item.isalpha():
-                        new_base['replacements'].append(item)
-                    else:
-                        new_base['replacements'][-1] += item
+        # Read though all the lines in the file
+        for value, prob in pairs:
 
-                # Save the base structure
-                #
-                # Note if we are skipping Markov attacks, don't save that
-                if not skip_brute or 'M' not in new_base['replacements']:
-                    base_structures.append(new_base)
+            prob = prob / total_prob
+
+            new_base = {
+                'prob':prob,
+                'replacements':[]
+            }
+
+            ## Split up the replacements and save them
+            #
+            # Note, splitting on digits, and all transistions are only
+            # one alpha character long
+            for item in value:
+                if item.isalpha():
+                    new_base['replacements'].append(item)
+                else:
+                    new_base['replacements'][-1] += item
+
+            # Save the base structure
+            #
+            # Note if we are skipping Markov attacks, don't save that
+            if not skip_brute or 'M' not in new_base['replacements']:
+                base_structures.append(new_base)
 
     except IOError as error:
         print (error,file=sys.stderr)
@@ -243,21 +272,60 @@ def _load_base_structures(base_structures, base_directory, skip_brute, base_stru
     return True
 
 
-def _load_terminals(ruleset_info, grammar, base_directory, config, skip_case):
+def _remove_unsupported_base_structures(base_structures, grammar):
     """
-    Loads most of the terminals for the grammar
+    Removes base structures that reference transitions missing from the grammar
 
-    This includes things like alpha strings, digits, keyboard patterns, etc
+    This can happen if a ruleset was edited by hand, or was trained by a
+    version of the trainer that saved base structures for a transition, (for
+    example Hangeul), without saving the terminals for it. Rather than crash
+    in the middle of a guessing session, remove those base structures and
+    let the user know.
+
+    Inputs:
+
+        base_structures: The list of base structures. Will be modified in place
+
+        grammar: The loaded grammar dictionary
+
+    Returns:
+
+        None
+    """
+
+    supported = []
+    missing = set()
+    for base in base_structures:
+        not_found = [item for item in base['replacements'] if item not in grammar]
+        if not_found:
+            missing.update(not_found)
+        else:
+            supported.append(base)
+
+    if missing:
+        print("Warning: Skipping " + str(len(base_structures) - len(supported)) +
+            " base structures that use transitions missing from the ruleset: " +
+            str(sorted(missing)), file=sys.stderr)
+
+    base_structures[:] = supported
+
+
+def _load_terminals(ruleset_info, grammar, base_directory, config, skip_case, binary=None):
+    """
+    Adds most of the terminals to the grammar
+
+    This includes things like alpha strings, digits, keyboard patterns, etc.
+    The files aren't read until the grammar is loaded
 
     Inputs:
         
         ruleset_info: A dictionary containing some general information about the
         ruleset
 
-        grammar: A dictionary to return the data in
-        Takes the form of a dictionary with the variable name, and
-        a list of (value, prob) tuples in probability order.
-        For example {'D2':[('11',0.3),('12',0.2),....]}
+        grammar: A PrunedGrammar to add the terminals to
+        Takes the form of a mapping of the variable name to
+        a list of {'values':[], 'prob':float} dictionaries in probability order.
+        For example {'D2':[{'values':['11'], 'prob':0.3},....]}
 
         base_directory: The base directory to load the rules from
 
@@ -266,6 +334,8 @@ def _load_terminals(ruleset_info, grammar, base_directory, config, skip_case):
 
         skip_case: (Bool) If True, capitalization masks are all set to lowercase
 
+        binary: A BinaryRuleset to load the terminals from, or None
+
     Returns:
         
         True: Config was loaded and parsed correctly
@@ -277,7 +347,7 @@ def _load_terminals(ruleset_info, grammar, base_directory, config, skip_case):
     encoding = ruleset_info['encoding']
 
     # Load the alpha terminals
-    if not _load_from_multiple_files(grammar, config['BASE_A'], base_directory, encoding):
+    if not _load_from_multiple_files(grammar, config['BASE_A'], base_directory, encoding, binary):
         print("Error loading alpha terminals")
         return False
 
@@ -287,7 +357,8 @@ def _load_terminals(ruleset_info, grammar, base_directory, config, skip_case):
                 grammar,
                 config['CAPITALIZATION'],
                 base_directory,
-                encoding):
+                encoding,
+                binary):
 
             print("Error loading capitalization masks")
             return False
@@ -302,7 +373,7 @@ def _load_terminals(ruleset_info, grammar, base_directory, config, skip_case):
                         'values': ['L'*length],
                         'prob': 1.0
                     }
-            grammar[name] = [item]
+            grammar.set(name, [item])
 
     '''
     2024.05.04 Added by Seunghee Seo.
@@ -310,56 +381,54 @@ def _load_terminals(ruleset_info, grammar, base_directory, config, skip_case):
     
     '''
     # Load the Hangeul terminals
-    if not _load_from_multiple_files(grammar, config['BASE_H'], base_directory, encoding):
-        print("Error loading Hangeul terminals")
-        return False
+    #
+    # Note: Rulesets trained before Hangeul support was added will not have
+    # this section in their config
+    if config.has_section('BASE_H'):
+        if not _load_from_multiple_files(grammar, config['BASE_H'], base_directory, encoding, binary):
+            print("Error loading Hangeul terminals")
+            return False
     
     ''''''
 
 
 
     # Load the digit terminals
-    if not _load_from_multiple_files(grammar, config['BASE_D'], base_directory, encoding):
+    if not _load_from_multiple_files(grammar, config['BASE_D'], base_directory, encoding, binary):
         print("Error loading digit terminals")
         return False
 
     # Load the 'other' terminals
-    if not _load_from_multiple_files(grammar, config['BASE_O'], base_directory, encoding):
+    if not _load_from_multiple_files(grammar, config['BASE_O'], base_directory, encoding, binary):
         print("Error loading other/special terminals")
         return False
 
     # Load the keyboard terminals
-    if not _load_from_multiple_files(grammar, config['BASE_K'], base_directory, encoding):
+    if not _load_from_multiple_files(grammar, config['BASE_K'], base_directory, encoding, binary):
         print("Error loading keyboard terminals")
         return False
 
     # Load the years
-    if not _load_from_multiple_files(grammar, config['BASE_Y'], base_directory, encoding):
+    if not _load_from_multiple_files(grammar, config['BASE_Y'], base_directory, encoding, binary):
         print("Error loading year terminals")
         return False
 
     # Load Context Sensitive replacements
-    if not _load_from_multiple_files(grammar, config['BASE_X'], base_directory, encoding):
+    if not _load_from_multiple_files(grammar, config['BASE_X'], base_directory, encoding, binary):
         print("Error loading context sensitive terminals")
         return False
 
     # Load OMEN level probabilities
     full_path = os.path.join(base_directory, "Omen", "pcfg_omen_prob.txt")
-    grammar['M'] = []
-    if not _load_from_file(grammar['M'], full_path, encoding):
-        return False
+    grammar.add('M', partial(_load_section, full_path, encoding, binary))
 
     # Load e-mail replacements
     full_path = os.path.join(base_directory, "Emails", "email_providers.txt")
-    grammar['E'] = []
-    if not _load_from_file(grammar['E'], full_path, encoding):
-        return False
+    grammar.add('E', partial(_load_section, full_path, encoding, binary))
 
     # Load website replacements
     full_path = os.path.join(base_directory, "Websites", "website_hosts.txt")
-    grammar['W'] = []
-    if not _load_from_file(grammar['W'], full_path, encoding):
-        return False
+    grammar.add('W', partial(_load_section, full_path, encoding, binary))
 
     return True
 
@@ -421,13 +490,15 @@ def _load_config(ruleset_info, base_directory, config):
     return True
 
 
-def _load_from_multiple_files(grammar, config, base_directory, encoding):
+def _load_from_multiple_files(grammar, config, base_directory, encoding, binary=None):
     """
-    Loads grammar information from multiple files for length specified terminals
+    Adds grammar information from multiple files for length specified terminals
+
+    The files are read when the grammar is loaded
 
     Inputs:
         
-        grammar: A Python dictionary to save the grammar to
+        grammar: A PrunedGrammar to add the terminals to
 
         config: The grammar/ruleset config
 
@@ -435,6 +506,8 @@ def _load_from_multiple_files(grammar, config, base_directory, encoding):
 
         encoding: What file encoding was used to save the grammar/ruleset
 
+        binary: A BinaryRuleset to load the files from, or None
+
     Returns:
         
         True: If everything was loaded ok
@@ -450,17 +523,43 @@ def _load_from_multiple_files(grammar, config, base_directory, encoding):
     for file in filenames:
         full_path = os.path.join(base_directory, directory, file)
 
-        # Initialize the structure to hold the data
         name = config.get('name') + file.split('.')[0]
-        grammar[name] = []
-
-        if not _load_from_file(grammar[name], full_path, encoding):
-            return False
+        grammar.add(name, partial(_load_section, full_path, encoding, binary))
 
     return True
 
 
-def _load_from_file(grammar_section, filename, encoding):
+def _load_section(filename, encoding, binary=None):
+    """
+    Loads the grammar information for one nonterminal from a file
+
+    Used by PrunedGrammar to load the terminals that weren't pruned
+
+    Inputs:
+
+        filename: The full filename of the grammar file to open/process
+
+        encoding: The encoding to use to parse the file
+
+        binary: A BinaryRuleset to load the file from, or None
+
+    Returns:
+
+        grammar_section: A list of {'values':[], 'prob':float} dictionaries
+        in probability order
+
+    Raises:
+
+        Exception: If the file couldn't be loaded
+    """
+    grammar_section = []
+    if not _load_from_file(grammar_section, filename, encoding, binary):
+        raise Exception("Error loading the ruleset file " + filename)
+
+    return grammar_section
+
+
+def _load_from_file(grammar_section, filename, encoding, binary=None):
     """
     Loads grammar information from a file
 
@@ -472,6 +571,9 @@ def _load_from_file(grammar_section, filename, encoding):
 
         encoding: The encoding to use to parse the file
 
+        binary: A BinaryRuleset to load the file from, or None. If the file
+        isn't in it the text file is parsed instead
+
     Returns:
         
         True: If everything was loaded ok
@@ -479,6 +581,12 @@ def _load_from_file(grammar_section, filename, encoding):
         False: If an error occured loading the ruleset
     """
 
+    if binary is not None:
+        section = binary.grouped(filename)
+        if section is not None:
+            grammar_section.extend(section)
+            return True
+
     # Try to open the file
     try:
         with codecs.open(filename, 'r', encoding= encoding, errors= 'surrogateescape') as file:
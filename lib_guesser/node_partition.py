@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+
+
+"""
+
+Name: PCFG_Guesser Node Partitioning
+
+Description: Splits up the guesses of a cracking session so multiple
+computers, (nodes), can work on the same hash list without repeating each
+other's guesses
+
+Every node runs the same priority queue, so they all pop the same
+pre-terminals in the same order. Each node then only generates the guesses
+it is responsible for:
+
+-Small pre-terminals are given to one node, picked by hashing the parse tree
+
+-Large pre-terminals are split into N index ranges, one per node, so a
+ single huge pre-terminal doesn't end up all on one node
+
+-OMEN guesses are handed out round robin by their guess number. Or if
+ omen_units is set, each OMEN level's (length, IP) work units are handed out
+ round robin instead, so a node doesn't have to generate the guesses it
+ then throws away
+
+No coordination between the nodes is needed. The only requirement is every
+node uses the same ruleset, the same --skip_brute/--all_lower options, and
+the same number of nodes, (and the same omen_units setting).
+
+"""
+
+
+import zlib
+
+
+# Pre-terminals with at least this many guesses are split between all of
+# the nodes instead of being given to just one. This must be the same on
+# every node so it isn't a command line option
+SPLIT_THRESHOLD = 10000
+
+
+def parse_node_option(value):
+    """
+    Parses a node option in the format 'i/N'
+
+    Inputs:
+        value: The string to parse, such as '2/4'
+
+    Returns:
+        (node_num, num_nodes)
+
+        node_num: The number of this node, starting at 1
+
+        num_nodes: The total number of nodes
+
+    Raises:
+        ValueError: If the value is not in the right format or the numbers
+        are out of range
+    """
+    try:
+        node_num, num_nodes = value.split('/')
+        node_num = int(node_num)
+        num_nodes = int(num_nodes)
+    except ValueError:
+        raise ValueError(f"The node must be in the format i/N, such as 1/4. The value specified was {value}")
+
+    if num_nodes <= 0 or node_num <= 0 or node_num > num_nodes:
+        raise ValueError(f"The node number must be between 1 and the number of nodes. The value specified was {value}")
+
+    return node_num, num_nodes
+
+
+class NodePartition:
+    """
+    Decides which guesses belong to this node
+    """
+
+    def __init__(self, node_num, num_nodes, omen_units = False):
+        """
+        Initializes the node partition
+
+        Inputs:
+            node_num: The number of this node, starting at 1
+
+            num_nodes: The total number of nodes
+
+            omen_units: If True, split the OMEN guesses up by work unit
+            instead of by guess number
+
+        Returns:
+            NodePartition
+        """
+
+        self.node_num = node_num
+        self.num_nodes = num_nodes
+        self.omen_units = omen_units
+
+        # Zero based version of the node number
+        self.node_index = node_num - 1
+
+    def __str__(self):
+        """
+        Returns the partition in the same 'i/N' format as the command line
+        """
+        return f"{self.node_num}/{self.num_nodes}"
+
+    def assign(self, pt, keyspace):
+        """
+        Finds which guesses of a pre-terminal this node should generate
+
+        Inputs:
+            pt: The parse tree, which is a list of tuples
+
+            keyspace: The number of guesses in the parse tree
+
+        Returns:
+            (start, stop): The range of guesses for this node. stop is
+            exclusive
+
+            None: If this node should not generate any guesses for the
+            parse tree
+        """
+
+        # Split large parse trees into a range for each node
+        if keyspace >= SPLIT_THRESHOLD:
+            start = keyspace * self.node_index // self.num_nodes
+            stop = keyspace * (self.node_index + 1) // self.num_nodes
+            return start, stop
+
+        # Give small parse trees to a single node. Python's hash() is
+        # randomized every time the program runs, so using crc32 so every
+        # node comes up with the same answer
+        key = ','.join(f"{pt_type}:{index}" for pt_type, index in pt)
+        if zlib.crc32(key.encode('utf-8')) % self.num_nodes != self.node_index:
+            return None
+
+        return 0, keyspace
+
+    def owns_omen_guess(self, omen_guess_num):
+        """
+        Checks if an OMEN guess belongs to this node
+
+        Inputs:
+            omen_guess_num: The number of the guess in the current OMEN level
+
+        Returns:
+            True: If this node should generate the guess
+
+            False: If another node will generate the guess
+        """
+        return omen_guess_num % self.num_nodes == self.node_index
+
+    def owned_omen_guesses(self, first_guess_num, guesses):
+        """
+        Returns the OMEN guesses in a batch that belong to this node
+
+        Inputs:
+            first_guess_num: The number of the first guess in the batch, in
+            the current OMEN level
+
+            guesses: The list of guesses in the batch
+
+        Returns:
+            guesses: The list of guesses this node should generate
+        """
+        first_owned = (self.node_index - first_guess_num) % self.num_nodes
+        return guesses[first_owned::self.num_nodes]
+
+    def owns_omen_unit(self, unit_index):
+        """
+        Checks if an OMEN (length, IP) work unit belongs to this node
+
+        Only used if omen_units is set
+
+        Inputs:
+            unit_index: The index of the work unit in the current OMEN level
+
+        Returns:
+            True: If this node should generate the guesses for the work unit
+
+            False: If another node will generate them
+        """
+        return unit_index % self.num_nodes == self.node_index
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+
+"""
+
+Name: OMEN Conditional Probability Table
+
+Description: An integer indexed version of the OMEN conditional
+probabilities, (CP), that is used to generate OMEN guesses.
+
+The CP ngrams read from disk are naturally stored as a dictionary keyed by
+the context, (the first ngram - 1 characters), where each value is another
+dictionary keyed by the level with a list of the possible next characters.
+Generating a guess with that means slicing a new context string out of the
+guess for every character, hashing it, and then probing the level
+dictionary for every level until a match is found.
+
+The CP table assigns every context an integer row, and saves all of the
+next characters in one flat string, grouped by row and then by level, with
+an array of offsets marking where each (row, level) group starts. Next to
+every character it saves the row of the context you end up in after adding
+that character, so walking from one character to the next is just a couple
+of array lookups.
+
+"""
+
+
+from array import array
+
+
+class CPTable:
+    """
+    Integer indexed representation of the OMEN conditional probabilities
+
+    Rows are assigned to the contexts in the order they are first seen in
+    CP.level. The characters for a (row, level) pair are:
+
+        letters[offsets[row * width + level]:offsets[row * width + level + 1]]
+
+    in the same order they were listed in CP.level
+    """
+
+    def __init__(self, cp, max_level):
+        """
+        Encodes the conditional probabilities
+
+        Inputs:
+            cp: The CP dictionary built while reading CP.level, in the format
+            {
+                'aaa': {
+                    0:['b','c'],
+                    2:['d','e']
+                    ...,
+                }
+            }
+
+            max_level: The maximum OMEN level
+
+        Returns:
+            CPTable
+        """
+
+        # The number of offsets saved for each row
+        self.width = max_level + 1
+
+        # Maps rows to contexts. Aka 5 -> 'abc'
+        self.contexts = list(cp)
+
+        # Maps contexts to rows. Aka 'abc' -> 5
+        self.rows = {context: row for row, context in enumerate(self.contexts)}
+
+        # Where each (row, level) group starts in self.letters. There is one
+        # more offset than groups so the last group has an end
+        self.offsets = array('I')
+
+        # The row of the context after a letter is added, or -1 if that
+        # context has no CP ngrams. Aka 'abc' + 'd' -> row of 'bcd'
+        self.next_rows = array('i')
+
+        letters = []
+        for context in self.contexts:
+            levels = cp[context]
+            suffix = context[1:]
+            for level in range(self.width):
+                self.offsets.append(len(letters))
+                for letter in levels.get(level, ()):
+                    letters.append(letter)
+                    self.next_rows.append(self.rows.get(suffix + letter, -1))
+        self.offsets.append(len(letters))
+
+        # All the possible next letters as one string
+        self.letters = ''.join(letters)
+
+    def row(self, context):
+        """
+        Returns the row of a context
+
+        Inputs:
+            context: The ngram - 1 characters to look up
+
+        Returns:
+            row: The row of the context, or -1 if the context has no CP ngrams
+        """
+        return self.rows.get(context, -1)
+
+    def __len__(self):
+        """
+        Returns the number of CP ngrams saved in the table
+        """
+        return len(self.letters)
+
+    def __eq__(self, other):
+        """
+        Two tables are equal if they encode the same CP ngrams in the same order
+        """
+        if not isinstance(other, CPTable):
+            return NotImplemented
+
+        return (self.width == other.width and
+            self.contexts == other.contexts and
+            self.letters == other.letters and
+            self.offsets == other.offsets and
+            self.next_rows == other.next_rows)
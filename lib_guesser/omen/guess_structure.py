@@ -12,6 +12,17 @@ class GuessStructure:
     Based on OMEN
 
     Seperating this out to clean up the markov_cracker code
+
+    The parse tree is a list of [row, level, position] items, one for each
+    CP ngram added after the IP. The row is the CPTable row of the context
+    the letter is added to, and the position is where the letter is saved in
+    CPTable.letters. The position always falls within the (row, level) group.
+
+    Guesses are generated in batches. Every letter left in the (row, level)
+    group of the last item is tried at once, so a batch is all of the
+    guesses that only differ by their last letter. The part of the guess
+    before the last letter is built up in self.prefixes as the parse tree
+    changes, so only the letters after the item that changed are added.
     """
 
     def __init__(self, cp, max_level, ip, cp_length, target_level, optimizer):
@@ -19,7 +30,7 @@ class GuessStructure:
         Initializes the guess structure
 
         Inputs:
-            cp: The conditional probability structure
+            cp: The conditional probability structure, (a CPTable)
 
             max_level: The maximum OMEN level a CP can be to be added. This
             is used as a quick bail out. Initially this will be equal to
@@ -46,12 +57,22 @@ class GuessStructure:
         # The CP structures
         self.cp = cp
 
+        # Saving these off so they don't have to be looked up for every
+        # letter of every guess
+        self.offsets = cp.offsets
+        self.next_rows = cp.next_rows
+        self.letters = cp.letters
+        self.width = cp.width
+
         # The maximum level an item can be
         self.max_level = max_level
 
         # The IP string to use
         self.ip = ip
 
+        # The CP row of the IP
+        self.ip_row = cp.row(ip)
+
         # The length of the IP to use
         self.ip_length = len(self.ip)
 
@@ -64,38 +85,67 @@ class GuessStructure:
         # Initialize the parse_tree
         self.parse_tree = []
 
+        # The start of the guess before each item in the parse tree is
+        # added. prefixes[0] is the IP, and prefixes[-1] is everything but
+        # the last letter of the guess
+        self.prefixes = [ip]
+
         # The optimizer
         self.optimizer = optimizer
 
-    def next_guess(self):
+    def set_parse_tree(self, parse_tree):
         """
-        Get the next guess for this guess structure (aka level + IP)
+        Sets the parse tree, such as when restoring a saved session
+
+        The next batch of guesses will start with the letter after the
+        one the last item in the parse tree points to
+
+        Inputs:
+            parse_tree: The parse tree to continue from
+
+        Returns:
+            None
+        """
+        self.parse_tree = parse_tree
+        self._update_prefixes(0)
+
+    def next_guesses(self):
+        """
+        Get the next batch of guesses for this guess structure (aka level + IP)
         Returns None if no valid guess is left
 
         Inputs:
             None:
 
         Returns:
-            guess: The next guess that can be generated for this Markov structure.
-            Aka the OMEN target level and initial IP.
+            guesses: A list of the next guesses that can be generated for
+            this Markov structure. Aka the OMEN target level and initial IP.
+            They only differ by their last letter.
 
             None: If no more guesses can be generated
         """
+        offsets = self.offsets
+        next_rows = self.next_rows
+        width = self.width
+
         # First Guess
         if not self.parse_tree:
-            self.parse_tree = self._fill_out_parse_tree(self.ip,self.cp_length, self.target_level)
-            if not self.parse_tree:
+            new_elements = self._fill_out_parse_tree(self.ip_row, self.cp_length, self.target_level)
+            if not new_elements:
                 return None
 
-            return self._format_guess()
+            self.parse_tree = [list(item) for item in new_elements]
+
+            self._update_prefixes(0)
+            return self._last_letter_guesses(self.parse_tree[-1][2])
 
         # Every guess after the first guess
 
-        # Shortcut deal with the last item
+        # Shortcut deal with the last item. Only happens if the parse tree
+        # was restored part way through a batch
         last_item = self.parse_tree[-1]
-        if last_item[2] + 1 < len(self.cp[last_item[0]][last_item[1]]):
-            self.parse_tree[-1][2] += 1
-            return self._format_guess()
+        if last_item[2] + 1 < offsets[last_item[0] * width + last_item[1] + 1]:
+            return self._last_letter_guesses(last_item[2] + 1)
 
         # Pop the last element off
         element = self.parse_tree.pop()
@@ -117,7 +167,7 @@ class GuessStructure:
             # Simplifying some of the code by assigning this pointer
             last_item = self.parse_tree[-1]
 
-            # Start it out by incrementing the index of the last item
+            # Start it out by incrementing the position of the last item
             last_item[2] += 1
 
             # The level we are workng from for this current depth
@@ -126,16 +176,43 @@ class GuessStructure:
             # Levels for depth start off at the max and go down to 0
             while True:
 
-                while last_item[2] < len(self.cp[last_item[0]][depth_level]):
-                    new_ip = element[0][0:-1] + self.cp[last_item[0]][depth_level][last_item[2]]
-                    new_elements = self._fill_out_parse_tree(new_ip, req_length, req_level-depth_level)
+                end = offsets[last_item[0] * width + depth_level + 1]
+
+                # Only the last letter is left to fill in. This is the most
+                # common case, so check for it here instead of calling
+                # _fill_out_parse_tree() for every letter at this depth
+                if req_length == 1:
+                    last_level = req_level - depth_level
+                    if 0 <= last_level <= self.max_level:
+                        for position in range(last_item[2], end):
+                            new_row = next_rows[position]
+                            if new_row < 0:
+                                continue
+
+                            group = new_row * width + last_level
+
+                            # Found a match!!
+                            if offsets[group] < offsets[group + 1]:
+                                last_item[2] = position
+                                self.parse_tree.append([new_row, last_level, offsets[group]])
+                                self._update_prefixes(len(self.parse_tree) - 2)
+                                return self._last_letter_guesses(offsets[group])
+
+                    last_item[2] = end
+
+                while last_item[2] < end:
+                    new_row = next_rows[last_item[2]]
+                    new_elements = self._fill_out_parse_tree(new_row, req_length, req_level-depth_level)
 
                     # Found a match!!
                     if new_elements is not None:
-                        self.parse_tree += new_elements
-                        return self._format_guess()
+                        self.parse_tree += [list(item) for item in new_elements]
+
+                        # Only the guess after the item that changed needs to be updated
+                        self._update_prefixes(len(self.parse_tree) - len(new_elements) - 1)
+                        return self._last_letter_guesses(self.parse_tree[-1][2])
 
-                    # Otherwise, increase the index and try again at this depth level
+                    # Otherwise, increase the position and try again at this depth level
                     last_item[2] += 1
 
                 # No lower level, exit out of this
@@ -143,16 +220,16 @@ class GuessStructure:
                     break
 
                 # Try a lower level
-                cp_index, depth_level = self._find_cp(last_item[0], depth_level-1, 0)
+                cp_start, depth_level = self._find_cp(last_item[0], depth_level-1, 0)
 
                 # No lower level, exit
-                if cp_index is None:
+                if cp_start is None:
                     break
 
                 last_item[1] = depth_level
 
-                # Reset the index to the start
-                last_item[2] = 0
+                # Reset the position to the start of the level
+                last_item[2] = cp_start
 
             # No match, go deeper
             element = self.parse_tree.pop()
@@ -163,49 +240,80 @@ class GuessStructure:
 
         return None
 
-    def _format_guess(self):
+    def _update_prefixes(self, depth):
         """
-        Takes the parse tree and the IP and generates an actual guess to return
+        Updates the start of the guess after the parse tree changed
 
         Inputs:
-            None
+            depth: The index of the first item in the parse tree that changed
 
         Returns:
-            guess: The string guess to print out
+            None
         """
+        letters = self.letters
+        prefixes = self.prefixes
 
-        guess = self.ip
-        for item in self.parse_tree:
-            guess += self.cp[item[0]][item[1]][item[2]]
+        # The prefixes up to and including depth don't use the changed items
+        del prefixes[depth + 1:]
 
-        return guess
+        prefix = prefixes[-1]
+        for item in self.parse_tree[depth:-1]:
+            prefix += letters[item[2]]
+            prefixes.append(prefix)
 
-    def _fill_out_parse_tree(self, ip, length, target_level):
+    def _last_letter_guesses(self, start):
+        """
+        Generates the guesses for every letter the last item in the parse
+        tree can be, starting with the letter at start
+
+        Moves the last item in the parse tree to the last letter of its group
+
+        Inputs:
+            start: The position in the CPTable of the first letter to use
+
+        Returns:
+            guesses: The list of guesses
+        """
+        last_item = self.parse_tree[-1]
+        end = self.offsets[last_item[0] * self.width + last_item[1] + 1]
+        last_item[2] = end - 1
+
+        prefix = self.prefixes[-1]
+        return [prefix + letter for letter in self.letters[start:end]]
+
+    def _fill_out_parse_tree(self, row, length, target_level):
         """
         Fills out a parse tree for OME given an IP, length and
         target level.
 
         Inputs:
-            ip: The initial probability Ngram to start with
+            row: The CP row of the context to start with, (-1 if there are no
+            CP ngrams for it)
 
             length: The length of the guess to generate
 
             target_level: The target level to generate OMEN strings for
 
         Returns:
-            result: the parse tree for this OMEN generation
+            result: the parse tree for this OMEN generation, as a tuple of
+            (row, level, position) tuples so it can be cached by the optimizer
+            without being copied
 
             None: If no valid parse tree exists for the IP/length/target level
         """
+        # Quick bail out if there is nothing that can follow this context
+        if row < 0:
+            return None
+
         if length == 1:
-            cp_index, cp_level = self._find_cp(ip, target_level, target_level)
-            if cp_index is None:
+            cp_start, cp_level = self._find_cp(row, target_level, target_level)
+            if cp_start is None:
                 return None
-            return [[ip, cp_level, 0]]
+            return ((row, cp_level, cp_start),)
 
         ###--Check to see if the optimizer has an answer
         if length <= self.optimizer.max_length:
-            found, result = self.optimizer.lookup(ip, length, target_level)
+            found, result = self.optimizer.lookup(row, length, target_level)
 
             # If a previous result was stored in the optimizer, return it
             if found:
@@ -218,45 +326,41 @@ class GuessStructure:
 
         while cur_level >= 0:
             # Find the top level CP for the current level
-            cp_index, cp_level = self._find_cp(ip, cur_level, 0)
-            if cp_index is None:
+            cp_start, cp_level = self._find_cp(row, cur_level, 0)
+            if cp_start is None:
                 if length <= self.optimizer.max_length:
-                    self.optimizer.update(ip, length, optimize_level_target, None)
+                    self.optimizer.update(row, length, optimize_level_target, None)
                 return None
 
             next_length = length - 1
-            top_index = len(cp_index)
-            cur_index = 0
-            while cur_index < top_index:
-                next_ip = ip[1:]+cp_index[cur_index]
+            cp_end = self.offsets[row * self.width + cp_level + 1]
+            for position in range(cp_start, cp_end):
                 working_parse_tree = self._fill_out_parse_tree(
-                    ip = next_ip,
+                    row = self.next_rows[position],
                     length = next_length,
                     target_level = target_level - cp_level
                     )
 
                 if working_parse_tree is not None:
-                    result = [[ip, cp_level, cur_index]] + working_parse_tree
+                    result = ((row, cp_level, position),) + working_parse_tree
                     if length <= self.optimizer.max_length:
-                        self.optimizer.update(ip, length, optimize_level_target, result)
+                        self.optimizer.update(row, length, optimize_level_target, result)
                     return result
 
-                cur_index += 1
-
             # Need to go one less than the returned cp level so we don't loop forever
             cur_level = cp_level - 1
 
         if length <= self.optimizer.max_length:
-            self.optimizer.update(ip, length, optimize_level_target, None)
+            self.optimizer.update(row, length, optimize_level_target, None)
         return None
 
-    def _find_cp(self, ip, top_level, bottom_level):
+    def _find_cp(self, row, top_level, bottom_level):
         """
-        Returns a pointer to the highest possible transition in the format of
-        [ip, level, index], for the next conditional probability ngram
+        Returns a pointer to the highest possible transition for the next
+        conditional probability ngram
 
         Inputs:
-            IP: The initial probability ngram to work from
+            row: The CP row of the context to work from
 
             top_level: The highest OMEN level the CP can be
 
@@ -266,24 +370,30 @@ class GuessStructure:
         Returns:
             (CP_Pointer, top_level)
 
-            CP_Pointer: A pointer to the hightest level CP possible
+            CP_Pointer: Where the letters for the hightest level CP possible
+            start in the CPTable
 
             top_level: The remainder OMEN level for future CP ngrams to use
         """
 
-        # Quick bail out if the ip is not present
-        if ip not in self.cp:
+        # Quick bail out if there are no CP ngrams for this context
+        if row < 0:
             return None, None
 
         # Set the maximum level we're going to check
         if self.max_level < top_level:
             top_level = self.max_level
 
+        offsets = self.offsets
+        group = row * self.width + top_level
+
         # Attempt to find the highest transition possible
         while top_level >= bottom_level:
-            if top_level in self.cp[ip]:
-                return self.cp[ip][top_level], top_level
+            start = offsets[group]
+            if start < offsets[group + 1]:
+                return start, top_level
 
             top_level -= 1
+            group -= 1
 
         return None, None
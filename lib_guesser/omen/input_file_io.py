@@ -13,10 +13,12 @@ import sys
 import os
 import codecs
 import configparser
-import traceback
 
+# Local imports
+from .cp_table import CPTable
 
-def load_rules(base_directory, grammar):
+
+def load_rules(base_directory, grammar, binary=None):
     """
     Top level function that is called to read in the ruleset from disk
 
@@ -41,14 +43,15 @@ def load_rules(base_directory, grammar):
                 ...
             },
             ep: { 'aaa': 0, 'aab': 4, ...},
-            cp: {
-                'aaa': {
-                    0:['b','c'],
-                    2:['d','e']
-                    ...,
-                }
-            },
+            cp: CPTable,
         }
+
+        The CPTable is an integer indexed version of the CP ngrams, see
+        cp_table.py for how it is laid out
+
+        binary: A BinaryRuleset to load the files from instead of the text
+        files, or None
+
     Returns:
         True: If it successfully loaded the grammar.
         Actual grammar is returned in the grammar dictionary
@@ -62,21 +65,25 @@ def load_rules(base_directory, grammar):
         _load_config(base_directory, "config.txt", grammar)
 
         # Load the alphabet
-        _load_alphabet(base_directory, "alphabet.txt", grammar)
+        _load_alphabet(base_directory, "alphabet.txt", grammar, binary)
 
         # Load the IP ngrams
-        _load_ngrams(base_directory, "IP.level", grammar, "ip")
+        _load_ngrams(base_directory, "IP.level", grammar, "ip", binary)
 
         # Load the EP ngrams
-        _load_ngrams(base_directory, "EP.level", grammar, "ep")
+        _load_ngrams(base_directory, "EP.level", grammar, "ep", binary)
 
         # Load the CP ngrams
-        _load_ngrams(base_directory, "CP.level", grammar, "cp")
+        _load_ngrams(base_directory, "CP.level", grammar, "cp", binary)
+
+        # Encode the CP ngrams into flat arrays for guess generation
+        grammar['cp'] = CPTable(grammar['cp'], grammar['max_level'])
 
         # Load the length info
-        _load_length(base_directory, "LN.level", grammar, "ln", grammar['ngram'])
+        _load_length(base_directory, "LN.level", grammar, "ln", grammar['ngram'], binary)
 
     except Exception as msg:
+        import traceback
         traceback.print_exc(file=sys.stdout)
         print(msg)
         return False
@@ -123,7 +130,7 @@ def _load_config(base_directory, filename, grammar):
         raise
 
 
-def _load_alphabet(base_directory, filename, grammar):
+def _load_alphabet(base_directory, filename, grammar, binary=None):
     """
     Loads the alphabet from file
 
@@ -136,12 +143,21 @@ def _load_alphabet(base_directory, filename, grammar):
 
         grammar: A dictionary to save the grammar to
 
+        binary: A BinaryRuleset to load the file from, or None
+
     Returns:
         None: Will raise an uncaught exception if an error occurs.
     """
     try:
         full_file_path = os.path.join(base_directory, filename)
         grammar['alphabet'] = []
+
+        if binary is not None:
+            lines = binary.lines(full_file_path)
+            if lines is not None:
+                grammar['alphabet'].extend(lines)
+                return
+
         # Using errors= 'strict' to throw an exception if we can't read any of the alphabet file
         # If that problem occurs, it strongly implies something happened during the training phase
         with codecs.open(full_file_path, 'r', encoding= grammar['alphabet_encoding'], errors= 'strict') as file:
@@ -158,7 +174,7 @@ def _load_alphabet(base_directory, filename, grammar):
         raise
 
 
-def _load_ngrams(base_directory, filename, grammar, name):
+def _load_ngrams(base_directory, filename, grammar, name, binary=None):
     """
     Reads the probability info for ngrams
 
@@ -175,6 +191,8 @@ def _load_ngrams(base_directory, filename, grammar, name):
         name: The key name to save the ngram info as. Also
         provides info on how to parse it, aka if the name is "ip".
 
+        binary: A BinaryRuleset to load the file from, or None
+
     Returns:
         None: Will raise an uncaught exception if an error occurs.
     """
@@ -191,48 +209,48 @@ def _load_ngrams(base_directory, filename, grammar, name):
     try:
         full_file_path = os.path.join(base_directory, filename)
 
+        # (level, ngram) pairs for each line in the file
+        items = None
+        if binary is not None:
+            section = binary.levels(full_file_path)
+            if section is not None:
+                items = zip(*section)
+
         # Open the file for reading
-        with codecs.open(full_file_path, 'r', encoding= grammar['alphabet_encoding'], errors= 'strict') as file:
-            for line in file:
-                line = line.rstrip('\n\r').split('\t')
-
-                # If there wasn't a line to read. This indicates an error in the trianing file somewhere
-                if len(line) != 2:
-                    print(f"Error parsing {full_file_path}", file=sys.stderr)
-                    print("This indicates there was a problem with the training program or the file was corrupted somehow", file=sys.stderr)
-                    raise Exception
-
-                # Will throw a ValueError if not an int
-                level = int(line[0])
-                # Sanity check on the range the level falls in
-                if level < 0 or level > grammar['max_level']:
-                    print(f"Invalid level found parsing {full_file_path}", file=sys.stderr)
-                    print(f"Level = {level}", file=sys.stderr)
-                    print("This indicates there was a problem with the training program or the file was corrupted somehow", file=sys.stderr)
-                    raise Exception
-
-                # Save the level
-
-                # For IP
-                if name == "ip":
-                    grammar[name][level].append(line[1])
-
-                # For EP
-                elif name == "ep":
-                    grammar[name][line[1]] = level
-
-                # For CP
-                elif name == "cp":
-                    # Get all of the characters except the last character
-                    search_string = line[1][0:-1]
-                    if search_string not in grammar[name]:
-                        grammar[name][search_string] = {}
-                    if level not in grammar[name][search_string]:
-                        grammar[name][search_string][level] = []
-
-                    grammar[name][search_string][level].append(line[1][-1])
-                else:
-                    print("Hmm that shouldn't happen. Hit an unexpected error with the function to load the rules", file=sys.stderr)
+        if items is None:
+            items = _read_ngram_file(full_file_path, grammar['alphabet_encoding'])
+
+        for level, ngram in items:
+
+            # Sanity check on the range the level falls in
+            if level < 0 or level > grammar['max_level']:
+                print(f"Invalid level found parsing {full_file_path}", file=sys.stderr)
+                print(f"Level = {level}", file=sys.stderr)
+                print("This indicates there was a problem with the training program or the file was corrupted somehow", file=sys.stderr)
+                raise Exception
+
+            # Save the level
+
+            # For IP
+            if name == "ip":
+                grammar[name][level].append(ngram)
+
+            # For EP
+            elif name == "ep":
+                grammar[name][ngram] = level
+
+            # For CP
+            elif name == "cp":
+                # Get all of the characters except the last character
+                search_string = ngram[0:-1]
+                if search_string not in grammar[name]:
+                    grammar[name][search_string] = {}
+                if level not in grammar[name][search_string]:
+                    grammar[name][search_string][level] = []
+
+                grammar[name][search_string][level].append(ngram[-1])
+            else:
+                print("Hmm that shouldn't happen. Hit an unexpected error with the function to load the rules", file=sys.stderr)
 
     except IOError as msg:
         print("Could not open the config file for the ruleset specified. The rule directory may not exist", file=sys.stderr)
@@ -247,7 +265,38 @@ def _load_ngrams(base_directory, filename, grammar, name):
         raise
 
 
-def _load_length(base_directory, filename, grammar, name, min_size):
+def _read_ngram_file(full_file_path, encoding):
+    """
+    Reads the (level, ngram) lines from an OMEN ngram file
+
+    Will raise an exception if the file can't be read or is malformed
+
+    Inputs:
+        full_file_path: The ngram file to read
+
+        encoding: The encoding the file was saved with
+
+    Returns:
+        items: A list of (level, ngram) tuples, in file order
+    """
+    items = []
+    with codecs.open(full_file_path, 'r', encoding= encoding, errors= 'strict') as file:
+        for line in file:
+            line = line.rstrip('\n\r').split('\t')
+
+            # If there wasn't a line to read. This indicates an error in the trianing file somewhere
+            if len(line) != 2:
+                print(f"Error parsing {full_file_path}", file=sys.stderr)
+                print("This indicates there was a problem with the training program or the file was corrupted somehow", file=sys.stderr)
+                raise Exception
+
+            # Will throw a ValueError if not an int
+            items.append((int(line[0]), line[1]))
+
+    return items
+
+
+def _load_length(base_directory, filename, grammar, name, min_size, binary=None):
     """
     Reads the probability info for guess length
 
@@ -267,6 +316,8 @@ def _load_length(base_directory, filename, grammar, name, min_size):
         to help target password creation policies where min length
         is enforced.
 
+        binary: A BinaryRuleset to load the file from, or None
+
     Returns:
         None: Will raise an uncaught exception if an error occurs.
     """
@@ -279,34 +330,41 @@ def _load_length(base_directory, filename, grammar, name, min_size):
     try:
         full_file_path = os.path.join(base_directory, filename)
 
-        # Open the file for writing
-        with open(full_file_path, 'r') as file:
-            # The length of the current item
-            cur_length = 1
-
-            # Read all of the lines in the file. Each one will be a new length level
-            for line in file:
+        lines = None
+        if binary is not None:
+            lines = binary.lines(full_file_path)
 
-                # Will throw a ValueError if not an int
-                level = int(line.rstrip('\n\r'))
-
-                # Sanity check on the range the level falls in
-                if level < 0 or level > grammar['max_level']:
-                    print(f"Invalid level found parsing {full_file_path}", file=sys.stderr)
-                    print(f"Level = {level}", file=sys.stderr)
-                    print("This indicates there was a problem with the training program or the file was corrupted somehow", file=sys.stderr)
-                    raise Exception
-
-                # Save the level
-                # Don't save if the length is smaller than the mininum size for this ruleset
-                if (cur_length >= min_size):
-                    # Note, we're saving the number of Conditional Probability items that need to be applied
-                    # to an IP, not the final guess length. This is to avoid having to recalculate that all the
-                    # time during guess gneneration
-                    grammar[name][level].append(cur_length - (min_size -1))
-
-                # Increment cur_length for the next length
-                cur_length += 1
+        # Open the file for writing
+        if lines is None:
+            with open(full_file_path, 'r') as file:
+                lines = file.readlines()
+
+        # The length of the current item
+        cur_length = 1
+
+        # Read all of the lines in the file. Each one will be a new length level
+        for line in lines:
+
+            # Will throw a ValueError if not an int
+            level = int(line.rstrip('\n\r'))
+
+            # Sanity check on the range the level falls in
+            if level < 0 or level > grammar['max_level']:
+                print(f"Invalid level found parsing {full_file_path}", file=sys.stderr)
+                print(f"Level = {level}", file=sys.stderr)
+                print("This indicates there was a problem with the training program or the file was corrupted somehow", file=sys.stderr)
+                raise Exception
+
+            # Save the level
+            # Don't save if the length is smaller than the mininum size for this ruleset
+            if (cur_length >= min_size):
+                # Note, we're saving the number of Conditional Probability items that need to be applied
+                # to an IP, not the final guess length. This is to avoid having to recalculate that all the
+                # time during guess gneneration
+                grammar[name][level].append(cur_length - (min_size -1))
+
+            # Increment cur_length for the next length
+            cur_length += 1
 
     except IOError:
         print("Could not open the config file for the ruleset specified. The rule directory may not exist", file=sys.stderr)
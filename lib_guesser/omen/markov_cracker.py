@@ -6,16 +6,47 @@ Brute force generation of password guesses using Markov probabilities to
 generate likely guesses first
 
 This uses the OMEN algorithm for generating guesses
+
+Sessions are saved in a small binary format so they can be saved often
+without slowing down guess generation. The format is:
+
+    header: magic (8 bytes), version (uint32), target_level (uint32),
+            len_level (uint32), len_index (uint32), ip_level (uint32),
+            ip_index (uint32), unit_index (int64), num_items (int32),
+            uuid_length (uint32)
+
+    uuid: uuid_length bytes, the UUID of the ruleset as UTF-8 text
+
+    parse_tree: num_items * 3 uint32s, the (row, level, position) of each
+                item in the parse tree
+
+unit_index is -1 if the level hasn't been started yet. num_items is -1 if
+all the guesses for the current work unit have been generated.
+
+Sessions saved by older versions of the guesser were python pickles, and
+can still be loaded.
 """
 
 
 import sys
-import pickle # Used for saving sessions
+import io
+import struct
+import pickle # Used for loading sessions from older versions
+from array import array
 
 # Local imports
 from .guess_structure import GuessStructure
 
 
+# Identifies the file as an OMEN session
+MAGIC = b'PCFGOMN1'
+
+# Increment this if the file format changes
+VERSION = 1
+
+HEADER = struct.Struct('<8sIIIIIIqiI')
+
+
 class MarkovCracker:
     """
     Contains all the logic for handling Markov guess generation
@@ -23,7 +54,7 @@ class MarkovCracker:
     Based on OMEN
     """
 
-    def __init__(self, grammar, target_level = 1, optimizer = None):
+    def __init__(self, grammar, target_level = 1, optimizer = None, ruleset_uuid = None):
         """
         Initializes the cracker
 
@@ -37,6 +68,9 @@ class MarkovCracker:
             optimizer: A TMTO option to cache words to make guess generation
             faster over time.
 
+            ruleset_uuid: The UUID of the ruleset. Saved with sessions so
+            they aren't restored with a different ruleset. None skips the check
+
         """
 
         # Store the ruleset
@@ -45,6 +79,9 @@ class MarkovCracker:
         # Save the optimizer
         self.optimizer = optimizer
 
+        # Used to check saved sessions are for the same ruleset
+        self.ruleset_uuid = ruleset_uuid
+
         # This is the maximum level an item can be
         self.max_level = grammar['max_level']
 
@@ -67,9 +104,27 @@ class MarkovCracker:
         # The current IP pointer
         self.cur_ip = None
 
-        # The current guess structure
+        # The index of the current (length, IP) work unit in this level
+        self.unit_index = None
+
+        # The current guess structure. If it is None once the level has
+        # started, then all the guesses for the current work unit are done
         self.cur_guess = None
 
+        # The work units left to generate guesses for, or None if this level
+        # hasn't been started yet
+        self.units = None
+
+        # A NodePartition if the work units are being split between multiple
+        # computers. None generates all of them
+        self.unit_partition = None
+
+        # The batch of guesses being returned one at a time by next_guess()
+        self.pending = []
+
+        # The index of the next guess in self.pending to return
+        self.pending_index = 0
+
     def _find_first_object(self, lookup_table):
         """
         Finds the first valid IP or Length object
@@ -96,6 +151,9 @@ class MarkovCracker:
         After that, it will "reset" so if you call it again it will start
         looping over the same guesses
 
+        Calling next_guesses() is a lot faster if you can deal with a batch
+        of guesses at a time
+
         Inputs:
             None
 
@@ -104,151 +162,169 @@ class MarkovCracker:
 
             None: If a guess does not exist, return None
         """
-        # Deal with starting off the Markov chain
-        if self.cur_guess is None:
+        if self.pending_index >= len(self.pending):
+            guesses = self.next_guesses()
+            if guesses is None:
+                self.pending = []
+                self.pending_index = 0
+                return None
+
+            self.pending = guesses
+            self.pending_index = 0
+
+        guess = self.pending[self.pending_index]
+        self.pending_index += 1
+        return guess
 
-            # Set the starting IP and Length
-            self.cur_len = [self.start_length, 0]
-            self.cur_ip  = [self.start_ip, 0]
 
-            # Create the guess structure
-            self.cur_guess = GuessStructure(
-                max_level = self.max_level,
-                cp = self.grammar['cp'],
-                ip = self.grammar['ip'][self.cur_ip[0]][self.cur_ip[1]],
-                cp_length = self.grammar['ln'][self.cur_len[0]][self.cur_len[1]],
-                target_level = self.target_level  - self.cur_len[0] - self.cur_ip[0],
-                optimizer = self.optimizer,
-                )
+    def next_guesses(self):
+        """
+        Generates the "next" batch of guesses from this model
 
-        # Grab the next guess for the current length and current target
-        guess =  self.cur_guess.next_guess()
+        Don't mix this with next_guess() since any guesses next_guess() has
+        not returned yet from its batch will be skipped
 
-        # If guess is None, then there isn't a guess for the current length
-        # so increase the length if possible
-        while guess is None:
+        Will return None when no more guesses are left to be created
+        After that, it will "reset" so if you call it again it will start
+        looping over the same guesses
 
-            # Attempt to increase the IP for the curent target level + length
-            if not self._increase_ip_for_target(working_target = self.target_level - self.cur_len[0]):
-                # Attempt to increase the length for the current target level
-                if not self._increase_len_for_target():
+        Inputs:
+            None
 
-                    # Done with all password guesses for this level, and can't increase level, exit
-                    self.cur_guess = None
-                    return None
+        Returns:
+            guesses: A list of the next guesses, if any exist
 
-            guess =  self.cur_guess.next_guess()
+            None: If no more guesses exist, return None
+        """
+        # Deal with starting off the Markov chain
+        if self.units is None:
+            self.units = self.work_units()
+            self.cur_guess = None
 
-        return guess
+        # Grab the next guesses for the current length and current target
+        guesses = None
+        if self.cur_guess is not None:
+            guesses = self.cur_guess.next_guesses()
+
+        # If guesses is None, then there isn't a guess left for the current
+        # length and IP, so move on to the next ones
+        while guesses is None:
+            if not self.next_unit():
+
+                # Done with all password guesses for this level, reset it
+                self.units = None
+                self.cur_guess = None
+                return None
+
+            guesses = self.cur_guess.next_guesses()
 
-    def _increase_len_for_target(self):
+        return guesses
+
+    def work_units(self):
         """
-        Increases the length for the current target level
+        Generates the (length, IP) work units for the target level
 
-        FYI: Should always return True if target level > max_level
+        Each work unit is a GuessStructure worth of guesses. They are
+        listed in the order the guesses are generated: by length level, then
+        length, then IP level, then IP. Only work units whose length and IP
+        levels fit in the target level are listed.
 
         Inputs:
             None
 
         Returns:
-            True: If it could increase the length for the target level
-
-            False: If it could not increase the length and still generate a guess for
-            the target level
-
+            units: A generator of (unit_index, cur_len, cur_ip), where cur_len
+            and cur_ip are [level, index] pointers into the LN and IP tables
         """
-        level = self.cur_len[0]
-        index = self.cur_len[1] + 1
-
         ln = self.grammar['ln']
+        ip = self.grammar['ip']
 
-        # Loop through all the valid levels left
-        while level <= self.max_level:
+        unit_index = 0
+        for len_level in range(self.start_length, min(self.max_level, self.target_level) + 1):
+            for len_index in range(len(ln[len_level])):
 
-            # Check to see if there is a length option for the current level
-            size = len(ln[level])
-            if size > index:
+                ip_target = self.target_level - len_level
+                for ip_level in range(self.start_ip, min(self.max_level, ip_target) + 1):
+                    for ip_index in range(len(ip[ip_level])):
+                        yield unit_index, [len_level, len_index], [ip_level, ip_index]
+                        unit_index += 1
 
-                # Save the new length pointer
-                self.cur_len = [level, index]
+    def next_unit(self):
+        """
+        Moves on to the next work unit, skipping any that belong to another
+        computer
 
-                # Reset the current IP
-                self.cur_ip  = [self.start_ip, 0]
+        Inputs:
+            None
+
+        Returns:
+            True: If there was another work unit. self.cur_guess is the
+            GuessStructure for it
 
-                # Reset the current guess
-                self.cur_guess = GuessStructure(
-                    cp = self.grammar['cp'],
-                    max_level = self.max_level,
-                    ip = self.grammar['ip'][self.cur_ip[0]][self.cur_ip[1]],
-                    cp_length = self.grammar['ln'][self.cur_len[0]][self.cur_len[1]],
-                    target_level = self.target_level  - self.cur_len[0] - self.cur_ip[0],
-                    optimizer = self.optimizer,
-                    )
+            False: If there are no more work units for this level
+        """
+        for unit_index, cur_len, cur_ip in self.units:
+            if self.unit_partition is None or self.unit_partition.owns_omen_unit(unit_index):
+                self.set_unit(unit_index, cur_len, cur_ip)
                 return True
 
-            # No valid items at this level, check if we can go up a level
-            level += 1
-            index = 0
-            if level > self.max_level:
-                return False
-            elif level > self.target_level:
-                return False
+        return False
 
-    def  _increase_ip_for_target(self, working_target = 0):
+    def set_unit(self, unit_index, cur_len, cur_ip, parse_tree = []):
         """
-        Increases the IP for the current target level
+        Sets the work unit to generate guesses for
 
         Inputs:
-            working_target: The target level, (minus the length value
+            unit_index: The index of the work unit in this level
+
+            cur_len: The [level, index] pointer of the length
+
+            cur_ip: The [level, index] pointer of the IP
+
+            parse_tree: Where to continue from in the work unit. An empty
+            list starts from the first guess, and None means all the guesses
+            for the work unit are done
 
         Returns:
-            True: If it could increase the IP level
+            None
+        """
+        self.unit_index = unit_index
+        self.cur_len = cur_len
+        self.cur_ip = cur_ip
+
+        if parse_tree is None:
+            self.cur_guess = None
+            return
+
+        self.cur_guess = self.unit_guess_structure(cur_len, cur_ip)
+        if parse_tree:
+            self.cur_guess.set_parse_tree(parse_tree)
 
-            False: If it could not increase the IP level and still generate a guess
-            that fell within the target level
+    def unit_guess_structure(self, cur_len, cur_ip):
         """
-        level = self.cur_ip[0]
-        index = self.cur_ip[1] + 1
+        Creates the GuessStructure for a work unit
 
-        ip = self.grammar['ip']
+        Inputs:
+            cur_len: The [level, index] pointer of the length
 
-        # Loop through all the valid levels left
-        while level <= self.max_level:
-
-            # Check to see if there is a IP option for the current level
-            size = len(ip[level])
-            if size > index:
-
-                # Save the new IP pointer
-                self.cur_ip = [level, index]
-
-                # Reset the current guess
-                self.cur_guess = GuessStructure(
-                    cp = self.grammar['cp'],
-                    max_level = self.max_level,
-                    ip = self.grammar['ip'][self.cur_ip[0]][self.cur_ip[1]],
-                    cp_length = self.grammar['ln'][self.cur_len[0]][self.cur_len[1]],
-                    target_level = self.target_level - self.cur_len[0] - self.cur_ip[0],
-                    optimizer = self.optimizer,
-                    )
-                return True
+            cur_ip: The [level, index] pointer of the IP
 
-            # No valid items at this level, check if we can go up a level
-            level += 1
-            index = 0
-            if level > self.max_level:
-                return False
-            elif level > working_target:
-                return False
+        Returns:
+            guess_structure: A GuessStructure that starts at the first guess
+        """
+        return GuessStructure(
+            cp = self.grammar['cp'],
+            max_level = self.max_level,
+            ip = self.grammar['ip'][cur_ip[0]][cur_ip[1]],
+            cp_length = self.grammar['ln'][cur_len[0]][cur_len[1]],
+            target_level = self.target_level - cur_len[0] - cur_ip[0],
+            optimizer = self.optimizer,
+            )
 
     def save_session(self, file_name):
         """
         Saves a cracking session to disk
 
-        Note: Using python pickles just to make coding it easier
-        Of course that makes debugging harder, and the overall saving slower though.
-        May move away from this in the future
-
         Inputs:
             file_name: The file to save the cracking session to
 
@@ -256,16 +332,69 @@ class MarkovCracker:
             None
         """
         with open(file_name, 'wb') as file:
+            file.write(self.session_data())
 
-            # Save the Markov Cracker variables here
-            pickle.dump(self.target_level, file)
-            pickle.dump(self.cur_ip, file)
-            pickle.dump(self.cur_len, file)
+    def session_data(self):
+        """
+        Returns the cracking session in the format saved by save_session()
 
-            # Save the guess structure variables here, not saving the full guess structure since it
-            # includes a link to the grammar itself.
-            pickle.dump(self.cur_guess.parse_tree, file)
-            pickle.dump(self.cur_guess.first_guess, file)
+        Used to save the session from another thread, since the cracker
+        state will have moved on by the time it is written
+
+        Inputs:
+            None
+
+        Returns:
+            data: The saved session as bytes
+        """
+        items = array('I')
+
+        # The level hasn't been started yet
+        if self.units is None:
+            unit_index = -1
+            cur_len = [0, 0]
+            cur_ip = [0, 0]
+            num_items = 0
+
+        else:
+            unit_index = self.unit_index
+            cur_len = self.cur_len
+            cur_ip = self.cur_ip
+
+            # All the guesses for the current work unit have been generated
+            if self.cur_guess is None:
+                num_items = -1
+
+            # Only save the parse tree, since the rest of the guess structure
+            # can be re-created from the grammar
+            else:
+                parse_tree = self.cur_guess.parse_tree
+                for item in parse_tree:
+                    items.extend(item)
+
+                # The guess structure has moved on to the end of the batch, so
+                # point it back at the last guess next_guess() returned
+                if parse_tree:
+                    items[-1] -= len(self.pending) - self.pending_index
+
+                num_items = len(parse_tree)
+
+        uuid = (self.ruleset_uuid or '').encode('utf-8')
+
+        header = HEADER.pack(
+            MAGIC,
+            VERSION,
+            self.target_level,
+            cur_len[0],
+            cur_len[1],
+            cur_ip[0],
+            cur_ip[1],
+            unit_index,
+            num_items,
+            len(uuid)
+            )
+
+        return header + uuid + items.tobytes()
 
     def load_session(self, file_name, pt_item):
         """
@@ -278,30 +407,134 @@ class MarkovCracker:
 
         Returns:
             None
+
+        Raises:
+            OSError: If the file could not be read
+
+            ValueError: If the file is not a valid OMEN session, or it is for
+            a different ruleset
         """
         with open(file_name, 'rb') as file:
+            data = file.read()
+
+        if data[:len(MAGIC)] == MAGIC:
+            unit_index, parse_tree = self._parse_session(data)
+        else:
+            unit_index, parse_tree = self._parse_legacy_session(data)
+
+        # Update the status report item with the real level
+        pt_item['pt'][0][1] = self.target_level -1
+        pt_item['pt'][0][2] = self.target_level -1
+
+        self.pending = []
+        self.pending_index = 0
+
+        # The session was saved before the level was started
+        if unit_index == -1:
+            self.units = None
+            self.cur_guess = None
+            return
+
+        # Find where the saved work unit is in the level, and continue
+        # with the units after it
+        self.units = self.work_units()
+        for unit_index, cur_len, cur_ip in self.units:
+            if cur_len == self.cur_len and cur_ip == self.cur_ip:
+                self.set_unit(unit_index, cur_len, cur_ip, parse_tree)
+                return
 
-            # Reset the options for the Markov Cracker
+        raise ValueError("The saved OMEN work unit is not in the ruleset")
+
+    def _parse_session(self, data):
+        """
+        Reads the cracker variables from a session saved by session_data()
+
+        Inputs:
+            data: The contents of the session file
+
+        Returns:
+            (unit_index, parse_tree)
+
+            unit_index: The index of the saved work unit, or -1 if the level
+            hadn't been started
+
+            parse_tree: The parse tree to continue from, or None if the work
+            unit was finished
+
+        Raises:
+            ValueError: If the file is not a valid OMEN session, or it is for
+            a different ruleset
+        """
+        if len(data) < HEADER.size:
+            raise ValueError("OMEN session file is too short")
+
+        (magic, version, target_level, len_level, len_index, ip_level, ip_index,
+            unit_index, num_items, uuid_length) = HEADER.unpack_from(data)
+
+        if version != VERSION:
+            raise ValueError(f"Unsupported OMEN session version {version}")
+
+        items = array('I')
+        if len(data) != HEADER.size + uuid_length + max(num_items, 0) * 3 * items.itemsize:
+            raise ValueError("OMEN session file is truncated or corrupt")
+
+        uuid = data[HEADER.size:HEADER.size + uuid_length].decode('utf-8')
+        if uuid and self.ruleset_uuid and uuid != self.ruleset_uuid:
+            raise ValueError(f"OMEN session is for a different ruleset. Expected UUID: {self.ruleset_uuid} Found UUID: {uuid}")
+
+        items.frombytes(data[HEADER.size + uuid_length:])
+
+        # Make sure the parse tree points into the CP table
+        cp = self.grammar['cp']
+        for position in range(0, len(items), 3):
+            row, level, letter = items[position:position + 3]
+            if row >= len(cp.contexts) or level >= cp.width or letter >= len(cp.letters):
+                raise ValueError("OMEN session parse tree is not in the ruleset")
+
+        self.target_level = target_level
+        self.cur_len = [len_level, len_index]
+        self.cur_ip = [ip_level, ip_index]
+
+        if num_items == -1:
+            return unit_index, None
+
+        parse_tree = [items[position:position + 3].tolist() for position in range(0, len(items), 3)]
+        return unit_index, parse_tree
+
+    def _parse_legacy_session(self, data):
+        """
+        Reads the cracker variables from a session saved as python pickles by
+        older versions of the guesser
+
+        Inputs:
+            data: The contents of the session file
+
+        Returns:
+            (unit_index, parse_tree)
+
+            unit_index: Always None, since older versions didn't save it
+
+            parse_tree: The parse tree to continue from
+
+        Raises:
+            ValueError: If the file could not be read
+        """
+        file = io.BytesIO(data)
+        try:
             self.target_level = pickle.load(file)
             self.cur_ip = pickle.load(file)
             self.cur_len = pickle.load(file)
-
-            # Reset the current guess
             parse_tree = pickle.load(file)
-            first_guess = pickle.load(file)
-
-            self.cur_guess = GuessStructure(
-                cp = self.grammar['cp'],
-                max_level = self.max_level,
-                ip = self.grammar['ip'][self.cur_ip[0]][self.cur_ip[1]],
-                cp_length = self.grammar['ln'][self.cur_len[0]][self.cur_len[1]],
-                target_level = self.target_level - self.cur_len[0] - self.cur_ip[0],
-                optimizer = self.optimizer
-                )
-
-            # Update the status report item with the real level
-            pt_item['pt'][0][1] = self.target_level -1
-            pt_item['pt'][0][2] = self.target_level -1
-
-            self.cur_guess.parse_tree = parse_tree
-            self.cur_guess.first_guess = first_guess
+        except Exception as msg:
+            raise ValueError(f"Not a valid OMEN session file: {msg}")
+
+        # Sessions saved before the CP table was added have the context
+        # string and the index of the letter in its level instead
+        if parse_tree and isinstance(parse_tree[0][0], str):
+            cp = self.grammar['cp']
+            parse_tree = [
+                [cp.row(context), level, cp.offsets[cp.row(context) * cp.width + level] + index]
+                for context, level, index in parse_tree
+                ]
+
+        return None, parse_tree
@@ -6,9 +6,20 @@
 Uses time memory trade off to speed up guess generation by caching previous results for
 filling out guesses for level + length + starting string combinations
 
+The cache is bounded. When it is full the least recently used result is
+removed to make room for the new one.
+
 """
 
 
+from collections import OrderedDict
+
+
+# The default maximum number of results to cache. Each result takes up a
+# few hundred bytes, so this keeps the cache to a few hundred MB
+DEFAULT_MAX_SIZE = 1000000
+
+
 class Optimizer:
     """
     Contains all the logic to speed up guess generation by using tmto tricks
@@ -16,51 +27,54 @@ class Optimizer:
     Creating this as a class so I can easily pass it around
     """
 
-    def __init__(self, max_length):
+    def __init__(self, max_length, max_size = DEFAULT_MAX_SIZE):
         """
         Initializes the optimizer
 
         Inputs:
             max_length: The maximum length of strings to optimize. Increasing this
             increases memory requirements
+
+            max_size: The maximum number of results to cache. The least
+            recently used results are removed when it is full. 0 means
+            don't cache anything
+
         """
 
         self.max_length = max_length
 
+        self.max_size = max_size
+
         # The grammar lookup
         #
-        # Will be a list indexed on the length
-        # so length 1 will be at position 1
-        # dictionary lookups will be of the format
-        # {
-        #    'ip_ngram':{
-        #         'level': 'first result',
-        #         'level2': 'first result',
-        #         ...
-        #    },
-        #   'ip_ngram2':{
-        #         'level':'first result',
-        #    }
-        #    ...,
-        # }
+        # Keyed on (ip_row, length, target_level), where ip_row is the
+        # CPTable row of the starting ngram. The value is the first parse
+        # tree found for the key as a tuple of (row, level, position)
+        # tuples, or None if there isn't one.
         #
-        # Example (assuming length = 4):
+        # Since the parse trees are tuples they can be returned as is without
+        # having to copy them
+        #
+        # Example:
         # {
-        #   'abc':{
-        #       '0':[[abc, 0],[bcd,0], [cde, 0], [def, 0]],
-        #       '5[[abc, 1],[bc1,1], [c12, 2], [123, 1]],
-        #   },
+        #   (12, 2, 5): ((12, 3, 410), (57, 2, 1180)),
+        #   (12, 2, 0): None,
         # }
-        self.tmto_lookup = []
-        for i in range(self.max_length + 1):
-            self.tmto_lookup.append({})
+        #
+        # Kept in order from least to most recently used
+        self.tmto_lookup = OrderedDict()
+
+        # Stats for status reports
+        self.num_hits = 0
+        self.num_misses = 0
+        self.num_evictions = 0
 
     def lookup(self, ip_ngram, length, target_level):
         """
         Look up a previous result
 
         Inputs:
-            ip_ngram: The initial starting point for the word
+            ip_ngram: The CPTable row of the initial starting point for the word
 
             length: The length of the word
 
@@ -74,44 +88,62 @@ class Optimizer:
             parse_tree: The first parse tree to match the lookup criteria.
             Returns None if no parse tree matches it
         """
+        key = (ip_ngram, length, target_level)
         try:
-            return True, self.custom_copy( self.tmto_lookup[length][ip_ngram][target_level] )
+            parse_tree = self.tmto_lookup[key]
         except KeyError:
+            self.num_misses += 1
             return False, None
 
+        self.tmto_lookup.move_to_end(key)
+        self.num_hits += 1
+        return True, parse_tree
+
     def update(self, ip_ngram, length, target_level, parse_tree):
         """
         Updates the optimizer with a found result
 
         Inputs:
-            ip_ngram: The inital pointer (ngram) to start the word
+            ip_ngram: The CPTable row of the inital pointer (ngram) to start the word
 
             length: The length of the word to generate
 
             target_level: The target OMEN level the word needs to be
 
-            parse_tree: The parse tree of the found result
+            parse_tree: The parse tree of the found result, as a tuple of
+            tuples
         """
+        if self.max_size <= 0:
+            return
 
-        ##--If we haven't seen this ip_ngram for this length before
-        if ip_ngram not in self.tmto_lookup[length]:
-            self.tmto_lookup[length][ip_ngram] = {}
+        self.tmto_lookup[(ip_ngram, length, target_level)] = parse_tree
 
-        self.tmto_lookup[length][ip_ngram][target_level] = self.custom_copy(parse_tree)
+        ##--Make room by removing the least recently used result
+        if len(self.tmto_lookup) > self.max_size:
+            self.tmto_lookup.popitem(last = False)
+            self.num_evictions += 1
 
-    def custom_copy(self, input_list):
+    def cache_stats(self):
         """
-        Copies the first order values of the list to a new list
-
-        Using this because copy.deepcopy is overkill, (and slow) for what we want
+        Returns stats about the cache for status reports
 
         Inputs:
-            input_list: The list to copy
+            None
 
         Returns:
-            copied_list: A copy of the list
+            stats: A dictionary with the following keys
+                'cache_size': Number of results cached
+                'max_cache_size': The most results that can be cached
+                'max_length': The maximum length of strings cached
+                'num_hits': Number of lookups that found a result
+                'num_misses': Number of lookups that didn't find a result
+                'num_evictions': Number of results removed to make room
         """
-
-        if input_list:
-            return [x[:] for x in input_list]
-        return None
+        return {
+            'cache_size': len(self.tmto_lookup),
+            'max_cache_size': self.max_size,
+            'max_length': self.max_length,
+            'num_hits': self.num_hits,
+            'num_misses': self.num_misses,
+            'num_evictions': self.num_evictions,
+        }
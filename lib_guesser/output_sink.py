@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+
+
+"""
+
+Name: PCFG_Guesser Output Sink
+
+Description: Writes generated guesses to stdout or a file
+
+Calling print() once per guess is the most expensive part of feeding
+guesses into a password cracker through stdin. Instead this collects
+guesses into a batch, encodes the whole batch with the ruleset encoding,
+and hands it to the underlying binary stream with a single write() call.
+
+"""
+
+
+import sys
+
+
+class OutputSink:
+    """
+    Buffers guesses and writes them out in large pre-encoded blocks
+
+    If the receiving program closes the pipe, (for example john or hashcat
+    has cracked all the hashes), this raises OSError which is what the
+    guessing sessions already use as the signal to shut down.
+    """
+
+    def __init__(self, stream, encoding, batch_size = 8192):
+        """
+        Initializes the output sink
+
+        Inputs:
+            stream: A binary stream to write to, (such as sys.stdout.buffer
+            or a file opened with 'wb')
+
+            encoding: The encoding to write the guesses in. This should be the
+            encoding of the ruleset
+
+            batch_size: The number of guesses to collect before writing them
+            out
+
+        Returns:
+            OutputSink
+        """
+
+        self.stream = stream
+        self.encoding = encoding
+        self.batch_size = batch_size
+
+        # The guesses waiting to be written out
+        self.pending = []
+
+        # If the receiving program has stopped accepting input
+        self.closed = False
+
+    def write(self, guess):
+        """
+        Adds a guess to the batch, and writes the batch out if it is full
+
+        If an error occurs will pass back OSError
+
+        Inputs:
+            guess: The string to write out. A newline is added after it
+
+        Returns:
+            None
+        """
+        pending = self.pending
+        pending.append(guess)
+        if len(pending) >= self.batch_size:
+            self.flush()
+
+    def write_many(self, guesses):
+        """
+        Adds a list of guesses to the batch, and writes the batch out if it
+        is full
+
+        If an error occurs will pass back OSError
+
+        Inputs:
+            guesses: A list of strings to write out
+
+        Returns:
+            None
+        """
+        pending = self.pending
+        pending.extend(guesses)
+        if len(pending) >= self.batch_size:
+            self.flush()
+
+    def write_encoded(self, data):
+        """
+        Writes out guesses that have already been encoded, (for example by
+        a worker process). Any pending guesses are written out first so the
+        order is kept
+
+        If an error occurs will pass back OSError
+
+        Inputs:
+            data: The encoded guesses as bytes, with a newline after each guess
+
+        Returns:
+            None
+        """
+        self.flush()
+        self._write(data)
+
+    def encode(self, guesses):
+        """
+        Encodes a list of guesses without writing them out
+
+        Inputs:
+            guesses: A list of strings to encode
+
+        Returns:
+            data: The encoded guesses as bytes, with a newline after each guess.
+            Guesses that can't be encoded are skipped
+        """
+        if not guesses:
+            return b''
+
+        return self._encode_guesses(guesses)
+
+    def flush(self):
+        """
+        Encodes and writes out all the pending guesses
+
+        If an error occurs will pass back OSError
+
+        Inputs:
+            None
+
+        Returns:
+            None
+        """
+
+        if not self.pending:
+            return
+
+        data = self._encode_guesses(self.pending)
+        self.pending = []
+
+        self._write(data)
+
+    def _encode_guesses(self, guesses):
+        """
+        Encodes a list of guesses in one go
+
+        Inputs:
+            guesses: A list of strings to encode
+
+        Returns:
+            data: The encoded guesses as bytes
+        """
+        try:
+            data = '\n'.join(guesses).encode(self.encoding)
+            return data + b'\n'
+
+        # While I could silently replace/ignore the Unicode character for now I
+        # want to provide a good spot to debug if this is happening
+        except UnicodeEncodeError:
+            return self._encode_skipping_errors(guesses)
+
+    def _write(self, data):
+        """
+        Writes encoded guesses to the stream
+
+        If an error occurs will pass back OSError
+
+        Inputs:
+            data: The bytes to write
+
+        Returns:
+            None
+        """
+
+        if self.closed:
+            raise OSError
+
+        try:
+            self.stream.write(data)
+            self.stream.flush()
+        except Exception:
+            self.closed = True
+            print('',file=sys.stderr)
+            print("The consumer, probably the password cracker, has stopped",file=sys.stderr)
+            print("accepting input.",file=sys.stderr)
+            print("Halting guess generation and exiting",file=sys.stderr)
+            raise OSError
+
+    def _encode_skipping_errors(self, guesses):
+        """
+        Encodes guesses one at a time, skipping any that can't be
+        represented in the output encoding
+
+        Only used when encoding the whole batch at once fails
+
+        Inputs:
+            guesses: A list of strings to encode
+
+        Returns:
+            data: The encoded guesses as bytes
+        """
+        encoded = []
+        for guess in guesses:
+            try:
+                encoded.append(guess.encode(self.encoding) + b'\n')
+            except UnicodeEncodeError:
+                pass
+
+        return b''.join(encoded)
+
+    def close(self):
+        """
+        Writes out any pending guesses and closes the stream if it is a file
+
+        Inputs:
+            None
+
+        Returns:
+            None
+        """
+        try:
+            self.flush()
+        except OSError:
+            pass
+
+        if self.stream is not sys.stdout.buffer:
+            self.stream.close()
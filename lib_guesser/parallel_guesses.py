@@ -0,0 +1,561 @@
+#!/usr/bin/env python3
+
+
+"""
+
+Name: PCFG_Guesser Parallel Guess Generation
+
+Description: Uses a pool of worker processes to turn pre-terminals into
+guesses
+
+The main process still owns the priority queue and pops pre-terminals off
+it in probability order. Each pre-terminal is sent to a worker, which
+generates its guesses and encodes them into a block of bytes. The results
+are then written out by the main process in the order the pre-terminals
+were popped, so the guesses are still in probability order. There is also
+a relaxed mode that writes results out as soon as they are ready, which is
+faster but the output is only roughly in probability order.
+
+Large pre-terminals are split up into chunks so they can be worked on by
+multiple workers at the same time. Only a few chunks are submitted at a
+time, and the rest are submitted as results are returned, so a huge
+pre-terminal doesn't fill up memory with results waiting to be written out.
+
+OMEN levels are split up into (length, IP) work units by the MarkovCracker.
+Groups of work units are sent to the workers, and the guesses are returned
+in the same order the MarkovCracker would have generated them in. Only as
+many groups are sent as there are workers to start on them, so a group that
+has too many guesses to return at once can be continued right away instead
+of waiting behind the rest.
+
+"""
+
+
+import multiprocessing
+import queue
+from collections import deque
+
+from .omen.markov_cracker import MarkovCracker
+
+
+# The number of OMEN work units to send to a worker at a time. Most work
+# units only have a few guesses, so they are grouped together to cut down on
+# the overhead of sending them to the workers
+OMEN_UNITS_PER_TASK = 256
+
+
+# How often to check if the workers are ready for more OMEN work units while
+# waiting on the next group's guesses, in seconds
+OMEN_FILL_INTERVAL = 0.01
+
+
+# The grammar used by each worker process. If the 'fork' start method is
+# available this is inherited from the main process, otherwise each worker
+# loads the grammar from disk when it starts up.
+_worker_pcfg = None
+
+
+def _init_worker(load_args):
+    """
+    Initializes a worker process
+
+    Inputs:
+        load_args: The arguments used to create the main process PcfgGrammar
+
+    Returns:
+        None
+    """
+    global _worker_pcfg
+
+    if _worker_pcfg is None:
+        # Import here to avoid a circular import with pcfg_grammar
+        from .pcfg_grammar import PcfgGrammar
+        _worker_pcfg = PcfgGrammar(**load_args)
+
+
+def _expand_task(pt, start, stop):
+    """
+    Generates and encodes the guesses for a chunk of a pre-terminal
+
+    Runs in the worker processes
+
+    Inputs:
+        pt: The parse tree, which is a list of tuples
+
+        start: The number of guesses to skip from the start of the parse tree
+
+        stop: The guess number to stop at, (exclusive)
+
+    Returns:
+        (data, num_guesses)
+
+        data: The encoded guesses, one per line
+
+        num_guesses: The number of guesses generated
+    """
+    guesses = list(_worker_pcfg.guess_iterator(pt, start, stop))
+    return _worker_pcfg.output.encode(guesses), len(guesses)
+
+
+def _omen_task(target_level, units, parse_tree, max_guesses):
+    """
+    Generates the OMEN guesses for a group of work units
+
+    Runs in the worker processes
+
+    Inputs:
+        target_level: The OMEN level to generate guesses for
+
+        units: A list of (unit_index, cur_len, cur_ip) work units, in the
+        order to generate them
+
+        parse_tree: Where to continue from in the first work unit. An empty
+        list starts from its first guess
+
+        max_guesses: Stop once at least this many guesses have been generated
+
+    Returns:
+        (guesses, continue_from)
+
+        guesses: The list of guesses generated
+
+        continue_from: None if all the work units are done. Otherwise
+        (unit_index, parse_tree) of the last guess generated
+    """
+    markov_cracker = MarkovCracker(
+        _worker_pcfg.omen_grammar,
+        target_level,
+        _worker_pcfg.omen_optimizer
+        )
+    markov_cracker.set_unit(*units[0], parse_tree)
+    markov_cracker.units = iter(units[1:])
+
+    guesses = []
+    while len(guesses) < max_guesses:
+        batch = markov_cracker.next_guesses()
+        if batch is None:
+            return guesses, None
+        guesses.extend(batch)
+
+    return guesses, (markov_cracker.unit_index, markov_cracker.cur_guess.parse_tree)
+
+
+class ParallelGuesses:
+    """
+    Manages the worker pool and puts the results back into order
+    """
+
+    def __init__(self, pcfg, num_workers, ordered = True, chunk_size = 100000):
+        """
+        Starts up the worker processes
+
+        Inputs:
+            pcfg: The PCFG grammar object
+
+            num_workers: The number of worker processes to start
+
+            ordered: If True, results are returned in the order they were
+            submitted. If False, results are returned as soon as they are done
+
+            chunk_size: The maximum number of guesses to send to a worker at
+            a time. Larger pre-terminals are split up into multiple chunks
+
+        Returns:
+            ParallelGuesses
+        """
+        global _worker_pcfg
+
+        self.num_workers = num_workers
+        self.ordered = ordered
+        self.chunk_size = chunk_size
+
+        # The maximum number of chunks to have submitted but not returned
+        # yet. Keeps memory bounded, while making sure workers have enough
+        # work queued up
+        self.max_pending = num_workers * 4
+
+        # Forked workers can re-use the grammar that is already loaded
+        if 'fork' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('fork')
+            _worker_pcfg = pcfg
+        else:
+            context = multiprocessing.get_context('spawn')
+
+        self.pool = context.Pool(
+            num_workers,
+            initializer = _init_worker,
+            initargs = (pcfg.load_args,)
+            )
+
+        # Chunks that have been submitted, in submission order. Each item
+        # is [task_info, AsyncResult]
+        self.pending = deque()
+
+        # Pre-terminals that still have chunks left to submit, in the order
+        # they were submitted. Each item is [pt_item, next_start, stop,
+        # chunk_index]
+        self.cursors = deque()
+
+        # Used in relaxed mode. Holds the [task_info, AsyncResult] items
+        # in the order the workers finish them
+        self.finished = queue.Queue()
+
+    def submit(self, pt_item, num_guesses, start = 0):
+        """
+        Submits a pre-terminal to be worked on by the worker pool
+
+        The pre-terminal is split into chunks of at most chunk_size guesses.
+        Chunks are only sent to the workers while there are less than
+        max_pending of them waiting, and the rest are sent as results are
+        returned by next_result()
+
+        Inputs:
+            pt_item: The parse tree item popped from the priority queue
+
+            num_guesses: The number of guesses to generate from the parse
+            tree
+
+            start: The number of guesses to skip from the start of the parse tree
+
+        Returns:
+            None
+        """
+        self.cursors.append([pt_item, start, start + num_guesses, 0])
+        self._submit_chunks()
+
+    def _submit_chunks(self):
+        """
+        Sends chunks of the submitted pre-terminals to the workers until
+        max_pending chunks are waiting
+
+        Inputs:
+            None
+
+        Returns:
+            None
+        """
+        while self.cursors and len(self.pending) < self.max_pending:
+            cursor = self.cursors[0]
+            pt_item, start, stop, chunk_index = cursor
+            chunk_stop = min(start + self.chunk_size, stop)
+
+            task_info = {
+                'pt_item': pt_item,
+                'chunk_index': chunk_index,
+            }
+            entry = [task_info, None]
+
+            # Only relaxed mode needs to know the order the chunks finish in.
+            # In ordered mode nothing would take them back out of the queue
+            if self.ordered:
+                entry[1] = self.pool.apply_async(
+                    _expand_task,
+                    (pt_item['pt'], start, chunk_stop)
+                    )
+            else:
+                entry[1] = self.pool.apply_async(
+                    _expand_task,
+                    (pt_item['pt'], start, chunk_stop),
+                    callback = lambda result, entry=entry: self.finished.put(entry),
+                    error_callback = lambda error, entry=entry: self.finished.put(entry)
+                    )
+            self.pending.append(entry)
+
+            # Move on to the next chunk
+            cursor[1] = chunk_stop
+            cursor[3] += 1
+            if chunk_stop >= stop:
+                self.cursors.popleft()
+
+    def has_room(self):
+        """
+        Checks if more work should be submitted to keep the workers busy
+
+        Inputs:
+            None
+
+        Returns:
+            True: If more pre-terminals should be submitted
+
+            False: If enough work is already queued up, or a pre-terminal
+            still has chunks waiting to be sent to the workers
+        """
+        return not self.cursors and len(self.pending) < self.max_pending
+
+    def next_result(self):
+        """
+        Waits for the next result from the workers
+
+        Inputs:
+            None
+
+        Returns:
+            (task_info, data, num_guesses)
+
+            task_info: A dictionary with the 'pt_item' the guesses were
+            generated from and the 'chunk_index' of this chunk
+
+            data: The encoded guesses
+
+            num_guesses: The number of guesses in data
+
+            None: If there is no work left that has been submitted
+        """
+        if not self.pending:
+            return None
+
+        if self.ordered:
+            entry = self.pending.popleft()
+        else:
+            entry = self.finished.get()
+            self.pending.remove(entry)
+
+        task_info, async_result = entry
+
+        # Keep the workers busy with the rest of the submitted pre-terminals
+        self._submit_chunks()
+
+        # Will re-raise any exception that occured in the worker
+        data, num_guesses = async_result.get()
+
+        return task_info, data, num_guesses
+
+    def max_pending_prob(self):
+        """
+        Returns the highest probability of a pre-terminal that has been
+        submitted but not returned by next_result() yet
+
+        Used when saving a session so the pre-terminals still being worked on
+        will be re-generated when the session is restored
+
+        Inputs:
+            None
+
+        Returns:
+            prob: The highest probability, or None if nothing is pending
+        """
+        pt_items = self.pending_pt_items()
+        if not pt_items:
+            return None
+
+        return max(pt_item['prob'] for pt_item in pt_items)
+
+    def pending_pt_items(self):
+        """
+        Returns the pre-terminals that have been submitted but not fully
+        returned by next_result() yet
+
+        Inputs:
+            None
+
+        Returns:
+            pt_items: A list of the pt_items, in the order they were submitted.
+            Pre-terminals split into multiple chunks are only listed once
+        """
+        pt_items = []
+        seen = set()
+        submitted = [task_info['pt_item'] for task_info, _ in self.pending]
+        for pt_item in submitted + [cursor[0] for cursor in self.cursors]:
+            if id(pt_item) not in seen:
+                seen.add(id(pt_item))
+                pt_items.append(pt_item)
+
+        return pt_items
+
+    def close(self):
+        """
+        Shuts down the worker pool
+
+        Inputs:
+            None
+
+        Returns:
+            None
+        """
+        self.pool.terminate()
+        self.pool.join()
+
+
+class ParallelOmen:
+    """
+    Generates the guesses for an OMEN level using the worker pool
+
+    Has the same next_guesses() and session_data() functions as the
+    MarkovCracker so it can be used in place of it
+    """
+
+    def __init__(self, parallel_guesses, markov_cracker):
+        """
+        Initializes the OMEN guess generation
+
+        Inputs:
+            parallel_guesses: The ParallelGuesses object that owns the worker
+            pool
+
+            markov_cracker: The MarkovCracker for the OMEN level. It can be
+            part way through the level, such as when restoring a session.
+            It is kept pointing at the last guess returned so it can be
+            used to save the session
+
+        Returns:
+            ParallelOmen
+        """
+        self.pool = parallel_guesses.pool
+        self.num_workers = parallel_guesses.num_workers
+        self.max_pending = parallel_guesses.max_pending
+        self.max_guesses = parallel_guesses.chunk_size
+        self.markov_cracker = markov_cracker
+
+        # Groups of work units that have been submitted, in order. Each item
+        # is [units, AsyncResult]
+        self.pending = deque()
+
+        # If all the work units for the level have been submitted
+        self.units_done = False
+
+        # Start the level if it hasn't been already
+        if markov_cracker.units is None:
+            markov_cracker.units = markov_cracker.work_units()
+            markov_cracker.cur_guess = None
+
+        # Finish off the work unit the cracker is part way through
+        if markov_cracker.cur_guess is not None:
+            unit = (markov_cracker.unit_index, markov_cracker.cur_len, markov_cracker.cur_ip)
+            self._submit([unit], markov_cracker.cur_guess.parse_tree)
+
+        self._fill()
+
+    def _submit(self, units, parse_tree = [], first = False):
+        """
+        Submits a group of work units to the worker pool
+
+        Inputs:
+            units: A list of (unit_index, cur_len, cur_ip) work units
+
+            parse_tree: Where to continue from in the first work unit
+
+            first: If True, the results are returned before the rest of the
+            submitted work units. Used to continue a group of work units that
+            had too many guesses to return all at once
+
+        Returns:
+            None
+        """
+        async_result = self.pool.apply_async(
+            _omen_task,
+            (self.markov_cracker.target_level, units, parse_tree, self.max_guesses)
+            )
+
+        if first:
+            self.pending.appendleft([units, async_result])
+        else:
+            self.pending.append([units, async_result])
+
+    def num_running(self):
+        """
+        Returns the number of groups of work units the workers haven't
+        finished yet
+
+        Inputs:
+            None
+
+        Returns:
+            num_running: The number of submitted groups that aren't done
+        """
+        return sum(1 for _, async_result in self.pending if not async_result.ready())
+
+    def _fill(self):
+        """
+        Submits work units until enough work is queued up for the workers
+
+        No more groups are submitted than there are workers to start on
+        them. The pool runs tasks in the order they are submitted, so if a
+        group has too many guesses to return at once, the rest of it is
+        started as soon as it is submitted instead of after a backlog of
+        other groups. Finished groups waiting to be returned in order are
+        still limited to max_pending
+
+        Inputs:
+            None
+
+        Returns:
+            None
+        """
+        markov_cracker = self.markov_cracker
+        while not self.units_done and len(self.pending) < self.max_pending:
+
+            if self.num_running() >= self.num_workers:
+                return
+
+            # Group up the next work units this node is responsible for
+            units = []
+            for unit in markov_cracker.units:
+                if markov_cracker.unit_partition is None or markov_cracker.unit_partition.owns_omen_unit(unit[0]):
+                    units.append(unit)
+                    if len(units) >= OMEN_UNITS_PER_TASK:
+                        break
+            else:
+                self.units_done = True
+
+            if units:
+                self._submit(units)
+
+    def next_guesses(self):
+        """
+        Returns the next batch of guesses from the worker pool
+
+        Inputs:
+            None
+
+        Returns:
+            guesses: A list of the next guesses, in the same order the
+            MarkovCracker would generate them
+
+            None: If there are no more guesses left for this level
+        """
+        while self.pending:
+            units, async_result = self.pending[0]
+
+            # Keep the workers busy while waiting for the next group in order
+            while not async_result.ready():
+                self._fill()
+                async_result.wait(OMEN_FILL_INTERVAL)
+
+            self.pending.popleft()
+
+            # Will re-raise any exception that occured in the worker
+            guesses, continue_from = async_result.get()
+
+            # Update the cracker so the session is saved after these guesses
+            if continue_from is None:
+                self.markov_cracker.set_unit(*units[-1], None)
+            else:
+                unit_index, parse_tree = continue_from
+                position = next(pos for pos, unit in enumerate(units) if unit[0] == unit_index)
+                self.markov_cracker.set_unit(*units[position], parse_tree)
+
+                # Continue the rest of the group before submitting anything
+                # else, so it starts on the worker that just finished
+                self._submit(units[position:], parse_tree, first = True)
+
+            self._fill()
+
+            if guesses:
+                return guesses
+
+        # Done with all password guesses for this level, reset it
+        self.markov_cracker.units = None
+        self.markov_cracker.cur_guess = None
+        return None
+
+    def session_data(self):
+        """
+        Returns the cracking session in the format saved by the MarkovCracker
+
+        Inputs:
+            None
+
+        Returns:
+            data: The saved session as bytes
+        """
+        return self.markov_cracker.session_data()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+
+
+"""
+
+Name: PCFG_Guesser Parallel Ruleset Loading
+
+Description: Uses a pool of worker processes to load the files in a
+ruleset at the same time
+
+Large rulesets have hundreds of terminal files, and the OMEN tables can be
+as big as the rest of the ruleset put together. The workers each parse
+some of the terminal files, while another worker parses the OMEN tables,
+and the results are sent back to the main process. Parsing the text files
+is what takes the time, so this helps the most when the ruleset hasn't been
+compiled into a binary ruleset.
+
+Also used to time how long each part of loading the ruleset takes, which is
+printed out when the guesser is run with --debug
+
+"""
+
+
+import sys
+import time
+
+from .omen.input_file_io import load_rules
+
+
+def _load_omen_rules(omen_directory, binary):
+    """
+    Loads the OMEN rules in a worker process
+
+    Inputs:
+        omen_directory: The Omen directory of the ruleset
+
+        binary: A BinaryRuleset to load the rules from, or None
+
+    Returns:
+        omen_grammar: The OMEN grammar dictionary, or None if it could not be
+        loaded
+    """
+    omen_grammar = {}
+    if not load_rules(omen_directory, omen_grammar, binary):
+        return None
+
+    return omen_grammar
+
+
+class LoadPool:
+    """
+    Manages the worker processes used to load a ruleset
+    """
+
+    def __init__(self, num_workers):
+        """
+        Starts up the worker processes
+
+        Inputs:
+            num_workers: The number of worker processes to start
+
+        Returns:
+            LoadPool
+        """
+        # Imported here so multiprocessing is only loaded if it's used
+        import multiprocessing
+
+        if 'fork' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('fork')
+        else:
+            context = multiprocessing.get_context('spawn')
+
+        self.num_workers = num_workers
+        self.pool = context.Pool(num_workers)
+
+    def load_grammar(self, grammar):
+        """
+        Loads all the nonterminals in a PrunedGrammar that haven't been loaded
+
+        Inputs:
+            grammar: The PrunedGrammar to load
+
+        Returns:
+            None
+        """
+        # Some files are much bigger than others, so hand them out one at a
+        # time to keep all the workers busy
+        grammar.load_all(lambda function, items: self.pool.map(function, items, chunksize = 1))
+
+    def load_omen_async(self, omen_directory, binary):
+        """
+        Starts loading the OMEN rules in a worker process
+
+        Inputs:
+            omen_directory: The Omen directory of the ruleset
+
+            binary: A BinaryRuleset to load the rules from, or None
+
+        Returns:
+            async_result: Call get() on it to wait for the OMEN grammar
+            dictionary, (or None if it couldn't be loaded)
+        """
+        return self.pool.apply_async(_load_omen_rules, (omen_directory, binary))
+
+    def close(self):
+        """
+        Shuts down the worker processes
+
+        Inputs:
+            None
+
+        Returns:
+            None
+        """
+        self.pool.close()
+        self.pool.join()
+
+
+class LoadTimer:
+    """
+    Records how long each step of loading a ruleset took
+    """
+
+    def __init__(self):
+        """
+        Starts the timer
+
+        Inputs:
+            None
+
+        Returns:
+            LoadTimer
+        """
+        # (step name, seconds) in the order the steps finished
+        self.steps = []
+        self.start = time.perf_counter()
+        self.last = self.start
+
+    def step(self, name):
+        """
+        Records that a step finished
+
+        The time for the step is the time since the last step finished
+
+        Inputs:
+            name: The name of the step
+
+        Returns:
+            None
+        """
+        now = time.perf_counter()
+        self.steps.append((name, now - self.last))
+        self.last = now
+
+    def print_report(self, grammar, num_workers = 1, file = sys.stderr):
+        """
+        Prints how long each step took, and how long each kind of terminal
+        took to load
+
+        Inputs:
+            grammar: The PrunedGrammar that was loaded
+
+            num_workers: The number of worker processes used to load it
+
+            file: Where to print the report
+
+        Returns:
+            None
+        """
+        print("Ruleset load times:", file=file)
+        for name, seconds in self.steps:
+            print(f"    {name}: {seconds:.3f} seconds", file=file)
+        print(f"    Total: {self.last - self.start:.3f} seconds", file=file)
+
+        # Group the terminals by their type, aka 'D' for all the digits
+        kinds = {}
+        for name, seconds in grammar.load_times.items():
+            num_files, total = kinds.get(name[0], (0, 0.0))
+            kinds[name[0]] = (num_files + 1, total + seconds)
+
+        if num_workers > 1:
+            print(f"Terminal load times, (summed over {num_workers} worker processes):", file=file)
+        else:
+            print("Terminal load times:", file=file)
+        for kind, (num_files, total) in sorted(kinds.items()):
+            print(f"    {kind}: {num_files} files, {total:.3f} seconds", file=file)
@@ -13,15 +13,27 @@ process one password at at time that is sent to it
 # Global imports
 import sys
 import os
-import copy
-import codecs
 import random
+import itertools
 
 # Local imports
 from .grammar_io import load_grammar, load_omen_keyspace
-from .omen.optimizer import Optimizer
+from .compiled_grammar import CompiledGrammar
+from .output_sink import OutputSink
+from .capitalization import CapitalizationMasks
+from .session_autosave import write_atomic, OMEN_CHECK_INTERVAL
+from .omen.optimizer import Optimizer, DEFAULT_MAX_SIZE
 from .omen.input_file_io import load_rules
 from .omen.markov_cracker import MarkovCracker
+from .binary_ruleset import open_binary_ruleset
+from .parallel_load import LoadPool, LoadTimer
+
+
+# Parents whose parent_ratio values are within this fraction of each other
+# are compared using their full probabilities. Any further apart and the
+# ratios are guaranteed to give the same answer, since floating point
+# rounding of the probabilities is many orders of magnitude smaller
+RATIO_TOLERANCE = 1e-9
 
 
 class PcfgGrammar:
@@ -37,7 +49,10 @@ class PcfgGrammar:
         skip_brute = False,
         skip_case = False,
         debug = False,
-        base_structure_folder = "Grammar"):
+        base_structure_folder = "Grammar",
+        load_workers = 1,
+        omen_tmto_length = 4,
+        omen_cache_size = DEFAULT_MAX_SIZE):
         """
         Initializes the class and all the data structures
 
@@ -64,6 +79,16 @@ class PcfgGrammar:
                     different base structure folders for a given ruleset to target
                     specific password complexity requirements
 
+            load_workers: The number of worker processes to load the ruleset
+                    files with. 1 loads them in this process
+
+            omen_tmto_length: The longest partial OMEN guesses to cache. Longer
+                    lengths make guess generation faster but use more memory
+
+            omen_cache_size: The maximum number of partial OMEN guesses to
+                    cache. The least recently used ones are removed when the
+                    cache is full
+
         Returns:
             PcfgGrammar
         """
@@ -73,6 +98,26 @@ class PcfgGrammar:
         self.debug = debug
         self.ruleset_info = None
 
+        # Saved so the grammar can be loaded again by worker processes
+        self.load_args = {
+            'rule_name': rule_name,
+            'base_directory': base_directory,
+            'version': version,
+            'skip_brute': skip_brute,
+            'skip_case': skip_case,
+            'base_structure_folder': base_structure_folder,
+            'omen_tmto_length': omen_tmto_length,
+            'omen_cache_size': omen_cache_size,
+        }
+
+        # Times each step of loading the ruleset for debugging
+        timer = LoadTimer()
+
+        # The compiled binary version of the ruleset, if there is an up to
+        # date one. Otherwise the text files are loaded
+        self.binary_ruleset = open_binary_ruleset(base_directory)
+        timer.step("Binary ruleset")
+
         # If an exception occurs below, don't catch it here, pass it back up the stack
         self.grammar, self.base, self.ruleset_info = load_grammar(
             rule_name,
@@ -80,8 +125,10 @@ class PcfgGrammar:
             version,
             skip_brute,
             skip_case,
-            base_structure_folder
+            base_structure_folder,
+            self.binary_ruleset
             )
+        timer.step("Config and base structures")
 
         self.encoding = self.ruleset_info['encoding']
 
@@ -90,17 +137,67 @@ class PcfgGrammar:
         # Dictionary that will contain the OMEN Grammar
         self.omen_grammar = {}
 
+        # Keyspace of each OMEN level. Used for status reports
+        self.omen_keyspace = {}
+
+        # Only load the OMEN rules if a base structure uses them. They aren't
+        # used if brute force is skipped or the ruleset was edited to remove
+        # the Markov base structure
+        load_omen = 'M' in self.grammar
         omen_directory = os.path.join(base_directory, "Omen")
 
-        # Load the OMEN rules from disk
-        if not load_rules(omen_directory, self.omen_grammar):
-            print("Error reading the OMEN ruleset", file=sys.stderr)
-            raise Exception
+        # Load the terminals and the OMEN rules. With multiple workers, the
+        # OMEN rules are loaded by one worker while the rest load terminals.
+        # Every nonterminal left in the grammar is loaded now, since the
+        # compiled grammar needs all of their probabilities
+        if load_workers > 1:
+            load_pool = LoadPool(load_workers)
+            try:
+                if load_omen:
+                    omen_result = load_pool.load_omen_async(omen_directory, self.binary_ruleset)
 
-        # Initialize the OMEN TMTO optimizer
-        self.omen_optimizer = Optimizer(max_length = 4)
+                load_pool.load_grammar(self.grammar)
+                timer.step("Terminals")
+
+                if load_omen:
+                    self.omen_grammar = omen_result.get()
+                    if self.omen_grammar is None:
+                        print("Error reading the OMEN ruleset", file=sys.stderr)
+                        raise Exception
+                    timer.step("OMEN rules")
+
+            finally:
+                load_pool.close()
+
+        else:
+            self.grammar.load_all()
+            timer.step("Terminals")
+
+            # Load the OMEN rules from disk
+            if load_omen:
+                if not load_rules(omen_directory, self.omen_grammar, self.binary_ruleset):
+                    print("Error reading the OMEN ruleset", file=sys.stderr)
+                    raise Exception
+                timer.step("OMEN rules")
+
+        if load_omen:
+            self.omen_keyspace = load_omen_keyspace(base_directory, self.binary_ruleset)
+            timer.step("OMEN keyspace")
+
+        # Integer indexed version of the grammar used by the "next" function
+        # so parse trees in the pqueue can be tuples of small ints
+        self.compiled = CompiledGrammar(self.grammar, self.base)
+        timer.step("Compiled grammar")
 
-        self.omen_keyspace = load_omen_keyspace(base_directory)
+        # Precompiled capitalization masks
+        self.case_masks = CapitalizationMasks(self.grammar)
+        timer.step("Capitalization masks")
+
+        if self.debug:
+            timer.print_report(self.grammar, load_workers)
+
+        # Initialize the OMEN TMTO optimizer
+        self.omen_optimizer = Optimizer(max_length = omen_tmto_length, max_size = omen_cache_size)
 
         # Used to track status during an OMEN guessing session
         self.omen_guess_num = 0
@@ -112,6 +209,24 @@ class PcfgGrammar:
         # If this exited in the middle of an OMEN guessing session
         self.omen_exit = False
 
+        # The number of OMEN guesses skipped the last time guesses were
+        # generated with a start offset
+        self.omen_skipped = 0
+
+        # Used when the guesses are being split between multiple computers.
+        # A NodePartition that decides which OMEN guesses this node generates.
+        # None means generate all of them
+        self.node_partition = None
+
+        # A ParallelGuesses object to generate the OMEN guesses with. Set by
+        # the cracking session when worker processes are used. None means
+        # generate them in this process
+        self.omen_workers = None
+
+        # An AutoSave object used to periodically save the session while
+        # OMEN guesses are being generated. None means autosave is off
+        self.autosave = None
+
         # Base filename for save files
         self.save_file = save_file
 
@@ -121,8 +236,16 @@ class PcfgGrammar:
         # The file handler for saving guesses to a file if desired
         self.output_file = None
 
+        # Where generated guesses are written. Defaults to stdout, but
+        # save_to_file() can point it at a file instead
+        self.output = OutputSink(sys.stdout.buffer, self.encoding)
+
+        # The number of guesses to generate at a time before handing them
+        # off to the output
+        self.batch_size = 8192
 
-    def create_guesses(self, pt, is_honeyword=False, limit=None):
+
+    def create_guesses(self, pt, is_honeyword=False, limit=None, start=0, stop=None):
         """
         Generates Guesses From a Parse Tree
 
@@ -138,12 +261,19 @@ class PcfgGrammar:
             limit: (None/Int) If it is not None, limit is a number that decrements
             which specifies how many guesses remain to be generated. Ignored if None
 
+            start: The number of guesses to skip from the start of the parse tree.
+            OMEN guesses can't be jumped over, so for OMEN parse trees this
+            many guesses are generated but not printed, (see omen_skipped)
+
+            stop: (None/Int) If it is not None, the guess number to stop at,
+            (exclusive). Ignored for OMEN parse trees
+
         Returns:
             num_guesses: The number of guesses generated
         """
 
         if not is_honeyword:
-            return self._recursive_guesses('', pt, limit)
+            return self._expand_guesses(pt, limit, start, stop)
         
         else:
             return self._honeyword_recursive_guess('', pt, limit)
@@ -170,7 +300,8 @@ class PcfgGrammar:
             
                 {
                     'prob': The probability of the parse tree (float),
-                    'pt': The parse tree, which is a list of tuples indexed into the grammar,
+                    'base_id': The id of the base structure in the compiled grammar,
+                    'indices': The compiled parse tree, a tuple of indexes into the grammar,
                     'base_prob': The probability of the base structure,
                 }
 
@@ -179,132 +310,240 @@ class PcfgGrammar:
         pt_list = []
 
         # Loop through all of the base structures to initalize them
-        for item in self.base:
+        for base_id, item in enumerate(self.base):
             pt_item = {
                 'base_prob': item['prob'],
-                'pt': []
+                'base_id': base_id,
+                'indices': (0,) * len(item['replacements']),
             }
 
-            # Create the pt from the base structure
-            for replacement in item['replacements']:
-                pt_item['pt'].append((replacement,0))
-
             # Calculate the probability
-            pt_item['prob'] = self._find_prob(pt_item['pt'], pt_item['base_prob'])
+            pt_item['prob'] = self.compiled.find_prob(base_id, pt_item['indices'])
 
             pt_list.append(pt_item)
 
         return pt_list
 
 
-    def _recursive_guesses(self, cur_guess, pt, limit=None):
+    def decode_pt_item(self, pt_item):
         """
-        Recursivly generates guesses from a parse tree
-        Will print out guesses to stdout
+        Adds the human readable parse tree to a compiled pt_item
+
+        The pqueue only saves compiled parse trees to save memory. This is
+        called on items as they leave the pqueue so the rest of the guesser,
+        (guess generation, status reports), can use the list of
+        (name, index) tuples
 
         Inputs:
-            cur_guess: The current guess being generated
+            pt_item: A compiled pt_item with 'base_id' and 'indices' keys
 
-            pt: The parse tree, which is a list of tuples. Will recursivly work though the pt to
-            fill out parts to cur_guess.
+        Returns:
+            pt_item: The same pt_item with the 'pt' and 'base_prob' keys
+            filled out
+        """
+        pt_item['pt'] = self.compiled.decode(pt_item['base_id'], pt_item['indices'])
+        pt_item['base_prob'] = self.compiled.base_probs[pt_item['base_id']]
 
-            limit: (None/Int) If it is not None, limit is a number that decrements
-            which specifies how many guesses remain to be generated. Ignored if None
+        return pt_item
 
-        Returns:
-            num_guesses: The number of guesses generated
+
+    def _expand_guesses(self, pt, limit=None, start=0, stop=None):
         """
+        Generates all the guesses for a parse tree
+        Will print out guesses to stdout
 
-        num_guesses = 0
+        Rather than recursing through the parse tree one transition at a
+        time, each transition is turned into a list of the strings it can
+        be replaced with, (a slot). The guesses are then the Cartesian
+        product of the slots, which itertools.product generates in the same
+        order the old recursive code did, (the last transition changes the
+        fastest). Guesses are handed to the output in batches.
 
-        # Get the transistion category for the current rule, aka 'A' for alpha
-        category = pt[0][0][0]
+        Capitalization masks modify the alpha string before them, so they are
+        merged into the previous slot, (word1 + all its masks, then word2...)
 
-        # Get the type for the transistion, Aka A10 for 10 letter long alpha
-        pt_type = pt[0][0]
+        Inputs:
+            pt: The parse tree, which is a list of tuples
 
-        # Get he index into the transition, aka the 2nd most probable A10
-        index = pt[0][1]
+            limit: (None/Int) If it is not None, only the first limit guesses
+            are generated
+
+            start: The number of guesses to skip from the start of the parse tree
+
+            stop: (None/Int) If it is not None, the guess number to stop at,
+            (exclusive)
+
+        Returns:
+            num_guesses: The number of guesses generated
+        """
 
         # If it is a Markov guess
-        if category == 'M':
+        if pt[0][0][0] == 'M':
+            pt_type, index = pt[0]
+
             # Get the level
             level = int(self.grammar[pt_type][index]['values'][0])
 
-            markov_cracker = MarkovCracker(self.omen_grammar, level, self.omen_optimizer)
+            markov_cracker = MarkovCracker(
+                self.omen_grammar,
+                level,
+                self.omen_optimizer,
+                ruleset_uuid = self.ruleset_info['uuid']
+                )
 
             # Initalize counter used for status reports and save files
             self.omen_guess_num = 0
 
-            return self.omen_generate_guesses(markov_cracker, limit)
+            return self.omen_generate_guesses(self._omen_generator(markov_cracker), limit, skip = start)
 
-        # If it is a capitalization mask
-        elif category == 'C':
+        if limit:
+            if stop is None:
+                stop = start + limit
+            else:
+                stop = min(stop, start + limit)
 
-            mask_len = len(self.grammar[pt_type][index]['values'][0])
-
-            # Split off the part of the word we need to modify with the mask
-            start_word = [cur_guess[:- mask_len]]
-            end_word = cur_guess[- mask_len:]
-
-            for mask in self.grammar[pt_type][index]['values']:
-
-                # Apply the capitalization mask
-                new_end = []
-                index = 0
-                for item in mask:
-                    if item == 'L':
-                        new_end.append(end_word[index])
-                    else:
-                        new_end.append(end_word[index].upper())
-                    index += 1
-
-                # Recombine the capitalization mask with what came before
-                new_guess = ''.join(start_word + new_end)
-
-                # Figure out if the guess is ready to be printed out or if
-                # there is more to do
-                if len(pt) == 1:
-                    num_guesses += 1
-                    self.print_guess(new_guess)
-
-                    # Check the limit
-                    if limit:
-                        limit = limit - 1
-                        if limit <= 0:
-                            return num_guesses
-
-                else:
-                    num_guesses += self._recursive_guesses(new_guess, pt[1:], limit)
-                    if limit:
-                        limit = limit - num_guesses
-                        if limit <= 0:
-                            return num_guesses
+        guesses = self.guess_iterator(pt, start, stop)
 
-        # If it is any striaght replacement, (digits, letters, etc)
+        num_guesses = 0
+        while True:
+            batch = list(itertools.islice(guesses, self.batch_size))
+            if not batch:
+                return num_guesses
+
+            num_guesses += len(batch)
+            self.print_guesses(batch)
+
+
+    def _build_slots(self, pt):
+        """
+        Creates the list of strings each transition in a parse tree can be
+        replaced with
+
+        Capitalization masks are merged into the alpha slot before them
+
+        Inputs:
+            pt: The parse tree, which is a list of tuples. Can not be an
+            OMEN parse tree
+
+        Returns:
+            slots: A list of lists of strings. The guesses for the parse tree
+            are the Cartesian product of the slots
+        """
+        slots = []
+        for pt_type, index in pt:
+            values = self.grammar[pt_type][index]['values']
+
+            # If it is a capitalization mask, apply it to the previous slot
+            if pt_type[0] == 'C':
+                slots[-1] = self.case_masks.apply(slots[-1], pt_type, index)
+
+            # If it is any striaght replacement, (digits, letters, etc)
+            else:
+                slots.append(values)
+
+        return slots
+
+
+    def guess_iterator(self, pt, start = 0, stop = None):
+        """
+        Returns an iterator of the guesses for a parse tree, in the order
+        they should be generated
+
+        Inputs:
+            pt: The parse tree, which is a list of tuples. Can not be an
+            OMEN parse tree
+
+            start: The number of guesses to skip from the start of the parse tree.
+            The guesses before start are never generated, (see _product_from)
+
+            stop: If not None, the guess number to stop at, (exclusive)
+
+        Returns:
+            guesses: An iterator of guess strings
+        """
+        slots = self._build_slots(pt)
+
+        # Only one slot so there is nothing to combine
+        if len(slots) == 1:
+            return iter(slots[0][start:stop])
+
+        if start:
+            guesses = self._product_from(slots, start)
         else:
-            for item in self.grammar[pt_type][index]['values']:
-                new_guess = cur_guess + item
-
-                # Figure out if the guess is ready to be printed out or if
-                # there is more to do
-                if len(pt) == 1:
-                    num_guesses += 1
-                    self.print_guess(new_guess)
-
-                    # Check the limit
-                    if limit:
-                        limit = limit - 1
-                        if limit == 0:
-                            return num_guesses
-
-                else:
-                    num_guesses += self._recursive_guesses(new_guess, pt[1:], limit)
-                    
-                    if limit:
-                        limit = limit - num_guesses
-                        if limit <= 0:
-                            return num_guesses
+            guesses = map(''.join, itertools.product(*slots))
+
+        if stop is not None:
+            guesses = itertools.islice(guesses, max(stop - start, 0))
+
+        return guesses
+
+
+    def _product_from(self, slots, start):
+        """
+        Returns the guesses for a set of slots starting in the middle of
+        their Cartesian product, without generating the guesses before it
+
+        The guess number is treated as a mixed radix number where each digit
+        is the index into a slot, (the last slot is the least significant
+        digit). For example with slots of size [10, 3, 5], guess 37 is
+        (2, 1, 2) since 37 = 2*15 + 1*5 + 2
+
+        The rest of the guesses are then generated as a series of smaller
+        products. First the remaining values of the last slot with all the
+        other slots fixed, then the remaining values of the second to last
+        slot with the last slot free, and so on.
+
+        Inputs:
+            slots: A list of lists of strings, as returned by _build_slots()
+
+            start: The guess number to start at
+
+        Returns:
+            guesses: An iterator of guess strings
+        """
+
+        # Find the index into each slot for the starting guess
+        digits = [0] * len(slots)
+        for pos in range(len(slots) - 1, -1, -1):
+            start, digits[pos] = divmod(start, len(slots[pos]))
+
+        # Start is past the end of the parse tree
+        if start:
+            return iter(())
+
+        products = []
+        for pos in range(len(slots) - 1, -1, -1):
+            fixed = [[slots[i][digits[i]]] for i in range(pos)]
+
+            # The starting guess is included in the first product only
+            if pos == len(slots) - 1:
+                first = digits[pos]
+            else:
+                first = digits[pos] + 1
+
+            products.append(itertools.product(*fixed, slots[pos][first:], *slots[pos + 1:]))
+
+        return map(''.join, itertools.chain.from_iterable(products))
+
+
+    def keyspace(self, pt):
+        """
+        Returns the number of guesses a parse tree will generate, without
+        generating them
+
+        Inputs:
+            pt: The parse tree, which is a list of tuples. Can not be an
+            OMEN parse tree
+
+        Returns:
+            num_guesses: The number of guesses in the parse tree
+        """
+        num_guesses = 1
+        for pt_type, index in pt:
+            if pt_type[0] == 'C':
+                num_guesses *= self.case_masks.num_variants(pt_type, index)
+            else:
+                num_guesses *= len(self.grammar[pt_type][index]['values'])
 
         return num_guesses
 
@@ -348,26 +587,10 @@ class PcfgGrammar:
         # If it is a capitalization mask
         elif category == 'C':
 
-            mask_len = len(self.grammar[pt_type][index]['values'][0])
-
-            # Split off the part of the word we need to modify with the mask
-            start_word = [cur_guess[:- mask_len]]
-            end_word = cur_guess[- mask_len:]
-
             mask = random.choice(self.grammar[pt_type][index]['values'])
 
             # Apply the capitalization mask
-            new_end = []
-            index = 0
-            for item in mask:
-                if item == 'L':
-                    new_end.append(end_word[index])
-                else:
-                    new_end.append(end_word[index].upper())
-                index += 1
-
-            # Recombine the capitalization mask with what came before
-            new_guess = ''.join(start_word + new_end)
+            new_guess = self.case_masks.apply_one(cur_guess, mask)
 
             # Figure out if the guess is ready to be printed out or if
             # there is more to do
@@ -415,7 +638,7 @@ class PcfgGrammar:
         return num_guesses
 
 
-    def omen_generate_guesses(self, markov_cracker, limit=None):
+    def omen_generate_guesses(self, markov_cracker, limit=None, skip=0):
         """
         Generates OMEN Guesses
 
@@ -428,44 +651,99 @@ class PcfgGrammar:
         which specifies how many guesses remain to be generated. Ignored if None
 
         Inputs:
-            markov_cracker: An OMEN MarkovCracker instance
+            markov_cracker: An OMEN MarkovCracker instance, or a ParallelOmen
+            generating the guesses with worker processes
+
+            skip: The number of guesses to generate without printing them.
+            How many were actually skipped is saved in self.omen_skipped
 
         Returns:
             num_guesses: The number of guesses generated for this OMEN session
         """
 
         num_guesses = 0
-        guess = markov_cracker.next_guess()
-        while guess is not None:
-            num_guesses += 1
+        self.omen_skipped = 0
 
-            # Output the results
-            self.print_guess(guess)
-            # Check the limit
-            if limit:
-                limit = limit - 1
-                if limit <= 0:
-                    return num_guesses
+        # Guesses are generated in batches that only differ by their last letter
+        guesses = markov_cracker.next_guesses()
+        while guesses is not None:
 
             # Update counter used for status reports and save files
-            self.omen_guess_num += 1
+            first_guess_num = self.omen_guess_num
+            self.omen_guess_num += len(guesses)
+
+            # Skip guesses that another node is generating. If the nodes are
+            # splitting up the OMEN work units instead, the markov_cracker
+            # only generated the ones for this node
+            if self.node_partition is not None and not self.node_partition.omen_units:
+                guesses = self.node_partition.owned_omen_guesses(first_guess_num, guesses)
+
+            # Skip guesses requested by the --skip option
+            if self.omen_skipped < skip:
+                num_skipped = min(skip - self.omen_skipped, len(guesses))
+                self.omen_skipped += num_skipped
+                guesses = guesses[num_skipped:]
+
+            # Check the limit
+            if limit and len(guesses) >= limit:
+                self.print_guesses(guesses[:limit])
+                return num_guesses + limit
+
+            # Output the results
+            self.print_guesses(guesses)
+            num_guesses += len(guesses)
+            if limit:
+                limit = limit - len(guesses)
 
             # Check to see if the user wanted to exit the program
             if self.should_exit:
                 self.omen_exit = True
                 print("Saving OMEN guess generation status",file=sys.stderr)
 
+                # Make sure an older autosave doesn't overwrite this one
+                if self.autosave is not None:
+                    self.autosave.wait()
+
                 # Note, need to add the new extension onto omen session
                 # files for now
-                markov_cracker.save_session(self.save_file[:-4] + ".omn")
+                write_atomic(self.save_file[:-4] + ".omn", markov_cracker.session_data())
                 return num_guesses
 
-            # Get next guess
-            guess = markov_cracker.next_guess()
+            # Periodically save the OMEN progress in case the program dies
+            if self.autosave is not None and first_guess_num // OMEN_CHECK_INTERVAL != self.omen_guess_num // OMEN_CHECK_INTERVAL:
+                self.autosave.check(markov_cracker)
+
+            # Get next batch of guesses
+            guesses = markov_cracker.next_guesses()
 
         return num_guesses
 
 
+    def _omen_generator(self, markov_cracker):
+        """
+        Sets up what to generate the guesses for an OMEN level with
+
+        Inputs:
+            markov_cracker: An OMEN MarkovCracker instance
+
+        Returns:
+            generator: The markov_cracker, or a ParallelOmen wrapping it if
+            worker processes are being used. Either way it has the
+            next_guesses() and session_data() functions
+        """
+        # Only generate the work units this node is responsible for
+        if self.node_partition is not None and self.node_partition.omen_units:
+            markov_cracker.unit_partition = self.node_partition
+
+        if self.omen_workers is None:
+            return markov_cracker
+
+        # Imported here so multiprocessing is only loaded if it's used
+        from .parallel_guesses import ParallelOmen
+
+        return ParallelOmen(self.omen_workers, markov_cracker)
+
+
     def print_guess(self, guess):
         """
         General code to print out a guess to stdout
@@ -475,6 +753,9 @@ class PcfgGrammar:
         Need to have error handling and want to centerlize all the calls to this so I don't
         accidently forget some printout somewhere else
 
+        Guesses are buffered by self.output and written out in blocks, so
+        call flush_guesses() or shutdown() when done generating guesses
+
         Inputs:
             guess: The string to print out to stdout
 
@@ -483,18 +764,7 @@ class PcfgGrammar:
         """
 
         if not self.debug:
-            try:
-                print(guess)
-            # While I could silently replace/ignore the Unicode character for now I
-            # want to provide a good spot to debug if this is happening
-            except UnicodeEncodeError:
-                pass
-            except:
-                print('',file=sys.stderr)
-                print("The consumer, probably the password cracker, has stopped",file=sys.stderr)
-                print("accepting input.",file=sys.stderr)
-                print("Halting guess generation and exiting",file=sys.stderr)
-                raise OSError
+            self.output.write(guess)
 
 
     def find_children(self, pt_item):
@@ -504,54 +774,74 @@ class PcfgGrammar:
         Uses the Deadbeat Dad algorithm to determine if a child node should
         be taken care of by the current parent node
 
+        A child's probability is worked out incrementally from the parent's
+        running probabilities, (CompiledGrammar.prefix_probs()), so only the
+        transitions from the one that changed onwards are multiplied. That
+        gives exactly the same answer as CompiledGrammar.find_prob().
+        Dividing out the parent's old transition would be cheaper, but the
+        result would then depend on which parent it was worked out from due
+        to floating point rounding. Restoring a session reaches parse trees
+        through different parents than the pqueue does, so it would then
+        disagree with the pqueue about which parse trees have already been
+        guessed
+
         Inputs:
-            pt_item: A parse tree item. It is a dictionary with the following keys
+            pt_item: A compiled parse tree item. It is a dictionary with the following keys
                 'prob': The probability of the parse tree (float)
 
-                'pt': The parse tree, which is a list of tuples indexed into the
-                 grammar
+                'base_id': The id of the base structure in the compiled grammar
 
-                'base_prob': The probability of the base structure
+                'indices': The compiled parse tree, which is a tuple of indexes
+                into the grammar
 
         Returns:
-            children_list: A list of all the children, formated as pt_item(s)
+            children_list: A list of all the children, formated as compiled pt_item(s)
         """
 
         parent_prob = pt_item['prob']
-        parent_pt = pt_item['pt']
+        parent_pt = pt_item['indices']
+        base_id = pt_item['base_id']
+        base_types = self.compiled.base_types[base_id]
+        probs = self.compiled.probs
+        find_prob_from = self.compiled.find_prob_from
+
+        # The running probability of the parent, (see
+        # CompiledGrammar.prefix_probs()), up to the current position
+        running_prob = self.compiled.base_probs[base_id]
 
         # The return values
         children_list = []
 
         # Go through all the possible children
-        for pos, item in enumerate(parent_pt):
+        for pos, parent_index in enumerate(parent_pt):
+
+            type_probs = probs[base_types[pos]]
 
-            parent_type = item[0]
-            parent_index = item[1]
+            # A child at this position shares everything before it with the parent
+            prefix_prob = running_prob
+            running_prob *= type_probs[parent_index]
 
             # If true, there are no children at this level
-            if len(self.grammar[parent_type]) == parent_index +1:
+            if len(type_probs) == parent_index +1:
                 continue
 
             # Create the child node
-            child = copy.copy(parent_pt)
-            child[pos] = (child[pos][0], child[pos][1]+1)
+            child = parent_pt[:pos] + (parent_index + 1,) + parent_pt[pos+1:]
 
             # Check to see if the child belongs to this parent
-            if self._are_you_my_child(child, pt_item['base_prob'], pos, parent_prob):
+            if self._are_you_my_child(child, base_id, pos, parent_prob):
 
-                # Testing, just add the child back
                 child_item = {
-                    'pt':child,
-                    'base_prob': pt_item['base_prob'],
-                    'prob': self._find_prob(child, pt_item['base_prob'])
+                    'indices':child,
+                    'base_id': base_id,
+                    'prob': find_prob_from(base_id, child, pos, prefix_prob)
                 }
                 children_list.append(child_item)
 
         return children_list
 
 
-    def _are_you_my_child(self, child, base_prob, parent_pos, parent_prob):
+    def _are_you_my_child(self, child, base_id, parent_pos, parent_prob):
         """
         Given a child and a potential parent, returns if that child is the
         responsibility of the parent
@@ -560,10 +850,10 @@ class PcfgGrammar:
         be taken care of by the current parent node
 
         Inputs:
-            child: The child's parse tree, which is a list of tuples indexed
+            child: The child's compiled parse tree, which is a tuple of indexes
             into the grammar
 
-            base_prob: The probaiblity of the base structure
+            base_id: The id of the base structure in the compiled grammar
 
             parent_pos: The edit position of the calling parent
 
@@ -588,26 +878,46 @@ class PcfgGrammar:
         # 2b) In the case of a tie between parents probability, the parent with
         #     the lowest 'parent_pos' will be responsible for child
         #
+        # All of the parents share every transition with the child except
+        # the one that was decremented, so a parent's probability is the
+        # child's probability times parent_ratio for that transition. That
+        # means most parents can be compared by their parent_ratio alone
+        # without calculating any of their probabilities. If the ratios are
+        # too close to call, the full probabilities are compared instead so
+        # the answer matches what is_parent_around() would find. Those are
+        # worked out incrementally from the child's running probabilities.
+        #
+        base_types = self.compiled.base_types[base_id]
+        parent_ratio = self.compiled.parent_ratio
+        child_prefix = None
+
+        calling_ratio = parent_ratio[base_types[parent_pos]][child[parent_pos]]
 
         # Go through all the possible parents
-        for pos, item in enumerate(child):
+        for pos, index in enumerate(child):
 
             # No sense calculating the calling parent
             if pos == parent_pos:
                 continue
 
             # Skip if there is no parent at this position
-            if item[1] == 0:
+            if index == 0:
                 continue
 
-            # Create the new parent
-            new_parent = copy.copy(child)
-            new_parent[pos] = (new_parent[pos][0], new_parent[pos][1]-1)
-
-            # Calculate new parent's probability
-            new_parent_prob = self._find_prob(new_parent, base_prob)
+            new_parent_ratio = parent_ratio[base_types[pos]][index]
 
             # Check if the new parent should take care of the child
+            if new_parent_ratio < calling_ratio * (1 - RATIO_TOLERANCE):
+                return False
+            elif new_parent_ratio > calling_ratio * (1 + RATIO_TOLERANCE):
+                continue
+
+            if child_prefix is None:
+                child_prefix = self.compiled.prefix_probs(base_id, child)
+
+            new_parent = child[:pos] + (index - 1,) + child[pos+1:]
+            new_parent_prob = self.compiled.find_prob_from(base_id, new_parent, pos, child_prefix[pos])
+
             if new_parent_prob < parent_prob:
                 return False
             elif new_parent_prob == parent_prob:
@@ -695,26 +1005,10 @@ class PcfgGrammar:
         # If it is a capitalization mask
         elif category == 'C':
 
-            mask_len = len(self.grammar[pt_type][index]['values'][0])
-
-            # Split off the part of the word we need to modify with the mask
-            start_word = [cur_guess[:- mask_len]]
-            end_word = cur_guess[- mask_len:]
-
             mask = self.grammar[pt_type][index]['values'][0]
 
             # Apply the capitalization mask
-            new_end = []
-            index = 0
-            for item in mask:
-                if item == 'L':
-                    new_end.append(end_word[index])
-                else:
-                    new_end.append(end_word[index].upper())
-                index += 1
-
-            # Recombine the capitalization mask with what came before
-            new_guess = ''.join(start_word + new_end)
+            new_guess = self.case_masks.apply_one(cur_guess, mask)
 
         # If it is any striaght replacement, (digits, letters, etc)
         else:
@@ -737,15 +1031,29 @@ class PcfgGrammar:
         """
         Walks through the pt_item restoring children using save_function
 
-        This is currently a launch function that initializes and then
-        kicks off the recursive restore. I eventually need to come back to this
-        and create a non-recursive version of this since it's caused some problems
-        when restoring longer sessions from large grammars. The problem is
-        it will hit Python's recursion limit and crash. I'm minimizing this by
-        increasing Python's recursion limit but that fix does not bring me joy.
+        Every parse tree for a base structure can be reached from the most
+        probable one by only increasing indexes at or to the right of the
+        last index that was increased. That means walking the children this
+        way visits every parse tree exactly once. Items with a probability
+        above max_prob have already been guessed, so their children are
+        walked. Items between max_prob and min_prob are saved if none of
+        their parents would have been in the pqueue, (Deadbeat Dad).
+
+        This uses an explicit stack instead of recursion so it does not hit
+        Python's recursion limit on large grammars. Items are still saved in
+        the same order as a depth first walk. Probabilities are calculated
+        incrementally the same way as find_children() so they exactly match
+        the ones the pqueue used when the session was saved.
+
+        Children along the last position walked can only have children
+        along that position themselves. So instead of walking that chain one
+        item at a time, a binary search jumps straight to the first item in
+        it that is at or below max_prob. Any order of positions visits every
+        parse tree once, so the positions are walked from the fewest to the
+        most values to make these chains as long as possible.
 
         Inputs:
-            pt_item: A pt_item to parse
+            pt_item: A compiled pt_item to parse
 
             max_prob: (float): The maximum probability of an item to restore. Items
             with a higher probability will not be restored. This is to avoid
@@ -759,95 +1067,91 @@ class PcfgGrammar:
             save_function: The function to call to save valid children
 
         Returns:
-            True: It was successful
-
-            False: An error was encountered
+            num_visited: The number of parse trees that were looked at
         """
-        recursion_depth = 10**6
-        try:
-            sys.setrecursionlimit(recursion_depth)
-            self._recursive_restore_prob_order(pt_item, max_prob, min_prob, save_function)
-        except RecursionError:
-            print ("Recursion error with restorting the save file",file=sys.stderr)
-            print (f"Max recusion depth of {recursion_depth} exceeded",file=sys.stderr)
-            print (f"Please open a bug/issue on the project github page since the",file=sys.stderr)
-            print (f"programmer obviously made some bad assumptions. That might",file=sys.stderr)
-            print (f"give them incentive to program a non-recursive restore...",file=sys.stderr)
-            return False
 
-        return True
+        base_id = pt_item['base_id']
+        base_types = self.compiled.base_types[base_id]
+        type_probs = [self.compiled.probs[type_id] for type_id in base_types]
+        pt_len = len(base_types)
+        find_prob_from = self.compiled.find_prob_from
 
+        # The order to walk the positions in. The position with the most
+        # values is walked last
+        walk_order = sorted(range(pt_len), key = lambda pos: len(type_probs[pos]))
+        last_pos = walk_order[-1]
 
-    def _recursive_restore_prob_order(self, pt_item, max_prob, min_prob, save_function, left_index=0):
-        """
-        Walks through the pt_item restoring children using save_function
+        num_visited = 0
 
-        Note: This works recursivly with the first call being passed the base_item
-        which is the most probable pt parsing
+        # Each item is (indices, prob, left_index) where left_index is the
+        # leftmost spot in walk_order children of the item can be created at
+        stack = [(pt_item['indices'], pt_item['prob'], 0)]
 
-        Inputs:
-            pt_item: A pt_item to parse
-
-            max_prob: (float): The maximum probability of an item to restore. Items
-            with a higher probability will not be restored. This is to avoid
-            re-guessing passwords that have already been guessed
-
-            min_prob: (float): The minimum probability of an item to restore. Items
-            with a lower probability will not be restored. This is to minimize
-            the size of the saved/restored values by not adding items that will
-            likely never be guessed
+        while stack:
+            parent_pt, parent_prob, left_index = stack.pop()
+            num_visited += 1
 
-            save_function: The function to call to save valid children
+            # Too low probability, stop this parsing
+            if parent_prob < min_prob:
+                continue
 
-            left_index: The index to find children at. The orig calling function should
-            not use this
+            # If this node might be inserted into the queue
+            if parent_prob <= max_prob:
+                child_item = {
+                    'indices': parent_pt,
+                    'base_id': base_id,
+                    'prob': parent_prob,
+                }
 
-        Returns:
-            None
-        """    
+                # Check to make sure none of this child's parents are in the queue
+                if not self.is_parent_around(child_item, max_prob):
+                    # Save the node, no need to check its children
+                    save_function(child_item)
 
-        parent_prob = pt_item['prob']
-        parent_pt = pt_item['pt']
-        parent_len = len(parent_pt)
+                continue
 
-        # Too low probability, stop this parsing
-        if parent_prob < min_prob:
-            return
+            # The running probability of the parent after each transition
+            parent_prefix = self.compiled.prefix_probs(base_id, parent_pt)
 
-        # If this node might be inserted into the queue
-        elif parent_prob <= max_prob:
-            # Check to make sure none of this child's parents are in the queue
-            if not self.is_parent_around(pt_item, max_prob):
-                # Save the node and exit, since we don't need to check its
-                # children
-                save_function(pt_item)
+            # Only find children to the right of left_index + left_index itself
+            #
+            # Children are pushed in reverse so the leftmost child is popped
+            # first, which keeps this a depth first walk
+            for walk_index in range(pt_len - 1, left_index - 1, -1):
 
-            return
+                pos = walk_order[walk_index]
+                parent_index = parent_pt[pos]
+                probs = type_probs[pos]
 
-        # Only find children the left of left_index + left_index itself
-        for pos in range(left_index, parent_len):
+                # If true, there are no children at this level
+                if len(probs) == parent_index + 1:
+                    continue
 
-            item = parent_pt[pos]
+                child = parent_pt[:pos] + (parent_index + 1,) + parent_pt[pos+1:]
+                child_prob = find_prob_from(base_id, child, pos, parent_prefix[pos])
 
-            parent_type = item[0]
-            parent_index = item[1]
+                # Skip over the chain of already guessed items along the
+                # last position
+                if pos == last_pos and child_prob > max_prob:
+                    low = parent_index + 2
+                    high = len(probs)
+                    while low < high:
+                        mid = (low + high) // 2
+                        if find_prob_from(base_id, parent_pt[:pos] + (mid,) + parent_pt[pos+1:], pos, parent_prefix[pos]) <= max_prob:
+                            high = mid
+                        else:
+                            low = mid + 1
 
-            # If true, there are no children at this level
-            if len(self.grammar[parent_type]) == parent_index +1:
-                continue
+                    # Everything along the last position has been guessed
+                    if low == len(probs):
+                        continue
 
-            # Create the child node
-            child = copy.copy(parent_pt)
-            child[pos] = (child[pos][0], child[pos][1]+1)
+                    child = parent_pt[:pos] + (low,) + parent_pt[pos+1:]
+                    child_prob = find_prob_from(base_id, child, pos, parent_prefix[pos])
 
-            child_item = {
-                    'pt':child,
-                    'base_prob': pt_item['base_prob'],
-                    'prob': self._find_prob(child, pt_item['base_prob'])
-                }
+                stack.append((child, child_prob, walk_index))
 
-            # Call the function again for the child
-            self._recursive_restore_prob_order(child_item, max_prob, min_prob, save_function, left_index = pos)
+        return num_visited
 
 
     def is_parent_around(self, pt_item, max_prob):
@@ -857,10 +1161,15 @@ class PcfgGrammar:
         to be inserted into the pqueue.
 
         Inputs:
-            pt_item: The parse tree of the child
+            pt_item: The compiled parse tree item of the child
 
             max_prob: The maximum probabilty of the parse tree. If the parent is still around
-            it needs to be of a lower probability than max_prob.
+            it needs to be of a lower or equal probability than max_prob.
+
+            The save file doesn't record which of the parse trees tied with
+            max_prob have been popped, so they are all treated as still being
+            around. That way the parent a tied child would be created by is
+            restored instead of the child, so the child isn't generated twice
 
         Returns:
             True: There is a parent node still in the pqueue
@@ -868,23 +1177,25 @@ class PcfgGrammar:
             False: There is no parent tree in the pqueue
         """
 
-        child = pt_item['pt']
+        child = pt_item['indices']
+        base_id = pt_item['base_id']
 
-        for pos, item in enumerate(child):
+        # The parents share the child's transitions up to the one that
+        # changed, so their probabilities are worked out from there
+        child_prefix = self.compiled.prefix_probs(base_id, child)
+
+        for pos, index in enumerate(child):
 
             # Skip if there is no parent at this position
-            if item[1] == 0:
+            if index == 0:
                 continue
 
-            # Create the new parent
-            new_parent = copy.copy(child)
-            new_parent[pos] = (new_parent[pos][0], new_parent[pos][1]-1)
-
             # Calculate new parent's probability
-            new_parent_prob = self._find_prob(new_parent, pt_item['base_prob'])
+            new_parent = child[:pos] + (index - 1,) + child[pos+1:]
+            new_parent_prob = self.compiled.find_prob_from(base_id, new_parent, pos, child_prefix[pos])
 
             # Check if the new parent should take care of the child
-            if new_parent_prob < max_prob:
+            if new_parent_prob <= max_prob:
                 return True
 
         return False
@@ -900,22 +1211,46 @@ class PcfgGrammar:
         Inputs:
             omen_guess_num: Where it is in the OMEN guess generation for the OMEN level
 
-            pt_item: The parse tree that specifies the OMEN level
+            pt_item: The parse tree that specifies the OMEN level. Its 'pt' is
+            filled in with the parse tree of the level being restored
 
         Returns:
             Int: The number of guesses generated
 
+            None: If the OMEN session could not be loaded. An error is
+            printed, and no guesses are generated
+
 
         """
 
         # Initialize, then restore the markovcracker
-        markov_cracker = MarkovCracker(self.omen_grammar, 1, self.omen_optimizer)
-        markov_cracker.load_session(self.save_file[:-4]+'.omn', pt_item)
+        markov_cracker = MarkovCracker(
+            self.omen_grammar,
+            1,
+            self.omen_optimizer,
+            ruleset_uuid = self.ruleset_info['uuid']
+            )
+
+        try:
+            markov_cracker.load_session(self.save_file[:-4]+'.omn', pt_item)
+        except (OSError, ValueError) as msg:
+            print(msg,file=sys.stderr)
+            print("Error: Could not restore the OMEN session: " + self.save_file[:-4] + ".omn",file=sys.stderr)
+            print("       The session can't be restored without it, since the rest of",file=sys.stderr)
+            print("       the OMEN level it was generating would be skipped",file=sys.stderr)
+            return None
+
+        # Fill in the parse tree of the level, since the session only saved
+        # how far into it the guesses got
+        for index, item in enumerate(self.grammar['M']):
+            if int(item['values'][0]) == markov_cracker.target_level:
+                pt_item['pt'] = [('M', index)]
+                break
 
         # Initalize counter used for status reports and save files
         self.omen_guess_num = omen_guess_num
 
-        return self.omen_generate_guesses(markov_cracker)
+        return self.omen_generate_guesses(self._omen_generator(markov_cracker))
 
 
     def save_to_file(self, filename):
@@ -940,16 +1275,50 @@ class PcfgGrammar:
 
         # If a file was specified to write the data to, open it for writing
         if self.output_filename:
-            self.output_file = codecs.open(
-                self.output_filename,
-                'w',
-                encoding= self.encoding,
-            )
+            self.output_file = open(self.output_filename, 'wb')
+            self.output = OutputSink(self.output_file, self.encoding)
 
             # Overload the print_guess function
             self.print_guess = self.write_guess_to_file
 
 
+    def print_guesses(self, guesses):
+        """
+        Prints out a list of guesses to stdout, (or the file set by
+        save_to_file)
+
+        If an error occurs will pass back OSError
+
+        Inputs:
+            guesses: A list of strings to print out
+
+        Returns:
+            None
+        """
+
+        if not self.debug or self.output_filename:
+            self.output.write_many(guesses)
+
+
+    def print_encoded_guesses(self, data):
+        """
+        Prints out a block of guesses that has already been encoded, (for
+        example by a worker process), to stdout or the file set by
+        save_to_file
+
+        If an error occurs will pass back OSError
+
+        Inputs:
+            data: The encoded guesses as bytes, with a newline after each guess
+
+        Returns:
+            None
+        """
+
+        if not self.debug or self.output_filename:
+            self.output.write_encoded(data)
+
+
     def write_guess_to_file(self, guess):
         """
         Saves the actual guess to file. Used to overload the normal print_guess to stdout function
@@ -960,8 +1329,22 @@ class PcfgGrammar:
         Returns:
             None
         """
-        self.output_file.write(guess)
-        self.output_file.write('\n')
+        self.output.write(guess)
+
+
+    def flush_guesses(self):
+        """
+        Writes out any guesses that are still buffered
+
+        If an error occurs will pass back OSError
+
+        Inputs:
+            None
+
+        Returns:
+            None
+        """
+        self.output.flush()
 
 
     def shutdown(self):
@@ -976,8 +1359,7 @@ class PcfgGrammar:
             None
 
         """
-        if self.output_filename:
-            self.output_file.close()
+        self.output.close()
 
 
     def random_walk(self):
@@ -1032,4 +1414,4 @@ class PcfgGrammar:
         # Calculate the probability
         pt_item['prob'] = self._find_prob(pt_item['pt'], pt_item['base_prob'])
 
-        return pt_item
\ No newline at end of file
+        return pt_item
\ No newline at end of file
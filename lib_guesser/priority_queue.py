@@ -13,133 +13,106 @@ generation session
 """
 
 
+import sys
+import time
 import heapq
+import itertools
+import struct
 
 
-class QueueItem:
+class SpillRun:
     """
-    Wrapper for a parse tree item
+    A run of pqueue items that were spilled to disk
 
-    This is so the Priority Queue can determine where to place a parse tree item
-    Aka it holds all the "less than", "greater than", "equal to", logic for abs
-    parse tree
+    The items are written out in the same order they would be popped off the
+    pqueue, (highest probability first), so only the head of the run needs
+    to be kept in memory. The file is a temporary file that is deleted when
+    it is closed or the program exits
 
-    Need to have a custom compare functions for use in the priority queue
-
-    I have to do this the reverse of what I'd normally expect
-    since the priority queue will output stuff of lower values first.
-    Aka if there are two items with probabilities of 0.7 and 0.4, the PQueue
-    will by default output 0.4
+    Each record is saved as:
+        prob (double), seq (uint64), base_id (uint32), length (uint32)
+        followed by length indices (uint32)
     """
 
-    def __init__(self, pt_item):
-        """
-        Initialization function
+    # Format of the fixed size part of a record
+    header = struct.Struct('<dQII')
 
-        Inputs:
-            pt_item: A parse tree item, (List)
-
-        Returns:
-            QueueItem
+    def __init__(self, items, directory = None):
         """
-
-        self.pt_item = pt_item
-
-    def __lt__(self, other):
-        """
-        Reverse of what you'd expect since the priority queue needs to output
-        the highest probability guess first. Therefore while this checkes the
-        "less then" for this item, it really checks if the item is higher probability
-        than what it is being compared against
+        Writes the run to disk and loads the first item
 
         Inputs:
-            other: Item to compare against
+            items: An iterable of pqueue tuples, (-prob, seq, indices, base_id),
+            already sorted in the order they should be popped
 
-        Outputs:
-            True: If the item is higher probability than the other
+            directory: The directory to create the run file in. If None, the
+            system temp directory is used
 
-            False: If the item is lower probability than the other
-        """
-        return self.pt_item['prob'] > other.pt_item['prob']
-
-    def __le__(self, other):
+        Returns:
+            SpillRun
         """
-        Reverse of what you'd expect since the priority queue needs to output
-        the highest probability guess first. Therefore while this checkes the
-        "less then or equal" for this item, it really checks if the item is higher probability
-        or equal than what it is being compared against
-
-        Inputs:
-            other: Item to compare against
 
-        Outputs:
-            True: If the item is higher probability than the other or equal
+        # Imported here since most sessions never spill to disk
+        import tempfile
 
-            False: If the item is lower probability than the other
-        """
-        return self.pt_item['prob'] >= other.pt_item['prob']
+        self.file = tempfile.TemporaryFile(prefix='pcfg_queue_', dir=directory)
 
-    def __eq__(self, other):
-        """
-        Checks if this item is equal to the other item.
+        # The number of items left in the run, including the head
+        self.size = 0
 
-        Inputs:
-            other: Item to compare against
+        header = self.header
+        for neg_prob, seq, indices, base_id in items:
+            self.file.write(header.pack(-neg_prob, seq, base_id, len(indices)))
+            self.file.write(struct.pack(f'<{len(indices)}I', *indices))
+            self.size += 1
 
-        Outputs:
-            True: If the item and the other are equal probability
+        self.file.seek(0)
 
-            False: If this item and the other item have different probabilities
-        """
-        return self.pt_item['prob'] == other.pt_item['prob']
+        # The next item to pop from this run
+        self.head = None
+        self.advance()
 
-    def __ne__(self, other):
+    def advance(self):
         """
-        Checks if this item is not equal to the other item.
+        Reads the next item from the run into self.head
 
         Inputs:
-            other: Item to compare against
-
-        Outputs:
-            True: If this item and the other item have different probabilities
+            None
 
-            False: If the item and the other are equal probability
+        Returns:
+            head: The new head of the run, or None if the run is empty. The
+            run file is closed once it is empty
         """
-        return self.pt_item['prob'] != other.pt_item['prob']
 
-    def __gt__(self, other):
-        """
-        Reverse of what you'd expect since the priority queue needs to output
-        the highest probability guess first. Therefore while this checkes the
-        "greater then" for this item, it really checks if the item is lower probability
-        than what it is being compared against
+        data = self.file.read(self.header.size)
+        if not data:
+            self.head = None
+            self.size = 0
+            self.file.close()
+            return None
 
-        Inputs:
-            other: Item to compare against
+        prob, seq, base_id, length = self.header.unpack(data)
+        indices = struct.unpack(f'<{length}I', self.file.read(4 * length))
 
-        Outputs:
-            True: If the item is lower probability than the other
+        if self.head is not None:
+            self.size -= 1
 
-            False: If the item is higher probability than the other
-        """
-        return self.pt_item['prob'] < other.pt_item['prob']
+        self.head = (-prob, seq, indices, base_id)
+        return self.head
 
-    def __ge__(self, other):
+    def items(self):
         """
-        Reverse of what you'd expect since the priority queue needs to output
-        the highest probability guess first. Therefore while this checkes the
-        "greater then or equal" for this item, it really checks if the item is lower probability
-        or equal to what it is being compared against
+        Generator that returns the head and then every item left in the run
 
         Inputs:
-            other: Item to compare against
-
-        Outputs:
-            True: If the item is lower probability or equal to the other
+            None
 
-            False: If the item is higher probability than the other
+        Returns:
+            (Generator) The pqueue tuples left in the run, in pop order
         """
-        return self.pt_item['prob'] <= other.pt_item['prob']
+        while self.head is not None:
+            yield self.head
+            self.advance()
 
 
 class PcfgQueue:
@@ -153,9 +126,42 @@ class PcfgQueue:
     better support removing low probability items from it when it grows too
     large. Therefore I felt it would be best to treat it as a class. Right now
     though it uses the standared python queue HeapQ as its backend
+
+    The pqueue can optionally be bounded by max_queue_size. When it grows
+    past that size the lowest probability half of the pqueue is either:
+
+        Discarded: min_probability is raised so nothing below it is pushed
+        back into the pqueue. Once the pqueue runs dry, everything below
+        min_probability is regenerated using restore_prob_order, the same
+        way a saved session is restored. Low memory, but costs time walking
+        the grammar when it is regenerated
+
+        Spilled: Written to a sorted run file on disk. The heads of the run
+        files are merged with the in memory pqueue by next() so items are
+        still returned in probability order. No time is spent regenerating
+        items, but it uses disk space
+
+    Items in the pqueue are saved as plain tuples vs. wrapping every parse
+    tree dictionary in an object with custom compare functions. That way
+    HeapQ can compare them natively, and each queued parse tree only costs
+    one tuple plus its probability. The format is:
+
+        (-prob, seq, indices, base_id)
+
+        -prob: The negative probability of the parse tree. It is negative
+        since HeapQ outputs the lowest value first
+
+        seq: An insertion counter. Parse trees with the same probability
+        are popped in the order they were inserted, and HeapQ never has to
+        compare the rest of the tuple
+
+        indices: The compiled parse tree, (an immutable tuple of ints)
+
+        base_id: The id of the base structure in the compiled grammar
     """
 
-    def __init__(self, pcfg, save_config = None):
+    def __init__(self, pcfg, save_config = None, max_queue_size = None, spill = False, spill_directory = None,
+        checkpoint = None):
         """
         Basic initialization function
 
@@ -167,6 +173,19 @@ class PcfgQueue:
                 min_probability: float
                 max_probability: float
 
+            max_queue_size: The maximum number of items to keep in memory.
+            If None, the pqueue is unbounded
+
+            spill: If True, items trimmed from the pqueue are spilled to
+            disk. If False they are discarded and regenerated later
+
+            spill_directory: The directory to save spill files to. If None,
+            the system temp directory is used
+
+            checkpoint: Used with save_config. A tuple of (queue_items, next_seq)
+            loaded from a checkpoint file, (see queue_checkpoint.py). If set the
+            pqueue is loaded from it instead of walking the grammar
+
         Returns:
             PcfgQueue
         """
@@ -177,6 +196,9 @@ class PcfgQueue:
         # The actual priority queue
         self.p_queue = []
 
+        # Used to break ties between items with the same probability
+        self.seq = itertools.count()
+
         # The current highest priority item in the queue. Used for memory
         # management and restoring sessions
         self.max_probability = 1.0
@@ -188,14 +210,31 @@ class PcfgQueue:
         # Used for memory management. The maximum number of items before
         # triming the queue.
         # Note: the queue can temporarially be larger than this
-        self.max_queue_size = 50000
+        self.max_queue_size = max_queue_size
+
+        # How to handle items trimmed from the queue
+        self.spill = spill
+        self.spill_directory = spill_directory
+
+        # Items spilled to disk. self.spill_heads is a heap of the current
+        # head of each run, saved as [head, SpillRun]
+        self.spill_heads = []
+
+        # If there are more spill runs than this, they are merged into one
+        self.max_spill_runs = 16
+
+        # Stats for the status report
+        self.num_trims = 0
+        self.num_discarded = 0
+        self.num_spilled = 0
+        self.num_regenerations = 0
 
         # New Guessing Session
         if save_config is None:
             # Initalize the priority queue with all of the initial base
             # structures from the pcfg
             for base_item in self.pcfg.initalize_base_structures():
-                heapq.heappush(self.p_queue, QueueItem(base_item))
+                self.insert_queue(base_item)
 
             return
 
@@ -203,8 +242,31 @@ class PcfgQueue:
         self.min_probability = save_config.getfloat('guessing_info', 'min_probability')
         self.max_probability = save_config.getfloat('guessing_info', 'max_probability')
 
-        for base_item in self.pcfg.initalize_base_structures():
-            self.restore_base_item(base_item)
+        # The checkpoint list is already a valid heap
+        if checkpoint is not None:
+            self.p_queue, next_seq = checkpoint
+            self.seq = itertools.count(next_seq)
+            print(f"Restored {len(self.p_queue)} pre-terminals from the checkpoint",file=sys.stderr)
+            return
+
+        base_items = self.pcfg.initalize_base_structures()
+
+        # Print progress every few seconds since restoring a long session
+        # on a large ruleset can take a while
+        start_time = time.time()
+        last_report = start_time
+        num_checked = 0
+
+        for num, base_item in enumerate(base_items, 1):
+            num_checked += self.restore_base_item(base_item)
+
+            if time.time() - last_report >= 5:
+                last_report = time.time()
+                print(f"Restoring: {num}/{len(base_items)} base structures, " +
+                    f"{num_checked} pre-terminals checked",file=sys.stderr)
+
+        print(f"Restored the priority queue in {time.time() - start_time:.1f} seconds. " +
+            f"{num_checked} pre-terminals checked",file=sys.stderr)
 
     def next(self):
         """
@@ -214,18 +276,38 @@ class PcfgQueue:
             None
 
         Returns:
-            pt_item: A parse tree item that was popped off the queue
+            pt_item: A parse tree item that was popped off the queue. It has
+            both the compiled parse tree, ('base_id' and 'indices'), and the
+            list of (name, index) tuples, ('pt')
 
             None: If no items are left to be popped from the queue
         """
 
         # Check if the queue is empty
-        if len(self.p_queue) == 0:
-            return None
+        if not self.p_queue and not self.spill_heads:
+
+            # Check if items were discarded that need to be regenerated
+            if self.min_probability <= 0:
+                return None
 
-        # Pop the top value off the queue
-        queue_item = heapq.heappop(self.p_queue)
-        self.max_probability = queue_item.pt_item['prob']
+            self._regenerate()
+            if not self.p_queue:
+                return None
+
+        # Pop the top value off the queue, or from a spill run if it has
+        # a higher probability
+        if self.spill_heads and (not self.p_queue or self.spill_heads[0][0] < self.p_queue[0]):
+            neg_prob, _, indices, base_id = self._pop_spill()
+        else:
+            neg_prob, _, indices, base_id = heapq.heappop(self.p_queue)
+
+        self.max_probability = -neg_prob
+
+        pt_item = {
+            'prob': -neg_prob,
+            'base_id': base_id,
+            'indices': indices,
+        }
 
         # Push the children back on the stack
         #
@@ -233,10 +315,12 @@ class PcfgQueue:
         # in my dissertation:
         # http://diginole.lib.fsu.edu/cgi/viewcontent.cgi?article=5135
         #
-        for child in self.pcfg.find_children(queue_item.pt_item):
+        for child in self.pcfg.find_children(pt_item):
             self.insert_queue(child)
 
-        return queue_item.pt_item
+        # The pqueue only holds compiled parse trees, so fill out the human
+        # readable parse tree for everything else that uses this item
+        return self.pcfg.decode_pt_item(pt_item)
 
     def insert_queue(self, queue_item):
         """
@@ -246,12 +330,163 @@ class PcfgQueue:
         operates in the future
 
         Inputs:
-            queue_item: The value to save in the pqueue
+            queue_item: The compiled pt_item to save in the pqueue. Only the
+            'prob', 'indices' and 'base_id' keys are saved
 
         Returns:
             None
         """
-        heapq.heappush(self.p_queue, QueueItem(queue_item))
+
+        # This item was trimmed and will be regenerated later
+        if queue_item['prob'] < self.min_probability:
+            return
+
+        heapq.heappush(
+            self.p_queue,
+            (-queue_item['prob'], next(self.seq), queue_item['indices'], queue_item['base_id'])
+            )
+
+        if self.max_queue_size and len(self.p_queue) > self.max_queue_size:
+            self._trim_queue()
+
+    def _trim_queue(self):
+        """
+        Removes the lowest probability half of the pqueue
+
+        Depending on self.spill, the removed items are either written to a
+        spill run on disk, or discarded and min_probability is raised so
+        they can be regenerated later
+
+        Inputs:
+            None
+
+        Returns:
+            None
+        """
+
+        # A sorted list is still a valid heap, so sort in place and cut off
+        # the tail. The tail is sorted highest probability first
+        self.p_queue.sort()
+        keep = max(1, self.max_queue_size // 2)
+
+        if not self.spill:
+            # Items with the same probability need to be either all kept or
+            # all discarded for regenerating them to work
+            cut = self.p_queue[keep][0]
+            while keep > 0 and self.p_queue[keep - 1][0] == cut:
+                keep -= 1
+
+            # Every item has the same probability, so nothing can be trimmed
+            if keep == 0:
+                return
+
+            # Set the cut off to in between the kept and discarded items so
+            # a parse tree's probability will never be equal to it
+            self.min_probability = -(self.p_queue[keep - 1][0] + cut) / 2
+            self.num_discarded += len(self.p_queue) - keep
+
+        else:
+            run = SpillRun(self.p_queue[keep:], self.spill_directory)
+            heapq.heappush(self.spill_heads, [run.head, run])
+            self.num_spilled += run.size
+
+            if len(self.spill_heads) > self.max_spill_runs:
+                self._merge_spill_runs()
+
+        del self.p_queue[keep:]
+        self.num_trims += 1
+
+    def _pop_spill(self):
+        """
+        Pops the highest probability item from the spill runs
+
+        Inputs:
+            None
+
+        Returns:
+            queue_item: The pqueue tuple that was popped
+        """
+        head, run = self.spill_heads[0]
+
+        if run.advance() is None:
+            heapq.heappop(self.spill_heads)
+        else:
+            heapq.heapreplace(self.spill_heads, [run.head, run])
+
+        return head
+
+    def _merge_spill_runs(self):
+        """
+        Merges all of the spill runs into one run to limit open files
+
+        Inputs:
+            None
+
+        Returns:
+            None
+        """
+        runs = [run for _, run in self.spill_heads]
+        merged = heapq.merge(*[run.items() for run in runs])
+
+        run = SpillRun(merged, self.spill_directory)
+        self.spill_heads = [[run.head, run]]
+
+    def _regenerate(self):
+        """
+        Regenerates the items that were discarded when the pqueue was trimmed
+
+        Uses the same logic as restoring a session, where every item at or
+        below min_probability whose parents are all above it is pushed into
+        the pqueue. This may trim the pqueue again if there are too many
+
+        Inputs:
+            None
+
+        Returns:
+            None
+        """
+        cut_off = self.min_probability
+        self.min_probability = 0.0
+        self.num_regenerations += 1
+
+        for base_item in self.pcfg.initalize_base_structures():
+            self.pcfg.restore_prob_order(
+                base_item,
+                cut_off,
+                0.0,
+                self.insert_queue
+                )
+
+    def queue_stats(self):
+        """
+        Returns stats about the pqueue memory management for status reports
+
+        Inputs:
+            None
+
+        Returns:
+            stats: A dictionary with the following keys
+                'queue_size': Number of items in memory
+                'max_queue_size': The size limit of the pqueue, (None if unbounded)
+                'num_trims': Number of times the pqueue was trimmed
+                'num_discarded': Number of items discarded to be regenerated
+                'num_regenerations': Number of times items were regenerated
+                'num_spilled': Number of items written to spill runs
+                'spill_runs': Number of spill runs on disk
+                'spill_size': Number of items still on disk
+                'min_probability': The current min_probability
+        """
+        return {
+            'queue_size': len(self.p_queue),
+            'max_queue_size': self.max_queue_size,
+            'num_trims': self.num_trims,
+            'num_discarded': self.num_discarded,
+            'num_regenerations': self.num_regenerations,
+            'num_spilled': self.num_spilled,
+            'spill_runs': len(self.spill_heads),
+            'spill_size': sum(run.size for _, run in self.spill_heads),
+            'min_probability': self.min_probability,
+        }
 
     def restore_base_item(self, base_item):
         """
@@ -263,15 +498,35 @@ class PcfgQueue:
             base_item: A pt of the most probable pre-terminal for a base_item
 
         Returns:
-            None
+            num_checked: The number of pre-terminals that were looked at
         """
-        load_success = self.pcfg.restore_prob_order(
+        return self.pcfg.restore_prob_order(
             base_item,
             self.max_probability,
             self.min_probability,
             self.insert_queue
             )
 
+    def checkpoint_snapshot(self):
+        """
+        Takes a snapshot of the pqueue to save in a checkpoint
+
+        Items that have been spilled to disk are not included, so checkpoints
+        can't be used with a spilling pqueue
+
+        Inputs:
+            None
+
+        Returns:
+            (queue_items, next_seq)
+
+            queue_items: A copy of the pqueue list. The items are immutable
+            tuples so this is safe to write out in another thread
+
+            next_seq: The next insertion counter value to use when restored
+        """
+        return list(self.p_queue), next(self.seq)
+
     def update_save_config(self, save_config):
         """
         Updates the config file for saving/loading sessions, with current status
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+
+
+"""
+
+Name: PCFG_Guesser Pruned Grammar
+
+Description: A grammar dictionary that can drop nonterminals, (such as
+'D4' or 'A8'), that no base structure uses before their files are read
+
+A ruleset has a file for every length of every kind of terminal, but a
+ruleset that has been edited to target a password policy, (or that was
+trained on a small or unusual set of passwords), may have base structures
+that only use a few of them. The grammar loader registers every file it
+could load, then uses the base structures to prune the nonterminals that
+can never be reached. Only the ones that are left are ever read.
+
+This is pruning, not lazy loading. The guesser still loads every
+nonterminal that is left when it starts up, since the compiled grammar
+needs the probabilities of all of them to seed the pqueue, and those are
+stored in the same files as the terminals.
+
+"""
+
+
+import time
+from collections.abc import Mapping
+
+
+def _timed_load(loader):
+    """
+    Calls a loader and times how long it took
+
+    Module level so it can be sent to worker processes
+
+    Inputs:
+        loader: The function that loads a nonterminal
+
+    Returns:
+        (groups, seconds): What the loader returned, and how long it took
+    """
+    start = time.perf_counter()
+    groups = loader()
+    return groups, time.perf_counter() - start
+
+
+class PrunedGrammar(Mapping):
+    """
+    Read only mapping of nonterminal names to their list of
+    {'values':[], 'prob':float} dictionaries
+
+    Nonterminals are added with a loader, and aren't read until load_all()
+    is called or one is looked up. That way restrict() can prune the ones
+    that aren't used first. Checking if a nonterminal is in the grammar, or
+    listing the names, does not load anything.
+    """
+
+    def __init__(self):
+        """
+        Creates an empty grammar
+
+        Inputs:
+            None
+
+        Returns:
+            PrunedGrammar
+        """
+
+        # Functions that load each nonterminal, in the order they were added.
+        # Each one takes no arguments and returns the list of
+        # {'values':[], 'prob':float} dictionaries
+        self.loaders = {}
+
+        # The nonterminals that have been loaded so far
+        self.loaded = {}
+
+        # How many seconds it took to load each nonterminal
+        self.load_times = {}
+
+    def add(self, name, loader):
+        """
+        Adds a nonterminal that will be loaded by load_all(), or the first
+        time it is looked up
+
+        Inputs:
+            name: The name of the nonterminal, aka 'D4'
+
+            loader: A function that takes no arguments and returns the list
+            of {'values':[], 'prob':float} dictionaries for the nonterminal.
+            It should raise an exception if the nonterminal can't be loaded
+
+        Returns:
+            None
+        """
+        self.loaders[name] = loader
+        self.loaded.pop(name, None)
+
+    def set(self, name, groups):
+        """
+        Adds a nonterminal that has already been loaded
+
+        Inputs:
+            name: The name of the nonterminal, aka 'C4'
+
+            groups: The list of {'values':[], 'prob':float} dictionaries
+
+        Returns:
+            None
+        """
+        self.loaders[name] = None
+        self.loaded[name] = groups
+
+    def restrict(self, names):
+        """
+        Removes every nonterminal that isn't in names
+
+        Used to drop nonterminals that aren't used by any base structure
+        before they are loaded
+
+        Inputs:
+            names: The names of the nonterminals to keep
+
+        Returns:
+            None
+        """
+        for name in list(self.loaders):
+            if name not in names:
+                del self.loaders[name]
+                self.loaded.pop(name, None)
+                self.load_times.pop(name, None)
+
+    def load_all(self, map_function = map):
+        """
+        Loads every nonterminal that hasn't been loaded yet
+
+        Inputs:
+            map_function: Used to call the loaders. Pass in the map function
+            of a process pool to load them in parallel. The loaders must be
+            picklable to do that
+
+        Returns:
+            None
+        """
+        names = [name for name in self.loaders if name not in self.loaded]
+        results = map_function(_timed_load, [self.loaders[name] for name in names])
+
+        for name, (groups, seconds) in zip(names, results):
+            self.loaded[name] = groups
+            self.load_times[name] = seconds
+
+    def is_loaded(self, name):
+        """
+        Checks if a nonterminal has been loaded yet
+
+        Inputs:
+            name: The name of the nonterminal
+
+        Returns:
+            True: If it has been loaded
+
+            False: If it hasn't been loaded, or isn't in the grammar
+        """
+        return name in self.loaded
+
+    def __getitem__(self, name):
+        try:
+            return self.loaded[name]
+        except KeyError:
+            pass
+
+        # Raises a KeyError if the nonterminal isn't in the grammar
+        loader = self.loaders[name]
+
+        groups, seconds = _timed_load(loader)
+        self.loaded[name] = groups
+        self.load_times[name] = seconds
+        return groups
+
+    def __contains__(self, name):
+        return name in self.loaders
+
+    def __iter__(self):
+        return iter(self.loaders)
+
+    def __len__(self):
+        return len(self.loaders)
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+
+
+"""
+
+Name: PCFG_Guesser Priority Queue Checkpoints
+
+Description: Saves the contents of the priority queue to disk so a session
+can be restored by loading it, rather than re-walking every base structure
+
+The normal session save file only has the min/max probability of the
+pqueue, and restoring it means walking the grammar to find every parse tree
+that falls between them. That is cheap to save but can take a long time to
+restore. A checkpoint instead saves every item in the pqueue, along with a
+copy of the session save file so the counters in the status report match
+the saved pqueue.
+
+The file format is:
+
+    header: magic (8 bytes), version (uint32), num_pending (uint64),
+            num_items (uint64), next_seq (uint64), config_length (uint32),
+            num_indices (uint64)
+
+    config: config_length bytes, the session save file as UTF-8 text
+
+    Then for the num_pending + num_items items:
+
+    probs: doubles, the probability of each item
+
+    seqs: uint64s, the insertion counter of each item
+
+    base_ids: uint32s, the base structure id of each item
+
+    lengths: uint32s, the number of indices for each item
+
+    indices: num_indices uint32s, the indices of every item one after another
+
+The first num_pending items are pre-terminals that were popped off the
+pqueue but whose guesses had not been generated yet, (for example the
+pre-terminal that was popped when the user asked to exit). Their children
+are already in the pqueue, so they need to have their guesses generated
+but must not be pushed back into the pqueue. The rest of the items are
+saved in the order of the pqueue list, which is already a valid heap, so
+loading them doesn't require re-sorting.
+
+Checkpoints are written to a temp file and then renamed over the old
+checkpoint, so a crash while writing will leave the previous checkpoint in
+place.
+
+"""
+
+
+import os
+import sys
+import mmap
+import itertools
+import struct
+import threading
+from array import array
+
+
+# Identifies the file as a pqueue checkpoint
+MAGIC = b'PCFGCHK1'
+
+# Increment this if the file format changes
+VERSION = 1
+
+HEADER = struct.Struct('<8sIQQQIQ')
+
+
+def write_checkpoint(filename, config_text, pending_items, queue_items, next_seq):
+    """
+    Writes a checkpoint file
+
+    The checkpoint is written to filename + '.tmp' and then renamed to
+    filename once it is complete
+
+    Inputs:
+        filename: The file to save the checkpoint to
+
+        config_text: The session save file, as a string
+
+        pending_items: A list of pqueue tuples, (-prob, seq, indices, base_id),
+        for pre-terminals that were popped but not guessed yet
+
+        queue_items: A list of pqueue tuples, (-prob, seq, indices, base_id)
+
+        next_seq: The next insertion counter value the pqueue will use
+
+    Returns:
+        None
+
+    Raises:
+        OSError: If the file could not be written
+    """
+
+    probs = array('d')
+    seqs = array('Q')
+    base_ids = array('I')
+    lengths = array('I')
+    indices = array('I')
+
+    for neg_prob, seq, pt, base_id in itertools.chain(pending_items, queue_items):
+        probs.append(-neg_prob)
+        seqs.append(seq)
+        base_ids.append(base_id)
+        lengths.append(len(pt))
+        indices.extend(pt)
+
+    config_data = config_text.encode('utf-8')
+
+    temp_filename = filename + '.tmp'
+    with open(temp_filename, 'wb') as checkpoint_file:
+        checkpoint_file.write(HEADER.pack(
+            MAGIC,
+            VERSION,
+            len(pending_items),
+            len(probs) - len(pending_items),
+            next_seq,
+            len(config_data),
+            len(indices)
+            ))
+        checkpoint_file.write(config_data)
+        for data in (probs, seqs, base_ids, lengths, indices):
+            checkpoint_file.write(data.tobytes())
+
+        checkpoint_file.flush()
+        os.fsync(checkpoint_file.fileno())
+
+    os.replace(temp_filename, filename)
+
+
+def read_checkpoint(filename):
+    """
+    Reads a checkpoint file
+
+    Inputs:
+        filename: The checkpoint file to load
+
+    Returns:
+        (config_text, pending_items, queue_items, next_seq)
+
+        config_text: The session save file, as a string
+
+        pending_items: A list of pqueue tuples for pre-terminals that were
+        popped but not guessed yet
+
+        queue_items: A list of pqueue tuples, (-prob, seq, indices, base_id),
+        that is a valid heap
+
+        next_seq: The next insertion counter value the pqueue should use
+
+    Raises:
+        OSError: If the file could not be read
+
+        ValueError: If the file is not a valid checkpoint
+    """
+
+    with open(filename, 'rb') as checkpoint_file:
+        with mmap.mmap(checkpoint_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+
+            if len(data) < HEADER.size:
+                raise ValueError("Checkpoint file is too short")
+
+            magic, version, num_pending, num_items, next_seq, config_length, num_indices = HEADER.unpack_from(data)
+
+            # The pending items are saved before the pqueue items
+            num_items += num_pending
+
+            if magic != MAGIC:
+                raise ValueError("Not a pqueue checkpoint file")
+
+            if version != VERSION:
+                raise ValueError(f"Unsupported checkpoint version {version}")
+
+            expected_size = HEADER.size + config_length + num_items * 24 + num_indices * 4
+            if len(data) != expected_size:
+                raise ValueError("Checkpoint file is truncated or corrupt")
+
+            offset = HEADER.size
+            config_text = data[offset:offset + config_length].decode('utf-8')
+            offset += config_length
+
+            sections = []
+            for typecode, count in (('d', num_items), ('Q', num_items), ('I', num_items), ('I', num_items), ('I', num_indices)):
+                section = array(typecode)
+                size = count * section.itemsize
+                section.frombytes(data[offset:offset + size])
+                offset += size
+                sections.append(section)
+
+    probs, seqs, base_ids, lengths, indices = sections
+
+    queue_items = []
+    start = 0
+    for prob, seq, base_id, length in zip(probs, seqs, base_ids, lengths):
+        queue_items.append((-prob, seq, tuple(indices[start:start + length]), base_id))
+        start += length
+
+    return config_text, queue_items[:num_pending], queue_items[num_pending:], next_seq
+
+
+class CheckpointWriter:
+    """
+    Writes checkpoints in a background thread so guess generation doesn't
+    have to wait on the disk
+
+    Only one checkpoint is written at a time. If a new checkpoint is requested
+    while the previous one is still being written, it waits for the previous
+    one to finish first
+    """
+
+    def __init__(self, filename):
+        """
+        Initializes the checkpoint writer
+
+        Inputs:
+            filename: The file to save checkpoints to
+
+        Returns:
+            CheckpointWriter
+        """
+        self.filename = filename
+
+        # The thread writing the current checkpoint
+        self.thread = None
+
+        # The number of checkpoints that have been written
+        self.num_checkpoints = 0
+
+    def save(self, config_text, pending_items, queue_items, next_seq, background = True):
+        """
+        Writes a checkpoint
+
+        Inputs:
+            config_text: The session save file, as a string
+
+            pending_items: The pqueue tuples for pre-terminals that were
+            popped but not guessed yet
+
+            queue_items: A snapshot of the pqueue items. This list must not be
+            modified after it is passed in
+
+            next_seq: The next insertion counter value the pqueue will use
+
+            background: If True, write the checkpoint in a background thread.
+            If False, wait until it is written
+
+        Returns:
+            None
+        """
+        self.wait()
+
+        if not background:
+            self._write(config_text, pending_items, queue_items, next_seq)
+            return
+
+        self.thread = threading.Thread(
+            target = self._write,
+            args = (config_text, pending_items, queue_items, next_seq)
+            )
+        self.thread.daemon = True
+        self.thread.start()
+
+    def wait(self):
+        """
+        Waits for the checkpoint being written in the background to finish
+
+        Inputs:
+            None
+
+        Returns:
+            None
+        """
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def _write(self, config_text, pending_items, queue_items, next_seq):
+        """
+        Writes the checkpoint, printing an error if it fails
+
+        Inputs:
+            config_text: The session save file, as a string
+
+            pending_items: The pqueue tuples for pre-terminals that were
+            popped but not guessed yet
+
+            queue_items: A snapshot of the pqueue items
+
+            next_seq: The next insertion counter value the pqueue will use
+
+        Returns:
+            None
+        """
+        try:
+            write_checkpoint(self.filename, config_text, pending_items, queue_items, next_seq)
+            self.num_checkpoints += 1
+
+        except OSError as error:
+            print(error,file=sys.stderr)
+            print("Error writing the pqueue checkpoint file: " + self.filename,file=sys.stderr)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+
+
+"""
+
+Name: PCFG_Guesser Session Autosave
+
+Description: Periodically saves a cracking session so a crash, (or the
+program being killed), doesn't lose all the progress since it started
+
+Normally the session save file is only written when the session starts and
+when the user exits with 'q'. Autosave also writes it every so many seconds
+and/or every so many pre-terminals. If OMEN guesses are being generated the
+OMEN session file is saved along with it.
+
+Each file is written to a temp file and then renamed over the old one, so
+the previous save is still there if the program dies while saving. The
+files are written in a background thread so guess generation doesn't have
+to wait on the disk. They are written in order, so the session save file,
+(which is written last), never points to OMEN state that hasn't been
+saved yet.
+
+"""
+
+
+import os
+import sys
+import time
+import threading
+
+
+# While generating OMEN guesses, only check if an autosave is due every
+# this many guesses to keep the overhead down
+OMEN_CHECK_INTERVAL = 1024
+
+
+def write_atomic(filename, data):
+    """
+    Writes a file so that it either has the old contents or the new ones
+
+    The data is written to filename + '.tmp', flushed to disk, and then
+    renamed to filename
+
+    Inputs:
+        filename: The file to write
+
+        data: The bytes to write to the file
+
+    Returns:
+        None
+
+    Raises:
+        OSError: If the file could not be written
+    """
+    temp_filename = filename + '.tmp'
+    with open(temp_filename, 'wb') as save_file:
+        save_file.write(data)
+        save_file.flush()
+        os.fsync(save_file.fileno())
+
+    os.replace(temp_filename, filename)
+
+
+class AutoSave:
+    """
+    Decides when to save a session and writes the save files in the
+    background
+    """
+
+    def __init__(self, save_files_function, interval = None, num_pts = None):
+        """
+        Initializes the autosave
+
+        Inputs:
+            save_files_function: Called when an autosave is due to get the
+            files to save. It is passed the MarkovCracker if OMEN guesses are
+            being generated, or None. It should return a list of
+            (filename, data) tuples, in the order they should be written
+
+            interval: The number of seconds between saves. None means don't
+            save based on time
+
+            num_pts: The number of pre-terminals between saves. None means
+            don't save based on the number of pre-terminals
+
+        Returns:
+            AutoSave
+        """
+        self.save_files_function = save_files_function
+        self.interval = interval
+        self.num_pts = num_pts
+
+        # When the last save happened, and how many pre-terminals have been
+        # processed since then
+        self.last_save = time.time()
+        self.pts_since_save = 0
+
+        # The thread writing the current save
+        self.thread = None
+
+        # The number of autosaves that have been written
+        self.num_saves = 0
+
+    def count_pt(self, num_pts = 1):
+        """
+        Records that more pre-terminals have had their guesses written out
+
+        Inputs:
+            num_pts: The number of pre-terminals
+
+        Returns:
+            None
+        """
+        self.pts_since_save += num_pts
+
+    def is_due(self):
+        """
+        Checks if it is time to save the session
+
+        Inputs:
+            None
+
+        Returns:
+            True: If the session should be saved
+
+            False: If it isn't time yet
+        """
+        if self.num_pts is not None and self.pts_since_save >= self.num_pts:
+            return True
+
+        if self.interval is not None and time.time() - self.last_save >= self.interval:
+            return True
+
+        return False
+
+    def check(self, markov_cracker = None):
+        """
+        Saves the session in the background if an autosave is due
+
+        Inputs:
+            markov_cracker: The MarkovCracker if OMEN guesses are being
+            generated
+
+        Returns:
+            None
+        """
+        if not self.is_due():
+            return
+
+        files = self.save_files_function(markov_cracker)
+
+        # Don't start writing a new save until the last one is done
+        self.wait()
+
+        self.thread = threading.Thread(target = self._write, args = (files,))
+        self.thread.daemon = True
+        self.thread.start()
+
+        self.last_save = time.time()
+        self.pts_since_save = 0
+
+    def wait(self):
+        """
+        Waits for the save being written in the background to finish
+
+        Needs to be called before the save files are written anywhere else,
+        so an older autosave doesn't replace them
+
+        Inputs:
+            None
+
+        Returns:
+            None
+        """
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def _write(self, files):
+        """
+        Writes the save files, printing an error if it fails
+
+        Inputs:
+            files: A list of (filename, data) tuples
+
+        Returns:
+            None
+        """
+        for filename, data in files:
+            try:
+                write_atomic(filename, data)
+
+            except OSError as error:
+                print(error,file=sys.stderr)
+                print("Error autosaving the session to: " + filename,file=sys.stderr)
+                return
+
+        self.num_saves += 1
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+
+"""
+
+Name: PCFG Startup Profile
+
+Description: Times how long a program takes to start up. Used by the
+--profile_startup option of the guesser, scorer, prince_ling and evaluator
+
+When a program is run on a small input, (for example the scorer being
+called once per password by another service), starting Python and
+importing the libraries can take longer than the actual work. The
+programs only import their libraries after the command line has been
+parsed, so printing the help or a bad option doesn't import anything.
+This shows where the rest of the startup time goes.
+
+Only uses the standard library so it can be imported first
+
+"""
+
+
+import sys
+import time
+
+
+def start_times():
+    """
+    Gets the times to measure the rest of the startup from
+
+    Should be called at the top of the program, before anything else is
+    imported
+
+    Inputs:
+        None
+
+    Returns:
+        (wall_time, cpu_time): The wall clock time, and the CPU time the
+        process has used so far, which is mostly starting up Python
+    """
+    return time.perf_counter(), time.process_time()
+
+
+class StartupProfile:
+    """
+    Records how long each step of starting a program took
+    """
+
+    def __init__(self, program_start):
+        """
+        Starts timing
+
+        Inputs:
+            program_start: The (wall_time, cpu_time) from start_times()
+
+        Returns:
+            StartupProfile
+        """
+        self.start, self.python_startup = program_start
+
+        # (step name, seconds) in the order the steps finished
+        self.steps = []
+        self.last = self.start
+
+    def step(self, name):
+        """
+        Records that a step finished
+
+        The time for the step is the time since the last step finished
+
+        Inputs:
+            name: The name of the step, aka "Importing the scorer"
+
+        Returns:
+            None
+        """
+        now = time.perf_counter()
+        self.steps.append((name, now - self.last))
+        self.last = now
+
+    def print_report(self, file = sys.stderr):
+        """
+        Prints how long each step took
+
+        Inputs:
+            file: Where to print the report
+
+        Returns:
+            None
+        """
+        print("Startup times:", file=file)
+        print(f"    Python startup: {self.python_startup:.3f} seconds of CPU time", file=file)
+        for name, seconds in self.steps:
+            print(f"    {name}: {seconds:.3f} seconds", file=file)
+        print(f"    Total, (after Python started): {self.last - self.start:.3f} seconds", file=file)
+        print('', file=file)
@@ -47,6 +47,9 @@ class StatusReport:
         # The start time of the current run
         self.start_time = time.perf_counter()
 
+        # The priority queue, used to print memory management stats
+        self.pqueue = None
+
     def print_status(self, pcfg):
         """
         Prints a status report to stderr
@@ -104,11 +107,62 @@ class StatusReport:
             print("OMEN Level: " + str(status_item['level']),file=sys.stderr)
             print("Keyspace for Level:           " + "{:,}".format(status_item['keyspace']),file=sys.stderr)
             print("Current Position in Keyspace: " + "{:,}".format(status_item['guess_num']),file=sys.stderr)
+            self._print_omen_cache_stats(pcfg.omen_optimizer.cache_stats())
 
         # Print out info for non-OMEN guess generation
         else:
             self._print_guess(status_item['first_guess'])
 
+        if self.pqueue is not None:
+            self._print_queue_stats(self.pqueue.queue_stats())
+
+    def _print_omen_cache_stats(self, stats):
+        """
+        Prints out the OMEN TMTO cache stats to stderr
+
+        Inputs:
+            stats: The dictionary returned by Optimizer.cache_stats()
+
+        Returns:
+            None
+        """
+
+        print("OMEN Cache Size: " + "{:,}".format(stats['cache_size']) +
+            " of " + "{:,}".format(stats['max_cache_size']),file=sys.stderr)
+        print("OMEN Cache Hits: " + "{:,}".format(stats['num_hits']) +
+            ", Misses: " + "{:,}".format(stats['num_misses']) +
+            ", Evictions: " + "{:,}".format(stats['num_evictions']),file=sys.stderr)
+
+    def _print_queue_stats(self, stats):
+        """
+        Prints out the priority queue memory management stats to stderr
+
+        Inputs:
+            stats: The dictionary returned by PcfgQueue.queue_stats()
+
+        Returns:
+            None
+        """
+
+        print("Priority Queue Size: " + "{:,}".format(stats['queue_size']),file=sys.stderr)
+
+        # Nothing else to report if the queue isn't bounded
+        if not stats['max_queue_size']:
+            return
+
+        print("Max Priority Queue Size: " + "{:,}".format(stats['max_queue_size']),file=sys.stderr)
+        print("Times Priority Queue Trimmed: " + "{:,}".format(stats['num_trims']),file=sys.stderr)
+
+        if stats['num_spilled']:
+            print("Pre-Terminals Spilled to Disk: " + "{:,}".format(stats['num_spilled']),file=sys.stderr)
+            print("Pre-Terminals Currently on Disk: " + "{:,}".format(stats['spill_size']),file=sys.stderr)
+            print("Spill Files: " + str(stats['spill_runs']),file=sys.stderr)
+
+        if stats['num_discarded']:
+            print("Pre-Terminals Discarded: " + "{:,}".format(stats['num_discarded']),file=sys.stderr)
+            print("Times Pre-Terminals Regenerated: " + "{:,}".format(stats['num_regenerations']),file=sys.stderr)
+            print("Regenerate Below Probability: " + str(stats['min_probability']),file=sys.stderr)
+
     def _print_guess(self, guess):
         """
         Prints out an example guess from the current pre-terminal to stderr for status report
@@ -288,6 +342,15 @@ class StatusReport:
         print("              An error message may display instead if the guess can", file=sys.stderr)
         print("              not be printed to terminal due to character encoding issues.", file=sys.stderr)
         print("", file=sys.stderr)
+        print("    Priority Queue Stats:", file=sys.stderr)
+        print("        Overview: The number of pre-terminals waiting in memory to", file=sys.stderr)
+        print("                  be processed.", file=sys.stderr)
+        print("        Misc: If --max_queue_size is set, also shows how many", file=sys.stderr)
+        print("              pre-terminals were removed from the queue. They are", file=sys.stderr)
+        print("              either saved to disk, (--queue_spill), or discarded", file=sys.stderr)
+        print("              and regenerated once the queue runs out of items", file=sys.stderr)
+        print("              above the 'Regenerate Below Probability' value.", file=sys.stderr)
+        print("", file=sys.stderr)
         print("    Various OMEN Status Outputs:", file=sys.stderr)
         print("        Overview: As a guessing session goes on, the keyspace for", file=sys.stderr)
         print("                  each Omen guess generation grows, so it is helpful", file=sys.stderr)
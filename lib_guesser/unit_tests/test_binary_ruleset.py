@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+
+#######################################################
+# Unit tests for compiling and loading binary rulesets
+#
+#######################################################
+
+
+import unittest
+import os
+import shutil
+import tempfile
+import contextlib
+import io
+
+
+## Functions and classes to tests
+#
+from ..binary_ruleset import compile_ruleset, open_binary_ruleset, BINARY_FILENAME
+from ..grammar_io import load_grammar, load_omen_keyspace
+from ..omen.input_file_io import load_rules
+
+
+## Location of the ruleset used for these tests
+#
+RULESET_DIRECTORY = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)),
+    '..',
+    '..',
+    'Rules',
+    'Default')
+
+
+## Responsible for testing the binary ruleset
+#
+# Note:
+# + = positive test, (valid input handling)
+# - = stress test, (invalid input handling)
+#
+# ==Current Tests==
+# + Test the binary ruleset loads the same PCFG grammar as the text files
+# + Test the binary ruleset loads the same OMEN grammar as the text files
+# - Test a binary ruleset isn't used after a text file changes
+# - Test a file that isn't a binary ruleset isn't used
+#
+class Test_Binary_Ruleset(unittest.TestCase):
+
+    ## Compiles a copy of the Default ruleset, so the real one isn't modified
+    #
+    def setUp(self):
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.base_directory = os.path.join(self.temp_directory.name, 'Default')
+        shutil.copytree(RULESET_DIRECTORY, self.base_directory)
+
+        # Don't test against a binary ruleset that was copied over
+        binary_filename = os.path.join(self.base_directory, BINARY_FILENAME)
+        if os.path.exists(binary_filename):
+            os.remove(binary_filename)
+
+        self.filename = compile_ruleset(self.base_directory)
+
+    def tearDown(self):
+        self.temp_directory.cleanup()
+
+
+    ## Loads the PCFG grammar, hiding warnings about unsupported base structures
+    #
+    def load_pcfg(self, skip_brute, binary):
+        with contextlib.redirect_stderr(io.StringIO()):
+            return load_grammar('Default', self.base_directory, '4.6', skip_brute, False, 'Grammar', binary)
+
+
+    ## Test the binary ruleset loads the same PCFG grammar as the text files
+    #
+    def test_pcfg_grammar(self):
+        binary = open_binary_ruleset(self.base_directory)
+        self.assertIsNotNone(binary)
+
+        for skip_brute in [False, True]:
+            self.assertEqual(
+                self.load_pcfg(skip_brute, binary),
+                self.load_pcfg(skip_brute, None))
+
+        binary.close()
+
+
+    ## Test the binary ruleset loads the same OMEN grammar as the text files
+    #
+    def test_omen_grammar(self):
+        binary = open_binary_ruleset(self.base_directory)
+        omen_directory = os.path.join(self.base_directory, 'Omen')
+
+        text_grammar = {}
+        binary_grammar = {}
+        self.assertTrue(load_rules(omen_directory, text_grammar))
+        self.assertTrue(load_rules(omen_directory, binary_grammar, binary))
+        self.assertEqual(binary_grammar, text_grammar)
+
+        self.assertEqual(
+            load_omen_keyspace(self.base_directory, binary),
+            load_omen_keyspace(self.base_directory))
+
+        binary.close()
+
+
+    ## Test a binary ruleset isn't used after a text file changes
+    #
+    def test_stale(self):
+        with open(os.path.join(self.base_directory, 'Digits', '1.txt'), 'a') as file:
+            file.write("0\t0.0001\n")
+
+        with contextlib.redirect_stderr(io.StringIO()) as stderr:
+            self.assertIsNone(open_binary_ruleset(self.base_directory))
+        self.assertIn('Digits/1.txt', stderr.getvalue())
+
+
+    ## Test a file that isn't a binary ruleset isn't used
+    #
+    def test_invalid_file(self):
+        with open(self.filename, 'wb') as file:
+            file.write(b'[rule_info]\nrule_name = Default\n' * 10)
+
+        with contextlib.redirect_stderr(io.StringIO()):
+            self.assertIsNone(open_binary_ruleset(self.base_directory))
+
+        # A truncated file shouldn't be used either
+        compile_ruleset(self.base_directory)
+        with open(self.filename, 'r+b') as file:
+            file.truncate(os.path.getsize(self.filename) - 8)
+
+        with contextlib.redirect_stderr(io.StringIO()):
+            self.assertIsNone(open_binary_ruleset(self.base_directory))
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+
+#######################################################
+# Unit tests for the precompiled capitalization masks
+#
+#######################################################
+
+
+import unittest
+import itertools
+
+
+## Functions and classes to tests
+#
+from ..capitalization import compile_mask, CapitalizationMasks
+
+
+## Applies a mask one character at a time, the way guesses used to be created
+#
+def reference_apply(word, mask):
+    start_word = word[:- len(mask)]
+    end_word = word[- len(mask):]
+    return start_word + ''.join(
+        letter if case == 'L' else letter.upper()
+        for letter, case in zip(end_word, mask)
+        )
+
+
+## Responsible for testing the capitalization masks
+#
+# Note:
+# + = positive test, (valid input handling)
+# - = stress test, (invalid input handling)
+#
+# ==Current Tests==
+# + Test every mask up to length 6 matches applying it one character at a time
+# + Test masks are applied to the end of a word longer than the mask
+# + Test lowercase masks are skipped
+# + Test a group of masks is applied in word then mask order
+#
+class Test_Capitalization(unittest.TestCase):
+
+    ## Test every mask up to length 6 matches applying it one character at a time
+    #
+    def test_all_masks(self):
+        for length in range(1, 7):
+            word = 'abcdef'[:length]
+            for mask in itertools.product('LU', repeat = length):
+                mask = ''.join(mask)
+                compiled = compile_mask(mask)
+                if compiled is None:
+                    self.assertEqual(mask, 'L' * length)
+                    continue
+
+                self.assertEqual(compiled(word), reference_apply(word, mask))
+
+
+    ## Test masks are applied to the end of a word longer than the mask
+    #
+    def test_longer_word(self):
+        for mask in ['ULLU', 'UUUU', 'LLLU', 'ULLL', 'LUUL']:
+            self.assertEqual(compile_mask(mask)('pass1word'), reference_apply('pass1word', mask))
+
+
+    ## Test lowercase masks are skipped
+    #
+    def test_lowercase_masks(self):
+        grammar = {
+            'C4': [
+                {'values': ['LLLL'], 'prob': 1.0},
+            ]
+        }
+        masks = CapitalizationMasks(grammar)
+        words = ['pass', 'word']
+
+        self.assertIs(masks.apply(words, 'C4', 0), words)
+        self.assertEqual(masks.apply_one('pass', 'LLLL'), 'pass')
+
+
+    ## Test a group of masks is applied in word then mask order
+    #
+    def test_group_order(self):
+        grammar = {
+            'C4': [
+                {'values': ['ULLL', 'LLLL', 'UUUU'], 'prob': 0.5},
+            ]
+        }
+        masks = CapitalizationMasks(grammar)
+
+        self.assertEqual(
+            masks.apply(['pass', 'word'], 'C4', 0),
+            ['Pass', 'pass', 'PASS', 'Word', 'word', 'WORD']
+            )
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+
+
+#######################################################
+# Unit tests for the OMEN conditional probability table and
+# generating OMEN guesses with it
+#
+#######################################################
+
+
+import unittest
+import os
+import codecs
+import tempfile
+
+
+## Functions and classes to tests
+#
+from ..omen.input_file_io import load_rules
+from ..omen.markov_cracker import MarkovCracker
+from ..omen.optimizer import Optimizer
+
+
+## Location of the OMEN ruleset used for these tests
+#
+OMEN_DIRECTORY = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)),
+    '..',
+    '..',
+    'Rules',
+    'Default',
+    'Omen')
+
+
+## Reads the {ngram: level} pairs from an OMEN ngram file
+#
+def read_levels(filename):
+    levels = {}
+    with codecs.open(os.path.join(OMEN_DIRECTORY, filename), 'r', encoding='utf-8') as file:
+        for line in file:
+            level, ngram = line.rstrip('\n\r').split('\t')
+            levels[ngram] = int(level)
+    return levels
+
+
+## Responsible for testing the CPTable
+#
+# Note:
+# + = positive test, (valid input handling)
+# - = stress test, (invalid input handling)
+#
+# ==Current Tests==
+# + Test the table contains every CP ngram at the right level
+# + Test the next rows point to the context after the letter is added
+# + Test the generated guesses are made up of ngrams that add up to the target level
+# + Test batches of guesses match generating them one at a time
+# + Test a session saved part way through a batch restores at the next guess
+#
+class Test_CP_Table(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.grammar = {}
+        load_rules(OMEN_DIRECTORY, cls.grammar)
+        cls.cp = cls.grammar['cp']
+        cls.cp_levels = read_levels('CP.level')
+
+
+    ## Test the table contains every CP ngram at the right level
+    #
+    def test_ngrams(self):
+        found = {}
+        for row, context in enumerate(self.cp.contexts):
+            self.assertEqual(self.cp.row(context), row)
+            for level in range(self.cp.width):
+                group = row * self.cp.width + level
+                for letter in self.cp.letters[self.cp.offsets[group]:self.cp.offsets[group + 1]]:
+                    found[context + letter] = level
+
+        self.assertEqual(found, self.cp_levels)
+        self.assertEqual(len(self.cp), len(self.cp_levels))
+        self.assertEqual(self.cp.row('not a context'), -1)
+
+
+    ## Test the next rows point to the context after the letter is added
+    #
+    def test_next_rows(self):
+        for row, context in enumerate(self.cp.contexts):
+            start = self.cp.offsets[row * self.cp.width]
+            end = self.cp.offsets[(row + 1) * self.cp.width]
+            for position in range(start, end):
+                next_context = context[1:] + self.cp.letters[position]
+                self.assertEqual(self.cp.next_rows[position], self.cp.row(next_context))
+
+
+    ## Test the generated guesses are made up of ngrams that add up to the target level
+    #
+    def test_guess_levels(self):
+        ip_levels = read_levels('IP.level')
+        ngram = self.grammar['ngram']
+
+        # The lengths that can be generated at each level
+        length_levels = {}
+        for level, lengths in self.grammar['ln'].items():
+            for length in lengths:
+                length_levels[length + ngram - 1] = level
+
+        optimizer = Optimizer(max_length = 4)
+        for target_level in range(1, 5):
+            markov_cracker = MarkovCracker(self.grammar, target_level, optimizer)
+            guesses = []
+            guess = markov_cracker.next_guess()
+            while guess is not None:
+                guesses.append(guess)
+                guess = markov_cracker.next_guess()
+
+            self.assertTrue(guesses)
+            self.assertEqual(len(guesses), len(set(guesses)))
+            for guess in guesses:
+                level = ip_levels[guess[:ngram - 1]] + length_levels[len(guess)]
+                for index in range(len(guess) - ngram + 1):
+                    level += self.cp_levels[guess[index:index + ngram]]
+                self.assertEqual(level, target_level, guess)
+
+
+    ## Generates every guess for a level one at a time
+    #
+    def all_guesses(self, target_level):
+        markov_cracker = MarkovCracker(self.grammar, target_level, Optimizer(max_length = 4))
+        guesses = []
+        guess = markov_cracker.next_guess()
+        while guess is not None:
+            guesses.append(guess)
+            guess = markov_cracker.next_guess()
+        return guesses
+
+
+    ## Test batches of guesses match generating them one at a time
+    #
+    def test_batches(self):
+        for target_level in range(1, 5):
+            markov_cracker = MarkovCracker(self.grammar, target_level, Optimizer(max_length = 4))
+            guesses = []
+            batch = markov_cracker.next_guesses()
+            while batch is not None:
+                self.assertTrue(batch)
+
+                # Every guess in a batch only differs by the last letter
+                self.assertEqual(len(set(guess[:-1] for guess in batch)), 1)
+                guesses.extend(batch)
+                batch = markov_cracker.next_guesses()
+
+            self.assertEqual(guesses, self.all_guesses(target_level))
+
+
+    ## Test a session saved part way through a batch restores at the next guess
+    #
+    def test_save_session(self):
+        expected = self.all_guesses(3)
+
+        with tempfile.TemporaryDirectory() as temp_directory:
+            file_name = os.path.join(temp_directory, 'test.omn')
+
+            for num_generated in [1, 2, 10, 77, len(expected) - 1]:
+                markov_cracker = MarkovCracker(self.grammar, 3, Optimizer(max_length = 4))
+                for _ in range(num_generated):
+                    markov_cracker.next_guess()
+                markov_cracker.save_session(file_name)
+
+                restored = MarkovCracker(self.grammar, 1, Optimizer(max_length = 4))
+                restored.load_session(file_name, {'pt': [[None, 0, 0]]})
+                self.assertEqual(restored.target_level, 3)
+
+                guesses = []
+                guess = restored.next_guess()
+                while guess is not None:
+                    guesses.append(guess)
+                    guess = restored.next_guess()
+                self.assertEqual(guesses, expected[num_generated:])
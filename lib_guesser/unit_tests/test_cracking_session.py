@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+
+
+#######################################################
+# Unit tests for saving and restoring cracking sessions
+#
+#######################################################
+
+
+import unittest
+import unittest.mock
+import os
+import io
+import tempfile
+import threading
+import configparser
+
+
+## Functions and classes to tests
+#
+from .. import pcfg_grammar
+from .. import cracking_session
+from .. import parallel_guesses
+from ..pcfg_grammar import PcfgGrammar
+from ..cracking_session import CrackingSession
+
+
+## Location of the ruleset used for these tests
+#
+RULESET_DIRECTORY = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)),
+    '..',
+    '..',
+    'Rules',
+    'Default')
+
+
+## Responsible for testing saving and restoring a CrackingSession
+#
+# Note:
+# + = positive test, (valid input handling)
+# - = stress test, (invalid input handling)
+#
+# ==Current Tests==
+# + Test a session autosaved while generating OMEN guesses doesn't repeat the level when restored
+# - Test a session with a corrupt OMEN session file isn't restored
+#
+class Test_Cracking_Session(unittest.TestCase):
+
+    ## Loads the Default ruleset, including OMEN, and generates all of its guesses
+    #
+    @classmethod
+    def setUpClass(cls):
+        cls.pcfg = PcfgGrammar(
+            rule_name = 'Default',
+            base_directory = RULESET_DIRECTORY,
+            version = '4.6')
+
+    def setUp(self):
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.save_filename = os.path.join(self.temp_directory.name, 'test.sav')
+        self.pcfg.save_file = self.save_filename
+
+        # Stands in for the user input thread. The session keeps running
+        # until this is set
+        self.user_exit = threading.Event()
+
+    def tearDown(self):
+        self.user_exit.set()
+        self.temp_directory.cleanup()
+
+
+    ## Runs a cracking session and returns the guesses it generated
+    #
+    def run_session(self, load_session = False, limit = None, **options):
+        save_config = configparser.ConfigParser()
+        if load_session:
+            save_config.read(self.save_filename)
+        else:
+            save_config.read_dict({
+                'rule_info': {
+                    'rule_name': 'Default',
+                    'uuid': self.pcfg.ruleset_info['uuid'],
+                    'skip_brute': 'False',
+                    'skip_case': 'False',
+                },
+                'session_info': {},
+                'guessing_info': {},
+            })
+
+        output_filename = os.path.join(self.temp_directory.name, 'guesses.txt')
+        self.pcfg.save_to_file(output_filename)
+
+        with unittest.mock.patch.object(cracking_session, 'keypress', lambda report, pcfg: self.user_exit.wait()), \
+            unittest.mock.patch('sys.stderr', new_callable = io.StringIO):
+            session = CrackingSession(self.pcfg, save_config, self.save_filename, **options)
+            session.run(load_session = load_session, limit = limit)
+
+        self.pcfg.shutdown()
+
+        with open(output_filename, encoding = 'utf-8') as output_file:
+            return output_file.read().splitlines()
+
+
+    ## Test a session autosaved while generating OMEN guesses doesn't repeat the level when restored
+    #
+    # The workers have written out all the pre-terminals before the OMEN level
+    # by the time it starts, so the session should be saved at the same
+    # probability with and without them
+    #
+    def test_omen_autosave(self):
+        expected = self.run_session()
+
+        # The first 400 guesses end part way through the second OMEN level
+        limit = 400
+
+        saved_probabilities = []
+        for workers in [1, 2]:
+            # Autosave after every batch of OMEN guesses, and only send one
+            # work unit at a time to the workers so there is more than one batch
+            with unittest.mock.patch.object(pcfg_grammar, 'OMEN_CHECK_INTERVAL', 1), \
+                unittest.mock.patch.object(parallel_guesses, 'OMEN_UNITS_PER_TASK', 1):
+                self.run_session(limit = limit, workers = workers, autosave_interval = 0)
+
+            save_config = configparser.ConfigParser()
+            save_config.read(self.save_filename)
+            self.assertTrue(save_config.has_option('guessing_info', 'omen_guess_number'))
+            saved_probabilities.append(save_config.get('guessing_info', 'max_probability'))
+
+            # The restored session picks up where the autosave was made, so
+            # it is the end of the full session. Parse trees with the same
+            # probability can come out in a different order after restoring
+            restored = self.run_session(load_session = True, workers = workers)
+            self.assertGreaterEqual(len(restored), len(expected) - limit)
+            self.assertEqual(sorted(restored), sorted(expected[len(expected) - len(restored):]))
+
+        self.assertEqual(saved_probabilities[0], saved_probabilities[1])
+
+
+    ## Test a session with a corrupt OMEN session file isn't restored
+    #
+    # Carrying on would skip the rest of the OMEN level it was generating
+    #
+    def test_corrupt_omen_session(self):
+        for workers in [1, 2]:
+            with unittest.mock.patch.object(pcfg_grammar, 'OMEN_CHECK_INTERVAL', 1):
+                self.run_session(limit = 400, autosave_interval = 0)
+
+            with open(self.save_filename, 'rb') as save_file:
+                saved = save_file.read()
+
+            omen_filename = self.save_filename[:-4] + '.omn'
+            with open(omen_filename, 'r+b') as omen_file:
+                omen_file.truncate(os.path.getsize(omen_filename) - 1)
+
+            self.assertEqual(self.run_session(load_session = True, workers = workers), [])
+
+            # The session file is left alone so it can be restored again
+            with open(self.save_filename, 'rb') as save_file:
+                self.assertEqual(save_file.read(), saved)
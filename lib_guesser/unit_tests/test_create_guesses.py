@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+
+
+#######################################################
+# Unit tests for generating guesses from a parse tree
+#
+#######################################################
+
+
+import unittest
+import os
+import io
+
+
+## Functions and classes to tests
+#
+from ..pcfg_grammar import PcfgGrammar
+from ..priority_queue import PcfgQueue
+from ..output_sink import OutputSink
+
+
+## Location of the ruleset used for these tests
+#
+RULESET_DIRECTORY = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)),
+    '..',
+    '..',
+    'Rules',
+    'Default')
+
+
+## Generates the guesses for a parse tree one transition at a time
+#
+# This is how guesses were generated before they were batched, so it is
+# used as the reference for what order the guesses should be in
+#
+def reference_guesses(grammar, pt, cur_guess = ''):
+    pt_type, index = pt[0]
+    values = grammar[pt_type][index]['values']
+
+    for item in values:
+        if pt_type[0] == 'C':
+            start_word = cur_guess[:- len(item)]
+            end_word = cur_guess[- len(item):]
+            new_guess = start_word + ''.join(
+                letter if case == 'L' else letter.upper()
+                for letter, case in zip(end_word, item)
+                )
+        else:
+            new_guess = cur_guess + item
+
+        if len(pt) == 1:
+            yield new_guess
+        else:
+            yield from reference_guesses(grammar, pt[1:], new_guess)
+
+
+## Responsible for testing create_guesses
+#
+# Note:
+# + = positive test, (valid input handling)
+# - = stress test, (invalid input handling)
+#
+# ==Current Tests==
+# + Test every parse tree generates the same guesses in the same order as the reference
+# + Test the limit stops after exactly limit guesses
+# + Test starting in the middle of a parse tree returns the rest of its guesses
+# + Test skip_case only generates lowercase guesses
+#
+class Test_Create_Guesses(unittest.TestCase):
+
+    ## Loads the Default ruleset and every non-OMEN parse tree
+    #
+    @classmethod
+    def setUpClass(cls):
+        cls.pcfg = PcfgGrammar(
+            rule_name = 'Default',
+            base_directory = RULESET_DIRECTORY,
+            version = '4.6',
+            skip_brute = True)
+
+        pcfg_queue = PcfgQueue(cls.pcfg)
+        cls.parse_trees = []
+        while True:
+            pt_item = pcfg_queue.next()
+            if pt_item is None:
+                break
+            cls.parse_trees.append(pt_item['pt'])
+
+
+    ## Generates the guesses for a parse tree and returns them as a list
+    #
+    def create_guesses(self, pcfg, pt, limit = None):
+        stream = io.BytesIO()
+        pcfg.output = OutputSink(stream, pcfg.encoding)
+        num_guesses = pcfg.create_guesses(pt, limit = limit)
+        pcfg.output.flush()
+
+        guesses = stream.getvalue().decode(pcfg.encoding).split('\n')[:-1]
+        self.assertEqual(num_guesses, len(guesses))
+
+        return guesses
+
+
+    ## Test every parse tree generates the same guesses in the same order as the reference
+    #
+    def test_guess_order(self):
+        for pt in self.parse_trees:
+            self.assertEqual(
+                self.create_guesses(self.pcfg, pt),
+                list(reference_guesses(self.pcfg.grammar, pt))
+                )
+
+
+    ## Test the limit stops after exactly limit guesses
+    #
+    def test_limit(self):
+        for pt in self.parse_trees:
+            expected = list(reference_guesses(self.pcfg.grammar, pt))
+            for limit in [1, 7, len(expected) - 1, len(expected) + 10]:
+                if limit <= 0:
+                    continue
+                self.assertEqual(
+                    self.create_guesses(self.pcfg, pt, limit),
+                    expected[:limit]
+                    )
+
+
+    ## Test starting in the middle of a parse tree returns the rest of its guesses
+    #
+    def test_start_offset(self):
+        for pt in self.parse_trees:
+            expected = list(reference_guesses(self.pcfg.grammar, pt))
+            for start in sorted({1, 5, len(expected) // 3, len(expected) - 1, len(expected), len(expected) + 3}):
+                self.assertEqual(
+                    list(self.pcfg.guess_iterator(pt, start)),
+                    expected[start:]
+                    )
+                self.assertEqual(
+                    list(self.pcfg.guess_iterator(pt, start, start + 4)),
+                    expected[start:start + 4]
+                    )
+
+
+    ## Test skip_case only generates lowercase guesses
+    #
+    def test_skip_case(self):
+        pcfg = PcfgGrammar(
+            rule_name = 'Default',
+            base_directory = RULESET_DIRECTORY,
+            version = '4.6',
+            skip_brute = True,
+            skip_case = True)
+
+        pcfg_queue = PcfgQueue(pcfg)
+        while True:
+            pt_item = pcfg_queue.next()
+            if pt_item is None:
+                break
+
+            guesses = self.create_guesses(pcfg, pt_item['pt'])
+            self.assertEqual(guesses, list(reference_guesses(pcfg.grammar, pt_item['pt'])))
+            self.assertEqual(guesses, [guess.lower() for guess in guesses])
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+
+
+#######################################################
+# Unit tests for the PCFG "next" function
+#
+# Runs the priority queue to exhaustion on the Default
+# ruleset and checks it against a brute force listing
+# of every parse tree the grammar can generate
+#
+#######################################################
+
+
+import unittest
+import os
+import itertools
+import configparser
+
+
+## Functions and classes to tests
+#
+from ..pcfg_grammar import PcfgGrammar
+from ..priority_queue import PcfgQueue
+
+
+## Location of the ruleset used for these tests
+#
+RULESET_DIRECTORY = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)),
+    '..',
+    '..',
+    'Rules',
+    'Default')
+
+
+## Generates every parse tree for the grammar without using the "next" function
+#
+# Returns a dictionary keyed by str(pt) with the probability of each parse tree
+# calculated from scratch using the string keyed grammar. This is the same
+# way the original implementation of the next function calculated them
+#
+def brute_force_parse_trees(pcfg):
+    reference = {}
+    for base in pcfg.base:
+        ranges = [range(len(pcfg.grammar[name])) for name in base['replacements']]
+        for indices in itertools.product(*ranges):
+            pt = list(zip(base['replacements'], indices))
+            prob = base['prob']
+            for name, index in pt:
+                prob *= pcfg.grammar[name][index]['prob']
+            reference[str(pt)] = prob
+
+    return reference
+
+
+## Responsible for testing the next function and Deadbeat Dad algorithm
+#
+# Note:
+# + = positive test, (valid input handling)
+# - = stress test, (invalid input handling)
+#
+# ==Current Tests==
+# + Test every parse tree is generated exactly once
+# + Test parse trees are generated in probability order
+# + Test the probabilities match the grammar exactly
+# + Test a probability worked out incrementally from any parent matches the full product
+# + Test the guess order is identical to the original implementation
+# + Test restoring the queue from a probability range generates the same parse trees
+# + Test restoring the queue at the probability of a popped parse tree doesn't lose any
+# + Test a bounded queue that discards and regenerates items generates the same parse trees
+# + Test a bounded queue that spills items to disk generates the same parse trees
+#
+class Test_Next_Function(unittest.TestCase):
+
+    ## Loads the Default ruleset once since it is used by every test
+    #
+    @classmethod
+    def setUpClass(cls):
+        cls.pcfg = PcfgGrammar(
+            rule_name = 'Default',
+            base_directory = RULESET_DIRECTORY,
+            version = '4.6')
+
+        cls.reference = brute_force_parse_trees(cls.pcfg)
+
+
+    ## Pops every item off a priority queue and returns them
+    #
+    def exhaust_queue(self, pcfg_queue):
+        results = []
+        while True:
+            pt_item = pcfg_queue.next()
+            if pt_item is None:
+                return results
+            results.append(pt_item)
+
+
+    ## Checks two sessions generate the same parse trees in the same probability order
+    #
+    # Parse trees with the same probability may come out in a different order
+    #
+    def assert_same_order(self, results, expected):
+        self.assertEqual(
+            sorted(str(item['pt']) for item in results),
+            sorted(str(item['pt']) for item in expected)
+            )
+
+        self.assertEqual(
+            [item['prob'] for item in results],
+            [item['prob'] for item in expected]
+            )
+
+
+    ## Test every parse tree is generated exactly once
+    #
+    def test_no_duplicates_or_missing_parse_trees(self):
+        results = self.exhaust_queue(PcfgQueue(self.pcfg))
+        generated = [str(item['pt']) for item in results]
+
+        self.assertEqual(len(generated), len(set(generated)))
+        self.assertEqual(set(generated), set(self.reference))
+
+
+    ## Test parse trees are generated in probability order
+    #
+    def test_probability_order(self):
+        results = self.exhaust_queue(PcfgQueue(self.pcfg))
+
+        for prev, cur in zip(results, results[1:]):
+            self.assertLessEqual(cur['prob'], prev['prob'])
+
+
+    ## Test the probabilities match the grammar exactly
+    #
+    # The probability of a parse tree must not depend on which parent it was
+    # found from, otherwise restoring a session can disagree with the pqueue
+    #
+    def test_probabilities_match_grammar(self):
+        results = self.exhaust_queue(PcfgQueue(self.pcfg))
+
+        for item in results:
+            self.assertEqual(item['prob'], self.reference[str(item['pt'])], item['pt'])
+
+
+    ## Test a probability worked out incrementally from any parent matches the full product
+    #
+    def test_incremental_probabilities(self):
+        compiled = self.pcfg.compiled
+        for base_id, base_types in enumerate(compiled.base_types):
+            ranges = [range(compiled.num_groups(type_id)) for type_id in base_types]
+            for child in itertools.product(*ranges):
+                prob = compiled.find_prob(base_id, child)
+                self.assertEqual(compiled.prefix_probs(base_id, child)[-1], prob)
+
+                for pos, index in enumerate(child):
+                    if index == 0:
+                        continue
+                    parent = child[:pos] + (index - 1,) + child[pos+1:]
+                    parent_prefix = compiled.prefix_probs(base_id, parent)
+                    self.assertEqual(compiled.find_prob_from(base_id, child, pos, parent_prefix[pos]), prob)
+
+
+    ## Test the guess order is identical to the original implementation
+    #
+    # The original implementation calculated every probability from scratch,
+    # so it generated parse trees in the order of the brute force listing.
+    # Only the order of parse trees with exactly the same probability can
+    # differ
+    #
+    def test_identical_order(self):
+        results = self.exhaust_queue(PcfgQueue(self.pcfg))
+
+        expected = sorted(self.reference.items(), key = lambda item: -item[1])
+        self.assertEqual([item['prob'] for item in results], [prob for _, prob in expected])
+
+        # Group the parse trees by probability and compare each group
+        for prob, group in itertools.groupby(results, key = lambda item: item['prob']):
+            expected_group = set(pt for pt, expected_prob in self.reference.items() if expected_prob == prob)
+            self.assertEqual(set(str(item['pt']) for item in group), expected_group)
+
+
+    ## Test restoring the queue from a probability range generates the same parse trees
+    #
+    # This is what happens when a cracking session is restored from a save file
+    #
+    def test_restore_prob_order(self):
+        results = self.exhaust_queue(PcfgQueue(self.pcfg))
+
+        # Pick a probability partway through the session that falls between
+        # two parse trees so floating point noise doesn't matter
+        index = len(results) // 3
+        while results[index + 1]['prob'] > results[index]['prob'] * 0.99:
+            index += 1
+        max_prob = (results[index]['prob'] + results[index + 1]['prob']) / 2
+
+        expected = set(str(item['pt']) for item in results[index + 1:])
+
+        save_config = configparser.ConfigParser()
+        save_config.read_dict({
+            'guessing_info': {
+                'max_probability': str(max_prob),
+                'min_probability': '0.0'
+            }
+        })
+        restored = self.exhaust_queue(PcfgQueue(self.pcfg, save_config = save_config))
+        generated = [str(item['pt']) for item in restored]
+
+        self.assertEqual(len(generated), len(set(generated)))
+        self.assertEqual(set(generated), expected)
+
+
+    ## Test restoring the queue at the probability of a popped parse tree doesn't lose any
+    #
+    # This is the max_probability a save file has after a parse tree is
+    # popped. Parse trees tied with it may be generated again since the save
+    # file doesn't record which of them were popped, but nothing that
+    # hasn't been popped can be lost
+    #
+    def test_restore_popped_prob(self):
+        results = self.exhaust_queue(PcfgQueue(self.pcfg))
+
+        num_tested = 0
+        for index in range(0, len(results) - 1, max(1, len(results) // 40)):
+            max_prob = results[index]['prob']
+            if max_prob <= 0:
+                continue
+            num_tested += 1
+
+            expected = set(str(item['pt']) for item in results[index + 1:])
+
+            save_config = configparser.ConfigParser()
+            save_config.read_dict({
+                'guessing_info': {
+                    'max_probability': repr(max_prob),
+                    'min_probability': '0.0'
+                }
+            })
+            restored = self.exhaust_queue(PcfgQueue(self.pcfg, save_config = save_config))
+            generated = [str(item['pt']) for item in restored]
+
+            self.assertEqual(len(generated), len(set(generated)))
+            self.assertEqual(expected - set(generated), set(), index)
+
+            # Only parse trees tied with max_prob can be generated again
+            for item in restored:
+                if str(item['pt']) not in expected:
+                    self.assertEqual(item['prob'], max_prob)
+
+        self.assertGreater(num_tested, 10)
+
+
+    ## Test a bounded queue that discards and regenerates items generates the same parse trees
+    #
+    def test_bounded_queue_discard(self):
+        expected = self.exhaust_queue(PcfgQueue(self.pcfg))
+
+        pcfg_queue = PcfgQueue(self.pcfg, max_queue_size = 8)
+        results = self.exhaust_queue(pcfg_queue)
+
+        self.assertGreater(pcfg_queue.num_regenerations, 0)
+        self.assert_same_order(results, expected)
+
+
+    ## Test a bounded queue that spills items to disk generates the same parse trees
+    #
+    def test_bounded_queue_spill(self):
+        expected = self.exhaust_queue(PcfgQueue(self.pcfg))
+
+        pcfg_queue = PcfgQueue(self.pcfg, max_queue_size = 8, spill = True)
+        results = self.exhaust_queue(pcfg_queue)
+
+        self.assertGreater(pcfg_queue.num_spilled, 0)
+        self.assert_same_order(results, expected)
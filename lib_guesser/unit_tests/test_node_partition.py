@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+
+#######################################################
+# Unit tests for splitting guesses between multiple nodes
+#
+#######################################################
+
+
+import unittest
+import os
+
+
+## Functions and classes to tests
+#
+from ..pcfg_grammar import PcfgGrammar
+from ..priority_queue import PcfgQueue
+from ..node_partition import NodePartition, parse_node_option, SPLIT_THRESHOLD
+
+
+## Location of the ruleset used for these tests
+#
+RULESET_DIRECTORY = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)),
+    '..',
+    '..',
+    'Rules',
+    'Default')
+
+
+## Responsible for testing NodePartition
+#
+# Note:
+# + = positive test, (valid input handling)
+# - = stress test, (invalid input handling)
+#
+# ==Current Tests==
+# + Test every guess of every parse tree is assigned to exactly one node
+# + Test large parse trees are split between all the nodes
+# + Test every OMEN guess is assigned to exactly one node
+# + Test parsing a valid node option
+# - Test parsing invalid node options
+#
+class Test_Node_Partition(unittest.TestCase):
+
+    ## Loads the Default ruleset and every non-OMEN parse tree
+    #
+    @classmethod
+    def setUpClass(cls):
+        cls.pcfg = PcfgGrammar(
+            rule_name = 'Default',
+            base_directory = RULESET_DIRECTORY,
+            version = '4.6',
+            skip_brute = True)
+
+        pcfg_queue = PcfgQueue(cls.pcfg)
+        cls.parse_trees = []
+        while True:
+            pt_item = pcfg_queue.next()
+            if pt_item is None:
+                break
+            cls.parse_trees.append(pt_item['pt'])
+
+
+    ## Test every guess of every parse tree is assigned to exactly one node
+    #
+    def test_disjoint_cover(self):
+        for num_nodes in [1, 2, 3, 7]:
+            nodes = [NodePartition(node_num, num_nodes) for node_num in range(1, num_nodes + 1)]
+
+            for pt in self.parse_trees:
+                keyspace = self.pcfg.keyspace(pt)
+
+                ranges = [node.assign(pt, keyspace) for node in nodes]
+                ranges = sorted(item for item in ranges if item is not None)
+
+                # The ranges should line up end to end and cover the keyspace
+                expected_start = 0
+                for start, stop in ranges:
+                    self.assertEqual(start, expected_start)
+                    expected_start = stop
+                self.assertEqual(expected_start, keyspace)
+
+
+    ## Test large parse trees are split between all the nodes
+    #
+    def test_split_large(self):
+        pt = [('D8', 0)]
+        keyspace = SPLIT_THRESHOLD * 5 + 3
+        nodes = [NodePartition(node_num, 4) for node_num in range(1, 5)]
+
+        ranges = [node.assign(pt, keyspace) for node in nodes]
+        self.assertEqual(ranges[0][0], 0)
+        self.assertEqual(ranges[-1][1], keyspace)
+        for start, stop in ranges:
+            self.assertGreater(stop, start)
+
+
+    ## Test every OMEN guess is assigned to exactly one node
+    #
+    def test_omen_guesses(self):
+        nodes = [NodePartition(node_num, 3) for node_num in range(1, 4)]
+        for omen_guess_num in range(100):
+            self.assertEqual(sum(node.owns_omen_guess(omen_guess_num) for node in nodes), 1)
+
+        # Batches of guesses are split the same way
+        for node in nodes:
+            for first_guess_num in range(5):
+                batch = list(range(first_guess_num, first_guess_num + 7))
+                self.assertEqual(
+                    node.owned_omen_guesses(first_guess_num, batch),
+                    [num for num in batch if node.owns_omen_guess(num)])
+
+
+    ## Test parsing a valid node option
+    #
+    def test_parse_node_option(self):
+        self.assertEqual(parse_node_option('2/4'), (2, 4))
+        self.assertEqual(str(NodePartition(*parse_node_option('1/1'))), '1/1')
+
+
+    ## Test parsing invalid node options
+    #
+    def test_parse_invalid_node_option(self):
+        for value in ['0/4', '5/4', '1/0', '-1/4', '1', 'a/b', '1/2/3']:
+            with self.assertRaises(ValueError):
+                parse_node_option(value)
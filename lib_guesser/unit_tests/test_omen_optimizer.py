@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+
+#######################################################
+# Unit tests for the OMEN TMTO optimizer cache
+#
+#######################################################
+
+
+import unittest
+import os
+
+
+## Functions and classes to tests
+#
+from ..omen.optimizer import Optimizer
+from ..omen.input_file_io import load_rules
+from ..omen.markov_cracker import MarkovCracker
+
+
+## Location of the OMEN ruleset used for these tests
+#
+OMEN_DIRECTORY = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)),
+    '..',
+    '..',
+    'Rules',
+    'Default',
+    'Omen')
+
+
+## Responsible for testing the OMEN Optimizer
+#
+# Note:
+# + = positive test, (valid input handling)
+# - = stress test, (invalid input handling)
+#
+# ==Current Tests==
+# + Test cached results are returned without being copied
+# + Test the least recently used result is evicted when the cache is full
+# + Test a small cache generates the same guesses as an unbounded one
+# - Test a cache size of 0 doesn't save anything
+#
+class Test_Omen_Optimizer(unittest.TestCase):
+
+    ## Test cached results are returned without being copied
+    #
+    def test_lookup(self):
+        optimizer = Optimizer(max_length = 4)
+        parse_tree = ((1, 2, 3), (4, 5, 6))
+
+        self.assertEqual(optimizer.lookup(1, 2, 5), (False, None))
+        optimizer.update(1, 2, 5, parse_tree)
+        optimizer.update(1, 3, 5, None)
+
+        found, result = optimizer.lookup(1, 2, 5)
+        self.assertTrue(found)
+        self.assertIs(result, parse_tree)
+
+        # A cached None means there is no parse tree
+        self.assertEqual(optimizer.lookup(1, 3, 5), (True, None))
+
+        stats = optimizer.cache_stats()
+        self.assertEqual(stats['cache_size'], 2)
+        self.assertEqual(stats['num_hits'], 2)
+        self.assertEqual(stats['num_misses'], 1)
+        self.assertEqual(stats['num_evictions'], 0)
+
+
+    ## Test the least recently used result is evicted when the cache is full
+    #
+    def test_eviction(self):
+        optimizer = Optimizer(max_length = 4, max_size = 2)
+        optimizer.update(1, 2, 0, ((1, 0, 0),))
+        optimizer.update(2, 2, 0, ((2, 0, 0),))
+
+        # Using the first result makes the second the least recently used
+        self.assertTrue(optimizer.lookup(1, 2, 0)[0])
+        optimizer.update(3, 2, 0, ((3, 0, 0),))
+
+        self.assertTrue(optimizer.lookup(1, 2, 0)[0])
+        self.assertFalse(optimizer.lookup(2, 2, 0)[0])
+        self.assertTrue(optimizer.lookup(3, 2, 0)[0])
+        self.assertEqual(optimizer.cache_stats()['cache_size'], 2)
+        self.assertEqual(optimizer.cache_stats()['num_evictions'], 1)
+
+
+    ## Test a small cache generates the same guesses as an unbounded one
+    #
+    def test_small_cache(self):
+        grammar = {}
+        load_rules(OMEN_DIRECTORY, grammar)
+
+        results = []
+        for optimizer in [Optimizer(max_length = 4), Optimizer(max_length = 6, max_size = 10)]:
+            guesses = []
+            for target_level in range(1, 6):
+                markov_cracker = MarkovCracker(grammar, target_level, optimizer)
+                batch = markov_cracker.next_guesses()
+                while batch is not None:
+                    guesses.extend(batch)
+                    batch = markov_cracker.next_guesses()
+            results.append(guesses)
+
+        self.assertTrue(results[0])
+        self.assertEqual(results[0], results[1])
+        self.assertGreater(optimizer.cache_stats()['num_evictions'], 0)
+
+
+    ## Test a cache size of 0 doesn't save anything
+    #
+    def test_no_cache(self):
+        optimizer = Optimizer(max_length = 4, max_size = 0)
+        optimizer.update(1, 2, 0, ((1, 0, 0),))
+
+        self.assertEqual(optimizer.lookup(1, 2, 0), (False, None))
+        self.assertEqual(optimizer.cache_stats()['cache_size'], 0)
+        self.assertEqual(optimizer.cache_stats()['num_evictions'], 0)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+
+#######################################################
+# Unit tests for saving and restoring OMEN sessions
+#
+#######################################################
+
+
+import unittest
+import os
+import io
+import pickle
+import tempfile
+
+
+## Functions and classes to tests
+#
+from ..omen.input_file_io import load_rules
+from ..omen.markov_cracker import MarkovCracker, HEADER
+from ..omen.optimizer import Optimizer
+
+
+## Location of the OMEN ruleset used for these tests
+#
+OMEN_DIRECTORY = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)),
+    '..',
+    '..',
+    'Rules',
+    'Default',
+    'Omen')
+
+
+## Responsible for testing the OMEN session file format
+#
+# Note:
+# + = positive test, (valid input handling)
+# - = stress test, (invalid input handling)
+#
+# ==Current Tests==
+# + Test a session saved before the level starts restores at the first guess
+# + Test a session saved at the end of a work unit restores at the next one
+# + Test sessions saved as pickles by older versions are still loaded
+# - Test a session for a different ruleset is rejected
+# - Test truncated and corrupt session files are rejected
+#
+class Test_Omen_Session(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.grammar = {}
+        load_rules(OMEN_DIRECTORY, cls.grammar)
+
+        markov_cracker = MarkovCracker(cls.grammar, 4, Optimizer(max_length = 4))
+        cls.expected = []
+        guess = markov_cracker.next_guess()
+        while guess is not None:
+            cls.expected.append(guess)
+            guess = markov_cracker.next_guess()
+
+
+    def setUp(self):
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.file_name = os.path.join(self.temp_directory.name, 'test.omn')
+
+
+    def tearDown(self):
+        self.temp_directory.cleanup()
+
+
+    ## Saves the session of a MarkovCracker
+    #
+    def save(self, markov_cracker, data = None):
+        with open(self.file_name, 'wb') as file:
+            file.write(markov_cracker.session_data() if data is None else data)
+
+
+    ## Restores the saved session and returns the rest of the guesses
+    #
+    def restore(self, ruleset_uuid = None):
+        markov_cracker = MarkovCracker(self.grammar, 1, Optimizer(max_length = 4), ruleset_uuid)
+        markov_cracker.load_session(self.file_name, {'pt': [[None, 0, 0]]})
+        self.assertEqual(markov_cracker.target_level, 4)
+
+        guesses = []
+        guess = markov_cracker.next_guess()
+        while guess is not None:
+            guesses.append(guess)
+            guess = markov_cracker.next_guess()
+        return guesses
+
+
+    ## Test a session saved before the level starts restores at the first guess
+    #
+    def test_not_started(self):
+        self.save(MarkovCracker(self.grammar, 4, Optimizer(max_length = 4)))
+        self.assertEqual(self.restore(), self.expected)
+
+
+    ## Test a session saved at the end of a work unit restores at the next one
+    #
+    def test_unit_finished(self):
+        markov_cracker = MarkovCracker(self.grammar, 4, Optimizer(max_length = 4), 'test-uuid')
+
+        # Generate all the guesses for the first work unit
+        guesses = []
+        batch = markov_cracker.next_guesses()
+        while batch is not None:
+            guesses.extend(batch)
+            batch = markov_cracker.cur_guess.next_guesses()
+        markov_cracker.set_unit(markov_cracker.unit_index, markov_cracker.cur_len, markov_cracker.cur_ip, None)
+
+        self.save(markov_cracker)
+        self.assertEqual(guesses + self.restore('test-uuid'), self.expected)
+
+
+    ## Test sessions saved as pickles by older versions are still loaded
+    #
+    def test_legacy(self):
+        markov_cracker = MarkovCracker(self.grammar, 4, Optimizer(max_length = 4))
+        for _ in range(25):
+            markov_cracker.next_guess()
+
+        # Older versions saved the context string and index in its level
+        cp = self.grammar['cp']
+        parse_tree = []
+        for row, level, position in markov_cracker.cur_guess.parse_tree:
+            parse_tree.append([cp.contexts[row], level, position - cp.offsets[row * cp.width + level]])
+        parse_tree[-1][2] -= len(markov_cracker.pending) - markov_cracker.pending_index
+
+        file = io.BytesIO()
+        for value in [4, markov_cracker.cur_ip, markov_cracker.cur_len, parse_tree, False]:
+            pickle.dump(value, file)
+
+        self.save(None, file.getvalue())
+        self.assertEqual(self.restore(), self.expected[25:])
+
+
+    ## Test a session for a different ruleset is rejected
+    #
+    def test_wrong_ruleset(self):
+        self.save(MarkovCracker(self.grammar, 4, Optimizer(max_length = 4), 'saved-uuid'))
+
+        with self.assertRaises(ValueError):
+            self.restore('other-uuid')
+
+
+    ## Test truncated and corrupt session files are rejected
+    #
+    def test_corrupt(self):
+        markov_cracker = MarkovCracker(self.grammar, 4, Optimizer(max_length = 4))
+        for _ in range(10):
+            markov_cracker.next_guess()
+        data = markov_cracker.session_data()
+
+        # A row past the end of the CP table
+        corrupt = bytearray(data)
+        corrupt[HEADER.size:HEADER.size + 4] = (2 ** 32 - 1).to_bytes(4, 'little')
+
+        for bad_data in [data[:-1], data[:HEADER.size - 1], bytes(corrupt), b'not a session']:
+            self.save(None, bad_data)
+            with self.assertRaises(ValueError):
+                self.restore()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+
+#######################################################
+# Unit tests for the buffered guess output
+#
+#######################################################
+
+
+import unittest
+import unittest.mock
+import io
+
+
+## Functions and classes to tests
+#
+from ..output_sink import OutputSink
+
+
+## Responsible for testing the output sink
+#
+# Note:
+# + = positive test, (valid input handling)
+# - = stress test, (invalid input handling)
+#
+# ==Current Tests==
+# + Test guesses are buffered until the batch is full
+# + Test guesses are encoded with the ruleset encoding
+# + Test encoding guesses doesn't touch the buffered guesses
+# - Test guesses that can't be encoded are skipped
+# - Test a closed pipe raises OSError
+#
+class Test_Output_Sink(unittest.TestCase):
+
+    ## Test guesses are buffered until the batch is full
+    #
+    def test_batching(self):
+        stream = io.BytesIO()
+        sink = OutputSink(stream, 'utf-8', batch_size = 3)
+
+        sink.write('password')
+        sink.write('123456')
+        self.assertEqual(stream.getvalue(), b'')
+
+        sink.write('monkey')
+        self.assertEqual(stream.getvalue(), b'password\n123456\nmonkey\n')
+
+        sink.write_many(['dragon', 'qwerty'])
+        sink.flush()
+        self.assertEqual(stream.getvalue(), b'password\n123456\nmonkey\ndragon\nqwerty\n')
+
+
+    ## Test guesses are encoded with the ruleset encoding
+    #
+    def test_encoding(self):
+        stream = io.BytesIO()
+        sink = OutputSink(stream, 'latin-1')
+
+        sink.write('café')
+        sink.flush()
+        self.assertEqual(stream.getvalue(), b'caf\xe9\n')
+
+
+    ## Test encoding guesses doesn't touch the buffered guesses
+    #
+    def test_encode(self):
+        stream = io.BytesIO()
+        sink = OutputSink(stream, 'ascii')
+
+        sink.write('password')
+        self.assertEqual(sink.encode(['first', 'café', 'last']), b'first\nlast\n')
+        self.assertEqual(sink.encode([]), b'')
+
+        sink.flush()
+        self.assertEqual(stream.getvalue(), b'password\n')
+
+
+    ## Test guesses that can't be encoded are skipped
+    #
+    def test_unencodable_guess(self):
+        stream = io.BytesIO()
+        sink = OutputSink(stream, 'ascii')
+
+        sink.write_many(['first', 'café', 'last'])
+        sink.flush()
+        self.assertEqual(stream.getvalue(), b'first\nlast\n')
+
+
+    ## Test a closed pipe raises OSError
+    #
+    def test_broken_pipe(self):
+        stream = unittest.mock.Mock()
+        stream.write.side_effect = BrokenPipeError
+
+        sink = OutputSink(stream, 'utf-8', batch_size = 1)
+
+        with unittest.mock.patch('sys.stderr', new_callable=io.StringIO):
+            with self.assertRaises(OSError):
+                sink.write('password')
+
+            # Future writes should also fail
+            with self.assertRaises(OSError):
+                sink.write('123456')
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+
+
+#######################################################
+# Unit tests for generating guesses with worker processes
+#
+#######################################################
+
+
+import unittest
+import os
+
+
+## Functions and classes to tests
+#
+from ..pcfg_grammar import PcfgGrammar
+from ..priority_queue import PcfgQueue
+from ..parallel_guesses import ParallelGuesses
+
+
+## Location of the ruleset used for these tests
+#
+RULESET_DIRECTORY = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)),
+    '..',
+    '..',
+    'Rules',
+    'Default')
+
+
+## Responsible for testing ParallelGuesses
+#
+# Note:
+# + = positive test, (valid input handling)
+# - = stress test, (invalid input handling)
+#
+# ==Current Tests==
+# + Test ordered mode returns the same guesses in the same order as a single process
+# + Test relaxed mode returns the same guesses as a single process
+# + Test large parse trees are split into chunks
+# + Test finished chunks aren't kept once their results are returned
+# + Test a large parse tree only has max_pending chunks sent to the workers at a time
+#
+class Test_Parallel_Guesses(unittest.TestCase):
+
+    ## Loads the Default ruleset and the first parse trees from the pqueue
+    #
+    @classmethod
+    def setUpClass(cls):
+        cls.pcfg = PcfgGrammar(
+            rule_name = 'Default',
+            base_directory = RULESET_DIRECTORY,
+            version = '4.6',
+            skip_brute = True)
+
+        pcfg_queue = PcfgQueue(cls.pcfg)
+        cls.pt_items = []
+        while len(cls.pt_items) < 200:
+            pt_item = pcfg_queue.next()
+            if pt_item is None:
+                break
+            cls.pt_items.append(pt_item)
+
+        cls.expected = []
+        for pt_item in cls.pt_items:
+            cls.expected.extend(cls.pcfg.guess_iterator(pt_item['pt']))
+
+
+    ## Submits all the parse trees and returns the guesses and task info
+    #
+    def run_workers(self, ordered, chunk_size):
+        generator = ParallelGuesses(self.pcfg, 2, ordered = ordered, chunk_size = chunk_size)
+        try:
+            for pt_item in self.pt_items:
+                generator.submit(pt_item, self.pcfg.keyspace(pt_item['pt']))
+                self.assertLessEqual(len(generator.pending), generator.max_pending)
+
+            guesses = []
+            task_infos = []
+            while True:
+                result = generator.next_result()
+                self.assertLessEqual(len(generator.pending), generator.max_pending)
+                if result is None:
+                    break
+
+                task_info, data, num_guesses = result
+                lines = data.decode(self.pcfg.encoding).split('\n')[:-1]
+                self.assertEqual(num_guesses, len(lines))
+
+                guesses.extend(lines)
+                task_infos.append(task_info)
+
+            # Nothing should be holding on to the results that were returned
+            self.assertTrue(generator.finished.empty())
+
+            return guesses, task_infos
+
+        finally:
+            generator.close()
+
+
+    ## Test ordered mode returns the same guesses in the same order as a single process
+    #
+    def test_ordered(self):
+        guesses, _ = self.run_workers(ordered = True, chunk_size = 100000)
+        self.assertEqual(guesses, self.expected)
+
+
+    ## Test relaxed mode returns the same guesses as a single process
+    #
+    def test_relaxed(self):
+        guesses, _ = self.run_workers(ordered = False, chunk_size = 100000)
+        self.assertEqual(sorted(guesses), sorted(self.expected))
+
+
+    ## Test large parse trees are split into chunks
+    #
+    def test_chunks(self):
+        guesses, task_infos = self.run_workers(ordered = True, chunk_size = 7)
+        self.assertEqual(guesses, self.expected)
+
+        # Every parse tree starts with chunk 0
+        self.assertEqual(
+            sum(1 for task_info in task_infos if task_info['chunk_index'] == 0),
+            len(self.pt_items)
+            )
+        self.assertGreater(len(task_infos), len(self.pt_items))
+
+
+    ## Test finished chunks aren't kept once their results are returned
+    #
+    def test_no_leak(self):
+        generator = ParallelGuesses(self.pcfg, 2, ordered = True, chunk_size = 7)
+        try:
+            for pt_item in self.pt_items:
+                generator.submit(pt_item, self.pcfg.keyspace(pt_item['pt']))
+
+            while generator.next_result() is not None:
+                pass
+
+            # Wait for any result callbacks to run before checking
+            generator.pool.close()
+            generator.pool.join()
+            self.assertTrue(generator.finished.empty())
+            self.assertFalse(generator.pending)
+
+        finally:
+            generator.close()
+
+
+    ## Test a large parse tree only has max_pending chunks sent to the workers at a time
+    #
+    def test_bounded(self):
+        pt_item = max(self.pt_items, key = lambda item: self.pcfg.keyspace(item['pt']))
+        expected = list(self.pcfg.guess_iterator(pt_item['pt']))
+
+        generator = ParallelGuesses(self.pcfg, 2, ordered = True, chunk_size = 1)
+        try:
+            generator.submit(pt_item, len(expected))
+            self.assertGreater(len(expected), generator.max_pending)
+            self.assertEqual(len(generator.pending), generator.max_pending)
+
+            # The rest of the chunks are still waiting to be sent
+            self.assertFalse(generator.has_room())
+            self.assertEqual(generator.pending_pt_items(), [pt_item])
+
+            guesses = []
+            result = generator.next_result()
+            while result is not None:
+                self.assertLessEqual(len(generator.pending), generator.max_pending)
+                guesses.append(result[1].decode(self.pcfg.encoding)[:-1])
+                result = generator.next_result()
+
+            self.assertEqual(guesses, expected)
+            self.assertTrue(generator.has_room())
+
+        finally:
+            generator.close()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+
+
+#######################################################
+# Unit tests for loading a ruleset with worker processes
+#
+#######################################################
+
+
+import unittest
+import os
+import contextlib
+import io
+
+
+## Functions and classes to tests
+#
+from ..parallel_load import LoadPool, LoadTimer
+from ..grammar_io import load_grammar
+from ..omen.input_file_io import load_rules
+
+
+## Location of the ruleset used for these tests
+#
+RULESET_DIRECTORY = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)),
+    '..',
+    '..',
+    'Rules',
+    'Default')
+
+
+## Loads the PCFG grammar of the test ruleset
+#
+def _load_test_grammar():
+    with contextlib.redirect_stderr(io.StringIO()):
+        grammar, _, _ = load_grammar(
+            'Default', RULESET_DIRECTORY, '4.6', False, False, 'Grammar')
+    return grammar
+
+
+## Responsible for testing loading a ruleset with a LoadPool
+#
+# Note:
+# + = positive test, (valid input handling)
+# - = stress test, (invalid input handling)
+#
+# ==Current Tests==
+# + Test the terminals loaded by the workers match a serial load
+# + Test the OMEN rules loaded by a worker match a serial load
+# + Test the timing report lists the steps and the kinds of terminals
+# - Test loading OMEN rules from a directory that doesn't exist
+#
+class Test_Parallel_Load(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = LoadPool(2)
+
+
+    def tearDown(self):
+        self.pool.close()
+
+
+    ## Test the terminals loaded by the workers match a serial load
+    #
+    def test_load_grammar(self):
+        serial = _load_test_grammar()
+        serial.load_all()
+
+        parallel = _load_test_grammar()
+        self.pool.load_grammar(parallel)
+
+        self.assertEqual(list(parallel), list(serial))
+        for name in serial:
+            self.assertTrue(parallel.is_loaded(name))
+            self.assertEqual(parallel[name], serial[name])
+
+        self.assertEqual(set(parallel.load_times), set(serial))
+
+
+    ## Test the OMEN rules loaded by a worker match a serial load
+    #
+    def test_load_omen(self):
+        omen_directory = os.path.join(RULESET_DIRECTORY, 'Omen')
+
+        serial = {}
+        self.assertTrue(load_rules(omen_directory, serial))
+
+        parallel = self.pool.load_omen_async(omen_directory, None).get()
+        self.assertEqual(parallel, serial)
+
+
+    ## Test the timing report lists the steps and the kinds of terminals
+    #
+    def test_report(self):
+        grammar = _load_test_grammar()
+
+        timer = LoadTimer()
+        self.pool.load_grammar(grammar)
+        timer.step("Terminals")
+
+        report = io.StringIO()
+        timer.print_report(grammar, 2, file=report)
+        report = report.getvalue()
+
+        self.assertIn("Terminals:", report)
+        self.assertIn("Total:", report)
+        self.assertIn("summed over 2 worker processes", report)
+        num_digits = len([name for name in grammar if name[0] == 'D'])
+        self.assertIn(f"D: {num_digits} files", report)
+
+
+    ## Test loading OMEN rules from a directory that doesn't exist
+    #
+    def test_load_omen_missing(self):
+        omen_directory = os.path.join(RULESET_DIRECTORY, 'Not_A_Directory')
+
+        # Start the workers with the error messages redirected so they
+        # aren't printed out with the test results
+        self.pool.close()
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            self.pool = LoadPool(1)
+            result = self.pool.load_omen_async(omen_directory, None).get()
+        self.assertIsNone(result)
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+
+
+#######################################################
+# Unit tests for generating OMEN guesses by work unit, and with
+# worker processes
+#
+#######################################################
+
+
+import unittest
+import os
+import tempfile
+
+
+## Functions and classes to tests
+#
+from ..pcfg_grammar import PcfgGrammar
+from ..parallel_guesses import ParallelGuesses, ParallelOmen
+from ..node_partition import NodePartition
+from ..omen.markov_cracker import MarkovCracker
+from ..omen.optimizer import Optimizer
+
+
+## Location of the ruleset used for these tests
+#
+RULESET_DIRECTORY = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)),
+    '..',
+    '..',
+    'Rules',
+    'Default')
+
+
+## Returns every guess from a MarkovCracker or ParallelOmen
+#
+def all_guesses(generator):
+    guesses = []
+    batch = generator.next_guesses()
+    while batch is not None:
+        guesses.extend(batch)
+        batch = generator.next_guesses()
+    return guesses
+
+
+## Responsible for testing the OMEN work units and ParallelOmen
+#
+# Note:
+# + = positive test, (valid input handling)
+# - = stress test, (invalid input handling)
+#
+# ==Current Tests==
+# + Test the work units are listed in the order their guesses are generated
+# + Test the workers generate the same guesses in the same order as a single process
+# + Test no more groups of work units are submitted than there are workers to start them
+# + Test a session saved while using the workers restores at the next guess
+# + Test every work unit is assigned to exactly one node
+#
+class Test_Parallel_Omen(unittest.TestCase):
+
+    ## Loads the Default ruleset, including OMEN
+    #
+    @classmethod
+    def setUpClass(cls):
+        cls.pcfg = PcfgGrammar(
+            rule_name = 'Default',
+            base_directory = RULESET_DIRECTORY,
+            version = '4.6')
+
+        cls.grammar = cls.pcfg.omen_grammar
+        cls.expected = {}
+        for target_level in range(1, 6):
+            markov_cracker = MarkovCracker(cls.grammar, target_level, Optimizer(max_length = 4))
+            cls.expected[target_level] = all_guesses(markov_cracker)
+
+
+    ## Test the work units are listed in the order their guesses are generated
+    #
+    def test_work_units(self):
+        for target_level in range(1, 6):
+            markov_cracker = MarkovCracker(self.grammar, target_level, Optimizer(max_length = 4))
+
+            guesses = []
+            for unit_num, (unit_index, cur_len, cur_ip) in enumerate(markov_cracker.work_units()):
+                self.assertEqual(unit_index, unit_num)
+
+                guess_structure = markov_cracker.unit_guess_structure(cur_len, cur_ip)
+                guesses.extend(all_guesses(guess_structure))
+
+            self.assertEqual(guesses, self.expected[target_level])
+
+
+    ## Test the workers generate the same guesses in the same order as a single process
+    #
+    def test_parallel(self):
+        # A small chunk size so work units are split between multiple tasks
+        generator = ParallelGuesses(self.pcfg, 2, chunk_size = 7)
+        try:
+            for target_level in range(1, 6):
+                markov_cracker = MarkovCracker(self.grammar, target_level, Optimizer(max_length = 4))
+                self.assertEqual(all_guesses(ParallelOmen(generator, markov_cracker)), self.expected[target_level])
+
+                # The level is reset when done, the same as the MarkovCracker
+                self.assertIsNone(markov_cracker.units)
+        finally:
+            generator.close()
+
+
+    ## Test no more groups of work units are submitted than there are workers to start them
+    #
+    # Groups with too many guesses to return at once are continued as soon as
+    # they come back, so they shouldn't have to wait behind other groups
+    #
+    def test_continue_first(self):
+        generator = ParallelGuesses(self.pcfg, 2, chunk_size = 7)
+        try:
+            markov_cracker = MarkovCracker(self.grammar, 4, Optimizer(max_length = 4))
+            parallel_omen = ParallelOmen(generator, markov_cracker)
+
+            guesses = []
+            num_continued = 0
+            batch = parallel_omen.next_guesses()
+            while batch is not None:
+                self.assertLessEqual(parallel_omen.num_running(), 2)
+
+                # A group is being continued
+                if markov_cracker.cur_guess is not None:
+                    num_continued += 1
+
+                guesses.extend(batch)
+                batch = parallel_omen.next_guesses()
+
+            self.assertEqual(guesses, self.expected[4])
+            self.assertGreater(num_continued, 0)
+        finally:
+            generator.close()
+
+
+    ## Test a session saved while using the workers restores at the next guess
+    #
+    def test_save_session(self):
+        expected = self.expected[4]
+
+        generator = ParallelGuesses(self.pcfg, 2, chunk_size = 5)
+        try:
+            with tempfile.TemporaryDirectory() as temp_directory:
+                file_name = os.path.join(temp_directory, 'test.omn')
+
+                for num_batches in [1, 3, 20]:
+                    markov_cracker = MarkovCracker(self.grammar, 4, Optimizer(max_length = 4))
+                    parallel_omen = ParallelOmen(generator, markov_cracker)
+                    guesses = []
+                    for _ in range(num_batches):
+                        guesses.extend(parallel_omen.next_guesses())
+
+                    with open(file_name, 'wb') as file:
+                        file.write(parallel_omen.session_data())
+
+                    # Restore it both with and without the workers
+                    for use_workers in [False, True]:
+                        restored = MarkovCracker(self.grammar, 1, Optimizer(max_length = 4))
+                        restored.load_session(file_name, {'pt': [[None, 0, 0]]})
+                        if use_workers:
+                            restored = ParallelOmen(generator, restored)
+
+                        self.assertEqual(guesses + all_guesses(restored), expected)
+        finally:
+            generator.close()
+
+
+    ## Test every work unit is assigned to exactly one node
+    #
+    def test_node_units(self):
+        for target_level in range(1, 6):
+            guesses = []
+            for node_num in range(1, 4):
+                markov_cracker = MarkovCracker(self.grammar, target_level, Optimizer(max_length = 4))
+                markov_cracker.unit_partition = NodePartition(node_num, 3, omen_units = True)
+                guesses.extend(all_guesses(markov_cracker))
+
+            self.assertEqual(len(guesses), len(self.expected[target_level]))
+            self.assertEqual(set(guesses), set(self.expected[target_level]))
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+
+#######################################################
+# Unit tests for pruning unused nonterminals from the grammar
+#
+#######################################################
+
+
+import unittest
+import os
+import contextlib
+import io
+
+
+## Functions and classes to tests
+#
+from ..pruned_grammar import PrunedGrammar
+from ..grammar_io import load_grammar
+
+
+## Location of the ruleset used for these tests
+#
+RULESET_DIRECTORY = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)),
+    '..',
+    '..',
+    'Rules',
+    'Default')
+
+
+## Responsible for testing PrunedGrammar
+#
+# Note:
+# + = positive test, (valid input handling)
+# - = stress test, (invalid input handling)
+#
+# ==Current Tests==
+# + Test a nonterminal is only loaded once, the first time it is looked up
+# + Test checking for and listing nonterminals doesn't load them
+# + Test restrict removes nonterminals
+# + Test load_grammar only keeps the nonterminals the base structures use
+# - Test looking up a nonterminal that isn't in the grammar
+#
+class Test_Pruned_Grammar(unittest.TestCase):
+
+    def setUp(self):
+        # The number of times each nonterminal was loaded
+        self.num_loads = {}
+
+        self.grammar = PrunedGrammar()
+        for name in ['D1', 'D2', 'A3']:
+            self.grammar.add(name, lambda name=name: self.load(name))
+
+
+    ## Used as the loader for the nonterminals
+    #
+    def load(self, name):
+        self.num_loads[name] = self.num_loads.get(name, 0) + 1
+        return [{'values': [name.lower()], 'prob': 1.0}]
+
+
+    ## Test a nonterminal is only loaded once, the first time it is looked up
+    #
+    def test_load_once(self):
+        self.assertFalse(self.grammar.is_loaded('D2'))
+        self.assertEqual(self.grammar['D2'], [{'values': ['d2'], 'prob': 1.0}])
+        self.assertEqual(self.grammar['D2'][0]['values'], ['d2'])
+
+        self.assertTrue(self.grammar.is_loaded('D2'))
+        self.assertEqual(self.num_loads, {'D2': 1})
+
+
+    ## Test checking for and listing nonterminals doesn't load them
+    #
+    def test_no_load(self):
+        self.assertIn('A3', self.grammar)
+        self.assertNotIn('A4', self.grammar)
+        self.assertEqual(list(self.grammar), ['D1', 'D2', 'A3'])
+        self.assertEqual(len(self.grammar), 3)
+
+        self.assertEqual(self.num_loads, {})
+
+
+    ## Test restrict removes nonterminals
+    #
+    def test_restrict(self):
+        self.grammar.set('C3', [{'values': ['LLL'], 'prob': 1.0}])
+        self.grammar.restrict({'A3', 'C3'})
+
+        self.assertEqual(list(self.grammar), ['A3', 'C3'])
+        self.assertEqual(self.grammar['C3'][0]['values'], ['LLL'])
+        self.assertEqual(self.num_loads, {})
+
+
+    ## Test load_grammar only keeps the nonterminals the base structures use
+    #
+    def test_load_grammar(self):
+        with contextlib.redirect_stderr(io.StringIO()):
+            grammar, base_structures, _ = load_grammar(
+                'Default', RULESET_DIRECTORY, '4.6', True, False, 'Grammar')
+
+        used = {item for base in base_structures for item in base['replacements']}
+        self.assertEqual(set(grammar), used)
+
+        # Skipping brute force means the OMEN probabilities aren't needed
+        self.assertNotIn('M', grammar)
+
+        # Nothing is read until the grammar is loaded
+        self.assertFalse(any(grammar.is_loaded(name) for name in grammar))
+        self.assertTrue(grammar['D1'])
+        self.assertTrue(grammar.is_loaded('D1'))
+
+
+    ## Test looking up a nonterminal that isn't in the grammar
+    #
+    def test_missing(self):
+        with self.assertRaises(KeyError):
+            self.grammar['D9']
+        self.assertEqual(self.num_loads, {})
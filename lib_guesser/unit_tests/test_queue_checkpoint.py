@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+
+#######################################################
+# Unit tests for saving and loading pqueue checkpoints
+#
+#######################################################
+
+
+import unittest
+import os
+import tempfile
+import configparser
+
+
+## Functions and classes to tests
+#
+from ..pcfg_grammar import PcfgGrammar
+from ..priority_queue import PcfgQueue
+from ..queue_checkpoint import write_checkpoint, read_checkpoint, CheckpointWriter
+
+
+## Location of the ruleset used for these tests
+#
+RULESET_DIRECTORY = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)),
+    '..',
+    '..',
+    'Rules',
+    'Default')
+
+
+## Responsible for testing the pqueue checkpoints
+#
+# Note:
+# + = positive test, (valid input handling)
+# - = stress test, (invalid input handling)
+#
+# ==Current Tests==
+# + Test a checkpoint loads back the same pqueue and pending items
+# + Test a restored pqueue pops the same parse trees as the original
+# - Test loading a truncated checkpoint
+# - Test loading a file that isn't a checkpoint
+#
+class Test_Queue_Checkpoint(unittest.TestCase):
+
+    ## Loads the Default ruleset and creates a temp directory to save to
+    #
+    @classmethod
+    def setUpClass(cls):
+        cls.pcfg = PcfgGrammar(
+            rule_name = 'Default',
+            base_directory = RULESET_DIRECTORY,
+            version = '4.6',
+            skip_brute = True)
+
+    def setUp(self):
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.temp_directory.name, 'test.chk')
+
+    def tearDown(self):
+        self.temp_directory.cleanup()
+
+
+    ## Returns a pqueue that has had some parse trees popped off it
+    #
+    def running_queue(self):
+        pcfg_queue = PcfgQueue(self.pcfg)
+        for _ in range(50):
+            pcfg_queue.next()
+        return pcfg_queue
+
+
+    ## Test a checkpoint loads back the same pqueue and pending items
+    #
+    def test_round_trip(self):
+        pcfg_queue = self.running_queue()
+        queue_items, next_seq = pcfg_queue.checkpoint_snapshot()
+        pending_items = [(-0.5, 0, (1, 2, 3), 7)]
+
+        writer = CheckpointWriter(self.filename)
+        writer.save("[session_info]\n", pending_items, queue_items, next_seq)
+        writer.wait()
+        self.assertEqual(writer.num_checkpoints, 1)
+
+        config_text, loaded_pending, loaded_items, loaded_seq = read_checkpoint(self.filename)
+        self.assertEqual(config_text, "[session_info]\n")
+        self.assertEqual(loaded_pending, pending_items)
+        self.assertEqual(loaded_items, queue_items)
+        self.assertEqual(loaded_seq, next_seq)
+
+        # The temp file should have been renamed
+        self.assertFalse(os.path.exists(self.filename + '.tmp'))
+
+
+    ## Test a restored pqueue pops the same parse trees as the original
+    #
+    def test_restored_queue(self):
+        pcfg_queue = self.running_queue()
+        queue_items, next_seq = pcfg_queue.checkpoint_snapshot()
+        write_checkpoint(self.filename, "", [], queue_items, next_seq)
+        _, _, queue_items, next_seq = read_checkpoint(self.filename)
+
+        save_config = configparser.ConfigParser()
+        save_config.add_section('guessing_info')
+        pcfg_queue.update_save_config(save_config)
+
+        restored_queue = PcfgQueue(self.pcfg, save_config, checkpoint = (queue_items, next_seq))
+
+        for _ in range(100):
+            expected = pcfg_queue.next()
+            pt_item = restored_queue.next()
+            self.assertEqual(pt_item['pt'], expected['pt'])
+
+
+    ## Test loading a truncated checkpoint
+    #
+    def test_truncated(self):
+        pcfg_queue = self.running_queue()
+        queue_items, next_seq = pcfg_queue.checkpoint_snapshot()
+        write_checkpoint(self.filename, "", [], queue_items, next_seq)
+
+        with open(self.filename, 'r+b') as checkpoint_file:
+            checkpoint_file.truncate(os.path.getsize(self.filename) - 4)
+
+        with self.assertRaises(ValueError):
+            read_checkpoint(self.filename)
+
+
+    ## Test loading a file that isn't a checkpoint
+    #
+    def test_invalid_file(self):
+        with open(self.filename, 'w') as checkpoint_file:
+            checkpoint_file.write("[rule_info]\nrule_name = Default\n" * 10)
+
+        with self.assertRaises(ValueError):
+            read_checkpoint(self.filename)
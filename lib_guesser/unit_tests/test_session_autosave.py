@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+
+#######################################################
+# Unit tests for automatically saving a session
+#
+#######################################################
+
+
+import unittest
+import os
+import tempfile
+
+
+## Functions and classes to tests
+#
+from ..session_autosave import AutoSave, write_atomic
+
+
+## Responsible for testing AutoSave
+#
+# Note:
+# + = positive test, (valid input handling)
+# - = stress test, (invalid input handling)
+#
+# ==Current Tests==
+# + Test a save is due after the number of pre-terminals
+# + Test a save is due after the interval
+# + Test the save files are written and the counters reset
+# + Test write_atomic replaces a file and removes the temp file
+# - Test nothing is saved if autosave isn't due
+#
+class Test_Session_Autosave(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.temp_directory.name, 'test.sav')
+
+        # The number of times the save files function was called
+        self.num_calls = 0
+
+    def tearDown(self):
+        self.temp_directory.cleanup()
+
+
+    ## Used as the save files function for AutoSave
+    #
+    def save_files(self, markov_cracker):
+        self.num_calls += 1
+        return [(self.filename, str(self.num_calls).encode('utf-8'))]
+
+
+    ## Test a save is due after the number of pre-terminals
+    #
+    def test_due_num_pts(self):
+        autosave = AutoSave(self.save_files, num_pts = 3)
+        autosave.count_pt()
+        autosave.count_pt()
+        self.assertFalse(autosave.is_due())
+        autosave.count_pt()
+        self.assertTrue(autosave.is_due())
+
+
+    ## Test a save is due after the interval
+    #
+    def test_due_interval(self):
+        autosave = AutoSave(self.save_files, interval = 60)
+        self.assertFalse(autosave.is_due())
+        autosave.last_save -= 61
+        self.assertTrue(autosave.is_due())
+
+
+    ## Test the save files are written and the counters reset
+    #
+    def test_check_saves(self):
+        autosave = AutoSave(self.save_files, num_pts = 1)
+        for _ in range(3):
+            autosave.count_pt()
+            autosave.check()
+        autosave.wait()
+
+        self.assertEqual(autosave.num_saves, 3)
+        self.assertEqual(autosave.pts_since_save, 0)
+        with open(self.filename, 'rb') as save_file:
+            self.assertEqual(save_file.read(), b'3')
+
+
+    ## Test write_atomic replaces a file and removes the temp file
+    #
+    def test_write_atomic(self):
+        write_atomic(self.filename, b'old')
+        write_atomic(self.filename, b'new')
+
+        with open(self.filename, 'rb') as save_file:
+            self.assertEqual(save_file.read(), b'new')
+        self.assertFalse(os.path.exists(self.filename + '.tmp'))
+
+
+    ## Test nothing is saved if autosave isn't due
+    #
+    def test_not_due(self):
+        autosave = AutoSave(self.save_files, interval = 60, num_pts = 100)
+        autosave.count_pt()
+        autosave.check()
+        autosave.wait()
+
+        self.assertEqual(self.num_calls, 0)
+        self.assertFalse(os.path.exists(self.filename))
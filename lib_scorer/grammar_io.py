@@ -15,6 +15,8 @@ import json
 import codecs
 from collections import Counter
 
+from lib_guesser.binary_ruleset import open_binary_ruleset
+
 
 def load_grammar(grammar, rule_directory):
     """
@@ -44,41 +46,45 @@ def load_grammar(grammar, rule_directory):
         # Find the encoding for the config file
         grammar.encoding = config.get('TRAINING_DATASET_DETAILS','encoding')
 
+        # Use the compiled binary version of the ruleset if it is up to date
+        binary = open_binary_ruleset(rule_directory)
+        grammar.binary_ruleset = binary
+
         # Load the values for the grammar
 
         # Load Years
         filename = os.path.join(rule_directory, 'Years', '1.txt')
-        if not _load_from_file(grammar.count_years, filename, grammar.encoding):
+        if not _load_from_file(grammar.count_years, filename, grammar.encoding, binary):
             return False
 
         # Load context sensitive replacements
         filename = os.path.join(rule_directory, 'Context', '1.txt')
-        if not _load_from_file(grammar.count_context_sensitive, filename, grammar.encoding):
+        if not _load_from_file(grammar.count_context_sensitive, filename, grammar.encoding, binary):
             return False
 
         # Load base structures
         filename = os.path.join(rule_directory, 'Grammar', 'grammar.txt')
-        if not _load_from_file(grammar.count_base_structures, filename, grammar.encoding):
+        if not _load_from_file(grammar.count_base_structures, filename, grammar.encoding, binary):
             return False
 
         # Load keyboard structures
-        if not _load_from_multiple_files(grammar.count_keyboard, config['BASE_K'], rule_directory, grammar.encoding):
+        if not _load_from_multiple_files(grammar.count_keyboard, config['BASE_K'], rule_directory, grammar.encoding, binary):
             return False
 
         # Load alpha strings
-        if not _load_from_multiple_files(grammar.count_alpha, config['BASE_A'], rule_directory, grammar.encoding):
+        if not _load_from_multiple_files(grammar.count_alpha, config['BASE_A'], rule_directory, grammar.encoding, binary):
             return False
 
         # Load alpha string masks (aka capitalizatoin masks)
-        if not _load_from_multiple_files(grammar.count_alpha_masks, config['CAPITALIZATION'], rule_directory, grammar.encoding):
+        if not _load_from_multiple_files(grammar.count_alpha_masks, config['CAPITALIZATION'], rule_directory, grammar.encoding, binary):
             return False
 
         # Load digits
-        if not _load_from_multiple_files(grammar.count_digits, config['BASE_D'], rule_directory, grammar.encoding):
+        if not _load_from_multiple_files(grammar.count_digits, config['BASE_D'], rule_directory, grammar.encoding, binary):
             return False
 
         # Load "other" structures. E.g. punctuation
-        if not _load_from_multiple_files(grammar.count_other, config['BASE_O'], rule_directory, grammar.encoding):
+        if not _load_from_multiple_files(grammar.count_other, config['BASE_O'], rule_directory, grammar.encoding, binary):
             return False
 
     except IOError as msg:
@@ -92,7 +98,7 @@ def load_grammar(grammar, rule_directory):
     return True
 
 
-def _load_from_multiple_files(grammar_counter, config, rule_directory, encoding):
+def _load_from_multiple_files(grammar_counter, config, rule_directory, encoding, binary=None):
     """
     Loads grammar information from multiple files for length specified terminals
 
@@ -106,6 +112,8 @@ def _load_from_multiple_files(grammar_counter, config, rule_directory, encoding)
 
         encoding: What file encoding to load the ruleset/grammar as.
 
+        binary: A BinaryRuleset to load the files from, or None
+
     Returns:
         True: If everything was loaded ok
 
@@ -123,13 +131,13 @@ def _load_from_multiple_files(grammar_counter, config, rule_directory, encoding)
 
         grammar_counter[length] = Counter()
 
-        if not _load_from_file(grammar_counter[length], full_path, encoding):
+        if not _load_from_file(grammar_counter[length], full_path, encoding, binary):
             return False
 
     return True
 
 
-def _load_from_file(grammar_counter, filename, encoding):
+def _load_from_file(grammar_counter, filename, encoding, binary=None):
     """
     Loads grammar information from a file
 
@@ -140,12 +148,22 @@ def _load_from_file(grammar_counter, filename, encoding):
 
         encoding: What file encoding to load the ruleset/grammar as.
 
+        binary: A BinaryRuleset to load the file from, or None. If the file
+        isn't in it the text file is parsed instead
+
     Returns:
         True: If everything was loaded ok
 
         False: If an error occured loading the ruleset
     """
 
+    if binary is not None:
+        pairs = binary.prob_pairs(filename)
+        if pairs is not None:
+            # Not using Counter.update() since that adds to the counts
+            dict.update(grammar_counter, pairs)
+            return True
+
     # Try to open the file
     try:
         with codecs.open(filename, 'r', encoding= encoding, errors= 'surrogateescape') as file:
@@ -20,7 +20,7 @@ class OmenScorer:
     Making this a class to bundle all of the OMEN functionality
     """
 
-    def __init__(self, base_directory, encoding, max_omen_level):
+    def __init__(self, base_directory, encoding, max_omen_level, binary = None):
         """
         Initalizes OmenScorer and calls to load the OMEN ruleset from disk
 
@@ -35,6 +35,9 @@ class OmenScorer:
             max_omen_level: The maximum OMEN level to use to attempt to
             parse passwords as.
 
+            binary: A BinaryRuleset to load the OMEN ruleset from instead of
+            the text files, or None
+
         Returns:
             OmenScorer
         """
@@ -54,7 +57,8 @@ class OmenScorer:
         self.ngram = -1
 
         # Load the OMEN stats from disk
-        self._load_omen(base_directory)
+        if binary is None or not self._load_omen_binary(base_directory, binary):
+            self._load_omen(base_directory)
 
         # Set the max length an OMEN parsing can be
         self.max_len = len(self.ln) - 1
@@ -103,6 +107,46 @@ class OmenScorer:
         except KeyError:
             return -1
 
+    def _load_omen_binary(self, base_directory, binary):
+        """
+        Loads the OMEN ruleset from a binary ruleset
+
+        Note: If an error occurs, it will forward/raise an Exception
+
+        Inputs:
+            base_directory: The rule directory the OMEN training will be found
+
+            binary: The BinaryRuleset to load from
+
+        Returns:
+            True: If the OMEN ruleset was loaded
+
+            False: If the OMEN files aren't in the binary ruleset
+        """
+        ip = binary.levels(os.path.join(base_directory, "Omen", "IP.level"))
+        cp = binary.levels(os.path.join(base_directory, "Omen", "CP.level"))
+        ln = binary.lines(os.path.join(base_directory, "Omen", "LN.level"))
+
+        if ip is None or cp is None or ln is None:
+            return False
+
+        ln = [int(line) for line in ln]
+
+        # Sanity check on the range the levels fall in
+        for levels in (ip[0], cp[0], ln):
+            if levels and min(levels) < 0:
+                print(f"Invalid level found in {binary.filename}", file=sys.stderr)
+                print("This indicates there was a problem with the training program or the file was corrupted somehow", file=sys.stderr)
+                raise Exception
+
+        self.ip.update(zip(ip[1], ip[0]))
+        self.cp.update(zip(cp[1], cp[0]))
+        if cp[1]:
+            self.ngram = len(cp[1][0])
+        self.ln.extend(ln)
+
+        return True
+
     def _load_omen(self, base_directory):
         """
         Loads the OMEN ruleset from disk
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+
+"""
+
+Uses a pool of worker processes to score passwords
+
+The main process reads the input file and splits it up into chunks of
+passwords. Each chunk is sent to a worker, which scores it with
+PCFGPasswordScorer.parse_batch(). The main process writes the results out
+in the same order as the input file.
+
+If the 'fork' start method is available the workers share the scorer that
+the main process already loaded. Otherwise each worker loads the ruleset
+from disk when it starts up.
+
+"""
+
+
+import itertools
+from collections import deque
+
+
+# The number of passwords sent to a worker at a time. Bigger chunks let
+# parse_batch() find more duplicates, but use more memory
+CHUNK_SIZE = 50000
+
+
+# The scorer used by each worker process
+_worker_scorer = None
+
+
+def read_chunks(passwords, chunk_size = CHUNK_SIZE):
+    """
+    Splits the input passwords up into chunks
+
+    Inputs:
+        passwords: An iterator of passwords, aka TrainerFileInput.read_password()
+
+        chunk_size: The most passwords to put in each chunk
+
+    Returns:
+        chunks: A generator of lists of passwords
+    """
+    passwords = iter(passwords)
+    while True:
+        chunk = list(itertools.islice(passwords, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _init_worker(load_args):
+    """
+    Initializes a worker process
+
+    Inputs:
+        load_args: Dictionary with the 'base_directory', 'limit', and
+        'max_omen_level' used to create the main process scorer
+
+    Returns:
+        None
+    """
+    global _worker_scorer
+
+    if _worker_scorer is None:
+        # Import here to avoid a circular import with pcfg_password_scorer
+        from .pcfg_password_scorer import PCFGPasswordScorer
+        from .grammar_io import load_grammar
+
+        _worker_scorer = PCFGPasswordScorer(limit = load_args['limit'])
+        if not load_grammar(_worker_scorer, load_args['base_directory']):
+            raise ValueError("Error loading the ruleset in a worker process")
+        _worker_scorer.create_multiword_detector()
+        _worker_scorer.create_omen_scorer(load_args['base_directory'], load_args['max_omen_level'])
+
+
+def _score_chunk(passwords):
+    """
+    Scores a chunk of passwords
+
+    Runs in the worker processes
+
+    Inputs:
+        passwords: The list of passwords to score
+
+    Returns:
+        results: The list of (password, category, probability, omen_score)
+    """
+    return _worker_scorer.parse_batch(passwords)
+
+
+class ParallelScorer:
+    """
+    Manages the worker pool and puts the results back into order
+    """
+
+    def __init__(self, pw_parser, num_workers, load_args):
+        """
+        Starts up the worker processes
+
+        Inputs:
+            pw_parser: The PCFGPasswordScorer, with everything loaded
+
+            num_workers: The number of worker processes to start
+
+            load_args: Dictionary with the 'base_directory', 'limit', and
+            'max_omen_level' so workers can load the scorer themselves if
+            they can't be forked
+
+        Returns:
+            ParallelScorer
+        """
+        # Imported here so multiprocessing is only loaded if it's used
+        import multiprocessing
+
+        global _worker_scorer
+
+        # The maximum number of chunks to have submitted but not returned
+        # yet. Keeps memory bounded no matter how big the input file is,
+        # while making sure workers have enough work queued up
+        self.max_pending = num_workers * 2
+
+        # Forked workers can re-use the scorer that is already loaded
+        if 'fork' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('fork')
+            _worker_scorer = pw_parser
+        else:
+            context = multiprocessing.get_context('spawn')
+
+        self.pool = context.Pool(
+            num_workers,
+            initializer = _init_worker,
+            initargs = (load_args,)
+            )
+
+    def score(self, chunks):
+        """
+        Scores chunks of passwords
+
+        Inputs:
+            chunks: An iterator of lists of passwords, aka read_chunks()
+
+        Returns:
+            results: A generator with a list of results for each chunk, in
+            the same order as the chunks
+        """
+        pending = deque()
+
+        for chunk in chunks:
+            pending.append(self.pool.apply_async(_score_chunk, (chunk,)))
+
+            if len(pending) >= self.max_pending:
+                yield pending.popleft().get()
+
+        while pending:
+            yield pending.popleft().get()
+
+    def close(self):
+        """
+        Shuts down the worker processes
+
+        Inputs:
+            None
+
+        Returns:
+            None
+        """
+        self.pool.terminate()
+        self.pool.join()
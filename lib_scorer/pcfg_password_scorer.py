@@ -13,6 +13,7 @@ Note: This class is based heavily on /lib_trainer/pcfg_password_parser
 """
 
 
+import math
 from collections import Counter
 
 # Local imports
@@ -29,6 +30,12 @@ from lib_trainer.detection_rules.multiword_detector import MultiWordDetector
 from .omen_scorer import OmenScorer
 
 
+# The most sections parse_batch() will remember the parsing of. The cache is
+# emptied when it gets this big so memory doesn't keep growing when scoring
+# very large lists
+MAX_SECTION_CACHE = 1000000
+
+
 class PCFGPasswordScorer:
     """
     Responsible for holding the Grammar and evaluating inputs against it
@@ -68,6 +75,10 @@ class PCFGPasswordScorer:
         self.count_base_structures = Counter()
         self.count_raw_base_structures = Counter()
 
+        # The compiled binary version of the ruleset, if load_grammar found
+        # an up to date one
+        self.binary_ruleset = None
+
         # Will actually be defined later in the
         # create_multiword_detector function
         self.multiword_detector = None
@@ -77,6 +88,11 @@ class PCFGPasswordScorer:
         self.omen = None
         self.max_omen_level = 0
 
+        # Used by parse_batch() to remember how each section of a password
+        # was parsed. Key is the section string, value is a tuple of
+        # (list of transitions, log probability)
+        self.section_cache = {}
+
     def create_multiword_detector(self):
         """
         Initializes the multiword detector
@@ -134,7 +150,7 @@ class PCFGPasswordScorer:
         self.max_omen_level = max_omen_level
 
         # Create the OmenScorer object to parse using OMEN Markov
-        self.omen = OmenScorer(base_directory, self.encoding, max_omen_level)
+        self.omen = OmenScorer(base_directory, self.encoding, max_omen_level, self.binary_ruleset)
 
     def parse(self, password):
         """
@@ -245,3 +261,173 @@ class PCFGPasswordScorer:
             category = 'p'
 
         return (password, category, cur_prob, omen_score)
+
+
+    def parse_batch(self, passwords):
+        """
+        Scores a batch of passwords
+
+        Gives the same results as calling parse() on each password, but is
+        much faster on large lists:
+
+        - Each unique password is only scored once
+        - After keyboard walks, e-mails, and websites are found, the rest of
+          the detection rules look at each section of the password on its
+          own. Many passwords share the same sections, (such as 'password',
+          '123456', or '!'), so the parsing and probability of each section
+          is cached in self.section_cache and reused
+        - Probabilities are multiplied by adding their logs, so very
+          unlikely passwords don't underflow to 0. Because of that the
+          probabilities can differ from parse() in the last couple digits
+
+        Inputs:
+            passwords: An iterable of the passwords to score
+
+        Returns:
+            results: A list with a (password, category, probability,
+            omen_score) tuple for each password, in the same order. See
+            parse() for what the values are
+        """
+        if len(self.section_cache) > MAX_SECTION_CACHE:
+            self.section_cache.clear()
+
+        # The result for each unique password in this batch
+        unique = {}
+
+        results = []
+        for password in passwords:
+            result = unique.get(password)
+            if result is None:
+                result = self._parse_cached(password)
+                unique[password] = result
+            results.append(result)
+
+        return results
+
+    def _parse_cached(self, password):
+        """
+        Scores a password using the section cache
+
+        Inputs:
+            password: The password to score
+
+        Returns:
+            (password, category, probability, omen_score)
+        """
+        omen_score = self.omen.parse(password)
+
+        # These look at the whole password so can't be cached by section
+        #
+        # A keyboard walk needs at least four keys with two kinds of
+        # characters, (see interesting_keyboard), so don't bother looking
+        # for one in passwords that are all letters or all digits
+        if len(password) < 4 or password.isalpha() or password.isdigit():
+            section_list, found_walks = [(password, None)], []
+        else:
+            section_list, found_walks, _ = detect_keyboard_walk(password)
+        found_emails, _ = email_detection(section_list)
+        found_urls, _, _ = website_detection(section_list)
+
+        if found_emails:
+            return (password, 'e', 0, omen_score)
+        if found_urls:
+            return (password, 'w', 0, omen_score)
+
+        base_structure = []
+        log_probs = []
+
+        try:
+            for item in found_walks:
+                log_probs.append(_log(self.count_keyboard[len(item)][item]))
+
+            for section in section_list:
+                if section[1] is not None:
+                    base_structure.append(section[1])
+                    continue
+
+                cached = self.section_cache.get(section[0])
+                if cached is None:
+                    cached = self._parse_section(section)
+                    self.section_cache[section[0]] = cached
+
+                base_structure.extend(cached[0])
+                log_probs.append(cached[1])
+
+            log_probs.append(_log(self.count_base_structures[''.join(base_structure)]))
+            cur_prob = math.exp(math.fsum(log_probs))
+
+        except KeyError:
+            cur_prob = 0
+
+        # Same classification as parse()
+        if cur_prob > self.limit or (omen_score <= self.omen.max_omen_level and omen_score >= 0):
+            return (password, 'p', cur_prob, omen_score)
+
+        return (password, 'o', cur_prob, omen_score)
+
+    def _parse_section(self, section):
+        """
+        Runs the detection rules that work on one section at a time, and
+        finds the probability of what they found
+
+        Inputs:
+            section: A (string, None) section left over after keyboard walks,
+            e-mails, and websites were found
+
+        Returns:
+            (transitions, log_prob)
+
+            transitions: The list of transitions the section was split into,
+            aka ['A8', 'D1']
+
+            log_prob: The log of the product of the probabilities of all the
+            terminals in the section. -inf if one of them isn't in the grammar
+
+        Raises:
+            KeyError: If the grammar doesn't have any terminals of the length
+            of one of the terminals found
+        """
+        section_list = [section]
+
+        found_years = year_detection(section_list)
+        found_context_sensitive_strings = context_sensitive_detection(section_list)
+        found_alpha_strings, found_mask_list = alpha_detection(section_list, self.multiword_detector)
+        found_digit_strings = digit_detection(section_list)
+        found_other_strings = other_detection(section_list)
+
+        log_probs = []
+
+        for item in found_years:
+            log_probs.append(_log(self.count_years[item]))
+
+        for item in found_context_sensitive_strings:
+            log_probs.append(_log(self.count_context_sensitive[item]))
+
+        for item in found_alpha_strings:
+            log_probs.append(_log(self.count_alpha[len(item)][item]))
+
+        for item in found_mask_list:
+            log_probs.append(_log(self.count_alpha_masks[len(item)][item]))
+
+        for item in found_digit_strings:
+            log_probs.append(_log(self.count_digits[len(item)][item]))
+
+        for item in found_other_strings:
+            log_probs.append(_log(self.count_other[len(item)][item]))
+
+        return [transition for _, transition in section_list], math.fsum(log_probs)
+
+
+def _log(prob):
+    """
+    Log of a probability, that works for a probability of 0
+
+    Inputs:
+        prob: The probability
+
+    Returns:
+        log_prob: The natural log of prob, or -inf if prob is 0
+    """
+    if prob <= 0:
+        return -math.inf
+    return math.log(prob)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+
+"""
+
+Client for sending passwords to a running scorer service
+
+Example:
+
+    from lib_scorer.scorer_client import ScorerClient
+
+    client = ScorerClient(socket_path = '/tmp/pcfg_scorer.sock')
+    for password, category, prob, omen_level in client.score(['password1']):
+        print(password, category, prob, omen_level)
+    client.close()
+
+Only uses the standard library, so it can be copied into other programs
+without the rest of the scorer
+
+"""
+
+
+import socket
+import json
+
+
+class ScorerError(Exception):
+    """
+    The scorer service couldn't answer a request
+    """
+
+
+class ScorerClient:
+    """
+    A connection to a scorer service started by scorer_server.py
+
+    Requests are sent one at a time over the same connection. Use one
+    ScorerClient per thread
+    """
+
+    def __init__(self, socket_path = None, host = '127.0.0.1', port = None, timeout = None):
+        """
+        Connects to the scorer service
+
+        Inputs:
+            socket_path: The filename of the Unix socket the service is
+            listening on. If None, connects to host:port instead
+
+            host: The host the service is listening on
+
+            port: The TCP port the service is listening on
+
+            timeout: How many seconds to wait for the service before raising
+            an exception. None waits forever
+
+        Returns:
+            ScorerClient
+
+        Raises:
+            OSError: If the service couldn't be connected to
+        """
+        if socket_path is not None:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.settimeout(timeout)
+            self.socket.connect(socket_path)
+        else:
+            self.socket = socket.create_connection((host, port), timeout = timeout)
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        self.file = self.socket.makefile('rb')
+
+    def score(self, passwords):
+        """
+        Scores a batch of passwords
+
+        Sending many passwords in one batch is much faster than sending them
+        one at a time
+
+        Inputs:
+            passwords: A list of the passwords to score
+
+        Returns:
+            results: A list of (password, category, probability, omen_level)
+            tuples, in the same order as the passwords. See
+            PCFGPasswordScorer.parse() for what the values mean
+
+        Raises:
+            ScorerError: If the service couldn't answer the request
+
+            OSError: If the connection to the service failed
+        """
+        request = json.dumps({'passwords': list(passwords)}).encode('utf-8') + b'\n'
+        self.socket.sendall(request)
+
+        line = self.file.readline()
+        if not line:
+            raise ScorerError("The scorer service closed the connection")
+
+        reply = json.loads(line)
+        if 'error' in reply:
+            raise ScorerError(reply['error'])
+
+        return [tuple(result) for result in reply['results']]
+
+    def close(self):
+        """
+        Closes the connection to the service
+
+        Inputs:
+            None
+
+        Returns:
+            None
+        """
+        self.file.close()
+        self.socket.close()
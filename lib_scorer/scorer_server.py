@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+
+
+"""
+
+Runs a PCFGPasswordScorer as a long running service
+
+Loading the grammar, the multiword detector, and the OMEN tables takes much
+longer than scoring a password, so a program that needs to score a few
+passwords at a time, (such as checking a password when someone signs up),
+can keep one scorer loaded and send it requests over a local socket.
+
+The service listens on a Unix socket, or on a TCP port on localhost. Each
+request is one line of JSON, and gets one line of JSON back:
+
+    Request: {"passwords": ["password1", "hello"]}
+
+    Reply: {"results": [["password1", "p", 4.79e-06, 3], ["hello", ...]]}
+
+Each result is the (password, category, probability, omen_level) that
+PCFGPasswordScorer.parse_batch() returns. If a request can't be parsed the reply
+is {"error": "reason"} and the connection stays open. A client can send as
+many requests as it wants over one connection.
+
+"""
+
+
+import sys
+import os
+import json
+import socket
+import socketserver
+import threading
+
+
+# The longest request line that will be read. Clients should split up
+# larger batches
+MAX_REQUEST_SIZE = 16 * 1024 * 1024
+
+
+def parse_request(line):
+    """
+    Gets the passwords out of a request line
+
+    Inputs:
+        line: The request, as bytes
+
+    Returns:
+        passwords: The list of passwords to score
+
+    Raises:
+        ValueError: If the request isn't valid
+    """
+    try:
+        request = json.loads(line)
+    except (UnicodeDecodeError, json.JSONDecodeError) as msg:
+        raise ValueError(f"Request is not valid JSON: {msg}") from msg
+
+    if not isinstance(request, dict) or not isinstance(request.get('passwords'), list):
+        raise ValueError("Request must be an object with a list of 'passwords'")
+
+    passwords = request['passwords']
+    for password in passwords:
+        if not isinstance(password, str):
+            raise ValueError("Each password must be a string")
+
+    return passwords
+
+
+class ScorerRequestHandler(socketserver.StreamRequestHandler):
+    """
+    Answers the requests sent over one client connection
+    """
+
+    def setup(self):
+        """
+        Sets up the connection to the client
+
+        Inputs:
+            None
+
+        Returns:
+            None
+        """
+        # Send replies right away rather than waiting to fill up a packet.
+        # Only TCP sockets have that option
+        self.disable_nagle_algorithm = isinstance(self.server, TCPScorerServer)
+        super().setup()
+
+    def handle(self):
+        """
+        Reads request lines until the client closes the connection
+
+        Inputs:
+            None
+
+        Returns:
+            None
+        """
+        try:
+            self._handle_requests()
+
+        # The client went away without waiting for its reply
+        except (BrokenPipeError, ConnectionResetError):
+            return
+
+    def _handle_requests(self):
+        """
+        Answers each request line that is sent
+
+        Inputs:
+            None
+
+        Returns:
+            None
+        """
+        while True:
+            line = self.rfile.readline(MAX_REQUEST_SIZE + 1)
+            if not line:
+                return
+
+            # Can't tell where the next request starts, so drop the connection
+            if len(line) > MAX_REQUEST_SIZE:
+                self._reply({'error': f"Request is longer than {MAX_REQUEST_SIZE} bytes"})
+                return
+
+            if not line.strip():
+                continue
+
+            try:
+                passwords = parse_request(line)
+            except ValueError as msg:
+                self._reply({'error': str(msg)})
+                continue
+
+            self._reply({'results': self.server.score(passwords)})
+
+    def _reply(self, reply):
+        """
+        Sends a reply line to the client
+
+        Inputs:
+            reply: The dictionary to send
+
+        Returns:
+            None
+        """
+        self.wfile.write(json.dumps(reply).encode('utf-8') + b'\n')
+
+
+class _ScorerServerMixIn(socketserver.ThreadingMixIn):
+    """
+    The parts of the server that are the same for Unix sockets and TCP
+    """
+
+    # Don't wait for clients that are still connected when shutting down
+    daemon_threads = True
+
+    def setup_scorer(self, pw_parser):
+        """
+        Sets the scorer used to answer requests
+
+        Inputs:
+            pw_parser: The PCFGPasswordScorer, with its grammar, multiword
+            detector, and OMEN scorer already loaded
+
+        Returns:
+            None
+        """
+        self.pw_parser = pw_parser
+
+        # Each client connection has its own thread. Scoring holds the GIL
+        # anyway, so one batch is scored at a time
+        self.lock = threading.Lock()
+
+    def score(self, passwords):
+        """
+        Scores a batch of passwords
+
+        Inputs:
+            passwords: The list of passwords to score
+
+        Returns:
+            results: A list of (password, category, probability, omen_level)
+            for each of the passwords
+        """
+        with self.lock:
+            return self.pw_parser.parse_batch(passwords)
+
+
+# Windows doesn't have Unix sockets, so only TCP can be used there
+if hasattr(socket, 'AF_UNIX'):
+    class UnixScorerServer(_ScorerServerMixIn, socketserver.UnixStreamServer):
+        """
+        Scorer service listening on a Unix socket
+        """
+
+
+class TCPScorerServer(_ScorerServerMixIn, socketserver.TCPServer):
+    """
+    Scorer service listening on a TCP port
+    """
+
+    allow_reuse_address = True
+
+
+def remove_stale_socket(socket_path):
+    """
+    Removes a Unix socket file left behind by a server that is no longer
+    running
+
+    Inputs:
+        socket_path: The filename of the Unix socket
+
+    Returns:
+        True: If there isn't a socket file there now
+
+        False: If another server is still listening on it
+    """
+    if not os.path.exists(socket_path):
+        return True
+
+    test_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        test_socket.connect(socket_path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        os.remove(socket_path)
+        return True
+    finally:
+        test_socket.close()
+
+    return False
+
+
+def create_server(pw_parser, socket_path = None, host = '127.0.0.1', port = None):
+    """
+    Creates a scorer service, (but doesn't start it)
+
+    Inputs:
+        pw_parser: The loaded PCFGPasswordScorer to answer requests with
+
+        socket_path: The filename of the Unix socket to listen on. If None,
+        listens on a TCP port instead
+
+        host: The address to listen on for TCP. Defaults to only accepting
+        connections from the local computer
+
+        port: The TCP port to listen on. 0 picks an unused port
+
+    Returns:
+        server: The UnixScorerServer or TCPScorerServer. Call
+        serve_forever() on it to start answering requests
+
+    Raises:
+        OSError: If the socket couldn't be opened, for example if another
+        server is already using it
+    """
+    if socket_path is not None:
+        if not hasattr(socket, 'AF_UNIX'):
+            raise OSError("Unix sockets aren't supported on this system. Use a TCP port instead")
+        if not remove_stale_socket(socket_path):
+            raise OSError(f"Another server is already listening on {socket_path}")
+        server = UnixScorerServer(socket_path, ScorerRequestHandler)
+    else:
+        server = TCPScorerServer((host, port), ScorerRequestHandler)
+
+    server.setup_scorer(pw_parser)
+    return server
+
+
+def server_address(server):
+    """
+    Gets a printable version of the address a server is listening on
+
+    Inputs:
+        server: The UnixScorerServer or TCPScorerServer
+
+    Returns:
+        address: The socket filename, or host:port
+    """
+    if isinstance(server.server_address, tuple):
+        return f"{server.server_address[0]}:{server.server_address[1]}"
+    return server.server_address
+
+
+def shutdown_server(server):
+    """
+    Closes the server, and removes its socket file if it is a Unix socket
+
+    Inputs:
+        server: The UnixScorerServer or TCPScorerServer
+
+    Returns:
+        None
+    """
+    server.server_close()
+    if not isinstance(server, TCPScorerServer):
+        try:
+            os.remove(server.server_address)
+        except OSError as msg:
+            print(f"Warning: Couldn't remove the socket file: {msg}", file=sys.stderr)
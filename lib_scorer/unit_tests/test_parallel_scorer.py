@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+
+#######################################################
+# Unit tests for scoring passwords with worker processes
+#
+#######################################################
+
+
+import unittest
+import os
+import contextlib
+import io
+
+
+## Functions and classes to tests
+#
+from ..parallel_scorer import ParallelScorer, read_chunks
+from ..pcfg_password_scorer import PCFGPasswordScorer
+from ..grammar_io import load_grammar
+
+
+## Location of the ruleset used for these tests
+#
+RULESET_DIRECTORY = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)),
+    '..',
+    '..',
+    'Rules',
+    'Default')
+
+
+## Responsible for testing ParallelScorer
+#
+# Note:
+# + = positive test, (valid input handling)
+# - = stress test, (invalid input handling)
+#
+# ==Current Tests==
+# + Test read_chunks splits up the input
+# + Test the workers return the same results as scoring in one process
+# - Test an empty input
+#
+class Test_Parallel_Scorer(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.load_args = {
+            'base_directory': RULESET_DIRECTORY,
+            'limit': 0,
+            'max_omen_level': 9,
+        }
+
+        cls.pw_parser = PCFGPasswordScorer()
+        with contextlib.redirect_stdout(io.StringIO()):
+            load_grammar(cls.pw_parser, RULESET_DIRECTORY)
+        cls.pw_parser.create_multiword_detector()
+        cls.pw_parser.create_omen_scorer(RULESET_DIRECTORY, 9)
+
+        # Passwords made from terminals in the ruleset, with duplicates
+        digits = sorted(cls.pw_parser.count_digits[6])
+        alphas = sorted(cls.pw_parser.count_alpha[8])
+        cls.passwords = (digits + [
+            alpha + digit for alpha in alphas for digit in digits]) * 2 + ['password', 'bob@gmail.com']
+
+
+    ## Test read_chunks splits up the input
+    #
+    def test_read_chunks(self):
+        chunks = list(read_chunks(iter(range(7)), 3))
+        self.assertEqual(chunks, [[0, 1, 2], [3, 4, 5], [6]])
+
+
+    ## Test the workers return the same results as scoring in one process
+    #
+    def test_same_results(self):
+        expected = self.pw_parser.parse_batch(self.passwords)
+
+        parallel_scorer = ParallelScorer(self.pw_parser, 2, self.load_args)
+        try:
+            results = []
+            for batch in parallel_scorer.score(read_chunks(self.passwords, 7)):
+                results.extend(batch)
+        finally:
+            parallel_scorer.close()
+
+        self.assertEqual(results, expected)
+        self.assertTrue(any(result[2] > 0 for result in results))
+
+
+    ## Test an empty input
+    #
+    def test_empty(self):
+        parallel_scorer = ParallelScorer(self.pw_parser, 2, self.load_args)
+        try:
+            self.assertEqual(list(parallel_scorer.score(read_chunks([]))), [])
+        finally:
+            parallel_scorer.close()
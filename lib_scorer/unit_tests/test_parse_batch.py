@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+
+#######################################################
+# Unit tests for scoring passwords in batches
+#
+#######################################################
+
+
+import unittest
+import os
+import contextlib
+import io
+
+
+## Functions and classes to tests
+#
+from ..pcfg_password_scorer import PCFGPasswordScorer
+from ..grammar_io import load_grammar
+
+
+## Location of the ruleset used for these tests
+#
+RULESET_DIRECTORY = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)),
+    '..',
+    '..',
+    'Rules',
+    'Default')
+
+
+## Responsible for testing PCFGPasswordScorer.parse_batch
+#
+# Note:
+# + = positive test, (valid input handling)
+# - = stress test, (invalid input handling)
+#
+# ==Current Tests==
+# + Test the batch results match scoring each password with parse()
+# + Test duplicate passwords get the same result, in the same order
+# + Test sections are cached between batches
+# - Test an empty batch
+#
+class Test_Parse_Batch(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pw_parser = PCFGPasswordScorer()
+        with contextlib.redirect_stdout(io.StringIO()):
+            load_grammar(cls.pw_parser, RULESET_DIRECTORY)
+        cls.pw_parser.create_multiword_detector()
+        cls.pw_parser.create_omen_scorer(RULESET_DIRECTORY, 9)
+
+        # Build passwords out of terminals from the ruleset so some of them
+        # have a probability, and add some that don't
+        digits = sorted(cls.pw_parser.count_digits[6])[:3]
+        alphas = sorted(cls.pw_parser.count_alpha[8])[:3]
+        cls.passwords = digits + alphas + [
+            alphas[0] + digits[0],
+            alphas[1].upper() + '!' + digits[1],
+            digits[2] + alphas[2] + digits[2],
+            'password',
+            '1qaz2wsx',
+            'Asdf1234!',
+            'test1990',
+            'bob@hotmail.com',
+            'www.rockyou.com',
+            'no.1fan',
+            '',
+            'a',
+            'ëñçødîng',
+        ]
+
+
+    ## Test the batch results match scoring each password with parse()
+    #
+    def test_matches_parse(self):
+        results = self.pw_parser.parse_batch(self.passwords)
+        self.assertEqual(len(results), len(self.passwords))
+
+        found_prob = False
+        for password, result in zip(self.passwords, results):
+            expected = self.pw_parser.parse(password)
+            self.assertEqual(result[0], password)
+            self.assertEqual(result[1], expected[1], password)
+            self.assertEqual(result[3], expected[3], password)
+
+            # Multiplied in log space, so can be off in the last digits
+            self.assertAlmostEqual(result[2], expected[2], delta = expected[2] * 1e-9)
+            if expected[2] > 0:
+                found_prob = True
+
+        self.assertTrue(found_prob)
+
+
+    ## Test duplicate passwords get the same result, in the same order
+    #
+    def test_duplicates(self):
+        passwords = ['test1990', '123456', 'test1990', 'hello', '123456']
+        results = self.pw_parser.parse_batch(iter(passwords))
+
+        self.assertEqual([result[0] for result in results], passwords)
+        self.assertIs(results[0], results[2])
+        self.assertIs(results[1], results[4])
+
+
+    ## Test sections are cached between batches
+    #
+    def test_section_cache(self):
+        self.pw_parser.section_cache.clear()
+        first = self.pw_parser.parse_batch(['hello123'])
+
+        self.assertIn('hello123', self.pw_parser.section_cache)
+        self.assertEqual(self.pw_parser.section_cache['hello123'][0], ['A5', 'D3'])
+        self.assertEqual(self.pw_parser.parse_batch(['hello123']), first)
+
+
+    ## Test an empty batch
+    #
+    def test_empty(self):
+        self.assertEqual(self.pw_parser.parse_batch([]), [])
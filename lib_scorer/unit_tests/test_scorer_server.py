@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+
+#######################################################
+# Unit tests for the scorer service and its client
+#
+#######################################################
+
+
+import unittest
+import os
+import socket
+import tempfile
+import threading
+
+
+## Functions and classes to tests
+#
+from ..scorer_server import create_server, shutdown_server
+from ..scorer_client import ScorerClient, ScorerError
+
+
+## Stand in for a loaded PCFGPasswordScorer
+#
+# Scores a password by its length so the tests don't need to load a ruleset
+#
+class LengthScorer:
+
+    def parse(self, password):
+        return (password, 'p' if len(password) > 4 else 'o', 1.0 / (len(password) + 1), len(password))
+
+    def parse_batch(self, passwords):
+        return [self.parse(password) for password in passwords]
+
+
+## Responsible for testing the scorer service
+#
+# Note:
+# + = positive test, (valid input handling)
+# - = stress test, (invalid input handling)
+#
+# ==Current Tests==
+# + Test scoring batches over a Unix socket
+# + Test scoring over a TCP port
+# + Test several clients connected at once
+# - Test a bad request returns an error and keeps the connection open
+# - Test starting a server on a socket file left behind by an old server
+#
+class Test_Scorer_Server(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.temp_directory.name, 'scorer.sock')
+        self.servers = []
+
+
+    def tearDown(self):
+        for server, thread in self.servers:
+            server.shutdown()
+            thread.join()
+            shutdown_server(server)
+        self.temp_directory.cleanup()
+
+
+    ## Starts a server in a background thread
+    #
+    def start(self, **kwargs):
+        server = create_server(LengthScorer(), **kwargs)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        self.servers.append((server, thread))
+        return server
+
+
+    ## Test scoring batches over a Unix socket
+    #
+    @unittest.skipUnless(hasattr(socket, 'AF_UNIX'), "Unix sockets aren't supported")
+    def test_unix_socket(self):
+        self.start(socket_path = self.socket_path)
+
+        client = ScorerClient(socket_path = self.socket_path)
+        self.assertEqual(
+            client.score(['pass', 'password1']),
+            [('pass', 'o', 0.2, 4), ('password1', 'p', 0.1, 9)])
+
+        # Multiple requests can be sent over the same connection
+        self.assertEqual(client.score([]), [])
+        self.assertEqual(client.score(['pässwörd']), [('pässwörd', 'p', 1.0 / 9, 8)])
+        client.close()
+
+
+    ## Test scoring over a TCP port
+    #
+    def test_tcp(self):
+        server = self.start(port = 0)
+
+        client = ScorerClient(port = server.server_address[1])
+        self.assertEqual(client.score(['hello']), [('hello', 'p', 1.0 / 6, 5)])
+        client.close()
+
+
+    ## Test several clients connected at once
+    #
+    def test_multiple_clients(self):
+        server = self.start(port = 0)
+
+        clients = [ScorerClient(port = server.server_address[1]) for _ in range(3)]
+        for index, client in enumerate(clients):
+            self.assertEqual(client.score(['x' * index])[0][3], index)
+        for client in clients:
+            client.close()
+
+
+    ## Test a bad request returns an error and keeps the connection open
+    #
+    def test_bad_request(self):
+        server = self.start(port = 0)
+
+        client = ScorerClient(port = server.server_address[1])
+        with self.assertRaises(ScorerError):
+            client.score([1234])
+
+        client.socket.sendall(b'not json\n')
+        self.assertIn(b'error', client.file.readline())
+
+        self.assertEqual(client.score(['abc']), [('abc', 'o', 0.25, 3)])
+        client.close()
+
+
+    ## Test starting a server on a socket file left behind by an old server
+    #
+    @unittest.skipUnless(hasattr(socket, 'AF_UNIX'), "Unix sockets aren't supported")
+    def test_stale_socket(self):
+        old_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_socket.bind(self.socket_path)
+        old_socket.close()
+
+        self.start(socket_path = self.socket_path)
+        client = ScorerClient(socket_path = self.socket_path)
+        self.assertEqual(len(client.score(['abc'])), 1)
+        client.close()
+
+        # Can't start a second server on a socket that's in use
+        with self.assertRaises(OSError):
+            create_server(LengthScorer(), socket_path = self.socket_path)
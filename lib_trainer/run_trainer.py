@@ -30,6 +30,8 @@ from lib_trainer.config_file import save_config_file
 from lib_trainer.save_pcfg_data import save_pcfg_data
 from lib_trainer.print_statistics import print_statistics
 
+from lib_guesser.binary_ruleset import compile_ruleset
+
 from lib_trainer.trainer_file_input import get_confirmation
 
 
@@ -305,5 +307,15 @@ def run_trainer(program_info, base_directory):
             ):
         print("Error, something went wrong saving the pcfg data to disk")
         return False
+
+    # Compile the binary version of the ruleset so the guesser and scorer
+    # can load it faster. The text files are already saved, so the ruleset
+    # can still be used if this fails
+    try:
+        compile_ruleset(base_directory)
+
+    except Exception as msg:
+        print("Warning, unable to compile the binary ruleset: " + str(msg))
+        print("The guesser will load the text files instead")
     
     return True
@@ -46,16 +46,20 @@ if sys.version_info[0] < 3:
     print("This program requires Python 3.x", file=sys.stderr)
     sys.exit(1)
 
+# Used by --profile_startup. Imported first so the rest of the imports are timed
+from lib_guesser.startup_profile import StartupProfile, start_times
+PROGRAM_START = start_times()
+
 import argparse
 import os
+import time
 import traceback
 
 # Local imports
+#
+# Note: The scorer is imported in main() after the command line has been
+# parsed, so printing the help is quick
 from lib_scorer.banner_info import print_banner
-from lib_scorer.pcfg_password_scorer import PCFGPasswordScorer
-from lib_scorer.grammar_io import load_grammar
-from lib_scorer.file_output import FileOutput
-from lib_trainer.trainer_file_input import TrainerFileInput
 
 
 def parse_command_line(program_info):
@@ -142,6 +146,27 @@ def parse_command_line(program_info):
         type = int,
     )
 
+    # Score passwords with multiple processes
+    parser.add_argument(
+        '--workers',
+        help = 'The number of worker processes to score passwords with. Default is ' +
+        str(program_info['workers']),
+        metavar = 'INT',
+        required = False,
+        default = program_info['workers'],
+        type = int,
+    )
+
+    # Print out how long each part of the program took
+    parser.add_argument(
+        '--profile_startup',
+        help = 'Prints out how long importing the scorer, loading the ruleset, and scoring the input took',
+        dest = 'profile_startup',
+        action = 'store_const',
+        const = not program_info['profile_startup'],
+        default = program_info['profile_startup'],
+    )
+
     # Parse all the args and save them
     args=parser.parse_args()
 
@@ -151,6 +176,8 @@ def parse_command_line(program_info):
     program_info['output_file']= args.output
     program_info['limit'] = args.limit
     program_info['max_omen_level'] = args.max_omen
+    program_info['workers'] = args.workers
+    program_info['profile_startup'] = args.profile_startup
 
     # Sanity checking of values
 
@@ -161,6 +188,10 @@ def parse_command_line(program_info):
         print("This is because most password guesses have very low probabilities of actually being a target's password.")
         return False
 
+    if program_info['workers'] <= 0:
+        print(f"Error, the number of workers must be a positive number. The value specified was {program_info['workers']}")
+        return False
+
     return True
 
 
@@ -193,7 +224,13 @@ def main():
         #
         # Note, picking 9 as the default because the keyspace when training
         # on rockyou for level 9 is roughly 600 million which seems reasonable
-        'max_omen_level':9
+        'max_omen_level':9,
+
+        # Advanced Options
+        'workers':1,
+
+        # Debugging Options
+        'profile_startup':False,
 
     }
 
@@ -201,12 +238,25 @@ def main():
     print("Version: " + str(program_info['version']))
     print()
 
+    profile = StartupProfile(PROGRAM_START)
+    profile.step("Standard library imports")
+
     # Parsing the command line
     if not parse_command_line(program_info):
         # There was a problem with the command line so exit
         print("Exiting...")
         return
 
+    profile.step("Parsing the command line")
+
+    from lib_scorer.pcfg_password_scorer import PCFGPasswordScorer
+    from lib_scorer.grammar_io import load_grammar
+    from lib_scorer.file_output import FileOutput
+    from lib_scorer.parallel_scorer import ParallelScorer, read_chunks
+    from lib_trainer.trainer_file_input import TrainerFileInput
+
+    profile.step("Importing the scorer")
+
     # Load Rules file from the standard storage location
     # Making this OS independent
     base_directory = os.path.join(
@@ -224,6 +274,8 @@ def main():
         print("Exiting...")
         return
 
+    profile.step("Loading the ruleset")
+
     # Initialize the multiword detector
     print("Initializing Multi-Word Detector")
     pw_parser.create_multiword_detector()
@@ -232,6 +284,8 @@ def main():
     print("Initializing the OMEN scorer")
     pw_parser.create_omen_scorer( base_directory, program_info['max_omen_level'])
 
+    profile.step("Initializing the scorers")
+
     # Initialize the file input to read input values from
     # Re-using the TrainerFileInput from the trainer
     file_input = TrainerFileInput(
@@ -250,19 +304,40 @@ def main():
     print()
 
     false_negative = 0
+    num_scored = 0
+    start_time = time.perf_counter()
+
+    # The passwords are scored in chunks so duplicates and common sections
+    # only need to be scored once, (see PCFGPasswordScorer.parse_batch)
+    chunks = read_chunks(file_input.read_password())
+
+    parallel_scorer = None
+    if program_info['workers'] > 1:
+        print("Starting " + str(program_info['workers']) + " worker processes")
+        parallel_scorer = ParallelScorer(
+            pw_parser,
+            program_info['workers'],
+            {
+                'base_directory': base_directory,
+                'limit': program_info['limit'],
+                'max_omen_level': program_info['max_omen_level'],
+            }
+            )
+        batches = parallel_scorer.score(chunks)
+    else:
+        batches = (pw_parser.parse_batch(chunk) for chunk in chunks)
+
     try:
-        input_value = file_input.read_password()
-        
-        for i_va in input_value:
+        # Results come back in the same order as the input
+        for results in batches:
+            for result in results:
+
+                writer.write(result)
 
-            result = pw_parser.parse(i_va)
-            
-            writer.write(result)
-            
-            if result[1] == 'o':
-                false_negative += 1
+                if result[1] == 'o':
+                    false_negative += 1
 
-            #input_value = file_input.read_password()
+            num_scored += len(results)
 
     except Exception as msg:
         traceback.print_exc(file=sys.stdout)
@@ -270,7 +345,20 @@ def main():
         print("Exiting...")
         return
 
+    finally:
+        if parallel_scorer is not None:
+            parallel_scorer.close()
+
+    elapsed = time.perf_counter() - start_time
+
     print("False negatives: " + str(false_negative))
+    print("Scored " + str(num_scored) + " passwords in " + f"{elapsed:.2f} seconds" +
+        f" ({num_scored / max(elapsed, 1e-9):.0f} passwords per second)")
+
+    profile.step("Scoring the input")
+    if program_info['profile_startup']:
+        print()
+        profile.print_report(file=sys.stdout)
 
 
 if __name__ == "__main__":
@@ -5,9 +5,14 @@ Created by Seunghee Seo
 
 """
 
+# Used by --profile_startup. Imported first so the rest of the imports are timed
+from lib_guesser.startup_profile import StartupProfile, start_times
+PROGRAM_START = start_times()
+
 import argparse, os, sys
 
-from lib_evaluation.montecarlo_evaluator import MonteCarloEvaluator
+# Note: The evaluator is imported in main() after the command line has been
+# parsed, so printing the help doesn't need NumPy or the grammar
 #from lib_guesser.grammar_io import load_grammar
 
 def print_banner(program_info):
@@ -96,6 +101,15 @@ def parse_command_line(program_info):
         required = False,
         default = program_info['label']
     )
+
+    parser.add_argument(
+        '--profile_startup',
+        help = 'Prints out how long importing the evaluator, loading the ruleset, and evaluating the input took',
+        dest = 'profile_startup',
+        action = 'store_const',
+        const = not program_info['profile_startup'],
+        default = program_info['profile_startup']
+    )
         
     # Parse all the args and save them
     args=parser.parse_args()
@@ -105,6 +119,7 @@ def parse_command_line(program_info):
     program_info['output_file']= args.output
     program_info['samples_num']= args.samples_num
     program_info['label']= args.label
+    program_info['profile_startup']= args.profile_startup
     
     return True
 
@@ -139,15 +154,27 @@ def main():
         #
         # Note, picking 9 as the default because the keyspace when training
         # on rockyou for level 9 is roughly 600 million which seems reasonable
-        'max_omen_level':9
+        'max_omen_level':9,
+
+        # Debugging Options
+        'profile_startup':False,
 
     }
+
+    profile = StartupProfile(PROGRAM_START)
+    profile.step("Standard library imports")
     
     # Parsing the command line
     if not parse_command_line(program_info):
         # There was a problem with the command line so exit
         print("Exiting...",file=sys.stderr)
         return
+
+    profile.step("Parsing the command line")
+
+    from lib_evaluation.montecarlo_evaluator import MonteCarloEvaluator
+
+    profile.step("Importing the evaluator")
     
     print_banner(program_info)
     
@@ -167,6 +194,8 @@ def main():
         program_info['version'],
         program_info['label']
         )
+
+    profile.step("Loading the ruleset")
     
     ## Setup evaluator.
         # 1) Random sampling
@@ -175,6 +204,8 @@ def main():
     
     md_evaluator.setup()
 
+    profile.step("Generating the samples")
+
     ## Evaluate the model performance with the inputs
     # 1) read input
     # 2) calculating probabilities
@@ -182,6 +213,11 @@ def main():
     # 4) confirm the position
 
     md_evaluator.evaluate_PCFG(program_info['input_file'])
+
+    profile.step("Evaluating the input")
+    if program_info['profile_startup']:
+        print()
+        profile.print_report(file=sys.stdout)
    
     ## Write estimation about inputs to draw graph
 
@@ -54,6 +54,10 @@ if sys.version_info[0] < 3:
     print("This program requires Python 3.x", file=sys.stderr)
     sys.exit(1)
 
+# Used by --profile_startup. Imported first so the rest of the imports are timed
+from lib_guesser.startup_profile import StartupProfile, start_times
+PROGRAM_START = start_times()
+
 # Global imports
 import argparse
 import os
@@ -61,10 +65,11 @@ import configparser # Used to save/load status of guessing sessions
 import datetime
 
 # Local imports
+#
+# Note: The grammar and the cracking sessions are imported in main() after
+# the command line has been parsed, so printing the help is quick
 from lib_guesser.banner_info import print_banner
-from lib_guesser.pcfg_grammar import PcfgGrammar
-from lib_guesser.cracking_session import CrackingSession
-from lib_guesser.honeyword_session import HoneywordSession
+from lib_guesser.node_partition import NodePartition, parse_node_option
 
 
 def parse_command_line(program_info):
@@ -139,6 +144,16 @@ def parse_command_line(program_info):
         default=program_info['limit']
     )
 
+    parser.add_argument(
+        '--skip',
+        help='Skip the first N guesses and then start generating guesses. Can be used with ' +
+            '--limit to split a session into chunks, or to resume at a specific guess count. ' +
+            'Whole pre-terminals are skipped without generating their guesses',
+        metavar = 'N',
+        type=int,
+        default=program_info['skip']
+    )
+
     parser.add_argument(
         '--skip_brute',
         help='Do not perform Markov based guesses using OMEN. This is useful ' +
@@ -158,6 +173,125 @@ def parse_command_line(program_info):
         default = program_info['skip_case']
     )
 
+    parser.add_argument(
+        '--max_queue_size',
+        help='The maximum number of pre-terminals to keep in the priority queue. When it ' +
+            'grows larger than this, the lowest probability items are removed and regenerated ' +
+            'later. Useful to limit memory usage in long running sessions. Default is unlimited',
+        metavar = 'INT',
+        type=int,
+        default=program_info['max_queue_size']
+    )
+
+    parser.add_argument(
+        '--queue_spill',
+        help='Used with --max_queue_size. Instead of regenerating the items removed from ' +
+            'the priority queue, save them to sorted temp files on disk',
+        dest='queue_spill',
+        action='store_const',
+        const= not program_info['queue_spill'],
+        default = program_info['queue_spill']
+    )
+
+    parser.add_argument(
+        '--omen_tmto_length',
+        help='The longest partial OMEN guesses to cache to speed up OMEN guess generation. ' +
+            'Longer lengths are faster but use more memory. 0 turns off the cache. Default is ' +
+            str(program_info['omen_tmto_length']),
+        metavar = 'INT',
+        type=int,
+        default=program_info['omen_tmto_length']
+    )
+
+    parser.add_argument(
+        '--omen_cache_size',
+        help='The maximum number of partial OMEN guesses to cache. Each one takes a few ' +
+            'hundred bytes. The least recently used ones are removed when the cache is full. ' +
+            'Default is ' + '{:,}'.format(program_info['omen_cache_size']),
+        metavar = 'INT',
+        type=int,
+        default=program_info['omen_cache_size']
+    )
+
+    parser.add_argument(
+        '--workers',
+        help='The number of worker processes to generate guesses with. The guesses are still ' +
+            'written out in probability order. Default is 1',
+        metavar = 'INT',
+        type=int,
+        default=program_info['workers']
+    )
+
+    parser.add_argument(
+        '--load_workers',
+        help='The number of worker processes to load the ruleset files with when starting up. ' +
+            'Helps with large rulesets that haven\'t been compiled with compile_ruleset.py. ' +
+            'Use --debug to see how long loading takes. Default is 1',
+        metavar = 'INT',
+        type=int,
+        default=program_info['load_workers']
+    )
+
+    parser.add_argument(
+        '--relaxed_order',
+        help='Used with --workers. Write out guesses as soon as a worker finishes them rather ' +
+            'than in strict probability order. Faster, but the output is only roughly ordered',
+        dest='relaxed_order',
+        action='store_const',
+        const= not program_info['relaxed_order'],
+        default = program_info['relaxed_order']
+    )
+
+    parser.add_argument(
+        '--node',
+        help='Split the guesses between multiple computers. Specified as i/N, where N is ' +
+            'the total number of computers and i is the number of this one, starting at 1. ' +
+            'Every computer must use the same ruleset and options. Example: --node 2/4',
+        metavar = 'i/N',
+        required = False,
+        default = program_info['node']
+    )
+
+    parser.add_argument(
+        '--node_omen_units',
+        help='Used with --node. Split up the OMEN guesses by giving each computer whole ' +
+            '(length, IP) work units of an OMEN level, rather than having every computer ' +
+            'generate all the OMEN guesses and keep every Nth one. Every computer must use ' +
+            'the same setting',
+        dest='node_omen_units',
+        action='store_const',
+        const= not program_info['node_omen_units'],
+        default = program_info['node_omen_units']
+    )
+
+    parser.add_argument(
+        '--checkpoint_interval',
+        help='Save a checkpoint of the whole priority queue every SECONDS seconds, and when ' +
+            'exiting. Restoring a session from a checkpoint is much faster than re-walking ' +
+            'the grammar, and it also allows recovering a session that crashed. Default is off',
+        metavar = 'SECONDS',
+        type=float,
+        default=program_info['checkpoint_interval']
+    )
+
+    parser.add_argument(
+        '--autosave_interval',
+        help='Automatically save the session every SECONDS seconds so progress isn\'t lost if ' +
+            'the program is killed or crashes. Also saves OMEN progress. Default is off',
+        metavar = 'SECONDS',
+        type=float,
+        default=program_info['autosave_interval']
+    )
+
+    parser.add_argument(
+        '--autosave_pts',
+        help='Automatically save the session after every N pre-terminals have been ' +
+            'guessed. Can be used along with --autosave_interval. Default is off',
+        metavar = 'N',
+        type=int,
+        default=program_info['autosave_pts']
+    )
+
     # Debugging and research information
     parser.add_argument(
         '--debug',
@@ -169,6 +303,16 @@ def parse_command_line(program_info):
         default = program_info['debug']
     )
 
+    parser.add_argument(
+        '--profile_startup',
+        help='Prints out how long importing the program and loading the ruleset took ' +
+            'before guesses start being generated.',
+        dest='profile_startup',
+        action='store_const',
+        const= not program_info['profile_startup'],
+        default = program_info['profile_startup']
+    )
+
     parser.add_argument(
         '--mode',
         '-m',
@@ -191,18 +335,109 @@ def parse_command_line(program_info):
 
     # Advanced Options
     program_info['limit'] = args.limit
+    program_info['skip'] = args.skip
     program_info['skip_brute'] = args.skip_brute
     program_info['skip_case'] = args.skip_case
     program_info['cracking_mode'] = args.mode
+    program_info['max_queue_size'] = args.max_queue_size
+    program_info['queue_spill'] = args.queue_spill
+    program_info['omen_tmto_length'] = args.omen_tmto_length
+    program_info['omen_cache_size'] = args.omen_cache_size
+    program_info['workers'] = args.workers
+    program_info['load_workers'] = args.load_workers
+    program_info['relaxed_order'] = args.relaxed_order
+    program_info['node'] = args.node
+    program_info['node_omen_units'] = args.node_omen_units
+    program_info['checkpoint_interval'] = args.checkpoint_interval
+    program_info['autosave_interval'] = args.autosave_interval
+    program_info['autosave_pts'] = args.autosave_pts
 
     # Debugging Options
     program_info['debug'] = args.debug
+    program_info['profile_startup'] = args.profile_startup
 
     # Check validity of options
     if program_info['limit'] and program_info['limit'] <= 0:
         print(f"The guess --limit/-n must be a positive number. The value specified was {program_info['limit']}")
         return False
 
+    if program_info['skip'] < 0:
+        print(f"The --skip must not be a negative number. The value specified was {program_info['skip']}")
+        return False
+
+    if program_info['skip'] and program_info['cracking_mode'] != 'true_prob_order':
+        print("The --skip option is only supported in the true_prob_order mode")
+        return False
+
+    if program_info['max_queue_size'] is not None and program_info['max_queue_size'] <= 0:
+        print(f"The --max_queue_size must be a positive number. The value specified was {program_info['max_queue_size']}")
+        return False
+
+    if program_info['queue_spill'] and program_info['max_queue_size'] is None:
+        print("The --queue_spill option requires --max_queue_size to be set")
+        return False
+
+    if program_info['omen_tmto_length'] < 0:
+        print(f"The --omen_tmto_length must not be a negative number. The value specified was {program_info['omen_tmto_length']}")
+        return False
+
+    if program_info['omen_cache_size'] < 0:
+        print(f"The --omen_cache_size must not be a negative number. The value specified was {program_info['omen_cache_size']}")
+        return False
+
+    if program_info['workers'] <= 0:
+        print(f"The --workers must be a positive number. The value specified was {program_info['workers']}")
+        return False
+
+    if program_info['load_workers'] <= 0:
+        print(f"The --load_workers must be a positive number. The value specified was {program_info['load_workers']}")
+        return False
+
+    if program_info['relaxed_order'] and program_info['workers'] == 1:
+        print("The --relaxed_order option requires --workers to be greater than 1")
+        return False
+
+    if program_info['node'] is not None:
+        try:
+            parse_node_option(program_info['node'])
+        except ValueError as msg:
+            print(msg)
+            return False
+
+        if program_info['cracking_mode'] != 'true_prob_order':
+            print("The --node option is only supported in the true_prob_order mode")
+            return False
+
+    elif program_info['node_omen_units']:
+        print("The --node_omen_units option requires --node")
+        return False
+
+    if program_info['checkpoint_interval'] is not None:
+        if program_info['checkpoint_interval'] <= 0:
+            print(f"The --checkpoint_interval must be a positive number. The value specified was {program_info['checkpoint_interval']}")
+            return False
+
+        if program_info['queue_spill']:
+            print("The --checkpoint_interval option can not be used with --queue_spill")
+            return False
+
+        if program_info['cracking_mode'] != 'true_prob_order':
+            print("The --checkpoint_interval option is only supported in the true_prob_order mode")
+            return False
+
+    if program_info['autosave_interval'] is not None and program_info['autosave_interval'] <= 0:
+        print(f"The --autosave_interval must be a positive number. The value specified was {program_info['autosave_interval']}")
+        return False
+
+    if program_info['autosave_pts'] is not None and program_info['autosave_pts'] <= 0:
+        print(f"The --autosave_pts must be a positive number. The value specified was {program_info['autosave_pts']}")
+        return False
+
+    if program_info['autosave_interval'] is not None or program_info['autosave_pts'] is not None:
+        if program_info['cracking_mode'] != 'true_prob_order':
+            print("The --autosave_interval and --autosave_pts options are only supported in the true_prob_order mode")
+            return False
+
     return True
 
 
@@ -239,9 +474,23 @@ def main():
         # Advanced Options
         'skip_brute': False,
         'skip_case': False,
+        'max_queue_size': None,
+        'queue_spill': False,
+        'omen_tmto_length': 4,
+        'omen_cache_size': 1000000,
+        'workers': 1,
+        'load_workers': 1,
+        'relaxed_order': False,
+        'node': None,
+        'node_omen_units': False,
+        'skip': 0,
+        'checkpoint_interval': None,
+        'autosave_interval': None,
+        'autosave_pts': None,
 
         # Debugging Options
         'debug': False,
+        'profile_startup': False,
 
     }
 
@@ -249,12 +498,23 @@ def main():
     print("Version: " + str(program_info['version']),file=sys.stderr)
     print('',file=sys.stderr)
 
+    profile = StartupProfile(PROGRAM_START)
+    profile.step("Standard library imports")
+
     # Parsing the command line
     if not parse_command_line(program_info):
         # There was a problem with the command line so exit
         print("Exiting...",file=sys.stderr)
         return
 
+    profile.step("Parsing the command line")
+
+    from lib_guesser.pcfg_grammar import PcfgGrammar
+    from lib_guesser.cracking_session import CrackingSession
+    from lib_guesser.honeyword_session import HoneywordSession
+
+    profile.step("Importing the guesser")
+
     # The configfile to load/save the guessing session status
     save_filename = os.path.join(
                         os.path.dirname(os.path.realpath(__file__)),
@@ -288,13 +548,18 @@ def main():
             save_filename,
             skip_brute = program_info['skip_brute'],
             skip_case = program_info['skip_case'],
-            debug = program_info['debug']
+            debug = program_info['debug'],
+            load_workers = program_info['load_workers'],
+            omen_tmto_length = program_info['omen_tmto_length'],
+            omen_cache_size = program_info['omen_cache_size']
             )
 
     except:
         print("Exiting")
         return
 
+    profile.step("Loading the ruleset")
+
     # Initiate cracking mode specific features
     if program_info['cracking_mode'] == 'true_prob_order':
         # Check to see if we need to load up a previous guessing session
@@ -327,17 +592,54 @@ def main():
         else:
             save_config.set('rule_info', 'uuid', pcfg.ruleset_info['uuid'])
 
+        # Set up which guesses this node is responsible for
+        node = None
+        if program_info['node'] is not None:
+            node = NodePartition(
+                *parse_node_option(program_info['node']),
+                omen_units = program_info['node_omen_units']
+                )
+            print("Generating guesses for node " + str(node),file=sys.stderr)
+
         # Initalize the cracking session
-        current_cracking_session = CrackingSession(pcfg, save_config, save_filename)
+        current_cracking_session = CrackingSession(
+            pcfg,
+            save_config,
+            save_filename,
+            max_queue_size = program_info['max_queue_size'],
+            queue_spill = program_info['queue_spill'],
+            workers = program_info['workers'],
+            relaxed_order = program_info['relaxed_order'],
+            node = node,
+            skip = program_info['skip'],
+            checkpoint_interval = program_info['checkpoint_interval'],
+            autosave_interval = program_info['autosave_interval'],
+            autosave_pts = program_info['autosave_pts']
+            )
+
+        profile.step("Setting up the session")
+        if program_info['profile_startup']:
+            profile.print_report()
 
         # Setup is done, now start generating rules
         current_cracking_session.run(load_session = program_info['load_session'], limit = program_info['limit'])
 
+        # Write out any guesses that are still buffered
+        pcfg.shutdown()
+
     elif program_info['cracking_mode'] in ['random_walk', 'honeywords']:
         current_cracking_session = HoneywordSession(pcfg, program_info['cracking_mode'])
+
+        profile.step("Setting up the session")
+        if program_info['profile_startup']:
+            profile.print_report()
+
         # Setup is done, now start generating rules
         current_cracking_session.run(limit = program_info['limit'])
 
+        # Write out any guesses that are still buffered
+        pcfg.shutdown()
+
 
 def create_save_config(program_info):
     """
@@ -410,6 +712,20 @@ def load_save(save_filename, program_info):
         # Set the skip_case flag for not doing case mangling
         program_info['skip_case'] = save_config.getboolean('rule_info','skip_case')
 
+        # Keep the same partition of the guesses if this is one of multiple nodes
+        if save_config.has_option('guessing_info','node'):
+            program_info['node'] = save_config.get('guessing_info','node')
+            try:
+                parse_node_option(program_info['node'])
+            except ValueError as msg:
+                raise configparser.Error(str(msg))
+
+            program_info['node_omen_units'] = save_config.getboolean(
+                'guessing_info',
+                'node_omen_units',
+                fallback = False
+                )
+
         return save_config
 
     except IOError as msg:
@@ -42,13 +42,18 @@ if sys.version_info[0] < 3:
     print("This program requires Python 3.x", file=sys.stderr)
     sys.exit(1)
 
+# Used by --profile_startup. Imported first so the rest of the imports are timed
+from lib_guesser.startup_profile import StartupProfile, start_times
+PROGRAM_START = start_times()
+
 import argparse
 import os
 
 # Local imports
+#
+# Note: The grammar is imported in main() after the command line has been
+# parsed, so printing the help is quick
 from lib_princeling.banner_info import print_banner
-from lib_princeling.wordlist_generation import create_prince_wordlist
-from lib_guesser.pcfg_grammar import PcfgGrammar
 
 def parse_command_line(program_info):
     """
@@ -119,6 +124,16 @@ def parse_command_line(program_info):
         default = program_info['skip_case']
     )
 
+    # Print out how long each part of the program took
+    parser.add_argument(
+        '--profile_startup',
+        help='Prints out how long importing the program, loading the ruleset, and creating the wordlist took',
+        dest='profile_startup',
+        action='store_const',
+        const= not program_info['profile_startup'],
+        default = program_info['profile_startup']
+    )
+
     # Parse all the args and save them
     args=parser.parse_args()
 
@@ -130,6 +145,9 @@ def parse_command_line(program_info):
     # Advanced options
     program_info['skip_case'] = args.skip_case
 
+    # Debugging options
+    program_info['profile_startup'] = args.profile_startup
+
     # Sanity checking of values
     # Check to make sure limit makes sense
     if program_info['max_size'] is not None and program_info['max_size'] <= 0:
@@ -166,18 +184,31 @@ def main():
 
         # Advanced Options
         'skip_case':False,
+
+        # Debugging Options
+        'profile_startup':False,
         }
 
     print_banner()
     print("Version: " + str(program_info['version']),file=sys.stderr)
     print("",file=sys.stderr)
 
+    profile = StartupProfile(PROGRAM_START)
+    profile.step("Standard library imports")
+
     # Parsing the command line
     if not parse_command_line(program_info):
         # There was a problem with the command line so exit
         print("Exiting...",file=sys.stderr)
         return
 
+    profile.step("Parsing the command line")
+
+    from lib_princeling.wordlist_generation import create_prince_wordlist
+    from lib_guesser.pcfg_grammar import PcfgGrammar
+
+    profile.step("Importing the grammar")
+
     # Get the base directory to load all of the rules from
     #
     # Don't want to use the relative path since who knows where someone is
@@ -211,6 +242,8 @@ def main():
         print("Exiting",file=sys.stderr)
         return
 
+    profile.step("Loading the ruleset")
+
     # Set up the wordlist save option, either stdout or write to file
     pcfg.save_to_file(program_info['output_file'])
 
@@ -221,6 +254,10 @@ def main():
 
     pcfg.shutdown()
 
+    profile.step("Creating the wordlist")
+    if program_info['profile_startup']:
+        profile.print_report()
+
 
 if __name__ == "__main__":
     main()
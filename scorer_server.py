@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+
+"""
+
+Name: PCFG Scorer Server
+
+   Loads a ruleset into the PCFG password scorer once, and then keeps
+   running, scoring the passwords that other programs send it over a Unix
+   socket or a TCP port on localhost.
+
+   Requests and replies are one line of JSON each. See
+   lib_scorer/scorer_server.py for the format, and
+   lib_scorer/scorer_client.py for a client that can be used from Python.
+
+   Example:
+       python3 scorer_server.py -r Default --socket /tmp/pcfg_scorer.sock
+
+Copyright 2021 Matt Weir
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+Contact Info: cweir@vt.edu
+
+"""
+
+# Including this to print error message if python < 3.0 is used
+from __future__ import print_function
+import sys
+# Check for python3 and error out if not
+if sys.version_info[0] < 3:
+    print("This program requires Python 3.x", file=sys.stderr)
+    sys.exit(1)
+
+import argparse
+import os
+import signal
+import traceback
+
+# Local imports
+from lib_scorer.pcfg_password_scorer import PCFGPasswordScorer
+from lib_scorer.grammar_io import load_grammar
+from lib_scorer.scorer_server import create_server, server_address, shutdown_server
+
+
+def parse_command_line(program_info):
+    """
+    Parses the command line
+
+    Inputs:
+        program_info: A python dictionary that contains information about
+        the program, and variables which cotain default values for
+        command line options
+
+    Returns:
+        True: If the command line was parsed correctly
+
+        False: If an error occured parsing the command line
+    """
+
+    # Keeping the title text to be generic to make re-using code easier
+    parser = argparse.ArgumentParser(
+        description= program_info['name'] +
+        ', version: ' +
+        program_info['version']
+    )
+
+    parser.add_argument(
+        '--rule',
+        '-r',
+        help = 'The ruleset to use. Default is ' +
+        program_info['rule_name'],
+        metavar = 'RULESET_NAME',
+        required = False,
+        default = program_info['rule_name']
+    )
+
+    parser.add_argument(
+        '--limit',
+        '-l',
+        help = 'The probability to use as a cut-off for password/not_password',
+        metavar = 'LIMIT_PERCENTAGE',
+        required = False,
+        default = program_info['limit'],
+        type = float,
+    )
+
+    parser.add_argument(
+        '--max_omen',
+        '-m',
+        help = 'The maximum OMEN level for categorization as a password. Set to "0" to disable OMEN matching',
+        metavar = 'MAX_OMEN_LEVEL',
+        required = False,
+        default = program_info['max_omen_level'],
+        type = int,
+    )
+
+    # Where to listen for requests. Need one or the other
+    listen = parser.add_mutually_exclusive_group(required = True)
+
+    listen.add_argument(
+        '--socket',
+        help = 'The filename of the Unix socket to listen on',
+        metavar = 'SOCKET_FILENAME',
+        default = program_info['socket_path']
+    )
+
+    listen.add_argument(
+        '--port',
+        help = 'The TCP port to listen on. Only accepts connections from localhost',
+        metavar = 'PORT',
+        type = int,
+        default = program_info['port']
+    )
+
+    args=parser.parse_args()
+
+    program_info['rule_name'] = args.rule
+    program_info['limit'] = args.limit
+    program_info['max_omen_level'] = args.max_omen
+    program_info['socket_path'] = args.socket
+    program_info['port'] = args.port
+
+    # Sanity checking of values
+    if program_info['limit'] < 0 or program_info['limit'] > 1.0:
+        print("Error, limit must be a value between 1.0 and 0.0")
+        return False
+
+    if program_info['port'] is not None and not 0 < program_info['port'] < 65536:
+        print(f"Error, the port must be between 1 and 65535. The value specified was {program_info['port']}")
+        return False
+
+    return True
+
+
+def main():
+    """
+    Main function, starts everything off
+
+    Inputs:
+        None
+
+    Returns:
+        None
+    """
+
+    # Information about this program
+    program_info = {
+        # Program and Contact Info
+        'name':'PCFG Scorer Server',
+        'version': '4.4',
+        'author':'Matt Weir',
+        'contact':'cweir@vt.edu',
+
+        # Standard Options
+        'rule_name':'Default',
+        'limit':0,
+        'max_omen_level':9,
+
+        # Where to listen for requests
+        'socket_path':None,
+        'port':None,
+    }
+
+    print(program_info['name'], file=sys.stderr)
+    print("Version: " + str(program_info['version']), file=sys.stderr)
+
+    # Parsing the command line
+    if not parse_command_line(program_info):
+        # There was a problem with the command line so exit
+        print("Exiting...", file=sys.stderr)
+        return
+
+    base_directory = os.path.join(
+                        os.path.dirname(os.path.realpath(__file__)),
+                        'Rules',
+                        program_info['rule_name'])
+
+    # Load everything the scorer needs, the same as password_scorer.py
+    pw_parser = PCFGPasswordScorer(limit = program_info['limit'])
+
+    print("Loading Rule: " + str(program_info['rule_name']), file=sys.stderr)
+    if not load_grammar(pw_parser, base_directory):
+        print("Exiting...", file=sys.stderr)
+        return
+
+    try:
+        pw_parser.create_multiword_detector()
+        pw_parser.create_omen_scorer(base_directory, program_info['max_omen_level'])
+
+    except Exception as msg:
+        traceback.print_exc(file=sys.stderr)
+        print("Error loading the OMEN ruleset: " + str(msg), file=sys.stderr)
+        print("Exiting...", file=sys.stderr)
+        return
+
+    try:
+        server = create_server(
+            pw_parser,
+            socket_path = program_info['socket_path'],
+            port = program_info['port']
+            )
+
+    except OSError as msg:
+        print("Error opening the socket: " + str(msg), file=sys.stderr)
+        print("Exiting...", file=sys.stderr)
+        return
+
+    # Shut down cleanly, (and remove the socket file), when killed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    print("Listening on " + server_address(server), file=sys.stderr)
+    print("Press Ctrl-C to exit", file=sys.stderr)
+    sys.stderr.flush()
+
+    try:
+        server.serve_forever()
+
+    except KeyboardInterrupt:
+        pass
+
+    finally:
+        shutdown_server(server)
+        print("Exiting...", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()